@@ -1,8 +1,11 @@
 """ Code to allow module store to interface with courseware index """
 from __future__ import absolute_import
 from abc import ABCMeta, abstractmethod
+from copy import copy
 from datetime import timedelta
+from functools import partial
 import logging
+from multiprocessing.pool import ThreadPool
 import re
 from six import add_metaclass
 
@@ -17,6 +20,7 @@ from openedx.core.lib.courses import course_image_url
 from search.search_engine_base import SearchEngine
 from xmodule.annotator_mixin import html_to_text
 from xmodule.modulestore import ModuleStoreEnum
+from xmodule.modulestore.exceptions import ItemNotFoundError
 from xmodule.library_tools import normalize_key_for_search
 
 # REINDEX_AGE is the default amount of time that we look back for changes
@@ -41,6 +45,13 @@ def strip_html_content_to_text(html_content):
     return text_content
 
 
+def _get_version_agnostic_location(location):
+    """
+    Gets the version agnostic location of an item
+    """
+    return location.version_agnostic().replace(branch=None)
+
+
 def indexing_is_enabled():
     """
     Checks to see if the indexing feature is enabled
@@ -86,8 +97,8 @@ class SearchIndexerBase(object):
 
     @classmethod
     @abstractmethod
-    def _fetch_top_level(cls, modulestore, structure_key):
-        """ Fetch the item from the modulestore location """
+    def _fetch_top_level(cls, modulestore, structure_key, depth=None):
+        """ Fetch the item from the modulestore location, with its descendants to the given depth """
 
     @classmethod
     @abstractmethod
@@ -114,7 +125,7 @@ class SearchIndexerBase(object):
         searcher.remove(cls.DOCUMENT_TYPE, result_ids)
 
     @classmethod
-    def index(cls, modulestore, structure_key, triggered_at=None, reindex_age=REINDEX_AGE):
+    def index(cls, modulestore, structure_key, triggered_at=None, reindex_age=REINDEX_AGE, chunked=False):
         """
         Process course for indexing
 
@@ -130,6 +141,12 @@ class SearchIndexerBase(object):
             which items may need to be removed from the index
             If None, then a full reindex takes place
 
+        chunked (bool) - whether the children of the structure, such as the
+            chapters of a course, are loaded and prepared for indexing in a pool
+            of COURSEWARE_INDEX_CHUNKED_REINDEX['WORKERS'] threads, and indexed
+            as they're prepared, in bulk requests of at most 'BULK_SIZE' items,
+            rather than loaded with the whole structure and indexed at once
+
         Returns:
         Number of items that have been added to the index
         """
@@ -141,10 +158,7 @@ class SearchIndexerBase(object):
         structure_key = cls.normalize_structure_key(structure_key)
         location_info = cls._get_location_info(structure_key)
 
-        # Wrap counter in dictionary - otherwise we seem to lose scope inside the embedded function `prepare_item_index`
-        indexed_count = {
-            "count": 0
-        }
+        indexed_count = 0
 
         # indexed_items is a list of all the items that we wish to remain in the
         # index, whether or not we are planning to actually update their index.
@@ -154,22 +168,26 @@ class SearchIndexerBase(object):
 
         # items_index is a list of all the items index dictionaries.
         # it is used to collect all indexes and index them using bulk API,
-        # instead of per item index API call.
+        # instead of per item index API call.  In chunked mode, it only holds
+        # the items which haven't been indexed yet.
         items_index = []
 
         def get_item_location(item):
             """
             Gets the version agnostic item location
             """
-            return item.location.version_agnostic().replace(branch=None)
+            return _get_version_agnostic_location(item.location)
 
-        def prepare_item_index(item, skip_index=False, groups_usage_info=None):
+        def prepare_item_index(item, prepared_items, skip_index=False, groups_usage_info=None):
             """
-            Add this item to the items_index and indexed_items list
+            Add this item to the prepared_items and indexed_items list
 
             Arguments:
             item - item to add to index, its children will be processed recursively
 
+            prepared_items - list of the items index dictionaries to which the
+                item is added, such as items_index
+
             skip_index - simply walk the children in the tree, the content change is
                 older than the REINDEX_AGE window and would have been already indexed.
                 This should really only be passed from the recursive child calls when
@@ -187,20 +205,7 @@ class SearchIndexerBase(object):
             item_content_groups = None
 
             if item.category == "split_test":
-                split_partition = item.get_selected_partition()
-                for split_test_child in item.get_children():
-                    if split_partition:
-                        for group in split_partition.groups:
-                            group_id = unicode(group.id)
-                            child_location = item.group_id_to_child.get(group_id, None)
-                            if child_location == split_test_child.location:
-                                groups_usage_info.update({
-                                    unicode(get_item_location(split_test_child)): [group_id],
-                                })
-                                for component in split_test_child.get_children():
-                                    groups_usage_info.update({
-                                        unicode(get_item_location(component)): [group_id]
-                                    })
+                groups_usage_info.update(cls._get_split_test_group_usage(item))
 
             if groups_usage_info:
                 item_location = get_item_location(item)
@@ -218,6 +223,7 @@ class SearchIndexerBase(object):
                         children_groups_usage.append(
                             prepare_item_index(
                                 child_item,
+                                prepared_items,
                                 skip_index=skip_child_index,
                                 groups_usage_info=groups_usage_info
                             )
@@ -228,36 +234,69 @@ class SearchIndexerBase(object):
             if skip_index or not item_index_dictionary:
                 return
 
-            item_index = {}
             # if it has something to add to the index, then add it
             try:
-                item_index.update(location_info)
-                item_index.update(item_index_dictionary)
-                item_index['id'] = item_id
-                if item.start:
-                    item_index['start_date'] = item.start
-                item_index['content_groups'] = item_content_groups if item_content_groups else None
-                item_index.update(cls.supplemental_fields(item))
-                items_index.append(item_index)
-                indexed_count["count"] += 1
+                item_index = cls._build_item_index(
+                    item, item_id, item_index_dictionary, location_info, item_content_groups
+                )
+                prepared_items.append(item_index)
                 return item_content_groups
             except Exception as err:  # pylint: disable=broad-except
                 # broad exception so that index operation does not fail on one item of many
                 log.warning('Could not index item: %s - %r', item.location, err)
                 error_list.append(_('Could not index item: {}').format(item.location))
 
+        def prepare_child_index(child_location, groups_usage_info):
+            """
+            Loads the child of the structure at child_location, and returns the
+            list of the index dictionaries of the child and its descendants.
+            Runs in the threads of the pool of the chunked mode.
+            """
+            child_index = []
+            # The branch setting is local to each thread
+            with modulestore.branch_setting(ModuleStoreEnum.RevisionOption.published_only):
+                try:
+                    child = modulestore.get_item(child_location, depth=None)
+                except ItemNotFoundError:
+                    return child_index
+                # The content groups of split_test children are added while walking the child
+                prepare_item_index(child, child_index, groups_usage_info=copy(groups_usage_info))
+            return child_index
+
         try:
             with modulestore.branch_setting(ModuleStoreEnum.RevisionOption.published_only):
-                structure = cls._fetch_top_level(modulestore, structure_key)
+                structure = cls._fetch_top_level(modulestore, structure_key, depth=0 if chunked else None)
                 groups_usage_info = cls.fetch_group_usage(modulestore, structure)
 
                 # First perform any additional indexing from the structure object
                 cls.supplemental_index_information(modulestore, structure)
 
                 # Now index the content
-                for item in structure.get_children():
-                    prepare_item_index(item, groups_usage_info=groups_usage_info)
-                searcher.index(cls.DOCUMENT_TYPE, items_index)
+                if chunked:
+                    workers = settings.COURSEWARE_INDEX_CHUNKED_REINDEX['WORKERS']
+                    bulk_size = settings.COURSEWARE_INDEX_CHUNKED_REINDEX['BULK_SIZE']
+                    pool = ThreadPool(workers)
+                    try:
+                        children_index = pool.imap(
+                            partial(prepare_child_index, groups_usage_info=groups_usage_info),
+                            structure.children
+                        )
+                        for child_index in children_index:
+                            items_index.extend(child_index)
+                            while len(items_index) >= bulk_size:
+                                searcher.index(cls.DOCUMENT_TYPE, items_index[:bulk_size])
+                                indexed_count += bulk_size
+                                del items_index[:bulk_size]
+                    finally:
+                        pool.terminate()
+                    if items_index:
+                        searcher.index(cls.DOCUMENT_TYPE, items_index)
+                        indexed_count += len(items_index)
+                else:
+                    for item in structure.get_children():
+                        prepare_item_index(item, items_index, groups_usage_info=groups_usage_info)
+                    searcher.index(cls.DOCUMENT_TYPE, items_index)
+                    indexed_count = len(items_index)
                 cls.remove_deleted_items(searcher, structure_key, indexed_items)
         except Exception as err:  # pylint: disable=broad-except
             # broad exception so that index operation does not prevent the rest of the application from working
@@ -271,15 +310,280 @@ class SearchIndexerBase(object):
         if error_list:
             raise SearchIndexingError('Error(s) present during indexing', error_list)
 
-        return indexed_count["count"]
+        return indexed_count
+
+    @classmethod
+    def index_changes(cls, modulestore, structure_key, changed_usage_keys):
+        """
+        Process changed blocks of course for indexing, without walking the
+        whole course: only the published subtrees of the changed blocks and
+        their ancestors are loaded and indexed.  The items of the index
+        below the changed blocks which are no longer published, such as
+        deleted children, are found by their ancestors and removed from the
+        index.  The whole course is indexed when the course itself changed.
+
+        Arguments:
+        modulestore - modulestore object to use for operations
+
+        structure_key (CourseKey|LibraryKey) - course or library identifier
+
+        changed_usage_keys (set(UsageKey)) - usage keys of the roots of the
+            published or deleted subtrees, as sent with the course_published signal
+
+        Returns:
+        Number of items that have been added to the index
+        """
+        error_list = []
+        searcher = SearchEngine.get_search_engine(cls.INDEX_NAME)
+        if not searcher:
+            return
+
+        structure_key = cls.normalize_structure_key(structure_key)
+        location_info = cls._get_location_info(structure_key)
+
+        # indexed_items are the ids of the items whose index has been
+        # prepared, and items_index their index dictionaries, indexed with
+        # the bulk API.  removed_items are the ids of the items to remove,
+        # along with the items below changed_items in the index, other than
+        # indexed_items.
+        indexed_items = set()
+        items_index = []
+        removed_items = set()
+        changed_items = set()
+
+        # The content groups of the items, as computed by get_content_groups, by location.
+        content_groups = {}
+
+        def get_item_id(item):
+            """
+            Gets the id of the item in the index
+            """
+            return unicode(cls._id_modifier(item.scope_ids.usage_id))
+
+        def get_index_dictionary(item):
+            """
+            Gets the index dictionary of the item, or None if it's not indexable
+            """
+            return item.index_dictionary() if hasattr(item, "index_dictionary") else None
+
+        def get_published_children(item):
+            """
+            Gets the children of the item which have been published
+            """
+            if not item.has_children:
+                return []
+            return [child for child in item.get_children() if modulestore.has_published_version(child)]
+
+        def get_content_groups(item):
+            """
+            Gets the content groups of the item: those the item is assigned to,
+            if its published children are all indexable and in content groups,
+            as when walking the whole course in `index`.  Only the children of
+            items assigned to content groups are loaded.
+            """
+            item_location = unicode(_get_version_agnostic_location(item.location))
+            if item_location not in content_groups:
+                item_content_groups = groups_usage_info.get(item_location, None)
+                if item_content_groups:
+                    for child in get_published_children(item):
+                        if not get_index_dictionary(child) or not get_content_groups(child):
+                            item_content_groups = None
+                            break
+                content_groups[item_location] = item_content_groups
+            return content_groups[item_location]
+
+        def prepare_item_index(item):
+            """
+            Add this item to the items_index and indexed_items list, once
+            """
+            item_id = get_item_id(item)
+            if item_id in indexed_items:
+                return
+            indexed_items.add(item_id)
+            removed_items.discard(item_id)
+
+            item_index_dictionary = get_index_dictionary(item)
+            if not item_index_dictionary:
+                return
+            try:
+                items_index.append(cls._build_item_index(
+                    item, item_id, item_index_dictionary, location_info, get_content_groups(item)
+                ))
+            except Exception as err:  # pylint: disable=broad-except
+                # broad exception so that index operation does not fail on one item of many
+                log.warning('Could not index item: %s - %r', item.location, err)
+                error_list.append(_('Could not index item: {}').format(item.location))
+
+        def get_subtree(item):
+            """
+            Gets the item and its published descendants
+            """
+            subtree = [item]
+            for child in get_published_children(item):
+                subtree.extend(get_subtree(child))
+            return subtree
+
+        def get_ancestors(item):
+            """
+            Gets the ancestors of the item below the structure, or None if the
+            item isn't reachable from the structure
+            """
+            ancestors = []
+            parent = item.get_parent()
+            while parent is not None and parent.location.block_type != structure.location.block_type:
+                ancestors.append(parent)
+                parent = parent.get_parent()
+            return ancestors if parent is not None else None
+
+        # The whole structure is indexed instead if the structure itself changed.
+        reindex_structure = False
+        groups_usage_info = {}
+
+        try:
+            with modulestore.branch_setting(ModuleStoreEnum.RevisionOption.published_only):
+                with modulestore.bulk_operations(structure_key):
+                    structure = cls._fetch_top_level(modulestore, structure_key, depth=0)
+                    reindex_structure = any(
+                        usage_key.block_type == structure.location.block_type for usage_key in changed_usage_keys
+                    )
+                    if not reindex_structure:
+                        groups_usage_info.update(cls.fetch_group_usage(modulestore, structure) or {})
+                        groups_usage_info.update(cls.fetch_split_test_group_usage(modulestore, structure_key))
+
+                        cls.supplemental_index_information(modulestore, structure)
+
+                        for usage_key in changed_usage_keys:
+                            changed_item = unicode(cls._id_modifier(_get_version_agnostic_location(usage_key)))
+                            changed_items.add(changed_item)
+                            if not modulestore.has_item(usage_key):
+                                # The subtree was deleted.
+                                removed_items.add(changed_item)
+                                continue
+
+                            item = modulestore.get_item(usage_key, depth=None)
+                            ancestors = get_ancestors(item)
+                            if ancestors is None:
+                                # The subtree isn't reachable from the structure any more.
+                                removed_items.update(
+                                    get_item_id(descendant) for descendant in get_subtree(item)
+                                    if get_item_id(descendant) not in indexed_items
+                                )
+                                continue
+
+                            for descendant in get_subtree(item):
+                                prepare_item_index(descendant)
+                            # Ancestors are indexed again, since their content groups depend on their descendants.
+                            for ancestor in ancestors:
+                                prepare_item_index(ancestor)
+
+                        if items_index:
+                            searcher.index(cls.DOCUMENT_TYPE, items_index)
+                        for changed_item in changed_items:
+                            removed_items.update(
+                                cls._get_descendant_items(searcher, structure_key, changed_item, indexed_items)
+                            )
+                        if removed_items:
+                            searcher.remove(cls.DOCUMENT_TYPE, list(removed_items))
+        except Exception as err:  # pylint: disable=broad-except
+            # broad exception so that index operation does not prevent the rest of the application from working
+            log.exception(
+                "Indexing error encountered, courseware index may be out of date %s - %r",
+                structure_key,
+                err
+            )
+            error_list.append(_('General indexing error occurred'))
+
+        if error_list:
+            raise SearchIndexingError('Error(s) present during indexing', error_list)
+
+        if reindex_structure:
+            return cls.index(modulestore, structure_key)
+        return len(items_index)
+
+    @classmethod
+    def _get_descendant_items(cls, searcher, structure_key, ancestor_item, exclude_items):
+        """
+        Returns the ids of the items present in the search index below the
+        item whose id is ancestor_item, other than exclude_items
+        """
+        field_dictionary = cls._get_location_info(structure_key)
+        field_dictionary['ancestors'] = ancestor_item
+        response = searcher.search(
+            doc_type=cls.DOCUMENT_TYPE,
+            field_dictionary=field_dictionary,
+            exclude_dictionary={"id": list(exclude_items)}
+        )
+        return [result["data"]["id"] for result in response["results"]]
+
+    @classmethod
+    def _build_item_index(cls, item, item_id, item_index_dictionary, location_info, item_content_groups):
+        """
+        Builds the index dictionary submitted to the index for the item
+        """
+        item_index = {}
+        item_index.update(location_info)
+        item_index.update(item_index_dictionary)
+        item_index['id'] = item_id
+        item_index['ancestors'] = cls._get_ancestor_items(item)
+        if item.start:
+            item_index['start_date'] = item.start
+        item_index['content_groups'] = item_content_groups if item_content_groups else None
+        item_index.update(cls.supplemental_fields(item))
+        return item_index
+
+    @classmethod
+    def _get_ancestor_items(cls, item):
+        """
+        Returns the ids of the ancestors of the item in the index, so that the
+        items below a changed item can be found when indexing changes
+        """
+        ancestor_items = []
+        parent = item.get_parent()
+        while parent is not None:
+            ancestor_items.append(unicode(cls._id_modifier(_get_version_agnostic_location(parent.location))))
+            parent = parent.get_parent()
+        return ancestor_items
+
+    @classmethod
+    def _get_split_test_group_usage(cls, split_test):
+        """
+        Returns a dictionary of the content groups of the children of the
+        split_test, and of their children, which are assigned to the group of
+        the selected partition they're shown to
+        """
+        groups_usage = {}
+        split_partition = split_test.get_selected_partition()
+        if not split_partition:
+            return groups_usage
+        for split_test_child in split_test.get_children():
+            for group in split_partition.groups:
+                group_id = unicode(group.id)
+                child_location = split_test.group_id_to_child.get(group_id, None)
+                if child_location == split_test_child.location:
+                    groups_usage[unicode(_get_version_agnostic_location(split_test_child.location))] = [group_id]
+                    for component_location in split_test_child.children:
+                        groups_usage[unicode(_get_version_agnostic_location(component_location))] = [group_id]
+        return groups_usage
 
     @classmethod
-    def _do_reindex(cls, modulestore, structure_key):
+    def fetch_split_test_group_usage(cls, modulestore, structure_key):
+        """
+        Returns a dictionary of the content groups of the children of all the
+        split_tests in the structure, and of their children, as assigned when
+        walking the structure in `index`.
+        """
+        groups_usage = {}
+        for split_test in modulestore.get_items(structure_key, qualifiers={'category': 'split_test'}):
+            groups_usage.update(cls._get_split_test_group_usage(split_test))
+        return groups_usage
+
+    @classmethod
+    def _do_reindex(cls, modulestore, structure_key, chunked=False):
         """
         (Re)index all content within the given structure (course or library),
         tracking the fact that a full reindex has taken place
         """
-        indexed_count = cls.index(modulestore, structure_key)
+        indexed_count = cls.index(modulestore, structure_key, chunked=chunked)
         if indexed_count:
             cls._track_index_request(cls.INDEX_EVENT['name'], cls.INDEX_EVENT['category'], indexed_count)
         return indexed_count
@@ -358,9 +662,9 @@ class CoursewareSearchIndexer(SearchIndexerBase):
         return structure_key
 
     @classmethod
-    def _fetch_top_level(cls, modulestore, structure_key):
+    def _fetch_top_level(cls, modulestore, structure_key, depth=None):
         """ Fetch the item from the modulestore location """
-        return modulestore.get_course(structure_key, depth=None)
+        return modulestore.get_course(structure_key, depth=depth)
 
     @classmethod
     def _get_location_info(cls, normalized_structure_key):
@@ -371,8 +675,11 @@ class CoursewareSearchIndexer(SearchIndexerBase):
     def do_course_reindex(cls, modulestore, course_key):
         """
         (Re)index all content within the given course, tracking the fact that a full reindex has taken place
+
+        The course is reindexed by chapter, in chunks, when COURSEWARE_INDEX_CHUNKED_REINDEX has workers
         """
-        return cls._do_reindex(modulestore, course_key)
+        chunked = settings.COURSEWARE_INDEX_CHUNKED_REINDEX['WORKERS'] > 0
+        return cls._do_reindex(modulestore, course_key, chunked=chunked)
 
     @classmethod
     def fetch_group_usage(cls, modulestore, structure):
@@ -446,9 +753,9 @@ class LibrarySearchIndexer(SearchIndexerBase):
         return normalize_key_for_search(structure_key)
 
     @classmethod
-    def _fetch_top_level(cls, modulestore, structure_key):
+    def _fetch_top_level(cls, modulestore, structure_key, depth=None):
         """ Fetch the item from the modulestore location """
-        return modulestore.get_library(structure_key, depth=None)
+        return modulestore.get_library(structure_key, depth=depth)
 
     @classmethod
     def _get_location_info(cls, normalized_structure_key):
@@ -0,0 +1,89 @@
+"""
+Management command to compare the codecs of the course structure cache on the
+structures of split courses.
+"""
+from optparse import make_option
+from textwrap import dedent
+import itertools
+import timeit
+
+from django.core.management import BaseCommand, CommandError
+from opaque_keys import InvalidKeyError
+from opaque_keys.edx.keys import CourseKey
+
+from xmodule.modulestore import ModuleStoreEnum
+from xmodule.modulestore.django import modulestore
+from xmodule.modulestore.split_mongo.mongo_connection import STRUCTURE_SERIALIZERS, structure_from_mongo
+from xmodule.util.codecs import Codec, COMPRESSORS, PickleSerializer, lz4
+
+
+class Command(BaseCommand):
+    """
+    Compares the size of the course structures of the given split courses, and
+    the time taken to encode and decode them, with each codec of the course
+    structure cache.  'legacy' is the format used before codecs, a pickle of
+    structures whose blocks are all converted to BlockData.
+
+    The courses in common/test/data are representative test data, e.g.:
+
+        ./manage.py cms import common/test/data toy simple graded
+        ./manage.py cms benchmark_structure_codecs course-v1:edX+toy+2012_Fall
+    """
+    help = dedent(__doc__)
+
+    args = "<course_id course_id ...>"
+
+    option_list = BaseCommand.option_list + (
+        make_option(
+            '--number',
+            type='int',
+            dest='number',
+            default=10,
+            help='The number of times each structure is encoded and decoded'
+        ),)
+
+    def handle(self, *args, **options):
+        if not args:
+            raise CommandError("benchmark_structure_codecs requires one or more course ids")
+
+        try:
+            course_keys = [CourseKey.from_string(arg) for arg in args]
+        except InvalidKeyError as error:
+            raise CommandError(u"Invalid course id: {}".format(error))
+
+        compressors = [name for name in sorted(COMPRESSORS) if name != 'lz4' or lz4 is not None]
+        codecs = [('legacy', Codec(PickleSerializer(), COMPRESSORS['zlib']), False)] + [
+            (
+                u'{}+{}'.format(serializer, compressor),
+                Codec(STRUCTURE_SERIALIZERS[serializer], COMPRESSORS[compressor], STRUCTURE_SERIALIZERS.values()),
+                True,
+            )
+            for serializer, compressor in itertools.product(sorted(STRUCTURE_SERIALIZERS), compressors)
+        ]
+
+        for course_key in course_keys:
+            document = self._get_structure_document(course_key)
+            self.stdout.write(u"{} ({} blocks)\n".format(course_key, len(document['blocks'])))
+            for name, codec, lazy in codecs:
+                structure = structure_from_mongo(dict(document), lazy=lazy)
+                data = codec.encode(structure)
+                encode_time = min(timeit.repeat(lambda: codec.encode(structure), number=1, repeat=options['number']))
+                decode_time = min(timeit.repeat(lambda: codec.decode(data), number=1, repeat=options['number']))
+                self.stdout.write(u"  {:<12} {:>10} bytes  encode {:>8.2f}ms  decode {:>8.2f}ms\n".format(
+                    name, len(data), encode_time * 1000, decode_time * 1000
+                ))
+
+    def _get_structure_document(self, course_key):
+        """
+        Returns the mongo document of the published structure of the split
+        course `course_key`.
+        """
+        store = modulestore()._get_modulestore_for_courselike(course_key)  # pylint: disable=protected-access
+        if store.get_modulestore_type() != ModuleStoreEnum.Type.split:
+            raise CommandError(u"{} is not a split course".format(course_key))
+
+        index = store.get_course_index_info(course_key)
+        if index is None:
+            raise CommandError(u"{} does not exist".format(course_key))
+        version = index['versions'].get(ModuleStoreEnum.BranchName.published) or index['versions'].values()[0]
+        return store.db_connection.structures.find_one({'_id': version})
@@ -36,7 +36,12 @@ def listen_for_course_publish(sender, course_key, **kwargs):  # pylint: disable=
         # import here, because signal is registered at startup, but items in tasks are not yet able to be loaded
         from .tasks import update_search_index
 
-        update_search_index.delay(unicode(course_key), datetime.now(UTC).isoformat())
+        # Only the changed blocks are indexed when they're known
+        changed_usage_keys = kwargs.get('changed_usage_keys')
+        if changed_usage_keys is not None:
+            changed_usage_keys = [unicode(usage_key) for usage_key in changed_usage_keys]
+
+        update_search_index.delay(unicode(course_key), datetime.now(UTC).isoformat(), changed_usage_keys)
 
 
 @receiver(SignalHandler.library_updated)
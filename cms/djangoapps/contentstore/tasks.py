@@ -13,7 +13,7 @@ from django.contrib.auth.models import User
 from contentstore.courseware_index import CoursewareSearchIndexer, LibrarySearchIndexer, SearchIndexingError
 from contentstore.utils import initialize_permissions
 from course_action_state.models import CourseRerunState
-from opaque_keys.edx.keys import CourseKey
+from opaque_keys.edx.keys import CourseKey, UsageKey
 from xmodule.course_module import CourseFields
 from xmodule.modulestore.django import modulestore
 from xmodule.modulestore.exceptions import DuplicateCourseError, ItemNotFoundError
@@ -92,11 +92,24 @@ def _parse_time(time_isoformat):
 
 
 @task()
-def update_search_index(course_id, triggered_time_isoformat):
-    """ Updates course search index. """
+def update_search_index(course_id, triggered_time_isoformat, changed_usage_keys=None):
+    """
+    Updates course search index.
+
+    If changed_usage_keys is given, only the subtrees of those blocks are indexed.
+    """
     try:
         course_key = CourseKey.from_string(course_id)
-        CoursewareSearchIndexer.index(modulestore(), course_key, triggered_at=(_parse_time(triggered_time_isoformat)))
+        if changed_usage_keys is not None:
+            CoursewareSearchIndexer.index_changes(
+                modulestore(),
+                course_key,
+                {UsageKey.from_string(usage_key) for usage_key in changed_usage_keys}
+            )
+        else:
+            CoursewareSearchIndexer.index(
+                modulestore(), course_key, triggered_at=(_parse_time(triggered_time_isoformat))
+            )
 
     except SearchIndexingError as exc:
         LOGGER.error('Search indexing error for complete course %s - %s', course_id, unicode(exc))
@@ -13,6 +13,7 @@ from uuid import uuid4
 from unittest import skip
 
 from django.conf import settings
+from django.test.utils import override_settings
 
 from course_modes.models import CourseMode
 from openedx.core.djangoapps.models.course_details import CourseDetails
@@ -258,6 +259,14 @@ class TestCoursewareSearchIndexer(MixedWithOptionsTestCase):
             reindex_age=(trigger_time - since_time)
         )
 
+    def index_changes(self, store, changed_locations):
+        """ index the changed subtrees of the course, as sent with the course_published signal """
+        return CoursewareSearchIndexer.index_changes(
+            store,
+            self.course.id,
+            {location.for_branch(None) for location in changed_locations}
+        )
+
     def _get_default_search(self):
         return {"course": unicode(self.course.id)}
 
@@ -537,6 +546,77 @@ class TestCoursewareSearchIndexer(MixedWithOptionsTestCase):
         self.assertEqual(result["course_name"], "Search Index Test Course")
         self.assertEqual(result["location"], ["Week 1", CoursewareSearchIndexer.UNNAMED_MODULE_NAME, "Subsection 2"])
 
+    @override_settings(COURSEWARE_INDEX_CHUNKED_REINDEX={'WORKERS': 2, 'BULK_SIZE': 2})
+    def _test_chunked_reindex(self, store):
+        """ Test that a chunked reindex indexes the chapters in bulk requests of bounded size """
+        ItemFactory.create(
+            parent_location=self.course.location,
+            category='chapter',
+            display_name="Week 2",
+            modulestore=store,
+            publish_item=True,
+            start=datetime(2015, 3, 1, tzinfo=UTC),
+        )
+        self.publish_item(store, self.vertical.location)
+        indexed_count = self.reindex_course(store)
+        self.assertEqual(indexed_count, 5)
+        response = self.search()
+        self.assertEqual(response["total"], 5)
+
+        # Deleted items are removed once all the chapters are indexed
+        self.delete_item(store, self.html_unit.location)
+        self.publish_item(store, self.vertical.location)
+        indexed_count = self.reindex_course(store)
+        self.assertEqual(indexed_count, 4)
+        response = self.search()
+        self.assertEqual(response["total"], 4)
+
+        with patch(settings.SEARCH_ENGINE + '.index') as mock_index:
+            self.reindex_course(store)
+        self.assertEqual([len(args[1]) for args, __ in mock_index.call_args_list], [2, 2])
+
+    def _test_index_changes(self, store):
+        """ Test that indexing changes indexes only the changed subtrees and their ancestors """
+        chapter2 = ItemFactory.create(
+            parent_location=self.course.location,
+            category='chapter',
+            display_name="Week 2",
+            modulestore=store,
+            publish_item=True,
+            start=datetime(2015, 3, 1, tzinfo=UTC),
+        )
+        self.publish_item(store, self.vertical.location)
+        indexed_count = self.reindex_course(store)
+        self.assertEqual(indexed_count, 5)
+
+        # Replace the html unit with another one
+        self.delete_item(store, self.html_unit.location)
+        html_unit2 = ItemFactory.create(
+            parent_location=self.vertical.location,
+            category="html",
+            display_name="Some other content",
+            publish_item=False,
+            modulestore=store,
+        )
+        self.publish_item(store, self.vertical.location)
+
+        # The vertical, the new html unit, and their ancestors are indexed, but not the other chapter
+        indexed_count = self.index_changes(store, {self.vertical.location})
+        self.assertEqual(indexed_count, 4)
+        response = self.search()
+        self.assertEqual(response["total"], 5)
+        indexed_ids = {result["data"]["id"] for result in response["results"]}
+        self.assertIn(unicode(html_unit2.location), indexed_ids)
+        self.assertIn(unicode(chapter2.location), indexed_ids)
+        self.assertNotIn(unicode(self.html_unit.location), indexed_ids)
+
+    def _test_index_changes_of_course(self, store):
+        """ Test that indexing changes of the course itself indexes the whole course """
+        indexed_count = self.index_changes(store, {self.course.location})
+        self.assertEqual(indexed_count, 3)
+        response = self.search()
+        self.assertEqual(response["total"], 3)
+
     @patch('django.conf.settings.SEARCH_ENGINE', 'search.tests.utils.ErroringIndexEngine')
     def _test_exception(self, store):
         """ Test that exception within indexing yields a SearchIndexingError """
@@ -572,6 +652,18 @@ class TestCoursewareSearchIndexer(MixedWithOptionsTestCase):
     def test_time_based_index(self, store_type):
         self._perform_test_using_store(store_type, self._test_time_based_index)
 
+    @ddt.data(*WORKS_WITH_STORES)
+    def test_chunked_reindex(self, store_type):
+        self._perform_test_using_store(store_type, self._test_chunked_reindex)
+
+    @ddt.data(*WORKS_WITH_STORES)
+    def test_index_changes(self, store_type):
+        self._perform_test_using_store(store_type, self._test_index_changes)
+
+    @ddt.data(*WORKS_WITH_STORES)
+    def test_index_changes_of_course(self, store_type):
+        self._perform_test_using_store(store_type, self._test_index_changes_of_course)
+
     @ddt.data(*WORKS_WITH_STORES)
     def test_exception(self, store_type):
         self._perform_test_using_store(store_type, self._test_exception)
@@ -760,6 +852,19 @@ class TestTaskExecution(SharedModuleStoreTestCase):
         )
         self.assertEqual(response["total"], 3)
 
+    def test_task_indexing_course_changes(self):
+        """ Making sure that the receiver indexes the changed blocks when they're sent with the signal """
+        searcher = SearchEngine.get_search_engine(CoursewareSearchIndexer.INDEX_NAME)
+
+        listen_for_course_publish(self, self.course.id, changed_usage_keys={self.vertical.location.for_branch(None)})
+
+        # Note that this test will only succeed if celery is working in inline mode
+        response = searcher.search(
+            doc_type=CoursewareSearchIndexer.DOCUMENT_TYPE,
+            field_dictionary={"course": unicode(self.course.id)}
+        )
+        self.assertEqual(response["total"], 3)
+
     def test_task_library_update(self):
         """ Making sure that the receiver correctly fires off the task when invoked by signal """
         searcher = SearchEngine.get_search_engine(LibrarySearchIndexer.INDEX_NAME)
@@ -1164,6 +1269,17 @@ class GroupConfigurationSearchMongo(CourseTestCase, MixedWithOptionsTestCase):
             kwargs={'group_configuration_id': cid},
         )
 
+    def _ancestors(self, block):
+        """
+        Return the ids of the ancestors of the block, as they're indexed.
+        """
+        ancestors = []
+        parent_location = self.store.get_parent_location(block.location)
+        while parent_location is not None:
+            ancestors.append(unicode(parent_location.version_agnostic().replace(branch=None)))
+            parent_location = self.store.get_parent_location(parent_location)
+        return ancestors
+
     def _html_group_result(self, html_unit, content_groups):
         """
         Return object with arguments and content group for html_unit.
@@ -1171,6 +1287,7 @@ class GroupConfigurationSearchMongo(CourseTestCase, MixedWithOptionsTestCase):
         return {
             'course_name': self.course.display_name,
             'id': unicode(html_unit.location),
+            'ancestors': self._ancestors(html_unit),
             'content': {'html_content': '', 'display_name': html_unit.display_name},
             'course': unicode(self.course.id),
             'location': [
@@ -1191,6 +1308,7 @@ class GroupConfigurationSearchMongo(CourseTestCase, MixedWithOptionsTestCase):
         return {
             'course_name': self.course.display_name,
             'id': unicode(html_unit.location),
+            'ancestors': self._ancestors(html_unit),
             'content': {'html_content': '', 'display_name': html_unit.display_name},
             'course': unicode(self.course.id),
             'location': [
@@ -1220,6 +1338,7 @@ class GroupConfigurationSearchMongo(CourseTestCase, MixedWithOptionsTestCase):
             'content_type': 'Sequence',
             'content_groups': content_groups,
             'id': unicode(vertical.location),
+            'ancestors': self._ancestors(vertical),
             'course_name': self.course.display_name,
             'org': self.course.org
         }
@@ -1231,6 +1350,7 @@ class GroupConfigurationSearchMongo(CourseTestCase, MixedWithOptionsTestCase):
         return {
             'course_name': self.course.display_name,
             'id': unicode(html_unit.location),
+            'ancestors': self._ancestors(html_unit),
             'content': {'html_content': '', 'display_name': html_unit.display_name},
             'course': unicode(self.course.id),
             'location': [
@@ -1322,6 +1442,30 @@ class GroupConfigurationSearchMongo(CourseTestCase, MixedWithOptionsTestCase):
             )
             mock_index.reset_mock()
 
+    def test_content_group_gets_indexed_on_changes(self):
+        """ indexing changes of a course with content groups test """
+        group_access_content = {'group_access': {666: [1]}}
+
+        self.client.ajax_post(
+            reverse_usage_url("xblock_handler", self.html_unit1.location),
+            data={'metadata': group_access_content}
+        )
+
+        self.publish_item(self.store, self.html_unit1.location)
+        self.publish_item(self.store, self.split_test_unit.location)
+
+        with patch(settings.SEARCH_ENGINE + '.index') as mock_index:
+            CoursewareSearchIndexer.index_changes(
+                self.store,
+                self.course.id,
+                {self.html_unit1.location.for_branch(None), self.html_unit4.location.for_branch(None)}
+            )
+            self.assertTrue(mock_index.called)
+            indexed_content = self._get_index_values_from_call_args(mock_index)
+            self.assertIn(self._html_group_result(self.html_unit1, [1]), indexed_content)
+            self.assertIn(self._html_experiment_group_result(self.html_unit4, [unicode(2)]), indexed_content)
+            self.assertNotIn(self._html_nogroup_result(self.html_unit2), indexed_content)
+
     def test_content_group_not_assigned(self):
         """ indexing course without content groups added test """
 
@@ -308,6 +308,11 @@ XBLOCK_FIELD_DATA_WRAPPERS = ENV_TOKENS.get(
 )
 
 CONTENTSTORE = AUTH_TOKENS['CONTENTSTORE']
+STATIC_CONTENT_DISK_CACHE.update(ENV_TOKENS.get('STATIC_CONTENT_DISK_CACHE', {}))
+COURSE_STRUCTURE_LOCAL_CACHE_SIZE = ENV_TOKENS.get(
+    'COURSE_STRUCTURE_LOCAL_CACHE_SIZE', COURSE_STRUCTURE_LOCAL_CACHE_SIZE
+)
+COURSE_STRUCTURE_CACHE_CODEC.update(ENV_TOKENS.get('COURSE_STRUCTURE_CACHE_CODEC', {}))
 DOC_STORE_CONFIG = AUTH_TOKENS['DOC_STORE_CONFIG']
 # Datadog for events!
 DATADOG = AUTH_TOKENS.get("DATADOG", {})
@@ -384,6 +389,7 @@ if FEATURES['ENABLE_COURSEWARE_INDEX'] or FEATURES['ENABLE_LIBRARY_INDEX']:
     SEARCH_ENGINE = "search.elastic.ElasticSearchEngine"
 
 ELASTIC_SEARCH_CONFIG = ENV_TOKENS.get('ELASTIC_SEARCH_CONFIG', [{}])
+COURSEWARE_INDEX_CHUNKED_REINDEX.update(ENV_TOKENS.get('COURSEWARE_INDEX_CHUNKED_REINDEX', {}))
 
 XBLOCK_SETTINGS = ENV_TOKENS.get('XBLOCK_SETTINGS', {})
 XBLOCK_SETTINGS.setdefault("VideoDescriptor", {})["licensing_enabled"] = FEATURES.get("LICENSING", False)
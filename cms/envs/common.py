@@ -426,6 +426,30 @@ MODULESTORE = {
     }
 }
 
+# A cache on local disk of assets served by the contentserver which are too large
+# for memcached.  None disables it.
+STATIC_CONTENT_DISK_CACHE = {
+    'DIRECTORY': None,
+    # The maximum size of the cache, in bytes.
+    'MAX_SIZE': 1024 ** 3,
+    # Larger assets are always streamed from the contentstore.
+    'MAX_FILE_SIZE': 100 * 1024 ** 2,
+}
+
+# The size, in bytes of their serializations, of the course structures which are cached
+# in each process in front of the 'course_structure_cache'.  The structures use several
+# times this much memory once unpickled, so it doesn't bound the memory of the process.
+# 0 disables it.
+COURSE_STRUCTURE_LOCAL_CACHE_SIZE = 64 * 1024 ** 2
+
+# How course structures are serialized ('pickle' or 'bson') and compressed ('zlib',
+# 'none', or 'lz4', which requires the lz4 package) in the 'course_structure_cache'.
+# Structures cached with any codec can be read after it changes.
+COURSE_STRUCTURE_CACHE_CODEC = {
+    'SERIALIZER': 'bson',
+    'COMPRESSOR': 'zlib',
+}
+
 # Modulestore-level field override providers. These field override providers don't
 # require student context.
 MODULESTORE_FIELD_OVERRIDE_PROVIDERS = ()
@@ -443,6 +467,15 @@ CODE_JAIL = {
         # How many CPU seconds can jailed code use?
         'CPU': 1,
     },
+
+    # Pool of warm sandboxes, which fork a child for each execution.
+    'pool': {
+        # How many sandboxes can each process run?  0 means start a new
+        # sandbox for each execution.
+        'size': 0,
+        # After how many executions is a sandbox replaced?
+        'max_executions': 100,
+    },
 }
 
 ############################ DJANGO_BUILTINS ################################
@@ -1102,6 +1135,15 @@ ELASTIC_FIELD_MAPPINGS = {
     }
 }
 
+# Full reindexes of courses prepare the index documents of their chapters in a pool of
+# 'WORKERS' threads, and send them to the search engine as they're prepared, in bulk
+# requests of at most 'BULK_SIZE' documents.  0 workers disables it, and all the
+# documents are prepared in order and sent at once.
+COURSEWARE_INDEX_CHUNKED_REINDEX = {
+    'WORKERS': 0,
+    'BULK_SIZE': 500,
+}
+
 XBLOCK_SETTINGS = {
     "VideoDescriptor": {
         "licensing_enabled": FEATURES.get("LICENSING", False)
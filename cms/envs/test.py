@@ -179,6 +179,9 @@ CACHES = {
     },
 }
 
+# Structures cached in the process would change the number of queries counted by tests.
+COURSE_STRUCTURE_LOCAL_CACHE_SIZE = 0
+
 # hide ratelimit warnings while running tests
 filterwarnings('ignore', message='No request passed to the backend, unable to rate-limit')
 
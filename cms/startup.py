@@ -15,6 +15,7 @@ from monkey_patch import (
 )
 from openedx.core.lib.xblock_utils import xblock_local_resource_url
 
+from capa.safe_exec import configure_sandbox_pool
 import xmodule.x_module
 import cms.lib.xblock.runtime
 
@@ -39,6 +40,10 @@ def run():
 
     add_mimetypes()
 
+    # Sandboxes of the pool are started when first needed, by each process.
+    sandbox_pool = settings.CODE_JAIL.get('pool', {})
+    configure_sandbox_pool(sandbox_pool.get('size', 0), sandbox_pool.get('max_executions', 100))
+
     if settings.FEATURES.get('USE_CUSTOM_THEME', False):
         enable_theme()
 
@@ -12,6 +12,8 @@ from django.core.cache import cache
 from django.db import DEFAULT_DB_ALIAS
 from opaque_keys import InvalidKeyError
 
+from contentserver.caching import asset_metadata_cache
+
 from . import app_settings
 
 
@@ -122,15 +124,19 @@ def del_cached_content(location):
     delete content for the given location, as well as for content with run=None.
     it's possible that the content could have been cached without knowing the
     course_key - and so without having the run.
+
+    the metadata of the content cached in this process is deleted too.
     """
     def location_str(loc):
         return unicode(loc).encode("utf-8")
 
-    locations = [location_str(location)]
+    locations = [location]
     try:
-        locations.append(location_str(location.replace(run=None)))
+        locations.append(location.replace(run=None))
     except InvalidKeyError:
         # although deprecated keys allowed run=None, new keys don't if there is no version.
         pass
 
-    cache.delete_many(locations)
+    cache.delete_many([location_str(loc) for loc in locations])
+    for loc in locations:
+        asset_metadata_cache.delete(loc)
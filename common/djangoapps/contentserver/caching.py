@@ -0,0 +1,242 @@
+"""
+Caches of the assets served by StaticContentServer, in addition to memcached:
+a cache of their metadata in the process, and a cache on local disk of assets
+which are too large to be cached in memcached.
+"""
+import errno
+import hashlib
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+
+from xmodule.assetstore.assetmgr import AssetManager
+from xmodule.contentstore.content import StaticContent, StaticContentStream
+from xmodule.util.lru import LRUCache
+
+log = logging.getLogger(__name__)
+
+# The number of assets whose metadata is cached in each process, and for how
+# many seconds.  Conditional requests are answered from the cached metadata, so
+# an asset that changes may be reported as unmodified for this long.
+METADATA_CACHE_SIZE = 10000
+METADATA_CACHE_TTL = 30
+
+# How many seconds a copy of an asset to the disk cache may go without being
+# written to before it's considered abandoned, and the asset is copied again.
+DISK_CACHE_COPY_TIMEOUT = 10 * 60
+
+
+class AssetMetadataCache(object):
+    """
+    A short-lived cache in the process of the metadata of assets, as
+    StaticContents without data, so that conditional requests for assets that
+    haven't changed don't need to load the assets.
+    """
+    def __init__(self, size=METADATA_CACHE_SIZE, ttl=METADATA_CACHE_TTL):
+        self.ttl = ttl
+        self._metadata = LRUCache(size)
+
+    def get(self, location):
+        """
+        Returns the cached metadata of the asset at `location`, or None.
+        """
+        cached = self._metadata.get(location)
+        if cached is None:
+            return None
+        expires_at, metadata = cached
+        if expires_at < time.time():
+            return None
+        return metadata
+
+    def set(self, content):
+        """
+        Caches the metadata of the given StaticContent.
+        """
+        metadata = StaticContent(
+            content.location, content.name, content.content_type, None,
+            last_modified_at=content.last_modified_at, thumbnail_location=content.thumbnail_location,
+            import_path=content.import_path, length=content.length, locked=getattr(content, 'locked', False),
+            content_digest=getattr(content, 'content_digest', None),
+        )
+        self._metadata.set(content.location, (time.time() + self.ttl, metadata))
+
+    def delete(self, location):
+        """
+        Removes the cached metadata of the asset at `location`.
+        """
+        self._metadata.delete(location)
+
+    def clear(self):
+        """
+        Removes all the cached metadata.
+        """
+        self._metadata.clear()
+
+
+asset_metadata_cache = AssetMetadataCache()  # pylint: disable=invalid-name
+
+
+class AssetDiskCache(object):
+    """
+    Keeps copies of assets in `directory`, using at most `max_size` bytes, and
+    evicting the least recently used copies first.
+
+    A copy is named after the asset's location and upload date, so copies of
+    replaced assets aren't used, and are eventually evicted.  Copies are
+    written in the background to temporary files and then renamed, so that
+    processes sharing the directory never see partial copies.  The temporary
+    file of a copy is created exclusively, so that only one thread of the
+    processes sharing the directory copies each asset.
+    """
+    def __init__(self, directory, max_size, max_file_size):
+        self.directory = directory
+        self.max_size = max_size
+        self.max_file_size = max_file_size
+
+    @classmethod
+    def from_settings(cls):
+        """
+        Returns the cache configured by STATIC_CONTENT_DISK_CACHE, or None if
+        it's disabled.
+        """
+        config = getattr(settings, 'STATIC_CONTENT_DISK_CACHE', {})
+        if not config.get('DIRECTORY'):
+            return None
+        return cls(config['DIRECTORY'], config['MAX_SIZE'], config['MAX_FILE_SIZE'])
+
+    def get_or_store(self, content):
+        """
+        Returns a StaticContentStream of the cached copy of the given
+        StaticContentStream, if there is one.  Otherwise, returns `content`
+        itself, to be served from the contentstore, and copies the asset to the
+        cache in the background, unless it's too large to be cached, or it's
+        already being copied.
+        """
+        if content.length is None or content.length > self.max_file_size:
+            return content
+
+        path = self._path_for(content)
+        try:
+            cached_file = open(path, 'rb')
+        except IOError:
+            self._store_in_background(content.location, path)
+            return content
+
+        # Mark the copy as recently used.
+        try:
+            os.utime(path, None)
+        except OSError:
+            # Another process evicted it, but it's open.
+            pass
+
+        content.close()
+        return StaticContentStream(
+            content.location, content.name, content.content_type, cached_file,
+            last_modified_at=content.last_modified_at, thumbnail_location=content.thumbnail_location,
+            import_path=content.import_path, length=content.length, locked=content.locked,
+            content_digest=content.content_digest,
+        )
+
+    def _path_for(self, content):
+        """
+        Returns the path of the copy of the given content.
+        """
+        key = u'{}|{}'.format(content.location, content.last_modified_at).encode('utf-8')
+        return os.path.join(self.directory, hashlib.sha1(key).hexdigest())
+
+    def _store_in_background(self, location, path):
+        """
+        Starts a thread which copies the asset at `location` to `path`, unless
+        another thread is already copying it.
+        """
+        temp_path = os.path.join(self.directory, '.tmp' + os.path.basename(path))
+        try:
+            if not os.path.isdir(self.directory):
+                os.makedirs(self.directory)
+            temp_file = self._create_temp_file(temp_path)
+        except (IOError, OSError):
+            log.exception(u"Couldn't cache asset %s on disk", location)
+            return
+        if temp_file is None:
+            return
+
+        thread = threading.Thread(target=self._store, args=(location, path, temp_file, temp_path))
+        thread.daemon = True
+        thread.start()
+
+    def _create_temp_file(self, temp_path):
+        """
+        Creates and opens the temporary file at `temp_path`, or returns None if
+        another thread is writing to it.
+        """
+        try:
+            if time.time() - os.path.getmtime(temp_path) > DISK_CACHE_COPY_TIMEOUT:
+                os.remove(temp_path)
+        except OSError:
+            # There is no temporary file, or another thread removed it.
+            pass
+
+        try:
+            temp_fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0644)
+        except OSError as err:
+            if err.errno == errno.EEXIST:
+                return None
+            raise
+        return os.fdopen(temp_fd, 'wb')
+
+    def _store(self, location, path, temp_file, temp_path):
+        """
+        Copies the asset at `location` to `temp_file`, which is renamed to
+        `path` unless the asset was replaced meanwhile, and then evicts copies
+        until the cache fits in `max_size`.
+        """
+        try:
+            with temp_file:
+                content = AssetManager.find(location, as_stream=True)
+                try:
+                    for chunk in content.stream_data():
+                        temp_file.write(chunk)
+                finally:
+                    content.close()
+            if self._path_for(content) == path:
+                os.rename(temp_path, path)
+            else:
+                os.remove(temp_path)
+        except Exception:  # pylint: disable=broad-except
+            log.exception(u"Couldn't cache asset %s on disk", location)
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            return
+
+        self._evict()
+
+    def _evict(self):
+        """
+        Removes the least recently used copies until the cache fits in
+        `max_size`.
+        """
+        copies = []
+        for name in os.listdir(self.directory):
+            if name.startswith('.tmp'):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                # Another process evicted it.
+                continue
+            copies.append((stat.st_mtime, stat.st_size, name))
+
+        total_size = sum(size for __, size, __ in copies)
+        for __, size, name in sorted(copies):
+            if total_size <= self.max_size:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+            total_size -= size
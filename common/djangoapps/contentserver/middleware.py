@@ -5,16 +5,18 @@ Middleware to serve assets.
 import logging
 
 import datetime
+from uuid import uuid4
 import newrelic.agent
 from django.http import (
     HttpResponse, HttpResponseNotModified, HttpResponseForbidden,
-    HttpResponseBadRequest, HttpResponseNotFound)
+    HttpResponseBadRequest, HttpResponseNotFound, StreamingHttpResponse)
 from student.models import CourseEnrollment
+from contentserver.caching import AssetDiskCache, asset_metadata_cache
 from contentserver.models import CourseAssetCacheTtlConfig, CdnUserAgentsConfig
 
 from header_control import force_header_for_response
 from xmodule.assetstore.assetmgr import AssetManager
-from xmodule.contentstore.content import StaticContent, XASSET_LOCATION_TAG
+from xmodule.contentstore.content import StaticContent, StaticContentStream, XASSET_LOCATION_TAG
 from xmodule.modulestore import InvalidLocationError
 from opaque_keys import InvalidKeyError
 from opaque_keys.edx.locator import AssetLocator
@@ -28,6 +30,15 @@ from xmodule.exceptions import NotFoundError
 log = logging.getLogger(__name__)
 HTTP_DATE_FORMAT = "%a, %d %b %Y %H:%M:%S GMT"
 
+# Assets smaller than this are cached in memcached, whose default maximum size
+# of a value is 1MB.  Larger assets are streamed, and may be cached on disk.
+MAX_CACHED_CONTENT_LENGTH = 1048576
+
+# Requests for more byte ranges than this, once overlapping and adjacent
+# ranges are coalesced, get the full content, rather than a multipart message
+# of many small parts.
+MAX_BYTE_RANGES = 100
+
 
 class StaticContentServer(object):
     def is_asset_request(self, request):
@@ -49,12 +60,17 @@ class StaticContentServer(object):
             except (InvalidLocationError, InvalidKeyError):
                 return HttpResponseBadRequest()
 
-            # Try and load the asset.
+            # Conditional requests may be answered from the asset's metadata, if it's
+            # cached in the process.  Otherwise, try and load the asset.
             content = None
-            try:
-                content = self.load_asset_from_location(loc)
-            except (ItemNotFoundError, NotFoundError):
-                return HttpResponseNotFound()
+            if self.is_conditional_request(request):
+                content = asset_metadata_cache.get(loc)
+            is_metadata_only = content is not None
+            if content is None:
+                try:
+                    content = self.load_asset_from_location(loc)
+                except (ItemNotFoundError, NotFoundError):
+                    return HttpResponseNotFound()
 
             # Set the basics for this request. Make sure that the course key for this
             # asset has a run, which old-style courses do not.  Otherwise, this will
@@ -81,24 +97,35 @@ class StaticContentServer(object):
 
             # Figure out if the client sent us a conditional request, and let them know
             # if this asset has changed since then.
-            last_modified_at_str = content.last_modified_at.strftime(HTTP_DATE_FORMAT)
-            if 'HTTP_IF_MODIFIED_SINCE' in request.META:
-                if_modified_since = request.META['HTTP_IF_MODIFIED_SINCE']
-                if if_modified_since == last_modified_at_str:
-                    return HttpResponseNotModified()
+            if self.is_not_modified(request, content):
+                newrelic.agent.add_custom_parameter('contentserver.not_modified', True)
+                response = HttpResponseNotModified()
+                etag = self.get_etag(content)
+                if etag:
+                    response['ETag'] = etag
+                return response
+
+            if is_metadata_only:
+                try:
+                    content = self.load_asset_from_location(loc)
+                except (ItemNotFoundError, NotFoundError):
+                    return HttpResponseNotFound()
+
+            # Large assets are streamed from the contentstore or the disk cache,
+            # rather than read into memory.
+            if isinstance(content, StaticContentStream):
+                response_class = StreamingHttpResponse
+            else:
+                response_class = HttpResponse
 
-            # *** File streaming within a byte range ***
+            # *** File streaming within byte ranges ***
             # If a Range is provided, parse Range attribute of the request
             # Add Content-Range in the response if Range is structurally correct
-            # Request -> Range attribute structure: "Range: bytes=first-[last]"
+            # Request -> Range attribute structure: "Range: bytes=first-[last][, first-[last]...]"
             # Response -> Content-Range attribute structure: "Content-Range: bytes first-last/totalLength"
             # http://www.w3.org/Protocols/rfc2616/rfc2616-sec14.html#sec14.35
             response = None
             if request.META.get('HTTP_RANGE'):
-                # If we have a StaticContent, get a StaticContentStream.  Can't manipulate the bytes otherwise.
-                if type(content) == StaticContent:
-                    content = AssetManager.find(loc, as_stream=True)
-
                 header_value = request.META['HTTP_RANGE']
                 try:
                     unit, ranges = parse_range_header(header_value, content.length)
@@ -108,38 +135,52 @@ class StaticContentServer(object):
                         u"%s in Range header: %s for content: %s", exception.message, header_value, unicode(loc)
                     )
                 else:
+                    # Unsatisfiable ranges of several are ignored, but if no range is satisfiable
+                    # the request can't be.
+                    # http://www.w3.org/Protocols/rfc2616/rfc2616-sec14.html#sec14.35.1
+                    ranges = coalesce_byte_ranges(
+                        [(first, last) for first, last in ranges if 0 <= first <= last < content.length]
+                    )
                     if unit != 'bytes':
                         # Only accept ranges in bytes
                         log.warning(u"Unknown unit in Range header: %s for content: %s", header_value, unicode(loc))
-                    elif len(ranges) > 1:
-                        # According to Http/1.1 spec content for multiple ranges should be sent as a multipart message.
-                        # http://www.w3.org/Protocols/rfc2616/rfc2616-sec14.html#sec14.16
-                        # But we send back the full content.
+                    elif not ranges:
                         log.warning(
-                            u"More than 1 ranges in Range header: %s for content: %s", header_value, unicode(loc)
+                            u"Cannot satisfy ranges in Range header: %s for content: %s", header_value, unicode(loc)
                         )
-                    else:
+                        return HttpResponse(status=416)  # Requested Range Not Satisfiable
+                    elif len(ranges) > MAX_BYTE_RANGES:
+                        log.warning(
+                            u"Too many ranges in Range header: %s for content: %s", header_value, unicode(loc)
+                        )
+                    elif len(ranges) == 1:
                         first, last = ranges[0]
+                        response = response_class(
+                            content.stream_data_in_range(first, last), content_type=content.content_type
+                        )
+                        response['Content-Range'] = 'bytes {first}-{last}/{length}'.format(
+                            first=first, last=last, length=content.length
+                        )
+                        response['Content-Length'] = str(last - first + 1)
+                        response.status_code = 206  # Partial Content
 
-                        if 0 <= first <= last < content.length:
-                            # If the byte range is satisfiable
-                            response = HttpResponse(content.stream_data_in_range(first, last))
-                            response['Content-Range'] = 'bytes {first}-{last}/{length}'.format(
-                                first=first, last=last, length=content.length
-                            )
-                            response['Content-Length'] = str(last - first + 1)
-                            response.status_code = 206  # Partial Content
-
-                            newrelic.agent.add_custom_parameter('contentserver.ranged', True)
-                        else:
-                            log.warning(
-                                u"Cannot satisfy ranges in Range header: %s for content: %s", header_value, unicode(loc)
-                            )
-                            return HttpResponse(status=416)  # Requested Range Not Satisfiable
-
-            # If Range header is absent or syntactically invalid return a full content response.
+                        newrelic.agent.add_custom_parameter('contentserver.ranged', True)
+                    else:
+                        # Content for multiple ranges is sent as a multipart message.
+                        # http://www.w3.org/Protocols/rfc2616/rfc2616-sec19.html#sec19.2
+                        boundary = uuid4().hex
+                        body, length = multipart_byteranges(content, ranges, boundary)
+                        response = response_class(
+                            body, content_type='multipart/byteranges; boundary={}'.format(boundary)
+                        )
+                        response['Content-Length'] = str(length)
+                        response.status_code = 206  # Partial Content
+
+                        newrelic.agent.add_custom_parameter('contentserver.ranged', True)
+
+            # If Range header is absent, syntactically invalid or has too many ranges, return a full content response.
             if response is None:
-                response = HttpResponse(content.stream_data())
+                response = response_class(content.stream_data(), content_type=content.content_type)
                 response['Content-Length'] = content.length
 
             newrelic.agent.add_custom_parameter('contentserver.content_len', content.length)
@@ -147,7 +188,6 @@ class StaticContentServer(object):
 
             # "Accept-Ranges: bytes" tells the user that only "bytes" ranges are allowed
             response['Accept-Ranges'] = 'bytes'
-            response['Content-Type'] = content.content_type
 
             # Set any caching headers, and do any response cleanup needed.  Based on how much
             # middleware we have in place, there's no easy way to use the built-in Django
@@ -181,12 +221,60 @@ class StaticContentServer(object):
             response['Cache-Control'] = "private, no-cache, no-store"
 
         response['Last-Modified'] = content.last_modified_at.strftime(HTTP_DATE_FORMAT)
+        etag = self.get_etag(content)
+        if etag:
+            response['ETag'] = etag
 
         # Force the Vary header to only vary responses on Origin, so that XHR and browser requests get cached
         # separately and don't screw over one another. i.e. a browser request that doesn't send Origin, and
         # caches a version of the response without CORS headers, in turn breaking XHR requests.
         force_header_for_response(response, 'Vary', 'Origin')
 
+    @staticmethod
+    def is_conditional_request(request):
+        """
+        Returns whether the given request is conditional on the asset having changed.
+        """
+        return 'HTTP_IF_NONE_MATCH' in request.META or 'HTTP_IF_MODIFIED_SINCE' in request.META
+
+    @staticmethod
+    def get_etag(content):
+        """
+        Returns the strong entity tag of the given content, which is its digest, or None if
+        the content doesn't have one.
+        """
+        content_digest = getattr(content, 'content_digest', None)
+        if not content_digest:
+            return None
+        return '"{}"'.format(content_digest)
+
+    def is_not_modified(self, request, content):
+        """
+        Returns whether the conditions of the given request show that the client has the
+        current version of the content.
+
+        If-None-Match takes precedence over If-Modified-Since.  Its entity tags are compared
+        weakly, as the spec requires, so a weak tag matches our strong one.
+        http://tools.ietf.org/html/rfc7232#section-6
+        """
+        if 'HTTP_IF_NONE_MATCH' in request.META:
+            etag = self.get_etag(content)
+            if etag is None:
+                return False
+            for if_none_match in request.META['HTTP_IF_NONE_MATCH'].split(','):
+                if_none_match = if_none_match.strip()
+                if if_none_match.startswith('W/'):
+                    if_none_match = if_none_match[2:]
+                if if_none_match in ('*', etag):
+                    return True
+            return False
+
+        if 'HTTP_IF_MODIFIED_SINCE' in request.META:
+            last_modified_at_str = content.last_modified_at.strftime(HTTP_DATE_FORMAT)
+            return request.META['HTTP_IF_MODIFIED_SINCE'] == last_modified_at_str
+
+        return False
+
     @staticmethod
     def is_cdn_request(request):
         """
@@ -251,14 +339,66 @@ class StaticContentServer(object):
 
             # Now that we fetched it, let's go ahead and try to cache it. We cap this at 1MB
             # because it's the default for memcached and also we don't want to do too much
-            # buffering in memory when we're serving an actual request.
-            if content.length is not None and content.length < 1048576:
+            # buffering in memory when we're serving an actual request.  Larger assets are
+            # cached on local disk, if a disk cache is configured.
+            if content.length is not None and content.length < MAX_CACHED_CONTENT_LENGTH:
                 content = content.copy_to_in_mem()
                 set_cached_content(content)
+            else:
+                disk_cache = AssetDiskCache.from_settings()
+                if disk_cache is not None:
+                    content = disk_cache.get_or_store(content)
 
+        asset_metadata_cache.set(content)
         return content
 
 
+def multipart_byteranges(content, ranges, boundary):
+    """
+    Returns an iterator of the body of a multipart/byteranges message of the
+    given (first, last) byte ranges of content, along with the body's length.
+    """
+    part_headers = [
+        (
+            '\r\n--{boundary}\r\n'
+            'Content-Type: {content_type}\r\n'
+            'Content-Range: bytes {first}-{last}/{length}\r\n\r\n'
+        ).format(
+            boundary=boundary, content_type=content.content_type, first=first, last=last, length=content.length
+        )
+        for first, last in ranges
+    ]
+    closing_boundary = '\r\n--{boundary}--\r\n'.format(boundary=boundary)
+
+    def body():
+        """
+        Yields the parts of the message, streaming each range of content.
+        """
+        for part_header, (first, last) in zip(part_headers, ranges):
+            yield part_header
+            for chunk in content.stream_data_in_range(first, last):
+                yield chunk
+        yield closing_boundary
+
+    length = sum(len(part_header) for part_header in part_headers) + len(closing_boundary)
+    length += sum(last - first + 1 for first, last in ranges)
+    return body(), length
+
+
+def coalesce_byte_ranges(ranges):
+    """
+    Returns the given (first, last) byte ranges in ascending order, with the
+    ranges which overlap or are adjacent merged into one.
+    """
+    coalesced_ranges = []
+    for first, last in sorted(ranges):
+        if coalesced_ranges and first <= coalesced_ranges[-1][1] + 1:
+            coalesced_ranges[-1] = (coalesced_ranges[-1][0], max(last, coalesced_ranges[-1][1]))
+        else:
+            coalesced_ranges.append((first, last))
+    return coalesced_ranges
+
+
 def parse_range_header(header_value, content_length):
     """
     Returns the unit and a list of (start, end) tuples of ranges.
@@ -0,0 +1,177 @@
+"""
+Tests for the disk cache of assets.
+"""
+import datetime
+import os
+import shutil
+from StringIO import StringIO
+import tempfile
+import unittest
+
+from mock import patch
+from opaque_keys.edx.locator import CourseLocator
+
+from contentserver.caching import AssetDiskCache, AssetMetadataCache
+from xmodule.contentstore.content import StaticContent, StaticContentStream
+
+
+class SynchronousThread(object):
+    """
+    A stand-in for threading.Thread which runs its target when it's started.
+    """
+    def __init__(self, target, args):
+        self.target = target
+        self.args = args
+        self.daemon = False
+
+    def start(self):
+        """
+        Runs the target.
+        """
+        self.target(*self.args)
+
+
+@patch('contentserver.caching.threading.Thread', SynchronousThread)
+class AssetDiskCacheTestCase(unittest.TestCase):
+    """
+    Tests for AssetDiskCache.
+    """
+    def setUp(self):
+        super(AssetDiskCacheTestCase, self).setUp()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.course_key = CourseLocator('org', 'course', 'run')
+        self.cache = AssetDiskCache(self.directory, max_size=250, max_file_size=100)
+
+        # The contentstore finds the assets most recently made by make_content.
+        self.assets = {}
+        patcher = patch(
+            'contentserver.caching.AssetManager.find',
+            side_effect=lambda location, as_stream: self.make_content(*self.assets[location]),
+        )
+        self.mock_find = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def make_content(self, name, data, last_modified_at=datetime.datetime(2016, 1, 1)):
+        """
+        Returns a StaticContentStream of the given data.
+        """
+        location = self.course_key.make_asset_key('asset', name)
+        self.assets[location] = (name, data, last_modified_at)
+        return StaticContentStream(
+            location, name, 'text/plain', StringIO(data), last_modified_at=last_modified_at, length=len(data),
+        )
+
+    def test_get_or_store(self):
+        # The asset is served from the contentstore while it's copied.
+        original_content = self.make_content('a.txt', 'a' * 100)
+        self.assertIs(self.cache.get_or_store(original_content), original_content)
+        self.assertEqual(len(os.listdir(self.directory)), 1)
+
+        # The cached copy is used, rather than the given stream.
+        content = self.cache.get_or_store(self.make_content('a.txt', 'b' * 100))
+        self.assertEqual(''.join(content.stream_data()), 'a' * 100)
+        self.assertEqual(''.join(content.stream_data_in_range(10, 19)), 'a' * 10)
+        self.assertEqual(self.mock_find.call_count, 1)
+
+    def test_copy_in_progress(self):
+        content = self.make_content('a.txt', 'a' * 100)
+        temp_path = os.path.join(
+            self.directory, '.tmp' + os.path.basename(self.cache._path_for(content))  # pylint: disable=protected-access
+        )
+        open(temp_path, 'w').close()
+
+        # The asset isn't copied again while another copy is being written.
+        self.assertIs(self.cache.get_or_store(content), content)
+        self.assertFalse(self.mock_find.called)
+
+        # An abandoned copy is replaced.
+        os.utime(temp_path, (0, 0))
+        self.cache.get_or_store(content)
+        self.assertEqual(self.mock_find.call_count, 1)
+        self.assertEqual(len(os.listdir(self.directory)), 1)
+        self.assertEqual(''.join(self.cache.get_or_store(content).stream_data()), 'a' * 100)
+
+    def test_asset_replaced_while_copied(self):
+        content = self.make_content('a.txt', 'a' * 100)
+        self.make_content('a.txt', 'b' * 100, last_modified_at=datetime.datetime(2016, 1, 2))
+
+        # A copy of a newer version of the asset isn't kept as a copy of the requested one.
+        self.assertIs(self.cache.get_or_store(content), content)
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_replaced_asset(self):
+        self.cache.get_or_store(self.make_content('a.txt', 'a' * 100))
+        content = self.make_content('a.txt', 'b' * 100, last_modified_at=datetime.datetime(2016, 1, 2))
+        self.cache.get_or_store(content)
+        content = self.cache.get_or_store(content)
+        self.assertEqual(''.join(content.stream_data()), 'b' * 100)
+        self.assertEqual(len(os.listdir(self.directory)), 2)
+
+    def test_large_asset(self):
+        content = self.make_content('a.txt', 'a' * 101)
+        self.assertIs(self.cache.get_or_store(content), content)
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_eviction(self):
+        for index, name in enumerate(['a.txt', 'b.txt', 'c.txt']):
+            self.cache.get_or_store(self.make_content(name, name[0] * 100))
+            # Copies are ordered by their modification time.
+            path = self.cache._path_for(self.make_content(name, ''))  # pylint: disable=protected-access
+            os.utime(path, (index, index))
+
+        # The least recently used copy was evicted.
+        self.assertEqual(len(os.listdir(self.directory)), 2)
+        content = self.cache.get_or_store(self.make_content('a.txt', 'd' * 100))
+        self.assertEqual(''.join(content.stream_data()), 'd' * 100)
+
+
+class AssetMetadataCacheTestCase(unittest.TestCase):
+    """
+    Tests for AssetMetadataCache.
+    """
+    def setUp(self):
+        super(AssetMetadataCacheTestCase, self).setUp()
+        self.course_key = CourseLocator('org', 'course', 'run')
+        self.cache = AssetMetadataCache(size=2, ttl=30)
+
+    def make_content(self, name):
+        """
+        Returns a StaticContent named `name`.
+        """
+        return StaticContent(
+            self.course_key.make_asset_key('asset', name), name, 'text/plain', 'data',
+            last_modified_at=datetime.datetime(2016, 1, 1), length=4, locked=True, content_digest='digest',
+        )
+
+    def test_get(self):
+        content = self.make_content('a.txt')
+        self.cache.set(content)
+
+        metadata = self.cache.get(content.location)
+        self.assertIsNone(metadata.data)
+        self.assertEqual(metadata.content_digest, 'digest')
+        self.assertEqual(metadata.last_modified_at, content.last_modified_at)
+        self.assertTrue(metadata.locked)
+
+    def test_expiry(self):
+        content = self.make_content('a.txt')
+        with patch('contentserver.caching.time.time', return_value=1000):
+            self.cache.set(content)
+        with patch('contentserver.caching.time.time', return_value=1030):
+            self.assertIsNotNone(self.cache.get(content.location))
+        with patch('contentserver.caching.time.time', return_value=1031):
+            self.assertIsNone(self.cache.get(content.location))
+
+    def test_delete(self):
+        content = self.make_content('a.txt')
+        self.cache.set(content)
+        self.cache.delete(content.location)
+        self.assertIsNone(self.cache.get(content.location))
+
+    def test_size(self):
+        contents = [self.make_content(name) for name in ['a.txt', 'b.txt', 'c.txt']]
+        for content in contents:
+            self.cache.set(content)
+        self.assertIsNone(self.cache.get(contents[0].location))
+        self.assertIsNotNone(self.cache.get(contents[2].location))
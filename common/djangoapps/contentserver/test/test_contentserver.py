@@ -2,10 +2,14 @@
 Tests for StaticContentServer
 """
 import copy
+import hashlib
 
 import datetime
 import ddt
 import logging
+import os
+import shutil
+import tempfile
 import unittest
 from uuid import uuid4
 
@@ -20,7 +24,12 @@ from xmodule.modulestore.django import modulestore
 from xmodule.modulestore.tests.django_utils import SharedModuleStoreTestCase
 from xmodule.modulestore.xml_importer import import_course_from_xml
 
-from contentserver.middleware import parse_range_header, HTTP_DATE_FORMAT, StaticContentServer
+from cache_toolbox.core import del_cached_content
+from contentserver.caching import asset_metadata_cache
+from contentserver.test.test_caching import SynchronousThread
+from contentserver.middleware import (
+    coalesce_byte_ranges, parse_range_header, HTTP_DATE_FORMAT, MAX_BYTE_RANGES, StaticContentServer
+)
 from student.models import CourseEnrollment
 from student.tests.factories import UserFactory, AdminFactory
 
@@ -70,6 +79,8 @@ class ContentStoreToyCourseTest(SharedModuleStoreTestCase):
         super(ContentStoreToyCourseTest, self).setUp()
         self.staff_usr = AdminFactory.create()
         self.non_staff_usr = UserFactory.create()
+        asset_metadata_cache.clear()
+        self.addCleanup(asset_metadata_cache.clear)
 
         self.client = Client()
 
@@ -119,6 +130,72 @@ class ContentStoreToyCourseTest(SharedModuleStoreTestCase):
         resp = self.client.get(self.url_locked)
         self.assertEqual(resp.status_code, 200)
 
+    def test_etag(self):
+        """
+        Test that assets are served with their digest as a strong ETag.
+        """
+        resp = self.client.get(self.url_unlocked)
+        data = self.contentstore.find(self.unlocked_asset).data
+        self.assertEqual(resp['ETag'], '"{}"'.format(hashlib.sha1(data).hexdigest()))
+
+    @ddt.data(
+        ('{etag}', 304),
+        ('W/{etag}', 304),
+        ('"other", {etag}', 304),
+        ('*', 304),
+        ('"other"', 200),
+    )
+    @ddt.unpack
+    def test_if_none_match(self, if_none_match, expected_status_code):
+        """
+        Test that requests with If-None-Match are answered with 304 Not Modified if a
+        tag matches the ETag.
+        """
+        etag = self.client.get(self.url_unlocked)['ETag']
+        resp = self.client.get(self.url_unlocked, HTTP_IF_NONE_MATCH=if_none_match.format(etag=etag))
+        self.assertEqual(resp.status_code, expected_status_code)
+        self.assertEqual(resp['ETag'], etag)
+
+    def test_if_none_match_takes_precedence(self):
+        """
+        Test that If-Modified-Since is ignored if If-None-Match is sent.
+        """
+        resp = self.client.get(self.url_unlocked)
+        resp = self.client.get(
+            self.url_unlocked, HTTP_IF_NONE_MATCH='"other"', HTTP_IF_MODIFIED_SINCE=resp['Last-Modified']
+        )
+        self.assertEqual(resp.status_code, 200)
+
+    def test_not_modified_from_metadata(self):
+        """
+        Test that conditional requests for unmodified assets whose metadata is cached don't
+        load the asset, but still check access.
+        """
+        etag = self.client.get(self.url_unlocked)['ETag']
+        self.client.login(username=self.staff_usr, password='test')
+        locked_etag = self.client.get(self.url_locked)['ETag']
+        self.client.logout()
+
+        with patch.object(StaticContentServer, 'load_asset_from_location') as mock_load_asset:
+            resp = self.client.get(self.url_unlocked, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(resp.status_code, 304)
+            resp = self.client.get(self.url_locked, HTTP_IF_NONE_MATCH=locked_etag)
+            self.assertEqual(resp.status_code, 403)
+        self.assertFalse(mock_load_asset.called)
+
+    def test_del_cached_content_drops_metadata(self):
+        """
+        Test that conditional requests load the asset again once its cached content is deleted.
+        """
+        etag = self.client.get(self.url_unlocked)['ETag']
+        del_cached_content(self.unlocked_asset)
+        with patch.object(
+            StaticContentServer, 'load_asset_from_location', wraps=StaticContentServer().load_asset_from_location
+        ) as mock_load_asset:
+            resp = self.client.get(self.url_unlocked, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 304)
+        self.assertTrue(mock_load_asset.called)
+
     def test_range_request_full_file(self):
         """
         Test that a range request from byte 0 to last,
@@ -154,13 +231,58 @@ class ContentStoreToyCourseTest(SharedModuleStoreTestCase):
 
     def test_range_request_multiple_ranges(self):
         """
-        Test that multiple ranges in request outputs the full content.
+        Test that multiple ranges in request outputs a multipart message of the ranges.
         """
         first_byte = self.length_unlocked / 4
         last_byte = self.length_unlocked / 2
         resp = self.client.get(self.url_unlocked, HTTP_RANGE='bytes={first}-{last}, -100'.format(
             first=first_byte, last=last_byte))
 
+        self.assertEqual(resp.status_code, 206)  # HTTP_206_PARTIAL_CONTENT
+        self.assertNotIn('Content-Range', resp)
+        self.assertEqual(resp['Content-Length'], str(len(resp.content)))
+
+        content_type, boundary = resp['Content-Type'].split('; boundary=')
+        self.assertEqual(content_type, 'multipart/byteranges')
+        data = self.contentstore.find(self.unlocked_asset).data
+        parts = resp.content.split('\r\n--{}'.format(boundary))
+        self.assertEqual(parts[0], '')
+        self.assertEqual(parts[-1], '--\r\n')
+        expected_ranges = [(first_byte, last_byte), (self.length_unlocked - 100, self.length_unlocked - 1)]
+        for part, (first, last) in zip(parts[1:-1], expected_ranges):
+            headers, body = part.split('\r\n\r\n', 1)
+            self.assertIn('Content-Range: bytes {}-{}/{}'.format(first, last, self.length_unlocked), headers)
+            self.assertEqual(body, data[first:last + 1])
+
+    def test_range_request_multiple_ranges_unsatisfiable(self):
+        """
+        Test that unsatisfiable ranges among multiple ranges are ignored.
+        """
+        resp = self.client.get(self.url_unlocked, HTTP_RANGE='bytes=0-9, {first}-'.format(
+            first=self.length_unlocked))
+
+        self.assertEqual(resp.status_code, 206)  # HTTP_206_PARTIAL_CONTENT
+        self.assertEqual(resp['Content-Range'], 'bytes 0-9/{}'.format(self.length_unlocked))
+        self.assertEqual(resp['Content-Length'], '10')
+
+    def test_range_request_overlapping_ranges(self):
+        """
+        Test that overlapping and adjacent ranges are coalesced into one.
+        """
+        resp = self.client.get(self.url_unlocked, HTTP_RANGE='bytes=10-19, 0-9, 5-14')
+
+        self.assertEqual(resp.status_code, 206)  # HTTP_206_PARTIAL_CONTENT
+        self.assertEqual(resp['Content-Range'], 'bytes 0-19/{}'.format(self.length_unlocked))
+        self.assertEqual(resp['Content-Length'], '20')
+
+    def test_range_request_too_many_ranges(self):
+        """
+        Test that a request for too many ranges results in a 200 OK full content response.
+        """
+        resp = self.client.get(self.url_unlocked, HTTP_RANGE='bytes={}'.format(
+            ', '.join('{0}-{0}'.format(index * 2) for index in xrange(MAX_BYTE_RANGES + 1))
+        ))
+
         self.assertEqual(resp.status_code, 200)
         self.assertNotIn('Content-Range', resp)
         self.assertEqual(resp['Content-Length'], str(self.length_unlocked))
@@ -314,6 +436,31 @@ class ContentStoreToyCourseTest(SharedModuleStoreTestCase):
         is_from_cdn = StaticContentServer.is_cdn_request(browser_request)
         self.assertEqual(is_from_cdn, True)
 
+    @patch('contentserver.middleware.MAX_CACHED_CONTENT_LENGTH', 0)
+    @patch('contentserver.middleware.get_cached_content', return_value=None)
+    @patch('contentserver.caching.threading.Thread', SynchronousThread)
+    def test_large_asset_disk_cache(self, __):
+        """
+        Test that assets too large for memcached are streamed, and cached on disk
+        once they're first served.
+        """
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir)
+        data = self.contentstore.find(self.unlocked_asset).data
+
+        with override_settings(STATIC_CONTENT_DISK_CACHE={
+            'DIRECTORY': cache_dir, 'MAX_SIZE': 1024 ** 2, 'MAX_FILE_SIZE': 1024 ** 2
+        }):
+            for __ in xrange(2):
+                resp = self.client.get(self.url_unlocked)
+                self.assertTrue(resp.streaming)
+                self.assertEqual(''.join(resp.streaming_content), data)
+                self.assertEqual(len(os.listdir(cache_dir)), 1)
+
+            resp = self.client.get(self.url_unlocked, HTTP_RANGE='bytes=10-19')
+            self.assertEqual(resp.status_code, 206)
+            self.assertEqual(''.join(resp.streaming_content), data[10:20])
+
 
 @ddt.ddt
 class ParseRangeHeaderTestCase(unittest.TestCase):
@@ -359,3 +506,20 @@ class ParseRangeHeaderTestCase(unittest.TestCase):
         self.assertRaisesRegexp(
             exception_class, exception_message_regex, parse_range_header, header_value, self.content_length
         )
+
+
+@ddt.ddt
+class CoalesceByteRangesTestCase(unittest.TestCase):
+    """
+    Tests for the coalesce_byte_ranges function.
+    """
+    @ddt.data(
+        ([(0, 9)], [(0, 9)]),
+        ([(20, 29), (0, 9)], [(0, 9), (20, 29)]),
+        ([(0, 9), (10, 19)], [(0, 19)]),
+        ([(0, 9), (5, 14), (30, 39), (0, 1)], [(0, 14), (30, 39)]),
+        ([(0, 99), (10, 19)], [(0, 99)]),
+    )
+    @ddt.unpack
+    def test_coalesce(self, ranges, expected_ranges):
+        self.assertEqual(coalesce_byte_ranges(ranges), expected_ranges)
@@ -0,0 +1,153 @@
+"""
+Event tracker backend that sends events to another backend in batches, from
+a background thread, so that requests don't wait for tracking I/O.
+
+It wraps the backend configured in its options::
+
+  TRACKING_BACKENDS = {
+      'mongo': {
+          'ENGINE': 'track.backends.buffered.BufferedBackend',
+          'OPTIONS': {
+              'backend': {
+                  'ENGINE': 'track.backends.mongodb.MongoBackend',
+                  'OPTIONS': {...}
+              },
+              'max_buffer_size': 10000,
+              'batch_size': 100,
+              'flush_interval': 1,
+          }
+      }
+  }
+
+"""
+
+from __future__ import absolute_import
+
+import atexit
+from collections import deque
+import logging
+import os
+import threading
+
+from django.db import close_old_connections
+from dogapi import dog_stats_api
+
+from track.backends import BaseBackend
+
+
+log = logging.getLogger(__name__)
+
+
+class BufferedBackend(BaseBackend):
+    """
+    Event tracker backend that buffers events, and sends them to another
+    backend's `send_many` from a background thread.
+
+    The buffer holds at most `max_buffer_size` events.  When it is full, the
+    oldest events are dropped, so that tracking can't use unbounded memory
+    when the wrapped backend is slow or down.
+
+    """
+
+    def __init__(self, backend, max_buffer_size=10000, batch_size=100, flush_interval=1, **kwargs):
+        """
+        :Parameters:
+
+          - `backend`: the configuration of the wrapped backend, as a dict
+            with an `ENGINE` and its `OPTIONS`
+          - `max_buffer_size`: the number of events that can wait to be sent
+          - `batch_size`: the maximum number of events sent at once
+          - `flush_interval`: the number of seconds after which buffered
+            events are sent, even if there are fewer than `batch_size`
+
+        """
+        super(BufferedBackend, self).__init__(**kwargs)
+
+        # Imported here, as the tracker instantiates this backend when it's
+        # imported.
+        from track.tracker import _instantiate_backend_from_name  # pylint: disable=protected-access
+        self.backend = _instantiate_backend_from_name(backend['ENGINE'], backend.get('OPTIONS', {}))
+        self.name = backend['ENGINE'].split('.')[-1]
+        self._tags = ['backend:{0}'.format(self.name)]
+
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._events = deque(maxlen=max_buffer_size)
+        self._condition = threading.Condition()
+        self._send_lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+        atexit.register(self.flush)
+
+    def send(self, event):
+        """Add the event to the buffer"""
+        self._ensure_thread()
+        with self._condition:
+            if len(self._events) == self._events.maxlen:
+                dog_stats_api.increment('track.buffered.dropped', tags=self._tags)
+            self._events.append(event)
+            if len(self._events) >= self.batch_size:
+                self._condition.notify()
+
+    def flush(self):
+        """Send all the buffered events now"""
+        while self._send_batch():
+            pass
+
+    def _ensure_thread(self):
+        """
+        Start the thread which sends the buffered events, unless it is running
+        in this process.  Threads of a parent process don't run in processes
+        forked from it.
+        """
+        if self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._condition:
+            if self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='track.buffered.{0}'.format(self.name))
+            self._thread.daemon = True
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def _run(self):
+        """Send the buffered events in batches, until the process exits"""
+        while True:
+            with self._condition:
+                if len(self._events) < self.batch_size:
+                    self._condition.wait(self.flush_interval)
+            try:
+                self._flush_from_thread()
+            except Exception:  # pylint: disable=broad-except
+                # The thread must keep running, whatever the wrapped backend
+                # raises.  The batch is lost.
+                log.exception('Error sending events to event tracker backend %s', self.name)
+
+    def _flush_from_thread(self):
+        """
+        Send all the buffered events from the thread.  Nothing closes the
+        thread's database connection, which the wrapped backend may use, at
+        the end of a request, so it's closed before each batch if it's broken
+        or older than CONN_MAX_AGE, as Django does between requests.
+        Otherwise, once the database server times out the connection, every
+        batch would fail.
+        """
+        while True:
+            close_old_connections()
+            if not self._send_batch():
+                break
+
+    def _send_batch(self):
+        """
+        Send up to `batch_size` buffered events, and return how many were
+        sent.
+        """
+        with self._send_lock:
+            with self._condition:
+                batch = [self._events.popleft() for __ in xrange(min(self.batch_size, len(self._events)))]
+                dog_stats_api.gauge('track.buffered.buffer_size', len(self._events), tags=self._tags)
+            if batch:
+                dog_stats_api.histogram('track.buffered.batch_size', len(batch), tags=self._tags)
+                self.backend.send_many(batch)
+            return len(batch)
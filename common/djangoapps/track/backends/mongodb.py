@@ -97,3 +97,14 @@ class MongoBackend(BaseBackend):
             # during the next event.
             msg = 'Error inserting to MongoDB event tracker backend'
             log.exception(msg)
+
+    def send_many(self, events):
+        """Insert the events in to the Mongo collection at once"""
+        try:
+            # insert_many adds an _id to the documents it inserts, so insert
+            # copies, which other backends may still be sending.
+            self.collection.insert_many([dict(event) for event in events], ordered=False)
+        except (PyMongoError, BSONError):
+            # As in send, the events are lost.
+            msg = 'Error inserting to MongoDB event tracker backend'
+            log.exception(msg)
@@ -0,0 +1,97 @@
+from __future__ import absolute_import
+
+from django.db import OperationalError
+from django.test import TestCase
+from mock import patch
+
+from track.backends import BaseBackend
+from track.backends.buffered import BufferedBackend
+
+
+class BatchRecordingBackend(BaseBackend):
+    """Backend that records the batches of events it's sent."""
+    def __init__(self, **options):
+        super(BatchRecordingBackend, self).__init__(**options)
+        self.batches = []
+
+    def send(self, event):
+        self.batches.append([event])
+
+    def send_many(self, events):
+        self.batches.append(events)
+
+
+class DatabaseRecordingBackend(BatchRecordingBackend):
+    """Backend that records batches in a database, whose connection may be dead."""
+    def __init__(self, **options):
+        super(DatabaseRecordingBackend, self).__init__(**options)
+        self.connection_alive = False
+
+    def send_many(self, events):
+        if not self.connection_alive:
+            raise OperationalError('MySQL server has gone away')
+        super(DatabaseRecordingBackend, self).send_many(events)
+
+
+class TestBufferedBackend(TestCase):
+    def create_backend(self, **options):
+        """Returns a BufferedBackend wrapping a BatchRecordingBackend."""
+        options.setdefault('flush_interval', 60)
+        backend = BufferedBackend(
+            backend={'ENGINE': 'track.backends.tests.test_buffered.BatchRecordingBackend'},
+            **options
+        )
+        # Send the events from the test, rather than from a thread.
+        backend._ensure_thread = lambda: None  # pylint: disable=protected-access
+        return backend
+
+    def test_batches(self):
+        backend = self.create_backend(batch_size=2)
+        for index in xrange(5):
+            backend.send({'test': index})
+        self.assertEqual(backend.backend.batches, [])
+
+        backend.flush()
+        self.assertEqual(
+            backend.backend.batches,
+            [[{'test': 0}, {'test': 1}], [{'test': 2}, {'test': 3}], [{'test': 4}]]
+        )
+
+        backend.flush()
+        self.assertEqual(len(backend.backend.batches), 3)
+
+    def test_full_buffer_drops_oldest_events(self):
+        backend = self.create_backend(max_buffer_size=3)
+        for index in xrange(5):
+            backend.send({'test': index})
+
+        backend.flush()
+        self.assertEqual(backend.backend.batches, [[{'test': 2}, {'test': 3}, {'test': 4}]])
+
+    def test_thread_sends_events(self):
+        backend = BufferedBackend(
+            backend={'ENGINE': 'track.backends.tests.test_buffered.BatchRecordingBackend'},
+            batch_size=2,
+            flush_interval=0.01,
+        )
+        backend.send({'test': 0})
+        backend._thread.join(0.5)  # pylint: disable=protected-access
+        self.assertEqual(backend.backend.batches, [[{'test': 0}]])
+
+    def test_thread_reopens_dead_connection(self):
+        backend = BufferedBackend(
+            backend={'ENGINE': 'track.backends.tests.test_buffered.DatabaseRecordingBackend'},
+            batch_size=2,
+        )
+        backend._ensure_thread = lambda: None  # pylint: disable=protected-access
+        for index in xrange(3):
+            backend.send({'test': index})
+
+        def reopen_connection():
+            """Closing the dead connection gets a new one for the next query."""
+            backend.backend.connection_alive = True
+
+        with patch('track.backends.buffered.close_old_connections', side_effect=reopen_connection) as mock_close:
+            backend._flush_from_thread()  # pylint: disable=protected-access
+        self.assertEqual(backend.backend.batches, [[{'test': 0}, {'test': 1}], [{'test': 2}]])
+        self.assertEqual(mock_close.call_count, 3)
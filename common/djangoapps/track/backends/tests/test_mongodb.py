@@ -37,3 +37,13 @@ class TestMongoBackend(TestCase):
 
         self.assertEqual(events[0], first_argument(calls[0]))
         self.assertEqual(events[1], first_argument(calls[1]))
+
+    def test_mongo_backend_send_many(self):
+        events = [{'test': 1}, {'test': 2}]
+
+        self.backend.send_many(events)
+
+        # The events were inserted at once, as copies.
+        (inserted_events,), _ = self.backend.collection.insert_many.call_args
+        self.assertEqual(inserted_events, events)
+        self.assertIsNot(inserted_events[0], events[0])
@@ -4,9 +4,11 @@ Parser and evaluator for FormulaResponse and NumericalResponse
 Uses pyparsing to parse. Main function as of now is evaluator().
 """
 
+from collections import OrderedDict
 import math
 import operator
 import numbers
+import threading
 import numpy
 import scipy.constants
 import functions
@@ -61,6 +63,14 @@ DEFAULT_VARIABLES = {
     'q': scipy.constants.e  # Fund. Charge: 1.602176565e-19 (Coulombs)
 }
 
+# The number of most recently used expressions kept parsed by
+# `compile_expression()`.
+COMPILED_EXPRESSION_CACHE_SIZE = 1024
+
+# The types of the values that expressions are evaluated to: numbers, or
+# arrays of numbers when variables are given as arrays of sample values.
+VALUE_TYPES = (numbers.Number, numpy.ndarray)
+
 # We eliminated the following extreme suffixes:
 #   P (1e15), E (1e18), Z (1e21), Y (1e24),
 #   f (1e-15), a (1e-18), z (1e-21), y (1e-24)
@@ -122,7 +132,7 @@ def eval_atom(parse_result):
     In the case of parenthesis, ignore them.
     """
     # Find first number in the list
-    result = next(k for k in parse_result if isinstance(k, numbers.Number))
+    result = next(k for k in parse_result if isinstance(k, VALUE_TYPES))
     return result
 
 
@@ -136,7 +146,7 @@ def eval_power(parse_result):
     # `reduce` will go from left to right; reverse the list.
     parse_result = reversed(
         [k for k in parse_result
-         if isinstance(k, numbers.Number)]  # Ignore the '^' marks.
+         if isinstance(k, VALUE_TYPES)]  # Ignore the '^' marks.
     )
     # Having reversed it, raise `b` to the power of `a`.
     power = reduce(lambda a, b: b ** a, parse_result)
@@ -155,6 +165,13 @@ def eval_parallel(parse_result):
     """
     if len(parse_result) == 1:
         return parse_result[0]
+    if any(isinstance(e, numpy.ndarray) for e in parse_result):
+        # Compute it at each sample point at once.
+        values = [e for e in parse_result if isinstance(e, VALUE_TYPES)]
+        has_zero = reduce(numpy.logical_or, [numpy.equal(e, 0) for e in values])
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            result = 1. / sum(1. / e for e in values)
+        return numpy.where(has_zero, float('nan'), result)
     if 0 in parse_result:
         return float('nan')
     reciprocals = [1. / e for e in parse_result
@@ -173,7 +190,10 @@ def eval_sum(parse_result):
     total = 0.0
     current_op = operator.add
     for token in parse_result:
-        if token == '+':
+        if isinstance(token, numpy.ndarray):
+            # Arrays can't be compared with the operators.
+            total = current_op(total, token)
+        elif token == '+':
             current_op = operator.add
         elif token == '-':
             current_op = operator.sub
@@ -191,7 +211,10 @@ def eval_product(parse_result):
     prod = 1.0
     current_op = operator.mul
     for token in parse_result:
-        if token == '*':
+        if isinstance(token, numpy.ndarray):
+            # Arrays can't be compared with the operators.
+            prod = current_op(prod, token)
+        elif token == '*':
             current_op = operator.mul
         elif token == '/':
             current_op = operator.truediv
@@ -223,39 +246,170 @@ def evaluator(variables, functions, math_expr, case_sensitive=False):
     -Variables are passed as a dictionary from string to value. They must be
      python numbers.
     -Unary functions are passed as a dictionary from string to function.
+
+    The expression is only parsed the first time it is evaluated; see
+    `compile_expression()`.
+
+    Variables may also be numpy arrays of their values at several sample
+    points, in which case the expression is evaluated at every sample point
+    at once, and an array is returned (or a number, if the expression doesn't
+    depend on the arrays).  As numpy doesn't raise errors where python does
+    (e.g. dividing by zero), invalid results are NaN or infinite instead, and
+    functions that don't accept arrays (e.g. `fact`) raise an error.
     """
     # No need to go further.
     if math_expr.strip() == "":
         return float('nan')
 
-    # Parse the tree.
-    math_interpreter = ParseAugmenter(math_expr, case_sensitive)
-    math_interpreter.parse_algebra()
+    return compile_expression(math_expr, case_sensitive).evaluate(variables, functions)
 
-    # Get our variables together.
-    all_variables, all_functions = add_defaults(variables, functions, case_sensitive)
 
-    # ...and check them
-    math_interpreter.check_variables(all_variables, all_functions)
+_compiled_expressions = OrderedDict()
+_compiled_expressions_lock = threading.Lock()
 
-    # Create a recursion to evaluate the tree.
-    if case_sensitive:
-        casify = lambda x: x
-    else:
-        casify = lambda x: x.lower()  # Lowercase for case insens.
-
-    evaluate_actions = {
-        'number': eval_number,
-        'variable': lambda x: all_variables[casify(x[0])],
-        'function': lambda x: all_functions[casify(x[0])](x[1]),
-        'atom': eval_atom,
-        'power': eval_power,
-        'parallel': eval_parallel,
-        'product': eval_product,
-        'sum': eval_sum
-    }
-
-    return math_interpreter.reduce_tree(evaluate_actions)
+
+def compile_expression(math_expr, case_sensitive=False):
+    """
+    Return a `CompiledExpression` for the given expression string.
+
+    The most recently used `COMPILED_EXPRESSION_CACHE_SIZE` expressions are
+    kept, so that evaluating the same expression many times with different
+    variables (e.g. at each sample point of a formula) only parses it once.
+    """
+    key = (math_expr, case_sensitive)
+    with _compiled_expressions_lock:
+        compiled_expr = _compiled_expressions.pop(key, None)
+        if compiled_expr is not None:
+            _compiled_expressions[key] = compiled_expr
+            return compiled_expr
+
+    # Parse outside of the lock; expressions that fail to parse aren't kept.
+    compiled_expr = CompiledExpression(math_expr, case_sensitive)
+    with _compiled_expressions_lock:
+        _compiled_expressions[key] = compiled_expr
+        while len(_compiled_expressions) > COMPILED_EXPRESSION_CACHE_SIZE:
+            _compiled_expressions.popitem(last=False)
+    return compiled_expr
+
+
+class CompiledExpression(object):
+    """
+    A parsed expression, which can be evaluated many times with different
+    variables and functions.
+
+    The parse tree is reduced once into nested closures, each of which
+    evaluates a node of the tree as `evaluator()` would, given the variables
+    and functions.
+    """
+    def __init__(self, math_expr, case_sensitive=False):
+        """
+        Parse the given math expression string.
+
+        Raise a `pyparsing.ParseException` if it can't be parsed.
+        """
+        math_interpreter = ParseAugmenter(math_expr, case_sensitive)
+        math_interpreter.parse_algebra()
+
+        self.math_expr = math_expr
+        self.case_sensitive = case_sensitive
+        self._math_interpreter = math_interpreter
+
+        if case_sensitive:
+            casify = lambda x: x
+        else:
+            casify = lambda x: x.lower()  # Lowercase for case insens.
+
+        compile_actions = {
+            'number': self._compile_number,
+            'variable': lambda x: self._compile_variable(casify(x[0])),
+            'function': lambda x: self._compile_function(casify(x[0]), x[1]),
+            'atom': self._compile_atom,
+            'power': lambda x: self._compile_operands(eval_power, x),
+            'parallel': lambda x: self._compile_operands(eval_parallel, x),
+            'product': lambda x: self._compile_operation(eval_product, x),
+            'sum': lambda x: self._compile_operation(eval_sum, x)
+        }
+        self._evaluate = math_interpreter.reduce_tree(compile_actions)
+
+        # The parse tree is no longer needed.
+        math_interpreter.tree = None
+
+    @property
+    def variables_used(self):
+        """
+        The set of variable names used in the expression.
+        """
+        return self._math_interpreter.variables_used
+
+    @property
+    def functions_used(self):
+        """
+        The set of function names used in the expression.
+        """
+        return self._math_interpreter.functions_used
+
+    def evaluate(self, variables, functions):
+        """
+        Evaluate the expression with the given variables and functions, along
+        with the defaults, as `evaluator()` does.
+        """
+        all_variables, all_functions = add_defaults(variables, functions, self.case_sensitive)
+        self._math_interpreter.check_variables(all_variables, all_functions)
+        return self._evaluate(all_variables, all_functions)
+
+    # The following functions turn the already compiled children of each
+    # node of the parse tree into a closure of `(variables, functions)`, which
+    # evaluates the node.
+
+    @staticmethod
+    def _compile_number(parse_result):
+        """
+        Numbers are evaluated once, when compiled.
+        """
+        value = eval_number(parse_result)
+        return lambda variables, functions: value
+
+    @staticmethod
+    def _compile_variable(name):
+        """
+        Look up the variable when evaluated.
+        """
+        return lambda variables, functions: variables[name]
+
+    @staticmethod
+    def _compile_function(name, evaluate_arg):
+        """
+        Look up the function and call it on its argument when evaluated.
+        """
+        return lambda variables, functions: functions[name](evaluate_arg(variables, functions))
+
+    @staticmethod
+    def _compile_atom(parse_result):
+        """
+        An atom is its only child that isn't a parenthesis.
+        """
+        return next(k for k in parse_result if callable(k))
+
+    @staticmethod
+    def _compile_operands(eval_action, parse_result):
+        """
+        Call `eval_action` on the values of the children, leaving out the
+        operators, which `eval_action` ignores.
+        """
+        operands = [k for k in parse_result if callable(k)]
+        if len(operands) == 1:
+            return operands[0]
+        return lambda variables, functions: eval_action([k(variables, functions) for k in operands])
+
+    @staticmethod
+    def _compile_operation(eval_action, parse_result):
+        """
+        Call `eval_action` on the values of the children, along with the
+        operators between them.
+        """
+        return lambda variables, functions: eval_action([
+            k(variables, functions) if callable(k) else k for k in parse_result
+        ])
 
 
 class ParseAugmenter(object):
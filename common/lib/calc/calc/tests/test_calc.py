@@ -559,3 +559,55 @@ class EvaluatorTest(unittest.TestCase):
             calc.evaluator({'r1': 5}, {}, "r1+r2")
         with self.assertRaisesRegexp(calc.UndefinedVariable, 'r1 r3'):
             calc.evaluator(variables, {}, "r1*r3", case_sensitive=True)
+
+
+class CompiledExpressionTest(unittest.TestCase):
+    """
+    Test that expressions are parsed once and then evaluated many times.
+    """
+    def setUp(self):
+        super(CompiledExpressionTest, self).setUp()
+        calc.calc._compiled_expressions.clear()  # pylint: disable=protected-access
+        self.addCleanup(calc.calc._compiled_expressions.clear)  # pylint: disable=protected-access
+
+    def test_evaluate(self):
+        """
+        Test evaluating a compiled expression with different variables.
+        """
+        compiled_expr = calc.compile_expression("x^2 + y || 2*sin(X)")
+        self.assertEqual(compiled_expr.variables_used, set(['x', 'y', 'X']))
+        self.assertEqual(compiled_expr.functions_used, set(['sin']))
+        for x_value, y_value in [(1.0, 2.0), (-3.5, 4.25), (0.5, 1.0)]:
+            variables = {'x': x_value, 'y': y_value}
+            self.assertEqual(
+                compiled_expr.evaluate(variables, {}),
+                x_value ** 2 + calc.eval_parallel([y_value, 2]) * numpy.sin(x_value)
+            )
+        with self.assertRaisesRegexp(calc.UndefinedVariable, 'y'):
+            compiled_expr.evaluate({'x': 1.0}, {})
+
+    def test_cache(self):
+        """
+        Test that an expression is only parsed the first time it is
+        compiled, until it is evicted from the cache.
+        """
+        compiled_expr = calc.compile_expression("x+1")
+        self.assertIs(calc.compile_expression("x+1"), compiled_expr)
+        case_sensitive_compiled_expr = calc.compile_expression("x+1", case_sensitive=True)
+        self.assertIsNot(case_sensitive_compiled_expr, compiled_expr)
+
+        # The least recently used expressions are evicted first.
+        for index in xrange(calc.COMPILED_EXPRESSION_CACHE_SIZE - 2):
+            calc.compile_expression(str(index))
+        self.assertIs(calc.compile_expression("x+1"), compiled_expr)
+        calc.compile_expression("y+1")
+        self.assertIs(calc.compile_expression("x+1"), compiled_expr)
+        self.assertIsNot(calc.compile_expression("x+1", case_sensitive=True), case_sensitive_compiled_expr)
+
+    def test_parse_error_not_cached(self):
+        """
+        Test that expressions that fail to parse are not kept.
+        """
+        with self.assertRaises(ParseException):
+            calc.compile_expression("1+")
+        self.assertEqual(len(calc.calc._compiled_expressions), 0)  # pylint: disable=protected-access
@@ -15,6 +15,7 @@ This is used by capa_module.
 
 from copy import deepcopy
 from datetime import datetime
+import hashlib
 import logging
 import os.path
 import re
@@ -30,6 +31,7 @@ import capa.responsetypes as responsetypes
 from capa.util import contextualize_text, convert_files_to_filenames
 import capa.xqueue_interface as xqueue_interface
 from capa.safe_exec import safe_exec
+from xmodule.util.lru import LRUCache
 
 
 # extra things displayed after "show answers" is pressed
@@ -58,6 +60,12 @@ html_problem_semantics = [
 
 log = logging.getLogger(__name__)
 
+# The number of most recently loaded problem definitions whose preprocessed
+# XML trees are kept, so that loading them again only needs to copy the tree.
+PREPROCESSED_TREE_CACHE_SIZE = 256
+
+_preprocessed_trees = LRUCache(PREPROCESSED_TREE_CACHE_SIZE)
+
 #-----------------------------------------------------------------------------
 # main class for this module
 
@@ -161,22 +169,19 @@ class LoncapaProblem(object):
         problem_text = re.sub(r"endouttext\s*/", "/text", problem_text)
         self.problem_text = problem_text
 
-        # parse problem XML file into an element tree
-        self.tree = etree.XML(problem_text)
-
-        self.make_xml_compatible(self.tree)
-
-        # handle any <include file="foo"> tags
-        self._process_includes()
+        # parse problem XML file into an element tree, with ID's assigned to its
+        # responses, input fields and solutions.  This doesn't depend on the seed or
+        # the student, so it's only done once for each problem definition.
+        self.tree, response_inputfields = self._get_preprocessed_tree()
 
         # construct script processor context (eg for customresponse problems)
         self.context = self._extract_context(self.tree)
 
-        # Pre-parse the XML tree: modifies it to add ID's and perform some in-place
-        # transformations.  This also creates the dict (self.responders) of Response
-        # instances for each question in the problem. The dict has keys = xml subtree of
-        # Response, values = Response instance
-        self._preprocess_problem(self.tree)
+        # Pre-parse the XML tree: performs some in-place transformations.  This also
+        # creates the dict (self.responders) of Response instances for each question in
+        # the problem. The dict has keys = xml subtree of Response, values = Response
+        # instance
+        self._preprocess_problem(response_inputfields)
 
         if not self.student_answers:  # True when student_answers is an empty dict
             self.set_initial_display()
@@ -824,19 +829,68 @@ class LoncapaProblem(object):
 
         return tree
 
-    def _preprocess_problem(self, tree):  # private
+    def _get_preprocessed_tree(self):
+        """
+        Return a copy of the element tree of the problem XML, preprocessed by
+        `_assign_ids()`, along with its `(response, inputfields)` pairs.
+
+        Preprocessed trees are cached by problem definition, unless they include
+        files, whose contents may change.  As Response instances modify the tree,
+        the cached trees are only ever copied.
+        """
+        problem_text = self.problem_text
+        if isinstance(problem_text, unicode):
+            problem_text = problem_text.encode('utf-8')
+        cache_key = (hashlib.sha1(problem_text).hexdigest(), self.problem_id)
+
+        cached_tree = _preprocessed_trees.get(cache_key)
+        if cached_tree is None:
+            # parse problem XML file into an element tree
+            self.tree = etree.XML(self.problem_text)
+
+            self.make_xml_compatible(self.tree)
+
+            # handle any <include file="foo"> tags
+            has_includes = self.tree.find('.//include') is not None
+            self._process_includes()
+
+            response_inputfields = self._assign_ids(self.tree)
+            if has_includes:
+                return self.tree, response_inputfields
+
+            # Elements are found in the copies of the tree by their index in
+            # document order.
+            element_indices = {element: index for index, element in enumerate(self.tree.iter())}
+            cached_tree = (
+                self.tree,
+                [
+                    (element_indices[response], [element_indices[inputfield] for inputfield in inputfields])
+                    for response, inputfields in response_inputfields
+                ],
+            )
+            _preprocessed_trees.set(cache_key, cached_tree)
+
+        tree, response_inputfield_indices = cached_tree
+        tree = deepcopy(tree)
+        elements = list(tree.iter())
+        response_inputfields = [
+            (elements[response_index], [elements[index] for index in inputfield_indices])
+            for response_index, inputfield_indices in response_inputfield_indices
+        ]
+        return tree, response_inputfields
+
+    def _assign_ids(self, tree):  # private
         """
         Assign IDs to all the responses
         Assign sub-IDs to all entries (textline, schematic, etc.)
-        Annoted correctness and value
+        Assign IDs to all the solutions
         In-place transformation
 
-        Also create capa Response instances for each responsetype and save as self.responders
-
-        Obtain all responder answers and save as self.responder_answers dict (key = response)
+        Returns a list of `(response, inputfields)` pairs, of each response
+        element and the input fields and solutions which belong to it.
         """
         response_id = 1
-        self.responders = {}
+        response_inputfields = []
         for response in tree.xpath('//' + "|//".join(responsetypes.registry.registered_tags())):
             response_id_str = self.problem_id + "_" + str(response_id)
             # create and save ID for this response
@@ -857,6 +911,31 @@ class LoncapaProblem(object):
                 entry.attrib['id'] = "%s_%i_%i" % (self.problem_id, response_id, answer_id)
                 answer_id = answer_id + 1
 
+            response_inputfields.append((response, inputfields))
+
+        # <solution>...</solution> may not be associated with any specific response; give
+        # IDs for those separately
+        # TODO: We should make the namespaces consistent and unique (e.g. %s_problem_%i).
+        solution_id = 1
+        for solution in tree.findall('.//solution'):
+            solution.attrib['id'] = "%s_solution_%i" % (self.problem_id, solution_id)
+            solution_id += 1
+
+        return response_inputfields
+
+    def _preprocess_problem(self, response_inputfields):  # private
+        """
+        Annoted correctness and value
+        In-place transformation
+
+        Create capa Response instances for each responsetype, given the
+        `(response, inputfields)` pairs found by `_assign_ids()`, and save as
+        self.responders
+
+        Obtain all responder answers and save as self.responder_answers dict (key = response)
+        """
+        self.responders = {}
+        for response, inputfields in response_inputfields:
             # instantiate capa Response
             responsetype_cls = responsetypes.registry.get_class_for_tag(response.tag)
             responder = responsetype_cls(response, inputfields, self.context, self.capa_system, self.capa_module)
@@ -873,11 +952,3 @@ class LoncapaProblem(object):
                 log.debug('responder %s failed to properly return get_answers()',
                           self.responders[response])  # FIXME
                 raise
-
-        # <solution>...</solution> may not be associated with any specific response; give
-        # IDs for those separately
-        # TODO: We should make the namespaces consistent and unique (e.g. %s_problem_%i).
-        solution_id = 1
-        for solution in tree.findall('.//solution'):
-            solution.attrib['id'] = "%s_solution_%i" % (self.problem_id, solution_id)
-            solution_id += 1
@@ -3206,6 +3206,12 @@ class FormulaResponse(LoncapaResponse):
         """
         _ = self.capa_system.i18n.ugettext
 
+        # Evaluating the answer at all the test cases at once is much faster, when it
+        # gives the same results.
+        out = self.evaluate_samples(answer, var_dict_list)
+        if out is not None:
+            return out
+
         out = []
         for var_dict in var_dict_list:
             try:
@@ -3257,6 +3263,38 @@ class FormulaResponse(LoncapaResponse):
                 )
         return out
 
+    def evaluate_samples(self, answer, var_dict_list):
+        """
+        Takes in an answer and a list of dictionaries mapping variables to values, as
+        tupleize_answers does, and evaluates the answer at all the test cases at once,
+        with each variable as an array of its values at each test case.
+
+        Returns a list of the results, or None if the answer can't be evaluated this way
+        or may not give the same results as evaluating it at each test case separately,
+        e.g. because it isn't a valid formula, or because numpy gives NaN or infinity
+        where python raises an error.
+        """
+        num_samples = len(var_dict_list)
+        if not var_dict_list or any(set(var_dict) != set(var_dict_list[0]) for var_dict in var_dict_list):
+            return None
+
+        samples = {
+            var: numpy.array([var_dict[var] for var_dict in var_dict_list])
+            for var in var_dict_list[0]
+        }
+        # pylint: disable=broad-except
+        try:
+            with numpy.errstate(all='ignore'):
+                result = numpy.asarray(evaluator(samples, dict(), answer, case_sensitive=self.case_sensitive))
+                if result.shape == ():
+                    # The answer doesn't depend on the variables.
+                    result = numpy.repeat(result, num_samples)
+                if result.shape != (num_samples,) or not numpy.isfinite(result).all():
+                    return None
+        except Exception:
+            return None
+        return result.tolist()
+
     def randomize_variables(self, samples):
         """
         Returns a list of dictionaries mapping variables to random values in range,
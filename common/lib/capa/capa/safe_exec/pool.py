@@ -0,0 +1,398 @@
+"""
+A pool of warm sandboxes for capa's execution of python code.
+
+Starting a sandboxed python, and importing numpy and scipy into it, for every
+execution of a problem's code is slow.  Instead, each worker of the pool is a
+sandboxed python process, started just as CodeJail starts one, which imports
+the assumed modules once.  For each execution, the worker forks a child, which
+applies CodeJail's resource limits to itself and runs the code.  So the code
+still runs in a separate process, under the limits, while the worker never
+runs the code itself.  Workers are replaced after a number of executions.
+
+The pool is configured with `configure_pool()`, and each process creates its
+own workers the first time they are needed.
+"""
+import json
+import logging
+import os
+import os.path
+import Queue
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+
+from codejail import jail_code
+from codejail.safe_exec import json_safe, SafeExecException
+from dogapi import dog_stats_api
+
+log = logging.getLogger(__name__)
+
+# The program run by the sandboxed python of each worker.  Its arguments are
+# the names of the modules to import.  It reads a JSON request from stdin for
+# each execution, and writes the JSON result to stdout.
+WORKER_CODE = r'''
+import json
+import os
+import resource
+import select
+import shutil
+import signal
+import sys
+import time
+import traceback
+
+for module_name in sys.argv[1:]:
+    try:
+        __import__(module_name)
+    except Exception:
+        pass
+
+RLIMITS = [("CPU", resource.RLIMIT_CPU), ("VMEM", resource.RLIMIT_AS), ("FSIZE", resource.RLIMIT_FSIZE)]
+OK_TYPES = (type(None), int, long, float, str, unicode, list, tuple, dict)
+
+
+class DevNull(object):
+    def write(self, *args, **kwargs):
+        pass
+
+
+def jsonable(value):
+    if not isinstance(value, OK_TYPES):
+        return False
+    try:
+        json.dumps(value)
+    except Exception:
+        return False
+    return True
+
+
+def execute(request, result_fd):
+    """Run the requested code, in the forked child."""
+    # The code can't reach the worker's stdin and stdout.
+    devnull = os.open(os.devnull, os.O_RDWR)
+    os.dup2(devnull, 0)
+    os.dup2(devnull, 1)
+    sys.stdout = DevNull()
+
+    os.chdir(request["home"])
+    os.environ["TMPDIR"] = os.path.join(request["home"], "tmp")
+    for name, rlimit in RLIMITS:
+        if request["limits"].get(name):
+            resource.setrlimit(rlimit, (request["limits"][name], request["limits"][name]))
+    resource.setrlimit(resource.RLIMIT_NPROC, (0, 0))
+    sys.path.extend(request["python_path"])
+
+    try:
+        g_dict = request["globals"]
+        exec request["code"] in g_dict
+        result = {
+            "globals": {
+                key: value for key, value in g_dict.iteritems()
+                if jsonable(value) and key != "__builtins__"
+            }
+        }
+    except BaseException:
+        result = {"error": traceback.format_exc()}
+
+    result_file = os.fdopen(result_fd, "w")
+    json.dump(result, result_file)
+    result_file.close()
+
+
+def run(request):
+    """Run the requested code in a forked child, and return its result."""
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        try:
+            execute(request, write_fd)
+        finally:
+            os._exit(0)
+    os.close(write_fd)
+
+    realtime = request["limits"].get("REALTIME")
+    deadline = time.time() + realtime if realtime else None
+    output = []
+    timed_out = False
+    while True:
+        timeout = max(deadline - time.time(), 0) if deadline else None
+        readable, __, __ = select.select([read_fd], [], [], timeout)
+        if not readable:
+            timed_out = True
+            os.kill(pid, signal.SIGKILL)
+            break
+        data = os.read(read_fd, 65536)
+        if not data:
+            break
+        output.append(data)
+    os.close(read_fd)
+    __, status = os.waitpid(pid, 0)
+
+    # Remove anything the code left in its temp directory.
+    tmp_dir = os.path.join(request["home"], "tmp")
+    for name in os.listdir(tmp_dir):
+        path = os.path.join(tmp_dir, name)
+        if os.path.isdir(path) and not os.path.islink(path):
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            os.remove(path)
+
+    if timed_out:
+        return {"error": "Killed after %s seconds" % realtime}
+    try:
+        return json.loads("".join(output))
+    except ValueError:
+        if os.WIFSIGNALED(status):
+            return {"error": "Killed by signal %s" % os.WTERMSIG(status)}
+        return {"error": "Exited with status %s" % os.WEXITSTATUS(status)}
+
+
+while True:
+    line = sys.stdin.readline()
+    if not line:
+        break
+    sys.stdout.write(json.dumps(run(json.loads(line))) + "\n")
+    sys.stdout.flush()
+'''
+
+_pool_config = None
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def configure_pool(size, max_executions, preload_modules=()):
+    """
+    Configure the pool of sandboxes used by `get_pool()`.
+
+    `size` is the maximum number of workers of each process.  Zero disables the
+    pool.
+
+    `max_executions` is the number of executions after which a worker is
+    replaced.
+
+    `preload_modules` are the names of the modules that workers import when
+    they start.
+    """
+    global _pool_config, _pool  # pylint: disable=global-statement
+    with _pool_lock:
+        _pool_config = (size, max_executions, tuple(preload_modules))
+        if _pool is not None:
+            _pool.shutdown()
+            _pool = None
+
+
+def get_pool():
+    """
+    Return the SandboxPool of the current process, or None if no pool is
+    configured, or CodeJail isn't configured to run python.
+    """
+    global _pool  # pylint: disable=global-statement
+    if not _pool_config or not _pool_config[0] or not jail_code.is_configured("python"):
+        return None
+    with _pool_lock:
+        # A pool inherited from the parent of a forked process can't be used,
+        # as it shares the parent's workers.
+        if _pool is None or _pool.pid != os.getpid():
+            _pool = SandboxPool(*_pool_config)
+        return _pool
+
+
+class SandboxWorker(object):
+    """
+    A sandboxed python process which runs each execution in a forked child.
+    """
+    def __init__(self, preload_modules):
+        command = jail_code.COMMANDS["python"]
+        cmd = []
+        if command["user"]:
+            cmd.extend(["sudo", "-u", command["user"]])
+        cmd.extend(command["cmdline_start"])
+        cmd.extend(["-c", WORKER_CODE])
+        cmd.extend(preload_modules)
+        self.process = subprocess.Popen(
+            cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, env={}, close_fds=True,
+        )
+        self.executions = 0
+
+    def is_alive(self):
+        """
+        Return whether the worker process is still running.
+        """
+        return self.process.poll() is None
+
+    def safe_exec(self, code, globals_dict, python_path=None, extra_files=None, slug=None):
+        """
+        Execute code as `codejail.safe_exec.safe_exec` does, in a child of
+        the worker.
+        """
+        self.executions += 1
+        python_path = python_path or ()
+        extra_files = extra_files or ()
+        extra_names = set(name for name, __ in extra_files)
+
+        home = tempfile.mkdtemp(prefix="codejail-")
+        try:
+            # The sandbox user needs to read the home directory and to write
+            # to its temp directory.
+            os.chmod(home, 0775)
+            tmp_dir = os.path.join(home, "tmp")
+            os.mkdir(tmp_dir)
+            os.chmod(tmp_dir, 0777)
+
+            # The code imports from the python path in its home directory.
+            for path in python_path:
+                name = os.path.basename(path)
+                if name in extra_names:
+                    continue
+                if os.path.isdir(path):
+                    shutil.copytree(path, os.path.join(home, name), symlinks=True)
+                else:
+                    shutil.copy(path, os.path.join(home, name))
+            for name, contents in extra_files:
+                with open(os.path.join(home, name), "wb") as extra_file:
+                    extra_file.write(contents)
+
+            request = {
+                "code": code,
+                "globals": json_safe(globals_dict),
+                "home": home,
+                "python_path": [os.path.basename(path) for path in python_path],
+                "limits": jail_code.LIMITS,
+            }
+            self.process.stdin.write(json.dumps(request) + "\n")
+            self.process.stdin.flush()
+            response = self.process.stdout.readline()
+        except IOError as err:
+            log.warning("Sandbox worker failed while executing %s: %s", slug, err)
+            response = None
+        finally:
+            shutil.rmtree(home, ignore_errors=True)
+
+        if not response:
+            raise SafeExecException("Couldn't execute jailed code: the sandbox worker exited")
+        result = json.loads(response)
+        if "error" in result:
+            raise SafeExecException("Couldn't execute jailed code: %s" % result["error"])
+        globals_dict.update(result["globals"])
+
+    def stop(self):
+        """
+        Stop the worker process.
+        """
+        try:
+            self.process.stdin.close()
+            self.process.wait()
+        except (IOError, OSError):
+            pass
+
+
+class SandboxPool(object):
+    """
+    A pool of up to `size` SandboxWorkers, which are started when needed, and
+    replaced after `max_executions` executions.
+    """
+    def __init__(self, size, max_executions, preload_modules=()):
+        self.size = size
+        self.max_executions = max_executions
+        self.preload_modules = preload_modules
+        self.pid = os.getpid()
+        self._idle_workers = Queue.Queue()
+        self._num_workers = 0
+        self._num_busy_workers = 0
+        self._lock = threading.Lock()
+
+    def safe_exec(self, code, globals_dict, python_path=None, extra_files=None, slug=None):
+        """
+        Execute code as `codejail.safe_exec.safe_exec` does, in one of the
+        pool's workers.
+        """
+        worker = self._acquire_worker()
+        try:
+            worker.safe_exec(code, globals_dict, python_path=python_path, extra_files=extra_files, slug=slug)
+        finally:
+            self._release_worker(worker)
+
+    def _acquire_worker(self):
+        """
+        Return an idle worker, starting one if there are fewer than `size`,
+        or else waiting for one.  Idle workers which have exited since they
+        were released are replaced.
+        """
+        start_time = time.time()
+        worker = None
+        while worker is None:
+            try:
+                worker = self._idle_workers.get_nowait()
+            except Queue.Empty:
+                with self._lock:
+                    start_worker = self._num_workers < self.size
+                    if start_worker:
+                        self._num_workers += 1
+                if start_worker:
+                    try:
+                        worker = SandboxWorker(self.preload_modules)
+                    except Exception:
+                        with self._lock:
+                            self._num_workers -= 1
+                        raise
+                    dog_stats_api.increment('capa.safe_exec.pool.started_workers')
+                    break
+                worker = self._idle_workers.get()
+
+            if not worker.is_alive():
+                self._remove_worker(worker)
+                worker = None
+
+        dog_stats_api.histogram('capa.safe_exec.pool.wait_time', time.time() - start_time)
+        self._update_busy_workers(1)
+        return worker
+
+    def _release_worker(self, worker):
+        """
+        Return a worker to the pool, replacing it if it has done enough
+        executions or has exited.
+        """
+        self._update_busy_workers(-1)
+        if worker.executions < self.max_executions and worker.is_alive():
+            self._idle_workers.put(worker)
+        else:
+            self._remove_worker(worker)
+
+    def _remove_worker(self, worker):
+        """
+        Stop a worker, making room in the pool for another one.
+        """
+        worker.stop()
+        dog_stats_api.increment('capa.safe_exec.pool.recycled_workers')
+        with self._lock:
+            self._num_workers -= 1
+
+    def _update_busy_workers(self, delta):
+        """
+        Update the number of busy workers, and report the pool's utilization.
+        """
+        with self._lock:
+            self._num_busy_workers += delta
+            num_busy_workers = self._num_busy_workers
+            size = self.size
+        dog_stats_api.gauge('capa.safe_exec.pool.busy_workers', num_busy_workers)
+        # A pool which was shut down has no size, but may still have busy workers.
+        if size:
+            dog_stats_api.gauge('capa.safe_exec.pool.utilization', float(num_busy_workers) / size)
+
+    def shutdown(self):
+        """
+        Stop the idle workers.  Busy workers are stopped when released.
+        """
+        self.size = 0
+        while True:
+            try:
+                worker = self._idle_workers.get_nowait()
+            except Queue.Empty:
+                break
+            worker.stop()
+            with self._lock:
+                self._num_workers -= 1
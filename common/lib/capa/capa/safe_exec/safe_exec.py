@@ -3,10 +3,20 @@
 from codejail.safe_exec import safe_exec as codejail_safe_exec
 from codejail.safe_exec import not_safe_exec as codejail_not_safe_exec
 from codejail.safe_exec import json_safe, SafeExecException
+from xmodule.util.lru import LRUCache
 from . import lazymod
+from .pool import configure_pool, get_pool
 from dogapi import dog_stats_api
 
 import hashlib
+import json
+import logging
+
+log = logging.getLogger(__name__)
+
+# The total size, in bytes, of the serialized results that ResultCache keeps
+# in each process.
+LOCAL_RESULT_CACHE_SIZE = 16 * 1024 * 1024
 
 # Establish the Python environment for Capa.
 # Capa assumes float-friendly division always.
@@ -47,6 +57,74 @@ for name, modname in ASSUMED_IMPORTS:
 LAZY_IMPORTS = "".join(LAZY_IMPORTS)
 
 
+def configure_sandbox_pool(size, max_executions):
+    """
+    Run sandboxed code in a pool of up to `size` warm sandbox workers in each
+    process, which already have the assumed imports imported, and which are
+    replaced after `max_executions` executions.  A `size` of zero runs each
+    execution in a new sandbox.
+    """
+    configure_pool(size, max_executions, [modname for __, modname in ASSUMED_IMPORTS])
+
+
+class ResultCache(object):
+    """
+    A cache of `safe_exec` results, which keeps recently used results in this
+    process in front of `shared_cache`, such as memcached, so that hits on
+    them don't need a round trip to the shared cache.
+
+    A result depends only on its key, so results kept in the process never go
+    stale.  They are kept serialized, so that callers can't change them, and
+    so that the memory they use is bounded by LOCAL_RESULT_CACHE_SIZE.
+    """
+    _local_results = LRUCache(LOCAL_RESULT_CACHE_SIZE)
+
+    def __init__(self, shared_cache):
+        self.shared_cache = shared_cache
+
+    def get(self, key):
+        """
+        Return the result cached for `key`, or None.
+        """
+        serialized_result = self._local_results.get(key)
+        if serialized_result is not None:
+            dog_stats_api.increment('capa.safe_exec.cache.local_hit')
+            emsg, cleaned_results = json.loads(serialized_result)
+            return emsg, cleaned_results
+
+        result = self.shared_cache.get(key)
+        if result is not None:
+            self._set_local(key, result)
+        return result
+
+    def set(self, key, result):
+        """
+        Cache `result` for `key`, in this process and in the shared cache.
+        """
+        self._set_local(key, result)
+        self.shared_cache.set(key, result)
+
+    def _set_local(self, key, result):
+        """
+        Keep `result` for `key` in this process.
+        """
+        serialized_result = json.dumps(result)
+        self._local_results.set(key, serialized_result, value_size=len(serialized_result))
+        dog_stats_api.gauge('capa.safe_exec.cache.local_bytes', self._local_results.current_size)
+
+
+def hash_globals(hasher, safe_globals):
+    """
+    Update a `hashlib` hasher with globals as returned by `json_safe`.
+
+    Like `update_hash`, this canonicalizes the order of dictionaries at every
+    level, but the globals are serialized by the json module's C encoder,
+    which is much faster than walking them in Python.
+
+    """
+    hasher.update(json.dumps(safe_globals, sort_keys=True, separators=(',', ':')))
+
+
 def update_hash(hasher, obj):
     """
     Update a `hashlib` hasher with a nested object.
@@ -99,7 +177,8 @@ def safe_exec(
 
     `cache` is an object with .get(key) and .set(key, value) methods.  It will be used
     to cache the execution, taking into account the code, the values of the globals,
-    and the random seed.
+    and the random seed.  Wrap a shared cache in a `ResultCache` to also keep
+    recent results in this process.
 
     `slug` is an arbitrary string, a description that's meaningful to the
     caller, that will be used in log messages.
@@ -112,24 +191,30 @@ def safe_exec(
         safe_globals = json_safe(globals_dict)
         md5er = hashlib.md5()
         md5er.update(repr(code))
-        update_hash(md5er, safe_globals)
+        hash_globals(md5er, safe_globals)
         key = "safe_exec.%r.%s" % (random_seed, md5er.hexdigest())
         cached = cache.get(key)
         if cached is not None:
             # We have a cached result.  The result is a pair: the exception
             # message, if any, else None; and the resulting globals dictionary.
+            dog_stats_api.increment('capa.safe_exec.cache.hit')
+            log.debug("safe_exec cache hit for %s", slug)
             emsg, cleaned_results = cached
             globals_dict.update(cleaned_results)
             if emsg:
                 raise SafeExecException(emsg)
             return
+        dog_stats_api.increment('capa.safe_exec.cache.miss')
 
     # Create the complete code we'll run.
     code_prolog = CODE_PROLOG % random_seed
 
     # Decide which code executor to use.
+    sandbox_pool = get_pool()
     if unsafely:
         exec_fn = codejail_not_safe_exec
+    elif sandbox_pool is not None:
+        exec_fn = sandbox_pool.safe_exec
     else:
         exec_fn = codejail_safe_exec
 
@@ -148,6 +233,7 @@ def safe_exec(
     # the globals dict might not be entirely serializable.
     if cache:
         cleaned_results = json_safe(globals_dict)
+        dog_stats_api.histogram('capa.safe_exec.cache.result_size', len(json.dumps(cleaned_results)))
         cache.set(key, (emsg, cleaned_results))
 
     # If an exception happened, raise it now.
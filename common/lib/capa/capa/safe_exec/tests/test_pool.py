@@ -0,0 +1,145 @@
+"""Test pool.py"""
+
+import os
+import unittest
+
+from mock import patch
+from nose.plugins.skip import SkipTest
+
+from capa.safe_exec import pool
+from capa.safe_exec.pool import SandboxPool
+from codejail.jail_code import is_configured
+from codejail.safe_exec import SafeExecException
+
+
+class FakeWorker(object):
+    """A SandboxWorker that sets `a` without running anything."""
+
+    def __init__(self, preload_modules):
+        self.preload_modules = preload_modules
+        self.executions = 0
+        self.alive = True
+        self.stopped = False
+
+    def is_alive(self):
+        return self.alive
+
+    def safe_exec(self, code, globals_dict, python_path=None, extra_files=None, slug=None):
+        self.executions += 1
+        globals_dict['a'] = 17
+
+    def stop(self):
+        self.stopped = True
+
+
+@patch('capa.safe_exec.pool.SandboxWorker', FakeWorker)
+class TestSandboxPool(unittest.TestCase):
+    """Test the bookkeeping of workers by SandboxPool."""
+
+    def test_reuses_idle_worker(self):
+        sandbox_pool = SandboxPool(2, 100)
+        g = {}
+        sandbox_pool.safe_exec("a = 17", g)
+        worker = sandbox_pool._acquire_worker()  # pylint: disable=protected-access
+        self.assertEqual(worker.executions, 1)
+        self.assertEqual(g['a'], 17)
+
+    def test_starts_workers_up_to_size(self):
+        sandbox_pool = SandboxPool(2, 100)
+        worker1 = sandbox_pool._acquire_worker()  # pylint: disable=protected-access
+        worker2 = sandbox_pool._acquire_worker()  # pylint: disable=protected-access
+        self.assertIsNot(worker1, worker2)
+        self.assertEqual(sandbox_pool._num_workers, 2)  # pylint: disable=protected-access
+
+        sandbox_pool._release_worker(worker2)  # pylint: disable=protected-access
+        self.assertIs(sandbox_pool._acquire_worker(), worker2)  # pylint: disable=protected-access
+
+    def test_recycles_workers(self):
+        sandbox_pool = SandboxPool(1, 2)
+        worker = sandbox_pool._acquire_worker()  # pylint: disable=protected-access
+        sandbox_pool._release_worker(worker)  # pylint: disable=protected-access
+        sandbox_pool.safe_exec("a = 17", {})
+        sandbox_pool.safe_exec("a = 17", {})
+
+        # The first worker did its 2 executions, and was replaced.
+        self.assertTrue(worker.stopped)
+        new_worker = sandbox_pool._acquire_worker()  # pylint: disable=protected-access
+        self.assertIsNot(new_worker, worker)
+        self.assertEqual(sandbox_pool._num_workers, 1)  # pylint: disable=protected-access
+
+    def test_replaces_dead_workers(self):
+        sandbox_pool = SandboxPool(1, 100)
+        worker = sandbox_pool._acquire_worker()  # pylint: disable=protected-access
+        worker.alive = False
+        sandbox_pool._release_worker(worker)  # pylint: disable=protected-access
+        self.assertTrue(worker.stopped)
+        self.assertIsNot(sandbox_pool._acquire_worker(), worker)  # pylint: disable=protected-access
+
+    def test_replaces_idle_workers_which_died(self):
+        sandbox_pool = SandboxPool(1, 100)
+        worker = sandbox_pool._acquire_worker()  # pylint: disable=protected-access
+        sandbox_pool._release_worker(worker)  # pylint: disable=protected-access
+        worker.alive = False
+
+        new_worker = sandbox_pool._acquire_worker()  # pylint: disable=protected-access
+        self.assertTrue(worker.stopped)
+        self.assertIsNot(new_worker, worker)
+        self.assertTrue(new_worker.is_alive())
+        self.assertEqual(sandbox_pool._num_workers, 1)  # pylint: disable=protected-access
+
+    def test_release_after_shutdown(self):
+        sandbox_pool = SandboxPool(1, 100)
+        worker = sandbox_pool._acquire_worker()  # pylint: disable=protected-access
+        sandbox_pool.shutdown()
+        sandbox_pool._release_worker(worker)  # pylint: disable=protected-access
+        self.assertTrue(worker.stopped)
+        self.assertEqual(sandbox_pool._num_workers, 0)  # pylint: disable=protected-access
+
+    def test_get_pool(self):
+        with patch('capa.safe_exec.pool.jail_code.is_configured', return_value=True):
+            pool.configure_pool(0, 100)
+            self.assertIsNone(pool.get_pool())
+
+            pool.configure_pool(2, 100, ['math'])
+            sandbox_pool = pool.get_pool()
+            self.assertEqual(sandbox_pool.preload_modules, ('math',))
+            self.assertIs(pool.get_pool(), sandbox_pool)
+
+            # A forked process gets a pool of its own.
+            with patch('capa.safe_exec.pool.os.getpid', return_value=os.getpid() + 1):
+                self.assertIsNot(pool.get_pool(), sandbox_pool)
+        pool.configure_pool(0, 100)
+
+
+class TestSandboxWorker(unittest.TestCase):
+    """Test executions in a real SandboxWorker."""
+
+    def setUp(self):
+        super(TestSandboxWorker, self).setUp()
+        # Sandbox workers run the sandboxed python configured for CodeJail.
+        if not is_configured("python"):
+            raise SkipTest
+        self.worker = pool.SandboxWorker(['math'])
+        self.addCleanup(self.worker.stop)
+
+    def test_set_values(self):
+        g = {'b': 2}
+        self.worker.safe_exec("import math; a = int(math.pi) + b", g)
+        self.assertEqual(g['a'], 5)
+
+    def test_executions_are_isolated(self):
+        self.worker.safe_exec("import math; math.pi = 3", {})
+        g = {}
+        self.worker.safe_exec("import math; a = math.pi", g)
+        self.assertNotEqual(g['a'], 3)
+
+    def test_raising_exceptions(self):
+        with self.assertRaises(SafeExecException) as cm:
+            self.worker.safe_exec("1/0", {})
+        self.assertIn("ZeroDivisionError", cm.exception.message)
+        self.assertTrue(self.worker.is_alive())
+
+    def test_cant_do_something_forbidden(self):
+        with self.assertRaises(SafeExecException) as cm:
+            self.worker.safe_exec("import os; files = os.listdir('/')", {})
+        self.assertIn("OSError", cm.exception.message)
@@ -9,7 +9,8 @@ import unittest
 
 from nose.plugins.skip import SkipTest
 
-from capa.safe_exec import safe_exec, update_hash
+from capa.safe_exec import ResultCache, hash_globals, safe_exec, update_hash
+from capa.safe_exec.safe_exec import LOCAL_RESULT_CACHE_SIZE
 from codejail.safe_exec import SafeExecException
 from codejail.jail_code import is_configured
 
@@ -177,6 +178,70 @@ class TestSafeExecCaching(unittest.TestCase):
                 self.fail("Tried executing code with non-ASCII unicode: {0}".format(code))
 
 
+class TestResultCache(unittest.TestCase):
+    """Test that ResultCache keeps results in front of the shared cache."""
+
+    def setUp(self):
+        super(TestResultCache, self).setUp()
+        ResultCache._local_results.clear()  # pylint: disable=protected-access
+        self.addCleanup(ResultCache._local_results.clear)  # pylint: disable=protected-access
+
+    def test_local_hit(self):
+        cache = {}
+        safe_exec("a = int(math.pi)", {}, cache=ResultCache(DictCache(cache)))
+        self.assertEqual(cache.values()[0], (None, {'a': 3}))
+
+        # The result is found in the process, without the shared cache.
+        cache.clear()
+        g = {}
+        safe_exec("a = int(math.pi)", g, cache=ResultCache(DictCache(cache)))
+        self.assertEqual(g['a'], 3)
+        self.assertEqual(cache, {})
+
+    def test_shared_hit(self):
+        cache = {}
+        safe_exec("a = int(math.pi)", {}, cache=DictCache(cache))
+        key = cache.keys()[0]
+        cache[key] = (None, {'a': 17})
+
+        # A result found in the shared cache is kept in the process.
+        result_cache = ResultCache(DictCache(cache))
+        g = {}
+        safe_exec("a = int(math.pi)", g, cache=result_cache)
+        self.assertEqual(g['a'], 17)
+        cache.clear()
+        self.assertEqual(result_cache.get(key), (None, {'a': 17}))
+
+    def test_cached_results_are_copied(self):
+        result_cache = ResultCache(DictCache({}))
+        g = {}
+        safe_exec("a = [1, 2]", g, cache=result_cache)
+        g['a'].append(3)
+
+        g = {}
+        safe_exec("a = [1, 2]", g, cache=result_cache)
+        self.assertEqual(g['a'], [1, 2])
+
+    def test_local_exceptions(self):
+        result_cache = ResultCache(DictCache({}))
+        for __ in xrange(2):
+            with self.assertRaises(SafeExecException) as cm:
+                safe_exec("1/0", {}, cache=result_cache)
+            self.assertIn("ZeroDivisionError", cm.exception.message)
+
+    def test_local_size(self):
+        result_cache = ResultCache(DictCache({}))
+        result_cache.set('small', (None, {'a': 1}))
+        local_results = ResultCache._local_results  # pylint: disable=protected-access
+        self.assertEqual(local_results.current_size, len('[null, {"a": 1}]'))
+
+        # A result larger than the whole local cache is only kept in the shared cache.
+        large_result = (None, {'a': 'x' * LOCAL_RESULT_CACHE_SIZE})
+        result_cache.set('large', large_result)
+        self.assertIsNone(local_results.get('large'))
+        self.assertEqual(result_cache.get('large'), large_result)
+
+
 class TestUpdateHash(unittest.TestCase):
     """Test the safe_exec.update_hash function to be sure it canonicalizes properly."""
 
@@ -235,6 +300,21 @@ class TestUpdateHash(unittest.TestCase):
         self.assertEqual(h1, h2)
 
 
+class TestHashGlobals(TestUpdateHash):
+    """Test that safe_exec.hash_globals canonicalizes like update_hash."""
+
+    def hash_obj(self, obj):
+        """Return the md5 hash that `hash_globals` makes us."""
+        md5er = hashlib.md5()
+        hash_globals(md5er, obj)
+        return md5er.hexdigest()
+
+    def test_types(self):
+        self.assertNotEqual(self.hash_obj({'a': 1}), self.hash_obj({'a': 1.0}))
+        self.assertNotEqual(self.hash_obj({'a': 1}), self.hash_obj({'a': True}))
+        self.assertNotEqual(self.hash_obj({'a': None}), self.hash_obj({'a': u'null'}))
+
+
 class TestRealProblems(unittest.TestCase):
     def test_802x(self):
         code = textwrap.dedent("""\
@@ -54,6 +54,28 @@ class CapaHtmlRenderTest(unittest.TestCase):
         self.assertEqual(test_element.tag, "test")
         self.assertEqual(test_element.text, "Test include")
 
+    def test_preprocessed_tree_cache(self):
+        xml_str = StringResponseXMLFactory().build_xml(answer="Test string", hints=[("test", "hint", "hint text")])
+
+        # Each problem gets its own copy of the preprocessed tree, which is
+        # only parsed the first time.
+        with mock.patch('capa.capa_problem.etree.XML', wraps=etree.XML) as mock_xml:
+            problems = [new_loncapa_problem(xml_str, seed=seed) for seed in (1, 2)]
+        self.assertEqual(mock_xml.call_count, 1)
+        self.assertIsNot(problems[0].tree, problems[1].tree)
+        self.assertEqual(etree.tostring(problems[0].tree), etree.tostring(problems[1].tree))
+        self.assertEqual(problems[0].get_html(), problems[1].get_html())
+        self.assertEqual(
+            [(response.tag, response.get('id')) for response in problems[0].responders],
+            [(response.tag, response.get('id')) for response in problems[1].responders]
+        )
+        for problem in problems:
+            # The responders belong to the problem's own tree.
+            for response, responder in problem.responders.items():
+                self.assertIs(response.getroottree().getroot(), problem.tree)
+                for inputfield in responder.inputfields:
+                    self.assertIs(inputfield.getroottree().getroot(), problem.tree)
+
     def test_process_outtext(self):
         # Generate some XML with <startouttext /> and <endouttext />
         xml_str = textwrap.dedent("""
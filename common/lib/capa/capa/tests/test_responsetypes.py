@@ -503,6 +503,38 @@ class FormulaResponseTest(ResponseTest):
         self.assertEquals(correct_map.get_hint('1_2_1'),
                           'Try including the variable x')
 
+    def test_evaluate_samples(self):
+        """
+        Test that answers are evaluated at all the test cases at once, when
+        that gives the same results as evaluating them at each test case.
+        """
+        problem = self.build_problem(sample_dict={'x': (-10, 10), 'y': (1, 5)},
+                                     num_samples=10,
+                                     tolerance=0.01,
+                                     answer="x+2*y")
+        responder = problem.responders.values()[0]
+        var_dict_list = responder.randomize_variables(responder.samples)
+
+        answer = "x^2 + sin(x) / y || 3"
+        with mock.patch('capa.responsetypes.evaluator', wraps=calc.evaluator) as mock_evaluator:
+            results = responder.tupleize_answers(answer, var_dict_list)
+        self.assertEqual(mock_evaluator.call_count, 1)
+        self.assertEqual(len(results), len(var_dict_list))
+        for result, var_dict in zip(results, var_dict_list):
+            self.assertAlmostEqual(result, calc.evaluator(var_dict, {}, answer))
+
+        # Answers that don't depend on the variables
+        self.assertEqual(responder.evaluate_samples("2*pi", var_dict_list), [2 * calc.evaluator({}, {}, "pi")] * 10)
+
+        # Answers that python can't evaluate at some test case, or that numpy
+        # can't evaluate at all, are evaluated at each test case.
+        self.assertIsNone(responder.evaluate_samples("x / (y - y)", var_dict_list))
+        self.assertIsNone(responder.evaluate_samples("fact(y)", var_dict_list))
+        self.assertIsNone(responder.evaluate_samples("x +", var_dict_list))
+        self.assertIsNone(responder.evaluate_samples("x + z", var_dict_list))
+        with self.assertRaises(StudentInputError):
+            responder.tupleize_answers("x / (y - y)", var_dict_list)
+
     def test_script(self):
         """
         Test if python script can be used to generate answers
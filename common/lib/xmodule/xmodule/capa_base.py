@@ -20,6 +20,7 @@ except ImportError:
 from capa.capa_problem import LoncapaProblem, LoncapaSystem
 from capa.responsetypes import StudentInputError, \
     ResponseError, LoncapaProblemError
+from capa.safe_exec import ResultCache
 from capa.util import convert_files_to_filenames, get_inner_html_from_xpath
 from .progress import Progress
 from xmodule.exceptions import NotFoundError
@@ -299,7 +300,7 @@ class CapaMixin(CapaFields):
         capa_system = LoncapaSystem(
             ajax_url=self.runtime.ajax_url,
             anonymous_student_id=self.runtime.anonymous_student_id,
-            cache=self.runtime.cache,
+            cache=ResultCache(self.runtime.cache),
             can_execute_unsafe_code=self.runtime.can_execute_unsafe_code,
             get_python_lib_zip=self.runtime.get_python_lib_zip,
             DEBUG=self.runtime.DEBUG,
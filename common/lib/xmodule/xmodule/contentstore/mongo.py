@@ -1,6 +1,7 @@
 """
 MongoDB/GridFS-level code for the contentstore.
 """
+import hashlib
 import os
 import json
 import pymongo
@@ -94,12 +95,18 @@ class MongoContentStore(ContentStore):
                               import_path=content.import_path,
                               # getattr b/c caching may mean some pickled instances don't have attr
                               locked=getattr(content, 'locked', False)) as fp:
+            sha1 = hashlib.sha1()
             if hasattr(content.data, '__iter__'):
                 for chunk in content.data:
+                    sha1.update(chunk)
                     fp.write(chunk)
             else:
+                sha1.update(content.data)
                 fp.write(content.data)
+            # A strong digest of the data, which validates the asset in conditional requests.
+            fp.sha1 = sha1.hexdigest()
 
+        content.content_digest = fp.sha1
         return content
 
     def delete(self, location_or_id):
@@ -128,7 +135,8 @@ class MongoContentStore(ContentStore):
                     location, fp.displayname, fp.content_type, fp, last_modified_at=fp.uploadDate,
                     thumbnail_location=thumbnail_location,
                     import_path=getattr(fp, 'import_path', None),
-                    length=fp.length, locked=getattr(fp, 'locked', False)
+                    length=fp.length, locked=getattr(fp, 'locked', False),
+                    content_digest=self._content_digest(fp)
                 )
             else:
                 with self.fs.get(content_id) as fp:
@@ -142,7 +150,8 @@ class MongoContentStore(ContentStore):
                         location, fp.displayname, fp.content_type, fp.read(), last_modified_at=fp.uploadDate,
                         thumbnail_location=thumbnail_location,
                         import_path=getattr(fp, 'import_path', None),
-                        length=fp.length, locked=getattr(fp, 'locked', False)
+                        length=fp.length, locked=getattr(fp, 'locked', False),
+                        content_digest=self._content_digest(fp)
                     )
         except NoFile:
             if throw_on_not_found:
@@ -150,6 +159,14 @@ class MongoContentStore(ContentStore):
             else:
                 return None
 
+    @staticmethod
+    def _content_digest(fp):
+        """
+        Returns the digest of a GridFS file's data: the sha1 saved with it, or the md5 that
+        GridFS computes, for files saved before sha1s were.
+        """
+        return getattr(fp, 'sha1', None) or fp.md5
+
     def export(self, location, output_directory):
         content = self.find(location)
 
@@ -193,7 +210,7 @@ class MongoContentStore(ContentStore):
             # to look. -- pmitros
             self.export(asset['asset_key'], output_directory)
             for attr, value in asset.iteritems():
-                if attr not in ['_id', 'md5', 'uploadDate', 'length', 'chunkSize', 'asset_key']:
+                if attr not in ['_id', 'md5', 'sha1', 'uploadDate', 'length', 'chunkSize', 'asset_key']:
                     policy.setdefault(asset['asset_key'].name, {})[attr] = value
 
         with open(assets_policy_file, 'w') as f:
@@ -302,7 +319,7 @@ class MongoContentStore(ContentStore):
         :param location:  a c4x asset location
         """
         for attr in attr_dict.iterkeys():
-            if attr in ['_id', 'md5', 'uploadDate', 'length']:
+            if attr in ['_id', 'md5', 'sha1', 'uploadDate', 'length']:
                 raise AttributeError("{} is a protected attribute.".format(attr))
         asset_db_key, __ = self.asset_db_key(location)
         # catch upsert error and raise NotFoundError if asset doesn't exist
@@ -363,7 +380,8 @@ class MongoContentStore(ContentStore):
                 thumbnail_location=asset['thumbnail_location'],
                 import_path=asset['import_path'],
                 # getattr b/c caching may mean some pickled instances don't have attr
-                locked=asset.get('locked', False)
+                locked=asset.get('locked', False),
+                sha1=asset.get('sha1'),
             )
 
     def delete_all_course_assets(self, course_key):
@@ -6,6 +6,8 @@ import sys
 
 from collections import namedtuple
 
+import numpy
+
 log = logging.getLogger("edx.courseware")
 
 # This is a tuple for holding scores, either from problems or sections.
@@ -160,6 +162,28 @@ class CourseGrader(object):
         '''Given a grade sheet, return a dict containing grading information'''
         raise NotImplementedError
 
+    def batch_grade(self, batch_grade_sheet, num_students):
+        """
+        Grades many students at once, using array operations.
+
+        The batch_grade_sheet is keyed by section format, like a grade_sheet.
+        Each value is a list of (section name, earned, possible) tuples, where
+        earned and possible are arrays holding each student's score for the
+        section.  Every student must have a score with a positive possible
+        value for every section.
+
+        Returns a dict with the following keys:
+        - percent: An array of the final percentage score for each student.
+        - section_breakdown: A list of dictionaries with the label and percent
+        keys of the section_breakdown returned by grade(), where each percent
+        is either an array of the students' percents or a single percent for
+        all students.
+
+        The results are equal to those of grading each student separately.
+        Graders that don't support batch grading raise NotImplementedError.
+        """
+        raise NotImplementedError
+
 
 class WeightedSubsectionsGrader(CourseGrader):
     """
@@ -199,6 +223,18 @@ class WeightedSubsectionsGrader(CourseGrader):
                 'section_breakdown': section_breakdown,
                 'grade_breakdown': grade_breakdown}
 
+    def batch_grade(self, batch_grade_sheet, num_students):
+        total_percent = numpy.zeros(num_students)
+        section_breakdown = []
+
+        for subgrader, __, weight in self.sections:
+            subgrade_result = subgrader.batch_grade(batch_grade_sheet, num_students)
+            total_percent += subgrade_result['percent'] * weight
+            section_breakdown += subgrade_result['section_breakdown']
+
+        return {'percent': total_percent,
+                'section_breakdown': section_breakdown}
+
 
 class SingleSectionGrader(CourseGrader):
     """
@@ -249,6 +285,17 @@ class SingleSectionGrader(CourseGrader):
                 #No grade_breakdown here
                 }
 
+    def batch_grade(self, batch_grade_sheet, num_students):
+        for section_name, earned, possible in batch_grade_sheet.get(self.type, []):
+            if section_name == self.name:
+                percent = earned / possible
+                break
+        else:
+            percent = numpy.zeros(num_students)
+
+        return {'percent': percent,
+                'section_breakdown': [{'percent': percent, 'label': self.short_label}]}
+
 
 class AssignmentFormatGrader(CourseGrader):
     """
@@ -390,3 +437,56 @@ class AssignmentFormatGrader(CourseGrader):
                 'section_breakdown': breakdown,
                 #No grade_breakdown here
                 }
+
+    def batch_grade(self, batch_grade_sheet, num_students):
+        scores = batch_grade_sheet.get(self.type, [])
+        num_assignments = max(self.min_count, len(scores))
+
+        # Placeholder scores of 0 are used for assignments that haven't been
+        # written yet, as in grade().
+        percents = [earned / possible for __, earned, possible in scores]
+        percents += [0] * (num_assignments - len(scores))
+        percent_matrix = numpy.zeros((num_students, num_assignments))
+        for index, percent in enumerate(percents):
+            percent_matrix[:, index] = percent
+
+        # Drop the same scores as grade(), which drops the last drop_count
+        # scores of a stable sort by descending percent.
+        kept = numpy.ones((num_students, num_assignments), dtype=bool)
+        if self.drop_count > 0 and num_assignments > 0:
+            descending_order = numpy.argsort(-percent_matrix, axis=1, kind='mergesort')
+            kept[numpy.arange(num_students)[:, numpy.newaxis], descending_order[:, -self.drop_count:]] = False
+
+        if not scores or num_assignments - self.drop_count <= 0:
+            # Only placeholder scores are kept, so grade() totals them as 0.
+            total_percent = 0
+        else:
+            # Sum the kept scores in assignment order, so the results are
+            # identical to grade()'s.
+            total_percent = numpy.zeros(num_students)
+            for index in xrange(num_assignments):
+                total_percent += numpy.where(kept[:, index], percent_matrix[:, index], 0.0)
+            total_percent /= num_assignments - self.drop_count
+
+        if num_assignments == 1:
+            breakdown = [{'percent': total_percent, 'label': self.short_label}]
+        else:
+            breakdown = []
+            if not self.show_only_average:
+                breakdown = [
+                    {
+                        'percent': percent,
+                        'label': u"{short_label} {index:02d}".format(
+                            index=index + self.starting_index,
+                            short_label=self.short_label
+                        ),
+                    }
+                    for index, percent in enumerate(percents)
+                ]
+            if not self.hide_average:
+                breakdown.append({'percent': total_percent, 'label': u"{short_label} Avg".format(
+                    short_label=self.short_label
+                )})
+
+        return {'percent': total_percent,
+                'section_breakdown': breakdown}
@@ -123,6 +123,9 @@ class BulkOpsRecord(object):
         self._active_count = 0
         self.has_publish_item = False
         self.has_library_updated_item = False
+        # Usage keys of the roots of the subtrees published within this bulk
+        # operation, or None if the extent of the publish is unknown.
+        self.published_usage_keys = set()
 
     @property
     def active(self):
@@ -150,6 +153,18 @@ class BulkOpsRecord(object):
         """
         return self._active_count == 1
 
+    def record_publish(self, usage_key=None):
+        """
+        Record that the subtree rooted at usage_key was published within this
+        bulk operation. A usage_key of None indicates that the extent of the
+        publish is unknown, such as when the entire course is published.
+        """
+        self.has_publish_item = True
+        if usage_key is None:
+            self.published_usage_keys = None
+        elif self.published_usage_keys is not None:
+            self.published_usage_keys.add(usage_key.for_branch(None))
+
 
 class ActiveBulkThread(threading.local):
     """
@@ -319,8 +334,13 @@ class BulkOperationsMixin(object):
         """
         if self.signal_handler and bulk_ops_record.has_publish_item:
             # We remove the branch, because publishing always means copying from draft to published
-            self.signal_handler.send("course_published", course_key=course_id.for_branch(None))
+            self.signal_handler.send(
+                "course_published",
+                course_key=course_id.for_branch(None),
+                changed_usage_keys=bulk_ops_record.published_usage_keys,
+            )
             bulk_ops_record.has_publish_item = False
+            bulk_ops_record.published_usage_keys = set()
 
     def send_bulk_library_updated_signal(self, bulk_ops_record, library_id):
         """
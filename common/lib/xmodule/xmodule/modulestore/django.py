@@ -87,9 +87,13 @@ class SignalHandler(object):
     5. The thing that listens for the signal lives in process, but should do
        almost no work. Its main job is to kick off the celery task that will
        do the actual work.
+    6. The course_published signal also provides "changed_usage_keys": the
+       set of usage keys of the roots of the published (or deleted) subtrees,
+       or None when the extent of the publish is unknown and the whole course
+       should be considered changed.
     """
     pre_publish = django.dispatch.Signal(providing_args=["course_key"])
-    course_published = django.dispatch.Signal(providing_args=["course_key"])
+    course_published = django.dispatch.Signal(providing_args=["course_key", "changed_usage_keys"])
     course_deleted = django.dispatch.Signal(providing_args=["course_key"])
     library_updated = django.dispatch.Signal(providing_args=["library_key"])
     item_deleted = django.dispatch.Signal(providing_args=["usage_key", "user_id"])
@@ -471,7 +471,7 @@ class DraftModuleStore(MongoModuleStore):
             item = super(DraftModuleStore, self).update_item(xblock, user_id, allow_not_found)
             course_key = xblock.location.course_key
             if isPublish or (item.category in DIRECT_ONLY_CATEGORIES and not child_update):
-                self._flag_publish_event(course_key)
+                self._flag_publish_event(course_key, xblock.location)
             return item
 
         if not super(DraftModuleStore, self).has_item(draft_loc):
@@ -551,7 +551,7 @@ class DraftModuleStore(MongoModuleStore):
             parent_block.children.remove(location)
             parent_block.location = parent_location  # ensure the location is with the correct revision
             self.update_item(parent_block, user_id, child_update=True)
-        self._flag_publish_event(location.course_key)
+        self._flag_publish_event(location.course_key, location)
 
         if is_item_direct_only or revision == ModuleStoreEnum.RevisionOption.all:
             as_functions = [as_draft, as_published]
@@ -743,7 +743,7 @@ class DraftModuleStore(MongoModuleStore):
             bulk_record.dirty = True
             self.collection.remove({'_id': {'$in': to_be_deleted}})
 
-        self._flag_publish_event(course_key)
+        self._flag_publish_event(course_key, location)
 
         return self.get_item(as_published(location))
 
@@ -762,7 +762,7 @@ class DraftModuleStore(MongoModuleStore):
         self._convert_to_draft(location, user_id, delete_published=True)
 
         course_key = location.course_key
-        self._flag_publish_event(course_key)
+        self._flag_publish_event(course_key, location)
 
     def revert_to_published(self, location, user_id=None):
         """
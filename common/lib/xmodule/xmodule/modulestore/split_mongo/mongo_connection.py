@@ -1,10 +1,10 @@
 """
 Segregation of pymongo functions from the data modeling mechanisms for split modulestore.
 """
+import copy
 import datetime
-import cPickle as pickle
+import itertools
 import math
-import zlib
 import pymongo
 import pytz
 import re
@@ -15,6 +15,7 @@ from time import time
 from pymongo.errors import DuplicateKeyError  # pylint: disable=unused-import
 
 try:
+    from django.conf import settings
     from django.core.cache import caches, InvalidCacheBackendError
     DJANGO_AVAILABLE = True
 except ImportError:
@@ -28,6 +29,8 @@ from xmodule.exceptions import HeartbeatFailure
 from xmodule.modulestore import BlockData
 from xmodule.modulestore.split_mongo import BlockKey
 from xmodule.mongo_utils import connect_to_mongodb, create_collection_index
+from xmodule.util.codecs import BSONSerializer, Codec, COMPRESSORS, PickleSerializer
+from xmodule.util.lru import LRUCache
 
 
 new_contract('BlockData', BlockData)
@@ -42,6 +45,37 @@ def get_cache(alias):
     return caches[alias]
 
 
+_LOCAL_STRUCTURE_CACHES = {}
+
+
+def get_local_cache():
+    """
+    Return the LocalStructureCache of this process, of the size set by
+    COURSE_STRUCTURE_LOCAL_CACHE_SIZE, or None if that's 0.
+
+    Note: The primary purpose of this is to mock the cache in test_split_modulestore.py
+    """
+    max_size = getattr(settings, 'COURSE_STRUCTURE_LOCAL_CACHE_SIZE', 0)
+    if not max_size:
+        return None
+    if max_size not in _LOCAL_STRUCTURE_CACHES:
+        _LOCAL_STRUCTURE_CACHES[max_size] = LocalStructureCache(max_size)
+    return _LOCAL_STRUCTURE_CACHES[max_size]
+
+
+def get_structure_codec():
+    """
+    Return the Codec of the CourseStructureCache, set by
+    COURSE_STRUCTURE_CACHE_CODEC.
+    """
+    config = getattr(settings, 'COURSE_STRUCTURE_CACHE_CODEC', {})
+    return Codec(
+        STRUCTURE_SERIALIZERS[config.get('SERIALIZER', 'pickle')],
+        COMPRESSORS[config.get('COMPRESSOR', 'zlib')],
+        STRUCTURE_SERIALIZERS.values(),
+    )
+
+
 def round_power_2(value):
     """
     Return value rounded up to the nearest power of 2.
@@ -161,7 +195,175 @@ class QueryTimer(object):
 TIMER = QueryTimer(__name__, 0.01)
 
 
-def structure_from_mongo(structure, course_context=None):
+class LazyBlockMap(dict):
+    """
+    The map {BlockKey: BlockData} of the blocks of a structure, which holds
+    the blocks' mongo documents, and converts each to BlockData only when it's
+    accessed.  A block is converted at most once, and converted blocks are
+    stored in the dict itself, so that updates to them are kept.
+
+    Loading a few blocks of a large course doesn't convert the other blocks,
+    but reading all the blocks (e.g. with `values` or `items`) converts them
+    all.  Iterating over the keys doesn't convert any.
+
+    N.B. `dict(block_map)` and `{}.update(block_map)` copy only the converted
+    blocks, since they don't call any of the methods of the map: use `copy`.
+    """
+    def __init__(self, block_docs=()):
+        super(LazyBlockMap, self).__init__()
+        # The mongo documents of the blocks which haven't been converted yet.
+        # They are never modified, so that they can be shared between copies
+        # of the map: converting a block copies its document.
+        self._block_docs = {}
+        for block in block_docs:
+            self._block_docs[BlockKey(block['block_type'], block['block_id'])] = block
+
+    @staticmethod
+    def _block_data(block):
+        """
+        Converts the mongo document of a block to BlockData, converting
+        'fields.children' from [[block_type, block_id]] to [BlockKey].
+        """
+        block = copy.deepcopy(block)
+        del block['block_id']
+        if 'children' in block['fields']:
+            check('list(list[2])', block['fields']['children'])
+            block['fields']['children'] = [BlockKey(*child) for child in block['fields']['children']]
+        return BlockData(**block)
+
+    def _convert(self, key):
+        """
+        Converts the block `key` if it hasn't been converted yet.
+        """
+        block = self._block_docs.get(key)
+        if block is not None:
+            # The block is stored before its document is removed, so that
+            # other threads reading the map always find it.
+            dict.setdefault(self, key, self._block_data(block))
+            self._block_docs.pop(key, None)
+
+    def _convert_all(self):
+        """
+        Converts all the blocks which haven't been converted yet.
+        """
+        for key in self._block_docs.keys():
+            self._convert(key)
+
+    @property
+    def converted_count(self):
+        """
+        The number of blocks which have been converted to BlockData.
+        """
+        return dict.__len__(self)
+
+    def __getitem__(self, key):
+        self._convert(key)
+        return dict.__getitem__(self, key)
+
+    def __setitem__(self, key, value):
+        self._block_docs.pop(key, None)
+        dict.__setitem__(self, key, value)
+
+    def __delitem__(self, key):
+        if self._block_docs.pop(key, None) is None:
+            dict.__delitem__(self, key)
+
+    def __contains__(self, key):
+        return key in self._block_docs or dict.__contains__(self, key)
+
+    has_key = __contains__
+
+    def __len__(self):
+        return dict.__len__(self) + len(self._block_docs)
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __eq__(self, other):
+        self._convert_all()
+        if isinstance(other, LazyBlockMap):
+            other._convert_all()  # pylint: disable=protected-access
+        return dict.__eq__(self, other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        self._convert_all()
+        return dict.__repr__(self)
+
+    def __reduce__(self):
+        """
+        Pickles and copies the map without converting its blocks, so that
+        structures read from the CourseStructureCache are lazy too.
+        """
+        return (LazyBlockMap, (), {'_block_docs': dict(self._block_docs)}, None, dict.iteritems(self))
+
+    def unconverted_documents(self):
+        """
+        Returns the mongo documents of the blocks which haven't been converted.
+        """
+        return self._block_docs.values()
+
+    def converted_items(self):
+        """
+        Returns the (BlockKey, BlockData) pairs of the converted blocks.
+        """
+        return dict.items(self)
+
+    def get(self, key, default=None):
+        self._convert(key)
+        return dict.get(self, key, default)
+
+    def pop(self, key, *default):
+        self._convert(key)
+        return dict.pop(self, key, *default)
+
+    def popitem(self):
+        self._convert_all()
+        return dict.popitem(self)
+
+    def setdefault(self, key, default=None):
+        self._convert(key)
+        return dict.setdefault(self, key, default)
+
+    def update(self, other=(), **kwargs):
+        if hasattr(other, 'keys'):
+            other = [(key, other[key]) for key in other.keys()]
+        for key, value in itertools.chain(other, kwargs.iteritems()):
+            self[key] = value
+
+    def clear(self):
+        self._block_docs.clear()
+        dict.clear(self)
+
+    def copy(self):
+        return copy.copy(self)
+
+    def keys(self):
+        return dict.keys(self) + self._block_docs.keys()
+
+    def iterkeys(self):
+        return iter(self.keys())
+
+    def values(self):
+        self._convert_all()
+        return dict.values(self)
+
+    def itervalues(self):
+        self._convert_all()
+        return dict.itervalues(self)
+
+    def items(self):
+        self._convert_all()
+        return dict.items(self)
+
+    def iteritems(self):
+        self._convert_all()
+        return dict.iteritems(self)
+
+
+def structure_from_mongo(structure, course_context=None, lazy=True):
     """
     Converts the 'blocks' key from a list [block_data] to a map
         {BlockKey: block_data}.
@@ -173,23 +375,21 @@ def structure_from_mongo(structure, course_context=None):
         structure: The document structure to convert
         course_context (CourseKey): For metrics gathering, the CourseKey
             for the course that this data is being processed for.
+        lazy (bool): If True, the blocks are a LazyBlockMap, which converts
+            (and checks) each block only when it's accessed.  Otherwise, all
+            the blocks are checked and converted now.
     """
     with TIMER.timer('structure_from_mongo', course_context) as tagger:
         tagger.measure('blocks', len(structure['blocks']))
+        tagger.tag(lazy=str(lazy).lower())
 
         check('seq[2]', structure['root'])
-        check('list(dict)', structure['blocks'])
-        for block in structure['blocks']:
-            if 'children' in block['fields']:
-                check('list(list[2])', block['fields']['children'])
-
         structure['root'] = BlockKey(*structure['root'])
-        new_blocks = {}
-        for block in structure['blocks']:
-            if 'children' in block['fields']:
-                block['fields']['children'] = [BlockKey(*child) for child in block['fields']['children']]
-            new_blocks[BlockKey(block['block_type'], block.pop('block_id'))] = BlockData(**block)
-        structure['blocks'] = new_blocks
+        if lazy:
+            structure['blocks'] = LazyBlockMap(structure['blocks'])
+        else:
+            check('list(dict)', structure['blocks'])
+            structure['blocks'] = dict(LazyBlockMap(structure['blocks']).items())
 
         return structure
 
@@ -207,14 +407,21 @@ def structure_to_mongo(structure, course_context=None):
 
         check('BlockKey', structure['root'])
         check('dict(BlockKey: BlockData)', structure['blocks'])
-        for block in structure['blocks'].itervalues():
-            if 'children' in block.fields:
-                check('list(BlockKey)', block.fields['children'])
 
         new_structure = dict(structure)
-        new_structure['blocks'] = []
+        blocks = structure['blocks']
+        if isinstance(blocks, LazyBlockMap):
+            # The documents of the blocks which haven't been converted are
+            # already in the mongo format.
+            new_structure['blocks'] = blocks.unconverted_documents()
+            blocks = blocks.converted_items()
+        else:
+            new_structure['blocks'] = []
+            blocks = blocks.iteritems()
 
-        for block_key, block in structure['blocks'].iteritems():
+        for block_key, block in blocks:
+            if 'children' in block.fields:
+                check('list(BlockKey)', block.fields['children'])
             new_block = dict(block.to_storable())
             new_block.setdefault('block_type', block_key.type)
             new_block['block_id'] = block_key.id
@@ -223,58 +430,164 @@ def structure_to_mongo(structure, course_context=None):
         return new_structure
 
 
+class StructureSerializer(BSONSerializer):
+    """
+    Serializes structures as their mongo documents, in BSON, so that
+    deserializing a structure doesn't create any BlockData (see LazyBlockMap).
+    """
+    tag = 's'
+
+    def dumps(self, value):
+        return super(StructureSerializer, self).dumps(structure_to_mongo(value))
+
+    def loads(self, data):
+        return structure_from_mongo(super(StructureSerializer, self).loads(data))
+
+
+STRUCTURE_SERIALIZERS = {
+    'pickle': PickleSerializer(),
+    'bson': StructureSerializer(),
+}
+
+
+class LocalStructureCache(object):
+    """
+    A cache in the process of the structures read from or written to the
+    CourseStructureCache, which holds up to `max_size` bytes of structures,
+    evicting the least recently used structures first.
+
+    The structures are sized by the length of their serializations, which is
+    cheap to know but understates the memory they use: unpickled structures
+    typically take several times the size of their serialization.  So
+    `max_size` bounds the structures that are cached, rather than the memory
+    of the process, and should be set with that overhead in mind.
+
+    Structures are immutable, so cached structures never need to be
+    invalidated.  However, callers modify the blocks they read (e.g. to add
+    their definitions' fields), so each `get` returns a copy of the cached
+    structure, whose blocks are converted from their documents again.  For
+    that reason, only structures whose blocks are all unconverted are cached.
+    """
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._structures = LRUCache(max_size)
+
+    @property
+    def size(self):
+        """
+        The total size of the serializations of the cached structures.
+        """
+        return self._structures.current_size
+
+    @staticmethod
+    def _copy(structure):
+        """
+        Returns a copy of `structure` which shares its blocks' documents.
+        """
+        structure = dict(structure)
+        structure['blocks'] = copy.copy(structure['blocks'])
+        return structure
+
+    def get(self, key):
+        """
+        Returns a copy of the cached structure whose id is `key`, or None.
+        """
+        structure = self._structures.get(key)
+        if structure is None:
+            return None
+        return self._copy(structure)
+
+    def set(self, key, structure, size):
+        """
+        Caches `structure`, whose serialization is `size` bytes, unless it's too large
+        or some of its blocks have been converted.
+        """
+        blocks = structure['blocks']
+        if size > self.max_size or not isinstance(blocks, LazyBlockMap) or blocks.converted_count:
+            return
+        self._structures.set(key, self._copy(structure), size)
+
+    def clear(self):
+        """
+        Removes all the cached structures.
+        """
+        self._structures.clear()
+
+
 class CourseStructureCache(object):
     """
     Wrapper around django cache object to cache course structure objects.
-    The course structures are pickled and compressed when cached.
+    The course structures are serialized and compressed when cached, by the
+    codec set by COURSE_STRUCTURE_CACHE_CODEC.
+
+    Structures are also cached in the process, in front of the django cache,
+    when COURSE_STRUCTURE_LOCAL_CACHE_SIZE is set.
 
     If the 'course_structure_cache' doesn't exist, then don't do anything for
     for set and get.
     """
     def __init__(self):
         self.cache = None
+        self.local_cache = None
+        self.codec = None
         if DJANGO_AVAILABLE:
             try:
                 self.cache = get_cache('course_structure_cache')
             except InvalidCacheBackendError:
                 pass
+            else:
+                self.local_cache = get_local_cache()
+                self.codec = get_structure_codec()
 
     def get(self, key, course_context=None):
-        """Pull the compressed, pickled struct data from cache and deserialize."""
+        """Pull the compressed, serialized struct data from cache and deserialize."""
         if self.cache is None:
             return None
 
         with TIMER.timer("CourseStructureCache.get", course_context) as tagger:
-            compressed_pickled_data = self.cache.get(key)
-            tagger.tag(from_cache=str(compressed_pickled_data is not None).lower())
+            if self.local_cache is not None:
+                structure = self.local_cache.get(key)
+                tagger.tag(from_local_cache=str(structure is not None).lower())
+                tagger.measure('local_cache_size', self.local_cache.size)
+                if structure is not None:
+                    return structure
 
-            if compressed_pickled_data is None:
+            compressed_data = self.cache.get(key)
+            tagger.tag(from_cache=str(compressed_data is not None).lower())
+
+            if compressed_data is None:
                 # Always log cache misses, because they are unexpected
                 tagger.sample_rate = 1
                 return None
 
-            tagger.measure('compressed_size', len(compressed_pickled_data))
+            tagger.measure('compressed_size', len(compressed_data))
 
-            pickled_data = zlib.decompress(compressed_pickled_data)
-            tagger.measure('uncompressed_size', len(pickled_data))
+            serializer_tag, serialized_data = self.codec.decompress(compressed_data)
+            tagger.measure('uncompressed_size', len(serialized_data))
+            tagger.tag(serializer=serializer_tag)
 
-            return pickle.loads(pickled_data)
+            structure = self.codec.deserialize(serializer_tag, serialized_data)
+            if self.local_cache is not None:
+                self.local_cache.set(key, structure, len(serialized_data))
+            return structure
 
     def set(self, key, structure, course_context=None):
-        """Given a structure, will pickle, compress, and write to cache."""
+        """Given a structure, will serialize, compress, and write to cache."""
         if self.cache is None:
             return None
 
         with TIMER.timer("CourseStructureCache.set", course_context) as tagger:
-            pickled_data = pickle.dumps(structure, pickle.HIGHEST_PROTOCOL)
-            tagger.measure('uncompressed_size', len(pickled_data))
+            serialized_data = self.codec.serialize(structure)
+            tagger.measure('uncompressed_size', len(serialized_data))
 
-            # 1 = Fastest (slightly larger results)
-            compressed_pickled_data = zlib.compress(pickled_data, 1)
-            tagger.measure('compressed_size', len(compressed_pickled_data))
+            compressed_data = self.codec.compress(serialized_data)
+            tagger.measure('compressed_size', len(compressed_data))
 
             # Stuctures are immutable, so we set a timeout of "never"
-            self.cache.set(key, compressed_pickled_data, None)
+            self.cache.set(key, compressed_data, None)
+
+            if self.local_cache is not None:
+                self.local_cache.set(key, structure, len(serialized_data))
 
 
 class MongoConnection(object):
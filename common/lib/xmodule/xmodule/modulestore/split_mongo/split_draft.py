@@ -231,7 +231,7 @@ class DraftVersioningModuleStore(SplitMongoModuleStore, ModuleStoreDraftAndPubli
                         parent_loc.block_type in DIRECT_ONLY_CATEGORIES
                     )
 
-            self._flag_publish_event(location.course_key)
+            self._flag_publish_event(location.course_key, location)
             for branch in branches_to_delete:
                 branched_location = location.for_branch(branch)
                 super(DraftVersioningModuleStore, self).delete_item(branched_location, user_id)
@@ -382,7 +382,7 @@ class DraftVersioningModuleStore(SplitMongoModuleStore, ModuleStoreDraftAndPubli
             blacklist=blacklist
         )
 
-        self._flag_publish_event(location.course_key)
+        self._flag_publish_event(location.course_key, location)
 
         return self.get_item(location.for_branch(ModuleStoreEnum.BranchName.published), **kwargs)
 
@@ -30,6 +30,7 @@ from xmodule.modulestore.inheritance import InheritanceMixin
 from xmodule.x_module import XModuleMixin
 from xmodule.fields import Date, Timedelta
 from xmodule.modulestore.split_mongo.split import SplitMongoModuleStore
+from xmodule.modulestore.split_mongo.mongo_connection import LocalStructureCache
 from xmodule.modulestore.tests.test_modulestore import check_has_course_method
 from xmodule.modulestore.split_mongo import BlockKey
 from xmodule.modulestore.tests.factories import check_mongo_calls
@@ -978,6 +979,25 @@ class TestCourseStructureCache(SplitModuleTest):
         # now make sure that you get the same structure
         self.assertEqual(cached_structure, not_cached_structure)
 
+    @patch('xmodule.modulestore.split_mongo.mongo_connection.get_local_cache')
+    @patch('xmodule.modulestore.split_mongo.mongo_connection.get_cache')
+    def test_local_cache(self, mock_get_cache, mock_get_local_cache):
+        mock_get_cache.return_value = self.cache
+        mock_get_local_cache.return_value = LocalStructureCache(1024 ** 2)
+
+        with check_mongo_calls(1):
+            not_cached_structure = self._get_structure(self.new_course)
+
+        # the structure is read from the process, even if the django cache is cleared
+        self.cache.clear()
+        with check_mongo_calls(0):
+            cached_structure = self._get_structure(self.new_course)
+
+        # now make sure that you get the same structure, but not the same blocks
+        self.assertEqual(cached_structure, not_cached_structure)
+        root = cached_structure['root']
+        self.assertIsNot(cached_structure['blocks'][root], not_cached_structure['blocks'][root])
+
     def test_dummy_cache(self):
         with check_mongo_calls(1):
             not_cached_structure = self._get_structure(self.new_course)
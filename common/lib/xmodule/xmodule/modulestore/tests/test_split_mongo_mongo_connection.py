@@ -1,7 +1,13 @@
 """ Test the behavior of split_mongo/MongoConnection """
+import copy
+import cPickle as pickle
 import unittest
 from mock import patch
-from xmodule.modulestore.split_mongo.mongo_connection import MongoConnection
+from xmodule.modulestore import BlockData
+from xmodule.modulestore.split_mongo import BlockKey
+from xmodule.modulestore.split_mongo.mongo_connection import (
+    LazyBlockMap, LocalStructureCache, MongoConnection, StructureSerializer, structure_from_mongo, structure_to_mongo
+)
 from xmodule.exceptions import HeartbeatFailure
 
 
@@ -17,3 +23,155 @@ class TestHeartbeatFailureException(unittest.TestCase):
 
             with self.assertRaises(HeartbeatFailure):
                 useless_conn.heartbeat()
+
+
+class TestLazyBlockMap(unittest.TestCase):
+    """ Test that LazyBlockMap converts blocks only when they're accessed """
+    def setUp(self):
+        super(TestLazyBlockMap, self).setUp()
+        self.structure = {
+            'root': ['course', 'course'],
+            'blocks': [
+                {
+                    'block_type': 'course', 'block_id': 'course', 'definition': 'def1',
+                    'fields': {'children': [['chapter', 'chapter']]}, 'edit_info': {},
+                },
+                {
+                    'block_type': 'chapter', 'block_id': 'chapter', 'definition': 'def2',
+                    'fields': {'display_name': 'Chapter'}, 'edit_info': {},
+                },
+            ],
+        }
+        self.course_key = BlockKey('course', 'course')
+        self.chapter_key = BlockKey('chapter', 'chapter')
+
+    def test_converts_accessed_blocks(self):
+        blocks = structure_from_mongo(self.structure)['blocks']
+        self.assertIsInstance(blocks, LazyBlockMap)
+        self.assertEqual(len(blocks), 2)
+        self.assertIn(self.chapter_key, blocks)
+        self.assertItemsEqual(blocks.keys(), [self.course_key, self.chapter_key])
+        self.assertEqual(blocks.converted_count, 0)
+
+        block = blocks[self.course_key]
+        self.assertIsInstance(block, BlockData)
+        self.assertEqual(block.fields['children'], [self.chapter_key])
+        self.assertIs(blocks.get(self.course_key), block)
+        self.assertEqual(blocks.converted_count, 1)
+
+        self.assertEqual(blocks.get(self.chapter_key).fields, {'display_name': 'Chapter'})
+        self.assertIsNone(blocks.get(BlockKey('html', 'missing')))
+        self.assertEqual(blocks.converted_count, 2)
+
+    def test_eager(self):
+        lazy_blocks = structure_from_mongo(copy.deepcopy(self.structure))['blocks']
+        blocks = structure_from_mongo(self.structure, lazy=False)['blocks']
+        self.assertNotIsInstance(blocks, LazyBlockMap)
+        self.assertEqual(blocks, lazy_blocks)
+
+    def test_update(self):
+        blocks = structure_from_mongo(self.structure)['blocks']
+        new_block = BlockData(block_type='chapter', fields={})
+        blocks[self.chapter_key] = new_block
+        self.assertIs(blocks[self.chapter_key], new_block)
+        self.assertEqual(len(blocks), 2)
+
+        del blocks[self.course_key]
+        self.assertNotIn(self.course_key, blocks)
+        self.assertEqual(blocks.items(), [(self.chapter_key, new_block)])
+
+        with self.assertRaises(KeyError):
+            del blocks[self.course_key]
+
+    def test_copies_are_lazy(self):
+        blocks = structure_from_mongo(self.structure)['blocks']
+        block = blocks[self.course_key]
+        for blocks_copy in [copy.copy(blocks), copy.deepcopy(blocks), pickle.loads(pickle.dumps(blocks, -1))]:
+            self.assertIsInstance(blocks_copy, LazyBlockMap)
+            self.assertEqual(blocks_copy.converted_count, 1)
+            self.assertEqual(blocks_copy[self.course_key], block)
+            self.assertEqual(blocks_copy[self.chapter_key], blocks[self.chapter_key])
+
+    def test_to_mongo(self):
+        structure = structure_from_mongo(copy.deepcopy(self.structure))
+        structure['blocks'][self.course_key].fields['display_name'] = 'Course'
+        blocks = sorted(structure_to_mongo(structure)['blocks'], key=lambda block: block['block_type'])
+        self.assertEqual(
+            [(block['block_type'], block['block_id'], block['fields']) for block in blocks],
+            [
+                ('chapter', 'chapter', {'display_name': 'Chapter'}),
+                ('course', 'course', {'children': [self.chapter_key], 'display_name': 'Course'}),
+            ]
+        )
+
+    def test_serializer(self):
+        serializer = StructureSerializer()
+        structure = serializer.loads(serializer.dumps(structure_from_mongo(copy.deepcopy(self.structure))))
+        self.assertIsInstance(structure['blocks'], LazyBlockMap)
+        self.assertEqual(structure['blocks'].converted_count, 0)
+        self.assertEqual(structure['root'], self.course_key)
+        self.assertEqual(structure['blocks'], structure_from_mongo(self.structure)['blocks'])
+
+    def test_conversion_leaves_documents(self):
+        # Copies share the documents, so converting a block doesn't modify its document.
+        course_doc = self.structure['blocks'][0]
+        blocks = structure_from_mongo(self.structure)['blocks']
+        blocks_copy = copy.copy(blocks)
+        self.assertEqual(blocks[self.course_key].fields['children'], [self.chapter_key])
+        self.assertEqual(blocks_copy[self.course_key].fields['children'], [self.chapter_key])
+        self.assertEqual(course_doc['block_id'], 'course')
+        self.assertEqual(course_doc['fields']['children'], [['chapter', 'chapter']])
+
+
+class TestLocalStructureCache(unittest.TestCase):
+    """ Test the cache of structures in the process """
+    def setUp(self):
+        super(TestLocalStructureCache, self).setUp()
+        self.cache = LocalStructureCache(200)
+
+    def make_structure(self, lazy=True):
+        """ Returns a structure with a block, as read from mongo """
+        return structure_from_mongo({
+            'root': ['course', 'course'],
+            'blocks': [{
+                'block_type': 'course', 'block_id': 'course', 'definition': 'def1',
+                'fields': {'display_name': 'Course'}, 'edit_info': {},
+            }],
+        }, lazy=lazy)
+
+    def test_get_copies(self):
+        structure = self.make_structure()
+        self.cache.set('a', structure, 100)
+        block_key = BlockKey('course', 'course')
+        structure['blocks'][block_key].fields['display_name'] = 'Changed'
+
+        cached_structure = self.cache.get('a')
+        self.assertEqual(cached_structure['blocks'][block_key].fields['display_name'], 'Course')
+        cached_structure['blocks'][block_key].fields['display_name'] = 'Changed'
+        self.assertEqual(self.cache.get('a')['blocks'][block_key].fields['display_name'], 'Course')
+        self.assertIsNone(self.cache.get('b'))
+
+    def test_eviction(self):
+        self.cache.set('a', self.make_structure(), 100)
+        self.cache.set('b', self.make_structure(), 100)
+        self.assertIsNotNone(self.cache.get('a'))
+        self.cache.set('c', self.make_structure(), 100)
+
+        # 'b' was the least recently used
+        self.assertIsNone(self.cache.get('b'))
+        self.assertIsNotNone(self.cache.get('a'))
+        self.assertIsNotNone(self.cache.get('c'))
+        self.assertEqual(self.cache.size, 200)
+
+        self.cache.set('d', self.make_structure(), 201)
+        self.assertIsNone(self.cache.get('d'))
+
+    def test_converted_structures_arent_cached(self):
+        structure = self.make_structure()
+        structure['blocks'].values()
+        self.cache.set('a', structure, 100)
+        self.assertIsNone(self.cache.get('a'))
+
+        structure = self.make_structure(lazy=False)
+        self.cache.set('a', structure, 100)
+        self.assertIsNone(self.cache.get('a'))
@@ -3,6 +3,7 @@
 import os
 import unittest
 import ddt
+from mock import patch
 from path import Path as path
 
 from xmodule.contentstore.content import StaticContent, StaticContentStream
@@ -11,7 +12,7 @@ from opaque_keys.edx.locations import SlashSeparatedCourseKey, AssetLocation
 from xmodule.static_content import _write_js, _list_descriptors
 
 SAMPLE_STRING = """
-This is a sample string with more than 1024 bytes, the default STREAM_DATA_CHUNK_SIZE
+This is a sample string with more than 1024 bytes, the STREAM_DATA_CHUNK_SIZE in these tests
 
 Lorem Ipsum is simply dummy text of the printing and typesetting industry.
 Lorem Ipsum has been the industry's standard dummy text ever since the 1500s,
@@ -124,6 +125,7 @@ class ContentTest(unittest.TestCase):
             asset_location
         )
 
+    @patch('xmodule.contentstore.content.STREAM_DATA_CHUNK_SIZE', 1024)
     def test_static_content_stream_stream_data(self):
         """
         Test StaticContentStream stream_data function, asserts that we get all the bytes
@@ -139,6 +141,7 @@ class ContentTest(unittest.TestCase):
 
         self.assertEqual(total_length, static_content_stream.length)
 
+    @patch('xmodule.contentstore.content.STREAM_DATA_CHUNK_SIZE', 1024)
     def test_static_content_stream_stream_data_in_range(self):
         """
         Test StaticContentStream stream_data_in_range function,
@@ -160,6 +163,26 @@ class ContentTest(unittest.TestCase):
 
         self.assertEqual(total_length, last_byte - first_byte + 1)
 
+    @patch('xmodule.contentstore.content.STREAM_DATA_CHUNK_SIZE', 1024)
+    def test_static_content_stream_data_in_range_matches(self):
+        """
+        Test that StaticContent and StaticContentStream stream the same bytes
+        of a range, including one ending at a chunk boundary.
+        """
+        item = FakeGridFsItem(SAMPLE_STRING)
+        static_content_stream = StaticContentStream('loc', 'name', 'type', item, length=item.length)
+        static_content = StaticContent('loc', 'name', 'type', SAMPLE_STRING, length=len(SAMPLE_STRING))
+
+        for first_byte, last_byte in [(0, 1023), (100, 1500), (1024, len(SAMPLE_STRING) - 1)]:
+            self.assertEqual(
+                ''.join(static_content_stream.stream_data_in_range(first_byte, last_byte)),
+                SAMPLE_STRING[first_byte:last_byte + 1]
+            )
+            self.assertEqual(
+                ''.join(static_content.stream_data_in_range(first_byte, last_byte)),
+                SAMPLE_STRING[first_byte:last_byte + 1]
+            )
+
     def test_static_content_write_js(self):
         """
         Test that only one filename starts with 000.
@@ -1,6 +1,9 @@
 """Grading tests"""
+import random
 import unittest
 
+import numpy
+
 from xmodule import graders
 from xmodule.graders import Score, aggregate_scores
 
@@ -190,6 +193,62 @@ class GraderTest(unittest.TestCase):
         self.assertEqual(len(graded['section_breakdown']), 0)
         self.assertEqual(len(graded['grade_breakdown']), 0)
 
+    def test_batch_grade(self):
+        course_grader = graders.WeightedSubsectionsGrader([
+            (graders.AssignmentFormatGrader("Homework", 12, 2), "Homework", 0.25),
+            (graders.AssignmentFormatGrader("Lab", 7, 3, show_only_average=True), "Lab", 0.25),
+            (graders.AssignmentFormatGrader("Midterm", 1, 0), "Midterm", 0.25),
+            (graders.AssignmentFormatGrader("Quiz", 2, 0, hide_average=True), "Quiz", 0.1),
+            (graders.AssignmentFormatGrader("Final", 1, 1), "Final", 0.1),
+            (graders.SingleSectionGrader("Project", "project1"), "Project", 0.05),
+        ])
+        num_sections = {'Homework': 4, 'Lab': 7, 'Midterm': 1, 'Project': 2}
+        num_students = 50
+
+        random.seed(1)
+        grade_sheets = [
+            {
+                section_format: [
+                    Score(
+                        earned=random.choice([0, random.randint(0, 10)]),
+                        possible=float(random.randint(1, 10)),
+                        graded=True,
+                        section='project{}'.format(index),
+                        module_id=None,
+                    )
+                    for index in range(count)
+                ]
+                for section_format, count in num_sections.iteritems()
+            }
+            for __ in range(num_students)
+        ]
+        batch_grade_sheet = {
+            section_format: [
+                (
+                    'project{}'.format(index),
+                    numpy.array([grade_sheet[section_format][index].earned for grade_sheet in grade_sheets]),
+                    numpy.array([grade_sheet[section_format][index].possible for grade_sheet in grade_sheets]),
+                )
+                for index in range(count)
+            ]
+            for section_format, count in num_sections.iteritems()
+        }
+
+        batch_graded = course_grader.batch_grade(batch_grade_sheet, num_students)
+        for student_index, grade_sheet in enumerate(grade_sheets):
+            graded = course_grader.grade(grade_sheet)
+            self.assertEqual(batch_graded['percent'][student_index], graded['percent'])
+            self.assertEqual(
+                [section['label'] for section in batch_graded['section_breakdown']],
+                [section['label'] for section in graded['section_breakdown']],
+            )
+            for batch_section, section in zip(batch_graded['section_breakdown'], graded['section_breakdown']):
+                percent = batch_section['percent']
+                if isinstance(percent, numpy.ndarray):
+                    percent = percent[student_index]
+                self.assertEqual(percent, section['percent'])
+                self.assertEqual(type(percent) is int, type(section['percent']) is int)
+
     def test_grader_from_conf(self):
 
         # Confs always produce a graders.WeightedSubsectionsGrader, so we test this by repeating the test
@@ -0,0 +1,66 @@
+"""
+Tests for xmodule.util.codecs
+"""
+import cPickle as pickle
+import datetime
+import itertools
+import zlib
+
+import ddt
+from bson import ObjectId
+from mock import patch
+from pytz import UTC
+from unittest import TestCase
+
+from xmodule.util.codecs import Codec, COMPRESSORS, get_codec, LZ4Compressor, lz4, SERIALIZERS
+
+
+VALUE = {
+    u'_id': ObjectId(),
+    u'name': u'value',
+    u'edited_on': datetime.datetime(2016, 1, 1, tzinfo=UTC),
+    u'list': [1, 2.5, None, {u'nested': True}],
+}
+
+
+@ddt.ddt
+class TestCodecs(TestCase):
+    """
+    Tests of encoding and decoding values with codecs.
+    """
+    @ddt.data(*itertools.product(SERIALIZERS, [name for name in COMPRESSORS if name != 'lz4' or lz4]))
+    @ddt.unpack
+    def test_encode_and_decode(self, serializer, compressor):
+        codec = get_codec(serializer, compressor)
+        data = codec.encode(VALUE)
+        self.assertEqual(codec.decode(data), VALUE)
+
+        # Data encoded with any codec can be decoded by the others.
+        self.assertEqual(get_codec().decode(data), VALUE)
+
+    def test_serialize_and_compress(self):
+        codec = get_codec('bson', 'zlib')
+        serialized = codec.serialize(VALUE)
+        data = codec.compress(serialized)
+        self.assertEqual(codec.decompress(data), ('b', serialized))
+        self.assertEqual(codec.deserialize('b', serialized), VALUE)
+
+    def test_decode_legacy(self):
+        data = zlib.compress(pickle.dumps(VALUE, pickle.HIGHEST_PROTOCOL), 1)
+        self.assertEqual(get_codec('bson', 'none').decode(data), VALUE)
+
+    def test_unknown_serializer(self):
+        data = get_codec('bson', 'zlib').encode(VALUE)
+        codec = Codec(SERIALIZERS['pickle'], COMPRESSORS['zlib'])
+        with self.assertRaises(ValueError):
+            codec.decode(data)
+
+    def test_unknown_compressor(self):
+        data = get_codec('pickle', 'zlib').encode(VALUE)
+        with self.assertRaises(ValueError):
+            get_codec().decode(data[:2] + 'x' + data[3:])
+
+    @patch('xmodule.util.codecs.lz4', None)
+    def test_lz4_unavailable(self):
+        with self.assertRaises(ValueError):
+            Codec(SERIALIZERS['pickle'], LZ4Compressor())
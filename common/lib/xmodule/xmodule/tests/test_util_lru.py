@@ -0,0 +1,58 @@
+"""
+Tests for xmodule.util.lru
+"""
+
+import unittest
+
+from xmodule.util.lru import LRUCache
+
+
+class LRUCacheTest(unittest.TestCase):
+    """
+    Test the least recently used cache.
+    """
+    def test_lru_cache(self):
+        """
+        Test that the least recently used values are evicted from LRUCache.
+        """
+        cache = LRUCache(2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        self.assertEqual(cache.get('a'), 1)
+        cache.set('c', 3)
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('b', 'default'), 'default')
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache.get('c'), 3)
+        cache.delete('a')
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(len(cache), 1)
+        cache.delete('missing')
+        cache.clear()
+        self.assertIsNone(cache.get('c'))
+
+    def test_value_sizes(self):
+        """
+        Test that values are evicted once their sizes add up to more than
+        the size of LRUCache.
+        """
+        cache = LRUCache(200)
+        cache.set('a', 1, 100)
+        cache.set('b', 2, 100)
+        self.assertEqual(cache.get('a'), 1)
+        cache.set('c', 3, 50)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.current_size, 150)
+        cache.set('a', 4, 160)
+        self.assertEqual(cache.get('a'), 4)
+        self.assertIsNone(cache.get('c'))
+        self.assertEqual(cache.current_size, 160)
+        cache.delete('a')
+        self.assertEqual(cache.current_size, 0)
+        cache.set('a', 4, 160)
+
+        # Values larger than the cache replace the cached value, but aren't cached.
+        cache.set('a', 5, 201)
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.current_size, 0)
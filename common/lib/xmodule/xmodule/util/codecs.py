@@ -0,0 +1,221 @@
+"""
+Codecs which serialize and compress the values stored in caches.
+
+A codec combines a serializer and a compressor, and prefixes the data it
+encodes with a header naming them, so that data encoded by any codec can be
+decoded after the configured codec changes.  Data without a header was
+encoded by `zlib.compress(pickle.dumps(value))`, as caches did before codecs.
+"""
+import cPickle as pickle
+import zlib
+
+from bson import BSON
+from bson.codec_options import CodecOptions
+
+try:
+    import lz4.block as lz4
+except ImportError:
+    try:
+        # Versions of lz4 before 0.8.
+        import lz4
+    except ImportError:
+        lz4 = None
+
+
+# The first byte of encoded data.  zlib data always starts with 0x78.
+HEADER_MAGIC = '\x00'
+HEADER_SIZE = 3
+
+
+class PickleSerializer(object):
+    """
+    Serializes any picklable value.
+    """
+    tag = 'p'
+
+    def dumps(self, value):
+        """
+        Returns the serialization of `value`, as a str.
+        """
+        return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    def loads(self, data):
+        """
+        Returns the value serialized in `data`.
+        """
+        return pickle.loads(data)
+
+
+class BSONSerializer(object):
+    """
+    Serializes dicts of the values which can be stored in mongo, without
+    creating any python objects other than those values when they're
+    deserialized.  Dates are deserialized as timezone aware datetimes.
+    """
+    tag = 'b'
+    codec_options = CodecOptions(tz_aware=True)
+
+    def dumps(self, value):
+        """
+        Returns the serialization of the dict `value`, as a str.
+        """
+        return BSON.encode(value)
+
+    def loads(self, data):
+        """
+        Returns the dict serialized in `data`.
+        """
+        return BSON(data).decode(self.codec_options)
+
+
+class ZlibCompressor(object):
+    """
+    Compresses data with zlib.
+    """
+    tag = 'z'
+
+    def __init__(self, level=1):
+        # 1 = Fastest (slightly larger results)
+        self.level = level
+
+    def compress(self, data):
+        """
+        Returns the compression of the str `data`.
+        """
+        return zlib.compress(data, self.level)
+
+    def decompress(self, data):
+        """
+        Returns the decompression of `data`, a str or a buffer.
+        """
+        return zlib.decompress(data)
+
+
+class LZ4Compressor(object):
+    """
+    Compresses data with lz4, which compresses less than zlib, but is much
+    faster.  Requires the lz4 package.
+    """
+    tag = 'l'
+
+    def compress(self, data):
+        """
+        Returns the compression of the str `data`.
+        """
+        return lz4.compress(data)
+
+    def decompress(self, data):
+        """
+        Returns the decompression of `data`, a str or a buffer.
+        """
+        return lz4.decompress(str(data))
+
+
+class NullCompressor(object):
+    """
+    Doesn't compress data, for caches where the size of values doesn't
+    matter.
+    """
+    tag = 'n'
+
+    def compress(self, data):
+        """
+        Returns `data`.
+        """
+        return data
+
+    def decompress(self, data):
+        """
+        Returns `data`, as a str.
+        """
+        return str(data)
+
+
+SERIALIZERS = {
+    'pickle': PickleSerializer(),
+    'bson': BSONSerializer(),
+}
+
+COMPRESSORS = {
+    'zlib': ZlibCompressor(),
+    'lz4': LZ4Compressor(),
+    'none': NullCompressor(),
+}
+
+
+class Codec(object):
+    """
+    Encodes values with `serializer` and `compressor`, and decodes values
+    encoded by any codec using the same compressors and `serializers`.
+
+    The serialization and the compression are available separately, so
+    that callers can measure the size of each.
+    """
+    def __init__(self, serializer, compressor, serializers=(PickleSerializer(),)):
+        if isinstance(compressor, LZ4Compressor) and lz4 is None:
+            raise ValueError("The lz4 compressor requires the lz4 package")
+        self.serializer = serializer
+        self.compressor = compressor
+        self._serializers = {serializer.tag: serializer for serializer in serializers}
+        self._serializers[serializer.tag] = serializer
+        self._header = HEADER_MAGIC + serializer.tag + compressor.tag
+
+    def __repr__(self):
+        return '{}({}, {})'.format(
+            self.__class__.__name__, self.serializer.__class__.__name__, self.compressor.__class__.__name__
+        )
+
+    def serialize(self, value):
+        """
+        Returns the serialization of `value`.
+        """
+        return self.serializer.dumps(value)
+
+    def compress(self, serialized):
+        """
+        Returns the encoded data of the `serialized` value.
+        """
+        return self._header + self.compressor.compress(serialized)
+
+    def decompress(self, data):
+        """
+        Returns the tag of the serializer of the value encoded in `data`, and
+        its serialization.
+        """
+        if not data.startswith(HEADER_MAGIC):
+            return PickleSerializer.tag, zlib.decompress(data)
+
+        serializer_tag, compressor_tag = data[1], data[2]
+        for compressor in COMPRESSORS.itervalues():
+            if compressor.tag == compressor_tag:
+                return serializer_tag, compressor.decompress(buffer(data, HEADER_SIZE))
+        raise ValueError("Unknown compressor {!r}".format(compressor_tag))
+
+    def deserialize(self, serializer_tag, serialized):
+        """
+        Returns the value serialized in `serialized` by the serializer tagged
+        `serializer_tag`.
+        """
+        if serializer_tag not in self._serializers:
+            raise ValueError("Unknown serializer {!r}".format(serializer_tag))
+        return self._serializers[serializer_tag].loads(serialized)
+
+    def encode(self, value):
+        """
+        Returns the serialized and compressed data of `value`.
+        """
+        return self.compress(self.serialize(value))
+
+    def decode(self, data):
+        """
+        Returns the value encoded in `data`.
+        """
+        return self.deserialize(*self.decompress(data))
+
+
+def get_codec(serializer='pickle', compressor='zlib'):
+    """
+    Returns the codec using the serializer and compressor of the given
+    names, from SERIALIZERS and COMPRESSORS.
+    """
+    return Codec(SERIALIZERS[serializer], COMPRESSORS[compressor], SERIALIZERS.values())
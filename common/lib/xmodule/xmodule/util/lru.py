@@ -0,0 +1,70 @@
+"""
+A least recently used cache of values in the process, shared by the
+in-process caches of the modulestore, capa and the content server.
+"""
+from collections import OrderedDict
+import threading
+
+
+class LRUCache(object):
+    """
+    An in-process cache of values whose sizes add up to at most `size`,
+    which evicts the least recently used values first.  Each value counts as
+    1, unless it's set with another size.  It can be shared between threads.
+    """
+    def __init__(self, size):
+        self.size = size
+        self.current_size = 0
+        # The (size, value) of each key, from the least recently used.
+        self._values = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """
+        Return the value cached for `key`, or `default` if there is none.
+        """
+        with self._lock:
+            try:
+                cached = self._values.pop(key)
+            except KeyError:
+                return default
+            self._values[key] = cached
+            return cached[1]
+
+    def set(self, key, value, value_size=1):
+        """
+        Cache `value`, of size `value_size`, for `key`, evicting the least
+        recently used values if the cache is full.  Values larger than the
+        whole cache aren't cached.
+        """
+        with self._lock:
+            previous = self._values.pop(key, None)
+            if previous is not None:
+                self.current_size -= previous[0]
+            if value_size > self.size:
+                return
+            self._values[key] = (value_size, value)
+            self.current_size += value_size
+            while self.current_size > self.size:
+                __, (evicted_size, __) = self._values.popitem(last=False)
+                self.current_size -= evicted_size
+
+    def delete(self, key):
+        """
+        Remove the value cached for `key`, if there is one.
+        """
+        with self._lock:
+            previous = self._values.pop(key, None)
+            if previous is not None:
+                self.current_size -= previous[0]
+
+    def clear(self):
+        """
+        Remove all the cached values.
+        """
+        with self._lock:
+            self._values.clear()
+            self.current_size = 0
+
+    def __len__(self):
+        return len(self._values)
@@ -2,10 +2,13 @@
 API entry point to the course_blocks app with top-level
 get_course_blocks and clear_course_from_cache functions.
 """
+from django.conf import settings
 from django.core.cache import cache
+from django.core.files.storage import get_storage_class
 from openedx.core.lib.block_structure.manager import BlockStructureManager
 from openedx.core.lib.block_structure.transformers import BlockStructureTransformers
 from xmodule.modulestore.django import modulestore
+from xmodule.util.codecs import get_codec
 
 from .transformers import (
     library_content,
@@ -79,13 +82,21 @@ def get_course_in_cache(course_key):
     return _get_block_structure_manager(course_key).get_collected()
 
 
-def update_course_in_cache(course_key):
+def update_course_in_cache(course_key, changed_usage_keys=None):
     """
     A higher order function implemented on top of the
     block_structure.updated_collected function that updates the block
     structure in the cache for the given course_key.
+
+    If changed_usage_keys is given, only the subtrees of those blocks
+    are recollected, when possible.
     """
-    return _get_block_structure_manager(course_key).update_collected()
+    if changed_usage_keys:
+        changed_usage_keys = {
+            course_key.make_usage_key(usage_key.block_type, usage_key.block_id)
+            for usage_key in changed_usage_keys
+        }
+    return _get_block_structure_manager(course_key).update_collected(changed_usage_keys)
 
 
 def clear_course_from_cache(course_key):
@@ -108,7 +119,7 @@ def _get_block_structure_manager(course_key):
     """
     store = modulestore()
     course_usage_key = store.make_course_usage_key(course_key)
-    return BlockStructureManager(course_usage_key, store, _get_cache())
+    return BlockStructureManager(course_usage_key, store, _get_cache(), _get_storage(), _get_codec())
 
 
 def _get_cache():
@@ -116,3 +127,23 @@ def _get_cache():
     Returns the storage for caching Block Structures.
     """
     return cache
+
+
+def _get_storage():
+    """
+    Returns the persistent storage for Block Structures, or None if it
+    is not configured.
+    """
+    config = getattr(settings, 'BLOCK_STRUCTURES_STORAGE_BACKEND', None)
+    if not config:
+        return None
+    storage_class = get_storage_class(config['class'])
+    return storage_class(**config.get('options', {}))
+
+
+def _get_codec():
+    """
+    Returns the codec for serializing Block Structures, which are
+    pickled and compressed by BLOCK_STRUCTURES_CACHE_COMPRESSOR.
+    """
+    return get_codec('pickle', getattr(settings, 'BLOCK_STRUCTURES_CACHE_COMPRESSOR', 'zlib'))
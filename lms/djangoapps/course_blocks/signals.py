@@ -14,12 +14,20 @@ def _listen_for_course_publish(sender, course_key, **kwargs):  # pylint: disable
     """
     Catches the signal that a course has been published in the module
     store and creates/updates the corresponding cache entry.
+
+    If the changed blocks are known, the cache entry is kept until it is
+    incrementally updated, rather than recollected for the whole course.
     """
-    clear_course_from_cache(course_key)
+    changed_usage_keys = kwargs.get('changed_usage_keys')
+    if changed_usage_keys is None:
+        clear_course_from_cache(course_key)
+        task_args = [unicode(course_key)]
+    else:
+        task_args = [unicode(course_key), [unicode(usage_key) for usage_key in changed_usage_keys]]
 
     # The countdown=0 kwarg ensures the call occurs after the signal emitter
     # has finished all operations.
-    update_course_in_cache.apply_async([unicode(course_key)], countdown=0)
+    update_course_in_cache.apply_async(task_args, countdown=0)
 
 
 @receiver(SignalHandler.course_deleted)
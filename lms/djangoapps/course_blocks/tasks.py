@@ -3,7 +3,7 @@ Asynchronous tasks related to the Course Blocks sub-application.
 """
 import logging
 from celery.task import task
-from opaque_keys.edx.keys import CourseKey
+from opaque_keys.edx.keys import CourseKey, UsageKey
 
 from . import api
 
@@ -12,9 +12,12 @@ log = logging.getLogger('edx.celery.task')
 
 
 @task()
-def update_course_in_cache(course_key):
+def update_course_in_cache(course_key, changed_usage_keys=None):
     """
     Updates the course blocks (in the database) for the specified course.
+    If changed_usage_keys is given, only those blocks' subtrees are updated.
     """
     course_key = CourseKey.from_string(course_key)
-    api.update_course_in_cache(course_key)
+    if changed_usage_keys is not None:
+        changed_usage_keys = {UsageKey.from_string(usage_key) for usage_key in changed_usage_keys}
+    api.update_course_in_cache(course_key, changed_usage_keys)
@@ -3,13 +3,13 @@ Content Library Transformer.
 """
 import json
 from courseware.models import StudentModule
-from openedx.core.lib.block_structure.transformer import BlockStructureTransformer
+from openedx.core.lib.block_structure.transformer import BlockStructureTransformer, FilteringTransformerMixin
 from xmodule.library_content_module import LibraryContentModule
 from xmodule.modulestore.django import modulestore
 from eventtracking import tracker
 
 
-class ContentLibraryTransformer(BlockStructureTransformer):
+class ContentLibraryTransformer(FilteringTransformerMixin, BlockStructureTransformer):
     """
     A transformer that manipulates the block structure by removing all
     blocks within a library_content module to which a user should not
@@ -59,11 +59,11 @@ class ContentLibraryTransformer(BlockStructureTransformer):
                 summary = summarize_block(child_key)
                 block_structure.set_transformer_block_field(child_key, cls, 'block_analytics_summary', summary)
 
-    def transform(self, usage_info, block_structure):
+    def transform_block_filters(self, usage_info, block_structure):
         """
-        Mutates block_structure based on the given usage_info.
+        Returns the removal conditions for block_structure based on
+        the given usage_info.
         """
-
         all_library_children = set()
         all_selected_children = set()
         for block_key in block_structure.topological_traversal(
@@ -112,9 +112,7 @@ class ContentLibraryTransformer(BlockStructureTransformer):
 
         # Check and remove all non-selected children from course
         # structure.
-        block_structure.remove_block_if(
-            check_child_removal
-        )
+        return [check_child_removal]
 
     @classmethod
     def _get_student_module(cls, user, course_key, block_key):
@@ -1,14 +1,14 @@
 """
 Start Date Transformer implementation.
 """
-from openedx.core.lib.block_structure.transformer import BlockStructureTransformer
+from openedx.core.lib.block_structure.transformer import BlockStructureTransformer, FilteringTransformerMixin
 from lms.djangoapps.courseware.access_utils import check_start_date
 from xmodule.course_metadata_utils import DEFAULT_START_DATE
 
 from .utils import get_field_on_block
 
 
-class StartDateTransformer(BlockStructureTransformer):
+class StartDateTransformer(FilteringTransformerMixin, BlockStructureTransformer):
     """
     A transformer that enforces the 'start' and 'days_early_for_beta'
     fields on blocks by removing blocks from the block structure for
@@ -83,19 +83,20 @@ class StartDateTransformer(BlockStructureTransformer):
                 merged_start_value
             )
 
-    def transform(self, usage_info, block_structure):
+    def transform_block_filters(self, usage_info, block_structure):
         """
-        Mutates block_structure based on the given usage_info.
+        Returns the removal conditions for block_structure based on
+        the given usage_info.
         """
         # Users with staff access bypass the Start Date check.
         if usage_info.has_staff_access:
-            return
+            return []
 
-        block_structure.remove_block_if(
+        return [
             lambda block_key: not check_start_date(
                 usage_info.user,
                 block_structure.get_xblock_field(block_key, 'days_early_for_beta'),
                 self.get_merged_start_date(block_structure, block_key),
                 usage_info.course_key,
             )
-        )
+        ]
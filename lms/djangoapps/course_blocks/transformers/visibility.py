@@ -1,10 +1,10 @@
 """
 Visibility Transformer implementation.
 """
-from openedx.core.lib.block_structure.transformer import BlockStructureTransformer
+from openedx.core.lib.block_structure.transformer import BlockStructureTransformer, FilteringTransformerMixin
 
 
-class VisibilityTransformer(BlockStructureTransformer):
+class VisibilityTransformer(FilteringTransformerMixin, BlockStructureTransformer):
     """
     A transformer that enforces the visible_to_staff_only field on
     blocks by removing blocks from the block structure for which the
@@ -67,14 +67,15 @@ class VisibilityTransformer(BlockStructureTransformer):
                 )
             )
 
-    def transform(self, usage_info, block_structure):
+    def transform_block_filters(self, usage_info, block_structure):
         """
-        Mutates block_structure based on the given usage_info.
+        Returns the removal conditions for block_structure based on
+        the given usage_info.
         """
         # Users with staff access bypass the Visibility check.
         if usage_info.has_staff_access:
-            return
+            return []
 
-        block_structure.remove_block_if(
+        return [
             lambda block_key: self.get_visible_to_staff_only(block_structure, block_key)
-        )
+        ]
@@ -0,0 +1,344 @@
+"""
+Grading of many students of a course at once, using bulk score queries and
+array operations instead of grading each student separately.
+"""
+from itertools import islice
+import logging
+
+from django.conf import settings
+from django.utils import timezone
+import numpy
+from opaque_keys.edx.keys import UsageKey
+from submissions.models import StudentItem
+from xmodule.error_module import ErrorDescriptor
+
+from courseware import courses
+from .grades import MaxScoresCache, iterate_grades_for, send_grades_updated
+from .models import StudentModule
+
+log = logging.getLogger("edx.courseware")
+
+# The number of students whose scores are fetched and graded together.
+BATCH_SIZE = 1000
+
+
+def iterate_batch_grades_for(course_or_id, students, batch_size=BATCH_SIZE):
+    """
+    Given a course_id and an iterable of students (User), yield a tuple of:
+
+    (student, gradeset, err_msg) for every student, in order.
+
+    This is a faster version of iterate_grades_for for courses whose graded
+    content is the same for every student.  The scores of batch_size students
+    are fetched together, and their grades are computed with array operations.
+    For these students, the gradeset is a dictionary with the following fields:
+
+    - grade : A final letter grade.
+    - percent : The final percent for the class (rounded up).
+    - section_breakdown : A list of dictionaries with the 'label' and
+        'percent' of each section that makes up the grade.
+
+    Students who can't be graded in batch, such as those with a problem whose
+    maximum score isn't known without loading it, and students of other
+    courses are graded with iterate_grades_for.  As grade() does, the
+    GRADES_UPDATED signal is sent for every student graded in batch.
+    """
+    if isinstance(course_or_id, basestring) or not hasattr(course_or_id, 'grading_context'):
+        course = courses.get_course_by_id(course_or_id)
+    else:
+        course = course_or_id
+
+    batch_grader = BatchGrader.create_for_course(course)
+    if batch_grader is None:
+        for result in iterate_grades_for(course, students):
+            yield result
+        return
+
+    students = iter(students)
+    students_batch = list(islice(students, batch_size))
+    while students_batch:
+        gradesets = batch_grader.grade(students_batch)
+        for student in students_batch:
+            if student.id in gradesets:
+                send_grades_updated(student, course, gradesets[student.id])
+                yield student, gradesets[student.id], ""
+            else:
+                for result in iterate_grades_for(course, [student]):
+                    yield result
+        students_batch = list(islice(students, batch_size))
+
+
+class BatchGrader(object):
+    """
+    Grades batches of students of a course whose graded content is the same
+    for every student, with the same results as grade().
+
+    The scores of each batch of students are held in students x problems
+    arrays, which are reduced to students' section scores in the same order
+    as grade() sums them, and then graded by the course grader's batch_grade.
+    """
+    def __init__(self, course, sections, max_scores_cache):
+        """
+        Arguments:
+            course (CourseDescriptor) - The course to grade.
+
+            sections (list) - A (section format, section name, scored
+                descriptors, descriptors in grading order) tuple for each
+                graded section in the course's grading context.
+
+            max_scores_cache (MaxScoresCache) - The cache of maximum scores
+                for the problems in the course.
+        """
+        self.course = course
+        self.sections = sections
+        self._max_scores_cache = max_scores_cache
+
+        # The locations of the course's problems, as stored in StudentModule,
+        # along with the locations by which the max scores cache knows them.
+        self.locations = []
+        self._cache_locations = []
+        self._location_indices = {}
+        for __, __, scored_descriptors, graded_descriptors in sections:
+            for descriptor in scored_descriptors + graded_descriptors:
+                location = self._versionless(descriptor.location)
+                if location not in self._location_indices:
+                    self._location_indices[location] = len(self.locations)
+                    self.locations.append(location)
+                    self._cache_locations.append(descriptor.location)
+
+        self._max_scores = None
+        self._fetch_max_scores()
+
+    @classmethod
+    def create_for_course(cls, course):
+        """
+        Returns a BatchGrader for the given CourseDescriptor, or None if the
+        course's graded content may differ between students, so its students
+        must be graded separately.
+        """
+        if settings.GENERATE_PROFILE_SCORES:
+            return None
+
+        # Scores registered with the submissions API aren't stored in
+        # StudentModule.
+        if StudentItem.objects.filter(course_id=course.id.to_deprecated_string()).exists():
+            return None
+
+        now = timezone.now()
+        if not all(cls._is_same_for_all_students(chapter, now) for chapter in [course] + course.get_children()):
+            return None
+
+        sections = []
+        for section_format, graded_sections in course.grading_context['graded_sections'].iteritems():
+            for section in graded_sections:
+                section_descriptor = section['section_descriptor']
+
+                # Visit the section's descendants in the same order as
+                # grade(), which uses yield_dynamic_descriptor_descendants.
+                graded_descriptors = []
+                stack = [section_descriptor]
+                while stack:
+                    descriptor = stack.pop()
+                    if not cls._is_same_for_all_students(descriptor, now):
+                        return None
+                    stack.extend(descriptor.get_children())
+                    if descriptor.has_score:
+                        graded_descriptors.append(descriptor)
+
+                sections.append((
+                    section_format,
+                    section_descriptor.display_name_with_default_escaped,
+                    section['xmoduledescriptors'],
+                    graded_descriptors,
+                ))
+
+        return cls(course, sections, MaxScoresCache.create_for_course(course))
+
+    @staticmethod
+    def _is_same_for_all_students(descriptor, now):
+        """
+        Returns whether every student has access to the given descriptor and
+        sees the same children of it, so that its grading doesn't depend on
+        the student.
+        """
+        return not (
+            isinstance(descriptor, ErrorDescriptor) or
+            descriptor.has_dynamic_children() or
+            descriptor.always_recalculate_grades or
+            descriptor.visible_to_staff_only or
+            descriptor.group_access or
+            (descriptor.start is not None and descriptor.start > now)
+        )
+
+    def grade(self, students):
+        """
+        Grades the given students, and returns a dict of user ids to
+        gradesets, as described in iterate_batch_grades_for, for the students
+        who could be graded in batch.
+        """
+        num_students = len(students)
+        correct, total, has_module = self._fetch_scores(students)
+
+        # Students graded separately cache the max scores they find, so
+        # these may be known since the previous batch.
+        if numpy.isnan(self._max_scores).any():
+            self._fetch_max_scores()
+
+        # Students without a score for a problem have earned 0 out of the
+        # problem's cached max score.  Students whose section needs a max
+        # score that isn't cached can't be graded in batch.
+        total = numpy.where(numpy.isnan(total), self._max_scores, total)
+        is_gradable = numpy.ones(num_students, dtype=bool)
+
+        batch_grade_sheet = {}
+        for section_format, section_name, scored_descriptors, graded_descriptors in self.sections:
+            # Sections without any student state are scored 0 out of 1.
+            should_grade_section = numpy.zeros(num_students, dtype=bool)
+            for descriptor in scored_descriptors:
+                should_grade_section |= has_module[:, self._location_indices[self._versionless(descriptor.location)]]
+
+            earned = numpy.zeros(num_students)
+            possible = numpy.zeros(num_students)
+            for descriptor in graded_descriptors:
+                index = self._location_indices[self._versionless(descriptor.location)]
+                is_gradable &= ~(should_grade_section & numpy.isnan(total[:, index]))
+                problem_correct, problem_total = self._weighted_scores(
+                    correct[:, index], total[:, index], descriptor.weight
+                )
+                if descriptor.graded:
+                    is_graded = problem_total > 0
+                    earned += numpy.where(is_graded, problem_correct, 0.0)
+                    possible += numpy.where(is_graded, problem_total, 0.0)
+
+            earned = numpy.where(should_grade_section, earned, 0.0)
+            possible = numpy.where(should_grade_section, possible, 1.0)
+
+            # grade() leaves sections with nothing possible out of the grade
+            # sheet, which shifts the remaining sections of their format.
+            is_gradable &= possible > 0
+            batch_grade_sheet.setdefault(section_format, []).append((section_name, earned, possible))
+
+        # Grading policy might be overriden by a CCX, need to reset it
+        self.course.set_grading_policy(self.course.grading_policy)
+        try:
+            grade_summary = self.course.grader.batch_grade(batch_grade_sheet, num_students)
+        except NotImplementedError:
+            log.info(u"The grader of course %s does not support batch grading.", self.course.id)
+            return {}
+
+        gradesets = {}
+        percents = {}
+        for student_index, student in enumerate(students):
+            if not is_gradable[student_index]:
+                continue
+            # We round the grade here, as grade() does.
+            percent = round(grade_summary['percent'][student_index] * 100 + 0.05) / 100
+            percents[student.id] = percent
+            gradesets[student.id] = {
+                'percent': percent,
+                'section_breakdown': [
+                    {
+                        'label': section['label'],
+                        'percent': self._student_value(section['percent'], student_index),
+                    }
+                    for section in grade_summary['section_breakdown']
+                ],
+            }
+
+        letter_grades = self._letter_grades(percents.values())
+        for user_id, letter_grade in zip(percents.keys(), letter_grades):
+            gradesets[user_id]['grade'] = letter_grade
+        return gradesets
+
+    def _fetch_max_scores(self):
+        """
+        Fetches the cached max scores of the course's problems into an array,
+        in which the max scores that aren't cached are NaN.
+        """
+        self._max_scores_cache.fetch_from_remote(self._cache_locations)
+        self._max_scores = numpy.array([
+            self._max_scores_cache.get(location) if settings.FEATURES.get("ENABLE_MAX_SCORE_CACHE") else None
+            for location in self._cache_locations
+        ], dtype=float)
+
+    def _fetch_scores(self, students):
+        """
+        Returns students x problems arrays of the correct and total scores
+        stored in StudentModule for the given students, along with whether
+        each student has a StudentModule for each problem.  Scores without a
+        total are NaN.
+        """
+        student_indices = {student.id: index for index, student in enumerate(students)}
+        shape = (len(students), len(self.locations))
+        correct = numpy.zeros(shape)
+        total = numpy.empty(shape)
+        total.fill(numpy.nan)
+        has_module = numpy.zeros(shape, dtype=bool)
+
+        scores = StudentModule.objects.filter(
+            course_id=self.course.id,
+            student_id__in=student_indices.keys(),
+            module_state_key__in=self.locations,
+        ).values_list('student_id', 'module_state_key', 'grade', 'max_grade')
+        for student_id, location, grade, max_grade in scores:
+            # Locations in StudentModule don't necessarily have course key info
+            # attached to them (since old mongo identifiers don't include runs).
+            location_index = self._location_indices.get(
+                UsageKey.from_string(location).map_into_course(self.course.id)
+            )
+            if location_index is None:
+                continue
+            student_index = student_indices[student_id]
+            has_module[student_index, location_index] = True
+            if max_grade is not None:
+                correct[student_index, location_index] = grade if grade is not None else 0.0
+                total[student_index, location_index] = max_grade
+
+        return correct, total, has_module
+
+    @staticmethod
+    def _weighted_scores(correct, total, weight):
+        """
+        Returns arrays of the weighted correct and total scores, computed as
+        in weighted_score.
+        """
+        if weight is None:
+            return correct, total
+        is_weighted = total != 0
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            weighted_correct = correct * weight / total
+        return (
+            numpy.where(is_weighted, weighted_correct, correct),
+            numpy.where(is_weighted, float(weight), total),
+        )
+
+    def _letter_grades(self, percents):
+        """
+        Returns the letter grade for each of the given percents, as
+        determined by grade_for_percentage.
+        """
+        # Possible grades, sorted in ascending order of score, so that for
+        # equal cutoffs, the grade found first by grade_for_percentage is last.
+        grade_cutoffs = self.course.grade_cutoffs
+        ascending_grades = sorted(grade_cutoffs, key=lambda x: grade_cutoffs[x], reverse=True)[::-1]
+        cutoffs = numpy.array([grade_cutoffs[letter_grade] for letter_grade in ascending_grades], dtype=float)
+        grade_indices = numpy.searchsorted(cutoffs, numpy.array(percents, dtype=float), side='right') - 1
+        return [ascending_grades[index] if index >= 0 else None for index in grade_indices]
+
+    @staticmethod
+    def _versionless(location):
+        """
+        Returns the given location without version and branch information,
+        as locations are stored in StudentModule.
+        """
+        return location.replace(version=None, branch=None)
+
+    @staticmethod
+    def _student_value(value, student_index):
+        """
+        Returns the given student's value from the given array of values for
+        all students, or the given value if it is the same for all students.
+        """
+        if isinstance(value, numpy.ndarray):
+            return float(value[student_index])
+        return value
@@ -5,12 +5,16 @@ import json
 import logging
 import random
 from collections import defaultdict
+from datetime import timedelta
 from functools import partial
+from hashlib import sha1
 
 import dogstats_wrapper as dog_stats_api
 from django.conf import settings
 from django.core.cache import cache
+from django.db import IntegrityError, transaction
 from django.test.client import RequestFactory
+from django.utils import timezone
 from opaque_keys import InvalidKeyError
 from opaque_keys.edx.keys import CourseKey
 from opaque_keys.edx.locator import BlockUsageLocator
@@ -27,7 +31,7 @@ from xmodule import graders
 from xmodule.graders import Score
 from xmodule.modulestore.django import modulestore
 from xmodule.modulestore.exceptions import ItemNotFoundError
-from .models import StudentModule
+from .models import PersistentCourseGrade, PersistentSubsectionGrade, StudentModule
 from .module_render import get_module_for_descriptor
 
 log = logging.getLogger("edx.courseware")
@@ -127,6 +131,236 @@ class MaxScoresCache(object):
         return max_score
 
 
+class PersistedGrades(object):
+    """
+    A student's persisted subsection and course grades for a course.
+
+    Subsection grades are fetched in a single query, and the grades of
+    subsections that had to be regraded are written back, along with the
+    course grade, in push_to_remote.  A persisted subsection grade is deleted
+    when the student's score for any block in the subsection changes (see
+    PersistentSubsectionGrade.invalidate), so only those subsections are
+    regraded.  Persisted grades are also deleted when the student's cohort,
+    or the content group of their cohort, changes (see
+    PersistentSubsectionGrade.invalidate_course).  All persisted grades are
+    ignored once the course content or grading policy changes, or once any
+    graded block is released.
+    """
+    def __init__(self, student, course):
+        self.student = student
+        self.course = course
+        self.grading_started = timezone.now()
+        self.course_version = self._get_course_version(course, self.grading_started)
+        self._subsection_grades = {}
+        self._subsection_grades_updates = {}
+        self._is_complete = True
+
+    @classmethod
+    def create_for_course(cls, student, course):
+        """
+        Returns a PersistedGrades for the given student and CourseDescriptor
+        if persistent grades are enabled for the course; returns None
+        otherwise.
+        """
+        if not settings.FEATURES.get('ENABLE_PERSISTENT_GRADES', False) or settings.GENERATE_PROFILE_SCORES:
+            return None
+        if course.subtree_edited_on is None or not student.is_authenticated():
+            # check for subtree_edited_on because old XML courses doesn't have this attribute
+            return None
+        return cls(student, course)
+
+    @classmethod
+    def _get_course_version(cls, course, now):
+        """
+        Returns a value that changes whenever the content or grading policy
+        of the given course changes, or when any of its graded blocks is
+        released, to beta testers or to everyone.
+        """
+        return sha1(json.dumps(
+            [
+                course.subtree_edited_on.isoformat(),
+                course.grading_policy,
+                course.grade_cutoffs,
+                cls._get_unreleased_locations(course, now),
+            ],
+            sort_keys=True,
+        )).hexdigest()
+
+    @classmethod
+    def _get_unreleased_locations(cls, course, now):
+        """
+        Returns the sorted locations of the graded sections of the given
+        course, and of their blocks, which are not released at the time now,
+        along with whether they're released to beta testers.
+        """
+        unreleased_locations = set()
+        for sections in course.grading_context['graded_sections'].itervalues():
+            for section in sections:
+                for descriptor in [section['section_descriptor']] + section['xmoduledescriptors']:
+                    if descriptor.start is None or descriptor.start <= now:
+                        continue
+                    beta_start = descriptor.start
+                    if descriptor.days_early_for_beta is not None:
+                        beta_start -= timedelta(descriptor.days_early_for_beta)
+                    unreleased_locations.add((unicode(descriptor.location), beta_start <= now))
+        return sorted(unreleased_locations)
+
+    def fetch_from_remote(self):
+        """
+        Populate the local subsection grades with the persisted grades.
+        """
+        self._subsection_grades = {
+            subsection_grade.usage_key.map_into_course(self.course.id): subsection_grade
+            for subsection_grade in PersistentSubsectionGrade.objects.filter(
+                user=self.student,
+                course_id=self.course.id,
+                course_version=self.course_version,
+            )
+        }
+
+    def get_course_grade(self):
+        """
+        Returns the persisted course grade summary, in the format returned
+        by grade(), or None if it is not available.
+        """
+        try:
+            course_grade = PersistentCourseGrade.objects.get(
+                user=self.student,
+                course_id=self.course.id,
+                course_version=self.course_version,
+            )
+        except PersistentCourseGrade.DoesNotExist:
+            return None
+
+        totaled_scores = {}
+        for section_format, sections in self.course.grading_context['graded_sections'].iteritems():
+            totaled_scores[section_format] = []
+            for section in sections:
+                graded_total = self.get(section)
+                if graded_total is None:
+                    return None
+                if graded_total.possible > 0:
+                    totaled_scores[section_format].append(graded_total)
+
+        grade_summary = json.loads(course_grade.gradeset)
+        grade_summary['totaled_scores'] = totaled_scores
+        return grade_summary
+
+    def get(self, section):
+        """
+        Returns the persisted graded total Score for the given section of
+        the course's grading context, or None if it must be regraded.
+        """
+        if self._always_recalculate(section):
+            return None
+        subsection_grade = self._subsection_grades.get(section['section_descriptor'].location)
+        if subsection_grade is None:
+            return None
+        return Score(
+            subsection_grade.earned,
+            subsection_grade.possible,
+            True,
+            section['section_descriptor'].display_name_with_default_escaped,
+            None,
+        )
+
+    def set(self, section, graded_total):
+        """
+        Adds the regraded total Score for the given section of the course's
+        grading context to the updates to persist.
+        """
+        if self._always_recalculate(section):
+            # These sections are never persisted, so neither is a course
+            # grade that includes them.
+            self._is_complete = False
+            return
+        subsection_grade = self._subsection_grades.get(section['section_descriptor'].location)
+        if subsection_grade and (subsection_grade.earned, subsection_grade.possible) == graded_total[:2]:
+            return
+        self._subsection_grades_updates[section['section_descriptor'].location] = PersistentSubsectionGrade(
+            user=self.student,
+            course_id=self.course.id,
+            usage_key=section['section_descriptor'].location,
+            course_version=self.course_version,
+            earned=graded_total.earned,
+            possible=graded_total.possible,
+            scored_locations=json.dumps([
+                unicode(descriptor.location) for descriptor in section['xmoduledescriptors']
+            ]),
+        )
+
+    def get_ungraded_sections(self):
+        """
+        Returns the sections of the course's grading context that don't have
+        a persisted grade.
+        """
+        return [
+            section
+            for sections in self.course.grading_context['graded_sections'].itervalues()
+            for section in sections
+            if self.get(section) is None
+        ]
+
+    def push_to_remote(self, grade_summary):
+        """
+        Persist the updated subsection grades and the given course grade
+        summary.
+
+        Nothing is persisted if any of the student's scores in the course
+        changed since grading started, since the grades may not reflect the
+        change, or if the grades were persisted concurrently by another
+        request.
+        """
+        if not self._subsection_grades_updates and not self._is_complete:
+            return
+        if StudentModule.objects.filter(
+                student=self.student,
+                course_id=self.course.id,
+                modified__gte=self.grading_started,
+        ).exists():
+            return
+
+        try:
+            with transaction.atomic():
+                if self._subsection_grades_updates:
+                    PersistentSubsectionGrade.objects.filter(
+                        user=self.student,
+                        course_id=self.course.id,
+                        usage_key__in=self._subsection_grades_updates.keys(),
+                    ).delete()
+                    PersistentSubsectionGrade.objects.bulk_create(self._subsection_grades_updates.values())
+                if self._is_complete:
+                    gradeset = {
+                        key: value
+                        for key, value in grade_summary.iteritems()
+                        if key not in ('totaled_scores', 'raw_scores')
+                    }
+                    PersistentCourseGrade.objects.filter(user=self.student, course_id=self.course.id).delete()
+                    PersistentCourseGrade.objects.create(
+                        user=self.student,
+                        course_id=self.course.id,
+                        course_version=self.course_version,
+                        gradeset=json.dumps(gradeset),
+                    )
+        except IntegrityError:
+            # Another request persisted grades for the student concurrently.
+            # Persisting is only an optimization, so these grades are dropped.
+            log.info(
+                u"Grades of user %s in course %s were persisted concurrently; not persisting them.",
+                self.student.id,
+                self.course.id,
+            )
+
+    @staticmethod
+    def _always_recalculate(section):
+        """
+        Returns whether the given section contains problems whose state is
+        updated independently of interaction with the LMS, so that it must
+        always be regraded. (E.g. combinedopenended ORA1)
+        """
+        return any(descriptor.always_recalculate_grades for descriptor in section['xmoduledescriptors'])
+
+
 class ProgressSummary(object):
     """
     Wrapper class for the computation of a user's scores across a course.
@@ -202,6 +436,22 @@ def field_data_cache_for_grading(course, user):
     )
 
 
+def field_data_cache_for_sections(course, user, sections):
+    """
+    Given a CourseDescriptor, User and sections of the course's grading
+    context, create the FieldDataCache for grading only those sections.
+    """
+    descriptor_filter = partial(descriptor_affects_grading, course.block_types_affecting_grading)
+    field_data_cache = FieldDataCache([], course.id, user)
+    for section in sections:
+        field_data_cache.add_descriptor_descendents(
+            section['section_descriptor'],
+            depth=None,
+            descriptor_filter=descriptor_filter
+        )
+    return field_data_cache
+
+
 def answer_distributions(course_key):
     """
     Given a course_key, return answer distributions in the form of a dictionary
@@ -302,6 +552,15 @@ def grade(student, request, course, keep_raw_scores=False, field_data_cache=None
     Also sends a signal to update the minimum grade requirement status.
     """
     grade_summary = _grade(student, request, course, keep_raw_scores, field_data_cache, scores_client)
+    send_grades_updated(student, course, grade_summary)
+    return grade_summary
+
+
+def send_grades_updated(student, course, grade_summary):
+    """
+    Sends the GRADES_UPDATED signal for the given grade of the student, to
+    update the minimum grade requirement status.
+    """
     responses = GRADES_UPDATED.send_robust(
         sender=None,
         username=student.username,
@@ -313,8 +572,6 @@ def grade(student, request, course, keep_raw_scores=False, field_data_cache=None
     for receiver, response in responses:
         log.info('Signal fired when student grade is calculated. Receiver: %s. Response: %s', receiver, response)
 
-    return grade_summary
-
 
 def _grade(student, request, course, keep_raw_scores, field_data_cache, scores_client):
     """
@@ -336,10 +593,28 @@ def _grade(student, request, course, keep_raw_scores, field_data_cache, scores_c
       for every graded module
 
     More information on the format is in the docstring for CourseGrader.
+
+    If persistent grades are enabled, the persisted course grade is returned
+    when available.  Otherwise, only the sections without a persisted grade
+    are regraded, and the results are persisted.
     """
+    persisted_grades = PersistedGrades.create_for_course(student, course)
+    if persisted_grades:
+        with outer_atomic():
+            persisted_grades.fetch_from_remote()
+            if not keep_raw_scores:
+                grade_summary = persisted_grades.get_course_grade()
+                if grade_summary is not None:
+                    return grade_summary
+
     with outer_atomic():
         if field_data_cache is None:
-            field_data_cache = field_data_cache_for_grading(course, student)
+            if persisted_grades and not keep_raw_scores:
+                field_data_cache = field_data_cache_for_sections(
+                    course, student, persisted_grades.get_ungraded_sections()
+                )
+            else:
+                field_data_cache = field_data_cache_for_grading(course, student)
         if scores_client is None:
             scores_client = ScoresClient.from_field_data_cache(field_data_cache)
 
@@ -376,6 +651,12 @@ def _grade(student, request, course, keep_raw_scores, field_data_cache, scores_c
             section_descriptor = section['section_descriptor']
             section_name = section_descriptor.display_name_with_default_escaped
 
+            persisted_graded_total = persisted_grades.get(section) if persisted_grades and not keep_raw_scores else None
+            if persisted_graded_total is not None:
+                if persisted_graded_total.possible > 0:
+                    format_scores.append(persisted_graded_total)
+                continue
+
             with outer_atomic():
                 # some problems have state that is updated independently of interaction
                 # with the LMS, so they need to always be scored. (E.g. combinedopenended ORA1)
@@ -460,6 +741,9 @@ def _grade(student, request, course, keep_raw_scores, field_data_cache, scores_c
                 else:
                     graded_total = Score(0.0, 1.0, True, section_name, None)
 
+                if persisted_grades:
+                    persisted_grades.set(section, graded_total)
+
                 #Add the graded total to totaled_scores
                 if graded_total.possible > 0:
                     format_scores.append(graded_total)
@@ -489,6 +773,8 @@ def _grade(student, request, course, keep_raw_scores, field_data_cache, scores_c
             grade_summary['raw_scores'] = raw_scores
 
         max_scores_cache.push_to_remote()
+        if persisted_grades:
+            persisted_grades.push_to_remote(grade_summary)
 
     return grade_summary
 
@@ -0,0 +1,106 @@
+"""
+Management command to measure the time taken to bind the children of a
+block, such as a large vertical, to a user.
+"""
+from optparse import make_option
+from textwrap import dedent
+import time
+
+from django.contrib.auth.models import User
+from django.core.management import BaseCommand, CommandError
+from opaque_keys import InvalidKeyError
+from opaque_keys.edx.keys import UsageKey
+from xblock.runtime import KvsFieldData
+
+from courseware.model_data import DjangoKeyValueStore, FieldDataCache
+from courseware.module_render import ModuleSystemFactory
+from xmodule.modulestore.django import modulestore
+
+
+class Command(BaseCommand):
+    """
+    Binds the children of the given block to the given user, and reports the
+    time taken to bind each child, at best:
+
+      - with a ModuleSystemFactory per child, which builds the parts of the
+        module system bound to the user for each child, as every child did
+        before module systems were built by factories,
+      - with a ModuleSystemFactory shared by all the children, as when they're
+        bound while rendering their parent.
+
+    No xblock is rendered, and no state is saved.  E.g.:
+
+        ./manage.py lms benchmark_module_binding staff block-v1:edX+DemoX+Demo_Course+type@vertical+block@...
+    """
+    help = dedent(__doc__)
+
+    args = "<username> <usage_key>"
+
+    option_list = BaseCommand.option_list + (
+        make_option(
+            '--number',
+            type='int',
+            dest='number',
+            default=10,
+            help='The number of times the children are bound'
+        ),)
+
+    def handle(self, *args, **options):
+        if len(args) != 2:
+            raise CommandError("benchmark_module_binding requires a username and a usage key")
+
+        try:
+            user = User.objects.get(username=args[0])
+        except User.DoesNotExist:
+            raise CommandError(u"Unknown user: {}".format(args[0]))
+
+        try:
+            usage_key = UsageKey.from_string(args[1])
+        except InvalidKeyError as error:
+            raise CommandError(u"Invalid usage key: {}".format(error))
+
+        course = modulestore().get_course(usage_key.course_key)
+        block = modulestore().get_item(usage_key, depth=None)
+        field_data_cache = FieldDataCache.cache_for_descriptor_descendents(usage_key.course_key, user, block)
+        student_data = KvsFieldData(DjangoKeyValueStore(field_data_cache))
+
+        def make_factory():
+            """
+            Returns a factory binding blocks to the user.
+            """
+            return ModuleSystemFactory(
+                user=user,
+                student_data=student_data,
+                course_id=usage_key.course_key,
+                track_function=lambda event_type, event: None,
+                xqueue_callback_url_prefix='',
+                request_token='benchmark_module_binding',
+                course=course,
+            )
+
+        def bind_per_child_factories(children):
+            """
+            Binds each child with its own factory.
+            """
+            for child in children:
+                make_factory().get_module(child)
+
+        def bind_shared_factory(children):
+            """
+            Binds the children with a shared factory.
+            """
+            factory = make_factory()
+            for child in children:
+                factory.get_module(child)
+
+        for name, bind in [('per-child factories', bind_per_child_factories), ('shared factory', bind_shared_factory)]:
+            times = []
+            for __ in range(options['number']):
+                # Bind new instances of the children, since binding is skipped for blocks bound to the user.
+                children = [modulestore().get_item(child) for child in block.children]
+                start = time.time()
+                bind(children)
+                times.append(time.time() - start)
+            self.stdout.write(u"{} ({} children): {:.2f}ms per child\n".format(
+                name, len(block.children), min(times) * 1000 / max(len(block.children), 1)
+            ))
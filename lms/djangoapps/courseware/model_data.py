@@ -19,16 +19,25 @@ UserStateSummaryCache: A cache for Scope.user_state_summary
 PreferencesCache: A cache for Scope.preferences
 UserInfoCache: A cache for Scope.user_info
 DjangoOrmFieldCache: A base-class for single-row-per-field caches.
+
+The caches write the fields set by each call of `set_many` in bulk.  Within
+:func:`bulk_writes`, they write the fields set by all the calls in bulk, when
+the block exits.
 """
 
 import json
+import operator
+import threading
 from abc import abstractmethod, ABCMeta
 from collections import defaultdict, namedtuple
+from contextlib import contextmanager
 from .models import (
     StudentModule,
     XModuleUserStateSummaryField,
     XModuleStudentPrefsField,
-    XModuleStudentInfoField
+    XModuleStudentInfoField,
+    chunks,
+    chunks_by_size,
 )
 import logging
 from opaque_keys.edx.keys import CourseKey, UsageKey
@@ -37,6 +46,8 @@ from opaque_keys.edx.asides import AsideUsageKeyV1
 from contracts import contract, new_contract
 
 from django.db import DatabaseError
+from django.db.models import Case, Q, TextField, Value, When
+from django.utils import timezone
 
 from xblock.runtime import KeyValueStore
 from xblock.exceptions import KeyValueMultiSaveError, InvalidScopeError
@@ -56,6 +67,65 @@ class InvalidWriteError(Exception):
     """
 
 
+class _BulkWrites(threading.local):
+    """
+    The state of the :func:`bulk_writes` blocks of a thread.
+    """
+    def __init__(self):
+        super(_BulkWrites, self).__init__()
+        self.depth = 0
+        self.field_data_caches = []
+
+
+_BULK_WRITES = _BulkWrites()
+
+
+@contextmanager
+def bulk_writes():
+    """
+    A context manager within which the fields set in any FieldDataCache are
+    only written when the outermost block exits, so that all the fields set
+    while handling a request are written by a few queries.  The caches return
+    the values that are set immediately.
+
+    Fields which can't be written raise a KeyValueMultiSaveError when the
+    block exits, rather than when they're set.  The fields of every cache are
+    written even if some fail, and when the block exits with an exception,
+    the errors writing them are only logged, so as not to mask it.
+    """
+    _BULK_WRITES.depth += 1
+    block_succeeded = False
+    try:
+        yield
+        block_succeeded = True
+    finally:
+        _BULK_WRITES.depth -= 1
+        if _BULK_WRITES.depth == 0:
+            field_data_caches, _BULK_WRITES.field_data_caches = _BULK_WRITES.field_data_caches, []
+            _flush_field_data_caches(field_data_caches, raise_errors=block_succeeded)
+
+
+def _flush_field_data_caches(field_data_caches, raise_errors):
+    """
+    Write the fields set in each of the `field_data_caches`.
+
+    Raises: KeyValueMultiSaveError, with the names of the fields written by
+        all of the caches, if any cache failed and `raise_errors` is True
+    """
+    saved_fields = []
+    failed = False
+    for field_data_cache in field_data_caches:
+        try:
+            saved_fields.extend(field_data_cache.flush())
+        except KeyValueMultiSaveError as exc:
+            failed = True
+            saved_fields.extend(exc.saved_field_names)
+    if failed:
+        if raise_errors:
+            raise KeyValueMultiSaveError(saved_fields)
+        log.error('Error saving fields at the end of bulk writes, only saved %r', saved_fields)
+
+
 def _all_usage_keys(descriptors, aside_types):
     """
     Return a set of all usage_ids for the `descriptors` and for
@@ -163,8 +233,17 @@ class DjangoOrmFieldCache(object):
     """
     __metaclass__ = ABCMeta
 
+    # The number of fields whose values are updated by each query of flush.
+    UPDATE_CHUNK_SIZE = 500
+
+    # The total length of the values updated by each query of flush, which keeps
+    # the queries well below MySQL's max_allowed_packet.
+    UPDATE_CHUNK_MAX_BYTES = 1024 * 1024
+
     def __init__(self):
         self._cache = {}
+        # The kvs keys of the fields set since the last flush, by cache key.
+        self._pending = {}
 
     def cache_fields(self, fields, xblocks, aside_types):
         """
@@ -218,32 +297,120 @@ class DjangoOrmFieldCache(object):
             kv_dict (dict): A dictionary mapping :class:`~DjangoKeyValueStore.Key`
                 objects to values to set.
         """
-        saved_fields = []
-        for kvs_key, value in sorted(kv_dict.items()):
+        self.defer_set_many(kv_dict)
+        self.flush()
+
+    @contract(kv_dict="dict(DjangoKeyValueStore_Key: *)")
+    def defer_set_many(self, kv_dict):
+        """
+        Set the specified fields to the supplied values in the cache, without
+        writing them until the next :meth:`flush`.
+
+        Arguments:
+            kv_dict (dict): A dictionary mapping :class:`~DjangoKeyValueStore.Key`
+                objects to values to set.
+        """
+        for kvs_key, value in kv_dict.items():
             cache_key = self._cache_key_for_kvs_key(kvs_key)
             field_object = self._cache.get(cache_key)
+            serialized_value = json.dumps(value)
 
-            try:
-                serialized_value = json.dumps(value)
-                # It is safe to force an insert or an update, because
-                # a) we should have retrieved the object as part of the
-                #    prefetch step, so if it isn't in our cache, it doesn't exist yet.
-                # b) no other code should be modifying these models out of band of
-                #    this cache.
-                if field_object is None:
-                    field_object = self._create_object(kvs_key, serialized_value)
-                    field_object.save(force_insert=True)
-                    self._cache[cache_key] = field_object
-                else:
-                    field_object.value = serialized_value
-                    field_object.save(force_update=True)
-
-            except DatabaseError:
-                log.exception("Saving field %r failed", kvs_key.field_name)
-                raise KeyValueMultiSaveError(saved_fields)
-
-            finally:
-                saved_fields.append(kvs_key.field_name)
+            if field_object is None:
+                self._cache[cache_key] = self._create_object(kvs_key, serialized_value)
+            else:
+                field_object.value = serialized_value
+            self._pending[cache_key] = kvs_key
+
+    def flush(self):
+        """
+        Write the fields set since the last flush: the new fields are inserted
+        by a single query, and the existing fields are updated by a single query.
+
+        Returns: the names of the fields written
+
+        Raises: KeyValueMultiSaveError if any field couldn't be written
+        """
+        pending, self._pending = self._pending, {}
+        new_fields = []
+        existing_fields = []
+        for cache_key, kvs_key in sorted(pending.items(), key=operator.itemgetter(1)):
+            field_object = self._cache[cache_key]
+            # It is safe to force an insert or an update, because
+            # a) we should have retrieved the object as part of the
+            #    prefetch step, so if it isn't in our cache, it doesn't exist yet.
+            # b) no other code should be modifying these models out of band of
+            #    this cache.
+            if field_object.pk is None:
+                new_fields.append((kvs_key, field_object))
+            else:
+                existing_fields.append((kvs_key, field_object))
+
+        saved_fields = []
+        try:
+            self._insert_objects([field_object for __, field_object in new_fields])
+            saved_fields.extend(kvs_key.field_name for kvs_key, __ in new_fields)
+            self._update_objects([field_object for __, field_object in existing_fields])
+            saved_fields.extend(kvs_key.field_name for kvs_key, __ in existing_fields)
+        except DatabaseError:
+            log.exception("Saving fields %r failed", [kvs_key.field_name for kvs_key in pending.itervalues()])
+            # Fields which weren't inserted don't exist.
+            for cache_key, kvs_key in pending.iteritems():
+                if self._cache[cache_key].pk is None:
+                    del self._cache[cache_key]
+            raise KeyValueMultiSaveError(saved_fields)
+
+        return saved_fields
+
+    def _insert_objects(self, field_objects):
+        """
+        Insert the new ``field_objects``, which are all instances of the same model.
+        """
+        if len(field_objects) <= 1:
+            for field_object in field_objects:
+                field_object.save(force_insert=True)
+            return
+
+        model = type(field_objects[0])
+        model.objects.bulk_create(field_objects)
+
+        # bulk_create doesn't set the ids of the objects, which are needed to update or delete them,
+        # so read them back by the fields which identify each object.
+        unique_fields = [model._meta.get_field(name).attname for name in model._meta.unique_together[0]]
+        for chunk in chunks(field_objects, self.UPDATE_CHUNK_SIZE):
+            query = reduce(operator.or_, (
+                Q(**{name: getattr(field_object, name) for name in unique_fields}) for field_object in chunk
+            ))
+            for saved_object in model.objects.filter(query):
+                field_object = self._cache.get(self._cache_key_for_field_object(saved_object))
+                if field_object is not None and field_object.pk is None:
+                    field_object.pk = saved_object.pk
+                    field_object.created = saved_object.created
+                    field_object.modified = saved_object.modified
+
+    def _update_objects(self, field_objects):
+        """
+        Update the values of the existing ``field_objects``, which are all instances of the same model.
+        """
+        if len(field_objects) <= 1:
+            for field_object in field_objects:
+                field_object.save(force_update=True)
+            return
+
+        model = type(field_objects[0])
+        modified = timezone.now()
+        for chunk in chunks_by_size(
+                field_objects, self.UPDATE_CHUNK_SIZE, self.UPDATE_CHUNK_MAX_BYTES,
+                lambda field_object: len(field_object.value),
+        ):
+            model.objects.filter(pk__in=[field_object.pk for field_object in chunk]).update(
+                value=Case(
+                    *[When(pk=field_object.pk, then=Value(field_object.value)) for field_object in chunk],
+                    output_field=TextField()
+                ),
+                modified=modified,
+            )
+            for field_object in chunk:
+                field_object.modified = modified
 
     @contract(kvs_key=DjangoKeyValueStore.Key)
     def delete(self, kvs_key):
@@ -261,7 +428,9 @@ class DjangoOrmFieldCache(object):
         if field_object is None:
             raise KeyError(kvs_key.field_name)
 
-        field_object.delete()
+        self._pending.pop(cache_key, None)
+        if field_object.pk is not None:
+            field_object.delete()
         del self._cache[cache_key]
 
     @contract(kvs_key=DjangoKeyValueStore.Key, returns=bool)
@@ -351,6 +520,8 @@ class UserStateCache(object):
     """
     def __init__(self, user, course_id):
         self._cache = defaultdict(dict)
+        # The fields set since the last flush, by cache key.
+        self._pending = defaultdict(dict)
         self.course_id = course_id
         self.user = user
         self._client = DjangoXBlockUserStateClient(self.user)
@@ -411,11 +582,42 @@ class UserStateCache(object):
             kv_dict (dict): A dictionary mapping :class:`~DjangoKeyValueStore.Key`
                 objects to values to set.
         """
-        pending_updates = defaultdict(dict)
+        self.defer_set_many(kv_dict)
+        self.flush()
+
+    @contract(kv_dict="dict(DjangoKeyValueStore_Key: *)")
+    def defer_set_many(self, kv_dict):
+        """
+        Set the specified fields to the supplied values in the cache, without
+        writing them until the next :meth:`flush`.
+
+        Arguments:
+            kv_dict (dict): A dictionary mapping :class:`~DjangoKeyValueStore.Key`
+                objects to values to set.
+        """
         for kvs_key, value in kv_dict.items():
             cache_key = self._cache_key_for_kvs_key(kvs_key)
 
-            pending_updates[cache_key][kvs_key.field_name] = value
+            self._pending[cache_key][kvs_key.field_name] = value
+            self._cache[cache_key][kvs_key.field_name] = value
+
+    def flush(self):
+        """
+        Write the fields set since the last flush, with a single call to the
+        user state client.
+
+        Returns: the names of the fields written
+
+        Raises: KeyValueMultiSaveError if the fields couldn't be written
+        """
+        pending_updates = {
+            cache_key: field_state
+            for cache_key, field_state in self._pending.iteritems()
+            if field_state
+        }
+        self._pending = defaultdict(dict)
+        if not pending_updates:
+            return []
 
         try:
             self._client.set_many(
@@ -425,8 +627,8 @@ class UserStateCache(object):
         except DatabaseError:
             log.exception("Saving user state failed for %s", self.user.username)
             raise KeyValueMultiSaveError([])
-        finally:
-            self._cache.update(pending_updates)
+
+        return [field_name for field_state in pending_updates.itervalues() for field_name in field_state]
 
     @contract(kvs_key=DjangoKeyValueStore.Key)
     def get(self, kvs_key):
@@ -464,6 +666,7 @@ class UserStateCache(object):
         if kvs_key.field_name not in field_state:
             raise KeyError(kvs_key.field_name)
 
+        self._pending.get(cache_key, {}).pop(kvs_key.field_name, None)
         self._client.delete(self.user.username, cache_key, fields=[kvs_key.field_name])
         del field_state[kvs_key.field_name]
 
@@ -837,10 +1040,10 @@ class FieldDataCache(object):
 
         Arguments:
             kv_dict (dict): dict mapping from `DjangoKeyValueStore.Key`s to field values
-        Raises: DatabaseError if any fields fail to save
+        Raises: KeyValueMultiSaveError if any fields fail to save, which within
+            :func:`bulk_writes` is raised when the block exits instead
         """
 
-        saved_fields = []
         by_scope = defaultdict(dict)
         for key, value in kv_dict.iteritems():
 
@@ -855,14 +1058,32 @@ class FieldDataCache(object):
             by_scope[key.scope][key] = value
 
         for scope, set_many_data in by_scope.iteritems():
+            self.cache[scope].defer_set_many(set_many_data)
+
+        if _BULK_WRITES.depth > 0:
+            if not any(field_data_cache is self for field_data_cache in _BULK_WRITES.field_data_caches):
+                _BULK_WRITES.field_data_caches.append(self)
+        else:
+            self.flush()
+
+    def flush(self):
+        """
+        Write all the fields set since the last flush.
+
+        Returns: the names of the fields written
+
+        Raises: KeyValueMultiSaveError if any fields fail to save
+        """
+        saved_fields = []
+        for scope_cache in self.cache.itervalues():
             try:
-                self.cache[scope].set_many(set_many_data)
                 # If save is successful on these fields, add it to
                 # the list of successful saves
-                saved_fields.extend(key.field_name for key in set_many_data)
+                saved_fields.extend(scope_cache.flush())
             except KeyValueMultiSaveError as exc:
-                log.exception('Error saving fields %r', [key.field_name for key in set_many_data])
+                log.exception('Error saving fields of %s', scope_cache.__class__.__name__)
                 raise KeyValueMultiSaveError(saved_fields + exc.saved_field_names)
+        return saved_fields
 
     @contract(key=DjangoKeyValueStore.Key)
     def delete(self, key):
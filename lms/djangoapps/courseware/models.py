@@ -12,16 +12,23 @@ file and check it in at the same time as your model changes. To do that,
 ASSUMPTIONS: modules have unique IDs, even across different module_types
 
 """
+import cPickle as pickle
+import json
 import logging
 import itertools
+from uuid import uuid4
 
 from django.contrib.auth.models import User
 from django.conf import settings
+from django.core.cache import cache
 from django.db import models
-from django.db.models.signals import post_save
+from django.db.models.signals import m2m_changed, post_delete, post_save
 from django.dispatch import receiver, Signal
 
 from model_utils.models import TimeStampedModel
+from opaque_keys import InvalidKeyError
+from opaque_keys.edx.keys import CourseKey
+from openedx.core.djangoapps.course_groups.models import CourseUserGroup, CourseUserGroupPartitionGroup
 from student.models import user_by_anonymous_id
 from submissions.models import score_set, score_reset
 import coursewarehistoryextended
@@ -39,6 +46,26 @@ def chunks(items, chunk_size):
     return (items[i:i + chunk_size] for i in xrange(0, len(items), chunk_size))
 
 
+def chunks_by_size(items, chunk_size, max_chunk_bytes, get_bytes):
+    """
+    Yields the values from items in chunks of at most chunk_size values, whose
+    sizes, as returned by get_bytes, add up to at most max_chunk_bytes.  A value
+    larger than max_chunk_bytes is yielded in a chunk of its own.
+    """
+    chunk = []
+    chunk_bytes = 0
+    for item in items:
+        item_bytes = get_bytes(item)
+        if chunk and (len(chunk) >= chunk_size or chunk_bytes + item_bytes > max_chunk_bytes):
+            yield chunk
+            chunk = []
+            chunk_bytes = 0
+        chunk.append(item)
+        chunk_bytes += item_bytes
+    if chunk:
+        yield chunk
+
+
 class ChunkingManager(models.Manager):
     """
     :class:`~Manager` that adds an additional method :meth:`chunked_filter` to provide
@@ -149,6 +176,92 @@ class StudentModule(models.Model):
         return unicode(repr(self))
 
 
+class StudentModuleStateCache(object):
+    """
+    A cache, shared between requests, of the state of the StudentModules of a
+    user in a course, so that a user navigating a course doesn't read the same
+    rows again.  The cached states of a user in a course are versioned, and
+    saving or deleting any of their StudentModules starts a new version.
+
+    The states are cached for STUDENT_MODULE_STATE_CACHE_TIMEOUT seconds,
+    which also bounds how long a read racing with an uncommitted write can
+    cache the previous state.  0 disables the cache.  The states of users
+    whose pickled states exceed MAX_SIZE bytes aren't cached.
+    """
+    # Memcached doesn't store values over 1MB, which leaves room for the
+    # overhead of the item.
+    MAX_SIZE = 1000 * 1000
+
+    @classmethod
+    def enabled(cls):
+        """
+        Returns whether the cache is enabled.
+        """
+        return getattr(settings, 'STUDENT_MODULE_STATE_CACHE_TIMEOUT', 0) > 0
+
+    @classmethod
+    def _version_key(cls, user_id, course_key):
+        """
+        Returns the cache key of the version of the states of the user in the course.
+        """
+        return u'courseware.student_module_state.version.{}.{}'.format(user_id, course_key)
+
+    @classmethod
+    def _states_key(cls, user_id, course_key, version):
+        """
+        Returns the cache key of the states of the user in the course, at the given version.
+        """
+        return u'courseware.student_module_state.{}.{}.{}'.format(user_id, course_key, version)
+
+    @classmethod
+    def get(cls, user_id, course_key):
+        """
+        Returns the current version of the states of the user in the course,
+        and a dict of the cached states, mapping the unicode of the usage keys
+        of blocks to the state and modified date of their StudentModule, or
+        to None if they don't have one.
+        """
+        timeout = settings.STUDENT_MODULE_STATE_CACHE_TIMEOUT
+        version_key = cls._version_key(user_id, course_key)
+        version = cache.get(version_key)
+        if version is None:
+            version = uuid4().hex
+            cache.set(version_key, version, timeout)
+            return version, {}
+        return version, cache.get(cls._states_key(user_id, course_key, version)) or {}
+
+    @classmethod
+    def set(cls, user_id, course_key, version, states):
+        """
+        Caches the `states` of the user in the course, as returned by get,
+        for the given version, unless they're too big to cache.
+        """
+        size = len(pickle.dumps(states, pickle.HIGHEST_PROTOCOL))
+        if size > cls.MAX_SIZE:
+            log.info(u"Not caching the %d bytes of states of user %s in course %s", size, user_id, course_key)
+            return
+        timeout = settings.STUDENT_MODULE_STATE_CACHE_TIMEOUT
+        cache.set(cls._states_key(user_id, course_key, version), states, timeout)
+
+    @classmethod
+    def invalidate(cls, user_id, course_key):
+        """
+        Starts a new version of the states of the user in the course.
+        """
+        if cls.enabled():
+            cache.delete(cls._version_key(user_id, course_key))
+
+
+@receiver(post_save, sender=StudentModule)
+@receiver(post_delete, sender=StudentModule)
+def invalidate_student_module_state_cache(sender, instance, **kwargs):  # pylint: disable=unused-argument
+    """
+    Invalidate the cached states of the user in the course of a StudentModule
+    which was saved or deleted.
+    """
+    StudentModuleStateCache.invalidate(instance.student_id, instance.course_id)
+
+
 class BaseStudentModuleHistory(models.Model):
     """Abstract class containing most fields used by any class
     storing Student Module History"""
@@ -361,6 +474,90 @@ class StudentFieldOverride(TimeStampedModel):
     value = models.TextField(default='null')
 
 
+class PersistentSubsectionGrade(TimeStampedModel):
+    """
+    Stores the most recently computed grade of a user for a graded
+    subsection, so that the course grade can be computed without
+    re-scoring the problems in subsections whose scores haven't changed.
+
+    A row is deleted whenever the user's score for any of the subsection's
+    scored_locations changes, or the user's cohort or its content group
+    changes, and is ignored if the course content or grading policy has
+    changed, or graded content has been released, since it was computed,
+    as recorded by its course_version.
+    """
+    class Meta(object):
+        app_label = "courseware"
+        unique_together = (('user', 'course_id', 'usage_key'),)
+
+    user = models.ForeignKey(User)
+    course_id = CourseKeyField(max_length=255)
+
+    # The usage key of the graded subsection
+    usage_key = LocationKeyField(max_length=255)
+
+    # The version of the course the grade was computed for
+    course_version = models.CharField(max_length=255, blank=True)
+
+    # The graded points earned and possible in the subsection
+    earned = models.FloatField()
+    possible = models.FloatField()
+
+    # The usage keys of all the blocks in the subsection that may have a
+    # score, stored as a JSON list
+    scored_locations = models.TextField(default='[]')
+
+    def __unicode__(self):
+        return u"[PersistentSubsectionGrade] {}: {} = {}/{}".format(
+            self.user_id, self.usage_key, self.earned, self.possible
+        )
+
+    @classmethod
+    def invalidate(cls, user_id, course_id, usage_key):
+        """
+        Deletes the given user's persisted grades for the subsections of the
+        given course that contain the given usage_key, along with the user's
+        persisted course grade.
+        """
+        cls.objects.filter(
+            user_id=user_id,
+            course_id=course_id,
+            scored_locations__contains=json.dumps(unicode(usage_key)),
+        ).delete()
+        PersistentCourseGrade.objects.filter(user_id=user_id, course_id=course_id).delete()
+
+    @classmethod
+    def invalidate_course(cls, user_ids, course_id):
+        """
+        Deletes all the persisted grades of the given users in the given
+        course, such as when the content they can access changes.
+        """
+        cls.objects.filter(user_id__in=user_ids, course_id=course_id).delete()
+        PersistentCourseGrade.objects.filter(user_id__in=user_ids, course_id=course_id).delete()
+
+
+class PersistentCourseGrade(TimeStampedModel):
+    """
+    Stores the most recently computed course grade of a user, computed
+    from the user's PersistentSubsectionGrades in the course.
+    """
+    class Meta(object):
+        app_label = "courseware"
+        unique_together = (('user', 'course_id'),)
+
+    user = models.ForeignKey(User)
+    course_id = CourseKeyField(max_length=255)
+
+    # The version of the course the grade was computed for
+    course_version = models.CharField(max_length=255, blank=True)
+
+    # The output of the course grader, stored as JSON
+    gradeset = models.TextField()
+
+    def __unicode__(self):
+        return u"[PersistentCourseGrade] {}: {} = {}".format(self.user_id, self.course_id, self.gradeset)
+
+
 # Signal that indicates that a user's score for a problem has been updated.
 # This signal is generated when a scoring event occurs either within the core
 # platform or in the Submissions module. Note that this signal will be triggered
@@ -457,3 +654,74 @@ def submissions_score_reset_handler(sender, **kwargs):  # pylint: disable=unused
             u"Failed to process score_reset signal from Submissions API. "
             "user: %s, course_id: %s, usage_id: %s", user, course_id, usage_id
         )
+
+
+@receiver(SCORE_CHANGED)
+def score_changed_persistent_grades_handler(sender, **kwargs):  # pylint: disable=unused-argument
+    """
+    Consume the SCORE_CHANGED signal and invalidate the user's persisted
+    grades for the subsection containing the scored block, so it is
+    regraded the next time the user's grade is requested.
+    """
+    try:
+        course_key = CourseKey.from_string(kwargs['course_id'])
+    except InvalidKeyError:
+        log.exception(u"Failed to invalidate persisted grades for course_id: %s", kwargs['course_id'])
+        return
+    PersistentSubsectionGrade.invalidate(kwargs['user_id'], course_key, kwargs['usage_id'])
+
+
+@receiver(post_delete, sender=StudentModule)
+def student_module_deleted_persistent_grades_handler(sender, instance, **kwargs):  # pylint: disable=unused-argument
+    """
+    Invalidate the user's persisted grades for the subsection containing
+    a block whose StudentModule was deleted, such as when an instructor
+    resets a student's attempts.
+    """
+    PersistentSubsectionGrade.invalidate(instance.student_id, instance.course_id, instance.module_state_key)
+
+
+@receiver(m2m_changed, sender=CourseUserGroup.users.through)
+def cohort_membership_changed_persistent_grades_handler(sender, **kwargs):  # pylint: disable=unused-argument
+    """
+    Invalidate the persisted grades of users who are added to or removed
+    from a cohort, since the content groups they can access may change.
+    """
+    action = kwargs["action"]
+    instance = kwargs["instance"]
+    pk_set = kwargs["pk_set"]
+    reverse = kwargs["reverse"]
+
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if reverse:
+        # instance is a user, and pk_set the ids of the groups
+        if action == 'pre_clear':
+            course_groups = instance.course_groups.all()
+        else:
+            course_groups = CourseUserGroup.objects.filter(pk__in=pk_set)
+        for course_id in set(course_group.course_id for course_group in course_groups):
+            PersistentSubsectionGrade.invalidate_course([instance.id], course_id)
+    else:
+        # instance is a group, and pk_set the ids of the users
+        if action == 'pre_clear':
+            user_ids = list(instance.users.values_list('id', flat=True))
+        else:
+            user_ids = list(pk_set)
+        PersistentSubsectionGrade.invalidate_course(user_ids, instance.course_id)
+
+
+@receiver(post_save, sender=CourseUserGroupPartitionGroup)
+@receiver(post_delete, sender=CourseUserGroupPartitionGroup)
+def cohort_group_changed_persistent_grades_handler(sender, instance, **kwargs):  # pylint: disable=unused-argument
+    """
+    Invalidate the persisted grades of the members of a cohort whose
+    content group changes.
+    """
+    try:
+        course_group = CourseUserGroup.objects.get(id=instance.course_user_group_id)
+    except CourseUserGroup.DoesNotExist:
+        return
+    PersistentSubsectionGrade.invalidate_course(
+        list(course_group.users.values_list('id', flat=True)), course_group.course_id
+    )
@@ -22,6 +22,7 @@ from django.test.client import RequestFactory
 from django.views.decorators.csrf import csrf_exempt
 from edx_proctoring.services import ProctoringService
 from eventtracking import tracker
+from lazy import lazy
 from opaque_keys import InvalidKeyError
 from opaque_keys.edx.keys import UsageKey, CourseKey
 from opaque_keys.edx.locations import SlashSeparatedCourseKey
@@ -45,7 +46,7 @@ from courseware.masquerade import (
     is_masquerading_as_specific_student,
     setup_masquerade,
 )
-from courseware.model_data import DjangoKeyValueStore, FieldDataCache, set_score
+from courseware.model_data import DjangoKeyValueStore, FieldDataCache, bulk_writes, set_score
 from courseware.models import SCORE_CHANGED
 from edxmako.shortcuts import render_to_string
 from lms.djangoapps.lms_xblock.field_data import LmsFieldData
@@ -394,84 +395,209 @@ def get_module_for_descriptor(user, request, descriptor, field_data_cache, cours
     )
 
 
-def get_module_system_for_user(user, student_data,  # TODO  # pylint: disable=too-many-statements
-                               # Arguments preceding this comment have user binding, those following don't
-                               descriptor, course_id, track_function, xqueue_callback_url_prefix,
-                               request_token, position=None, wrap_xmodule_display=True, grade_bucket_type=None,
-                               static_asset_path='', user_location=None, disable_staff_debug_info=False,
-                               course=None):
+class ModuleSystemFactory(object):
     """
-    Helper function that returns a module system and student_data bound to a user and a descriptor.
-
-    The purpose of this function is to factor out everywhere a user is implicitly bound when creating a module,
-    to allow an existing module to be re-bound to a user.  Most of the user bindings happen when creating the
-    closures that feed the instantiation of ModuleSystem.
+    Builds the module systems of the descriptors that are bound to a user during a request.
 
-    The arguments fall into two categories: those that have explicit or implicit user binding, which are user
-    and student_data, and those don't and are just present so that ModuleSystem can be instantiated, which
-    are all the other arguments.  Ultimately, this isn't too different than how get_module_for_descriptor_internal
-    was before refactoring.
+    Most of a module system is bound to the user and the request rather than to the descriptor: the user's access
+    to the course, their anonymous ids, the wrappers of their fragments, and the services.  The factory builds
+    those parts once, when they're first needed, and shares them between the module systems of all the descriptors
+    it binds, such as the children of a vertical, so that each descriptor only adds the few parts bound to it.
 
     Arguments:
         see arguments for get_module()
+        student_data (KvsFieldData): the user's state
         request_token (str): A token unique to the request use by xblock initialization
-
-    Returns:
-        (LmsModuleSystem, KvsFieldData):  (module system, student_data) bound to, primarily, the user and descriptor
     """
+    def __init__(self, user, student_data, course_id, track_function, xqueue_callback_url_prefix, request_token,
+                 position=None, wrap_xmodule_display=True, grade_bucket_type=None, static_asset_path='',
+                 user_location=None, disable_staff_debug_info=False, course=None):
+        self.user = user
+        self.student_data = student_data
+        self.course_id = course_id
+        self.track_function = track_function
+        self.xqueue_callback_url_prefix = xqueue_callback_url_prefix
+        self.request_token = request_token
+        self.position = position
+        self.wrap_xmodule_display = wrap_xmodule_display
+        self.grade_bucket_type = grade_bucket_type
+        self.static_asset_path = static_asset_path
+        self.user_location = user_location
+        self.disable_staff_debug_info = disable_staff_debug_info
+        self.course = course
+
+        # The parts which need a descriptor to check the user's access, computed for the first one bound.
+        self._user_is_staff = None
+        self._staff_markup_wrapper = None
+        self._services = None
+
+    @lazy
+    def masquerading_as_specific_student(self):
+        """
+        Whether the user is a staff member masquerading as a specific student.
+        """
+        return is_masquerading_as_specific_student(self.user, self.course_id)
+
+    @lazy
+    def user_is_admin(self):
+        """
+        Whether the user is global staff.
+        """
+        return bool(has_access(self.user, u'staff', 'global'))
+
+    @lazy
+    def user_is_beta_tester(self):
+        """
+        Whether the user is a beta tester of the course.
+        """
+        return CourseBetaTesterRole(self.course_id).has_user(self.user)
+
+    @lazy
+    def anonymous_student_id(self):
+        """
+        The user's per-student anonymized id.
+        """
+        return anonymous_id_for_user(self.user, None)
+
+    @lazy
+    def anonymous_course_student_id(self):
+        """
+        The user's per-course anonymized id.
+        """
+        return anonymous_id_for_user(self.user, self.course_id)
+
+    @lazy
+    def jump_to_id_base_url(self):
+        """
+        The url of the courseware's jump_to_id view, without a module id.
+        """
+        # NOTE: module_id is empty string here. The 'module_id' will get assigned in the replacement
+        # function, we just need to specify something to get the reverse() to work.
+        return reverse('jump_to_id', kwargs={'course_id': self.course_id.to_deprecated_string(), 'module_id': ''})
+
+    @lazy
+    def parsed_position(self):
+        """
+        The position specified in the URL, as an int, or None.
+        """
+        if self.position is None:
+            return None
+        try:
+            return int(self.position)
+        except (ValueError, TypeError):
+            log.exception('Non-integer %r passed as position.', self.position)
+            return None
+
+    def user_is_staff(self, descriptor):
+        """
+        Returns whether the user has staff access to the course of `descriptor`.  Staff access is granted per
+        course, so it's only checked for the first descriptor.
+        """
+        if self._user_is_staff is None:
+            self._user_is_staff = bool(has_access(self.user, u'staff', descriptor.location, self.course_id))
+        return self._user_is_staff
+
+    def staff_markup_wrapper(self, descriptor):
+        """
+        Returns the wrapper adding the staff debug info to fragments when it's displayed to the user, or None.
+        Like staff access, instructor access is granted per course, so it's only checked for the first descriptor.
+        """
+        if self._staff_markup_wrapper is None:
+            self._staff_markup_wrapper = False
+            if self.masquerading_as_specific_student:
+                # When masquerading as a specific student, we want to show the debug button
+                # unconditionally to enable resetting the state of the student we are masquerading as.
+                # We already know the user has staff access when masquerading is active.
+                staff_access = True
+                # To figure out whether the user has instructor access, we temporarily remove the
+                # masquerade_settings from the real_user.  With the masquerading settings in place,
+                # the result would always be "False".
+                masquerade_settings = self.user.real_user.masquerade_settings
+                del self.user.real_user.masquerade_settings
+                instructor_access = bool(has_access(self.user.real_user, 'instructor', descriptor, self.course_id))
+                self.user.real_user.masquerade_settings = masquerade_settings
+            else:
+                staff_access = has_access(self.user, 'staff', descriptor, self.course_id)
+                instructor_access = bool(has_access(self.user, 'instructor', descriptor, self.course_id))
+            if staff_access:
+                self._staff_markup_wrapper = partial(
+                    add_staff_markup, self.user, instructor_access, self.disable_staff_debug_info
+                )
+        return self._staff_markup_wrapper or None
+
+    def services(self, descriptor):
+        """
+        Returns the services of the module systems other than the field data, which is bound to the descriptor.
+        """
+        if self._services is None:
+            self._services = {
+                'fs': FSService(),
+                'user': DjangoXBlockUserService(self.user, user_is_staff=self.user_is_staff(descriptor)),
+                "reverification": ReverificationService(),
+                'proctoring': ProctoringService(),
+                'credit': CreditService(),
+                'bookmarks': BookmarksService(user=self.user),
+            }
+        return self._services
+
+    @lazy
+    def leading_block_wrappers(self):
+        """
+        The wrappers which are applied to fragments before their static urls are replaced.
+        """
+        block_wrappers = []
+
+        if self.masquerading_as_specific_student:
+            block_wrappers.append(filter_displayed_blocks)
+
+        if settings.FEATURES.get("LICENSING", False):
+            block_wrappers.append(wrap_with_license)
+
+        # Wrap the output display in a single div to allow for the XModule
+        # javascript to be bound correctly
+        if self.wrap_xmodule_display is True:
+            block_wrappers.append(partial(
+                wrap_xblock,
+                'LmsRuntime',
+                extra_data={'course-id': self.course_id.to_deprecated_string()},
+                usage_id_serializer=lambda usage_id: quote_slashes(usage_id.to_deprecated_string()),
+                request_token=self.request_token,
+            ))
+
+        return block_wrappers
 
-    def make_xqueue_callback(dispatch='score_update'):
+    @lazy
+    def trailing_block_wrappers(self):
+        """
+        The wrappers which are applied to fragments after their static urls are replaced, except for the staff
+        debug info.
+        """
+        return [
+            # Allow URLs of the form '/course/' refer to the root of multicourse directory
+            #   hierarchy of this course
+            partial(replace_course_urls, self.course_id),
+            # this will rewrite intra-courseware links (/jump_to_id/<id>). This format
+            # is an improvement over the /course/... format for studio authored courses,
+            # because it is agnostic to course-hierarchy.
+            partial(replace_jump_to_id_urls, self.course_id, self.jump_to_id_base_url),
+        ]
+
+    def make_xqueue_callback(self, location, dispatch='score_update'):
         """
         Returns fully qualified callback URL for external queueing system
         """
         relative_xqueue_callback_url = reverse(
             'xqueue_callback',
             kwargs=dict(
-                course_id=course_id.to_deprecated_string(),
-                userid=str(user.id),
-                mod_id=descriptor.location.to_deprecated_string(),
+                course_id=self.course_id.to_deprecated_string(),
+                userid=str(self.user.id),
+                mod_id=location.to_deprecated_string(),
                 dispatch=dispatch
             ),
         )
-        return xqueue_callback_url_prefix + relative_xqueue_callback_url
-
-    # Default queuename is course-specific and is derived from the course that
-    #   contains the current module.
-    # TODO: Queuename should be derived from 'course_settings.json' of each course
-    xqueue_default_queuename = descriptor.location.org + '-' + descriptor.location.course
-
-    xqueue = {
-        'interface': XQUEUE_INTERFACE,
-        'construct_callback': make_xqueue_callback,
-        'default_queuename': xqueue_default_queuename.replace(' ', '_'),
-        'waittime': settings.XQUEUE_WAITTIME_BETWEEN_REQUESTS
-    }
+        return self.xqueue_callback_url_prefix + relative_xqueue_callback_url
 
-    def inner_get_module(descriptor):
-        """
-        Delegate to get_module_for_descriptor_internal() with all values except `descriptor` set.
-
-        Because it does an access check, it may return None.
-        """
-        # TODO: fix this so that make_xqueue_callback uses the descriptor passed into
-        # inner_get_module, not the parent's callback.  Add it as an argument....
-        return get_module_for_descriptor_internal(
-            user=user,
-            descriptor=descriptor,
-            student_data=student_data,
-            course_id=course_id,
-            track_function=track_function,
-            xqueue_callback_url_prefix=xqueue_callback_url_prefix,
-            position=position,
-            wrap_xmodule_display=wrap_xmodule_display,
-            grade_bucket_type=grade_bucket_type,
-            static_asset_path=static_asset_path,
-            user_location=user_location,
-            request_token=request_token,
-            course=course
-        )
-
-    def _fulfill_content_milestones(user, course_key, content_key):
+    def _fulfill_content_milestones(self, content_key):
         """
         Internal helper to handle milestone fulfillments for the specified content module
         """
@@ -479,20 +605,20 @@ def get_module_system_for_user(user, student_data,  # TODO  # pylint: disable=to
         # If this module is part of an entrance exam, we'll need to see if the student
         # has reached the point at which they can collect the associated milestone
         if milestones_helpers.is_entrance_exams_enabled():
-            course = modulestore().get_course(course_key)
+            course = modulestore().get_course(self.course_id)
             content = modulestore().get_item(content_key)
             entrance_exam_enabled = getattr(course, 'entrance_exam_enabled', False)
             in_entrance_exam = getattr(content, 'in_entrance_exam', False)
             if entrance_exam_enabled and in_entrance_exam:
                 # We don't have access to the true request object in this context, but we can use a mock
                 request = RequestFactory().request()
-                request.user = user
+                request.user = self.user
                 exam_pct = get_entrance_exam_score(request, course)
                 if exam_pct >= course.entrance_exam_minimum_score_pct:
                     exam_key = UsageKey.from_string(course.entrance_exam_id)
                     relationship_types = milestones_helpers.get_milestone_relationship_types()
                     content_milestones = milestones_helpers.get_course_content_milestones(
-                        course_key,
+                        self.course_id,
                         exam_key,
                         relationship=relationship_types['FULFILLS']
                     )
@@ -501,18 +627,18 @@ def get_module_system_for_user(user, student_data,  # TODO  # pylint: disable=to
                     for milestone in content_milestones:
                         milestones_helpers.add_user_milestone(user, milestone)
 
-    def handle_grade_event(block, event_type, event):  # pylint: disable=unused-argument
+    def handle_grade_event(self, location, block, event_type, event):  # pylint: disable=unused-argument
         """
         Manages the workflow for recording and updating of student module grade state
         """
-        user_id = user.id
+        user_id = self.user.id
 
         grade = event.get('value')
         max_grade = event.get('max_value')
 
         set_score(
             user_id,
-            descriptor.location,
+            location,
             grade,
             max_grade,
         )
@@ -521,23 +647,19 @@ def get_module_system_for_user(user, student_data,  # TODO  # pylint: disable=to
         score_bucket = get_score_bucket(grade, max_grade)
 
         tags = [
-            u"org:{}".format(course_id.org),
-            u"course:{}".format(course_id),
+            u"org:{}".format(self.course_id.org),
+            u"course:{}".format(self.course_id),
             u"score_bucket:{0}".format(score_bucket)
         ]
 
-        if grade_bucket_type is not None:
-            tags.append('type:%s' % grade_bucket_type)
+        if self.grade_bucket_type is not None:
+            tags.append('type:%s' % self.grade_bucket_type)
 
         dog_stats_api.increment("lms.courseware.question_answered", tags=tags)
 
         # Cycle through the milestone fulfillment scenarios to see if any are now applicable
         # thanks to the updated grading information that was just submitted
-        _fulfill_content_milestones(
-            user,
-            course_id,
-            descriptor.location,
-        )
+        self._fulfill_content_milestones(location)
 
         # Send a signal out to any listeners who are waiting for score change
         # events.
@@ -546,14 +668,14 @@ def get_module_system_for_user(user, student_data,  # TODO  # pylint: disable=to
             points_possible=event['max_value'],
             points_earned=event['value'],
             user_id=user_id,
-            course_id=unicode(course_id),
-            usage_id=unicode(descriptor.location)
+            course_id=unicode(self.course_id),
+            usage_id=unicode(location)
         )
 
-    def publish(block, event_type, event):
+    def publish(self, location, block, event_type, event):
         """A function that allows XModules to publish events."""
-        if event_type == 'grade' and not is_masquerading_as_specific_student(user, course_id):
-            handle_grade_event(block, event_type, event)
+        if event_type == 'grade' and not self.masquerading_as_specific_student:
+            self.handle_grade_event(location, block, event_type, event)
         else:
             aside_context = {}
             for aside in block.runtime.get_asides(block):
@@ -562,9 +684,9 @@ def get_module_system_for_user(user, student_data,  # TODO  # pylint: disable=to
                     if aside_event_info is not None:
                         aside_context[aside.scope_ids.block_type] = aside_event_info
             with tracker.get_tracker().context('asides', {'asides': aside_context}):
-                track_function(event_type, event)
+                self.track_function(event_type, event)
 
-    def rebind_noauth_module_to_user(module, real_user):
+    def rebind_noauth_module_to_user(self, module, real_user):
         """
         A function that allows a module to get re-bound to a real user if it was previously bound to an AnonymousUser.
 
@@ -577,41 +699,41 @@ def get_module_system_for_user(user, student_data,  # TODO  # pylint: disable=to
         Returns:
             nothing (but the side effect is that module is re-bound to real_user)
         """
-        if user.is_authenticated():
+        if self.user.is_authenticated():
             err_msg = ("rebind_noauth_module_to_user can only be called from a module bound to "
                        "an anonymous user")
             log.error(err_msg)
             raise LmsModuleRenderError(err_msg)
 
         field_data_cache_real_user = FieldDataCache.cache_for_descriptor_descendents(
-            course_id,
+            self.course_id,
             real_user,
             module.descriptor,
             asides=XBlockAsidesConfig.possible_asides(),
         )
         student_data_real_user = KvsFieldData(DjangoKeyValueStore(field_data_cache_real_user))
 
-        (inner_system, inner_student_data) = get_module_system_for_user(
+        real_user_factory = ModuleSystemFactory(
             user=real_user,
             student_data=student_data_real_user,  # These have implicit user bindings, rest of args considered not to
-            descriptor=module.descriptor,
-            course_id=course_id,
-            track_function=track_function,
-            xqueue_callback_url_prefix=xqueue_callback_url_prefix,
-            position=position,
-            wrap_xmodule_display=wrap_xmodule_display,
-            grade_bucket_type=grade_bucket_type,
-            static_asset_path=static_asset_path,
-            user_location=user_location,
-            request_token=request_token,
-            course=course
+            course_id=self.course_id,
+            track_function=self.track_function,
+            xqueue_callback_url_prefix=self.xqueue_callback_url_prefix,
+            position=self.position,
+            wrap_xmodule_display=self.wrap_xmodule_display,
+            grade_bucket_type=self.grade_bucket_type,
+            static_asset_path=self.static_asset_path,
+            user_location=self.user_location,
+            request_token=self.request_token,
+            course=self.course
         )
+        (inner_system, inner_student_data) = real_user_factory.get_module_system(module.descriptor)
 
         module.descriptor.bind_for_student(
             inner_system,
             real_user.id,
             [
-                partial(OverrideFieldData.wrap, real_user, course),
+                partial(OverrideFieldData.wrap, real_user, self.course),
                 partial(LmsFieldData, student_data=inner_student_data),
             ],
         )
@@ -624,169 +746,203 @@ def get_module_system_for_user(user, student_data,  # TODO  # pylint: disable=to
         module.runtime = inner_system
         inner_system.xmodule_instance = module
 
-    # Build a list of wrapping functions that will be applied in order
-    # to the Fragment content coming out of the xblocks that are about to be rendered.
-    block_wrappers = []
+    def get_module_system(self, descriptor):
+        """
+        Returns a module system and student_data bound to the user and `descriptor`.
 
-    if is_masquerading_as_specific_student(user, course_id):
-        block_wrappers.append(filter_displayed_blocks)
+        Returns:
+            (LmsModuleSystem, KvsFieldData):  (module system, student_data) bound to, primarily, the user and descriptor
+        """
+        # Default queuename is course-specific and is derived from the course that
+        #   contains the current module.
+        # TODO: Queuename should be derived from 'course_settings.json' of each course
+        xqueue_default_queuename = descriptor.location.org + '-' + descriptor.location.course
+
+        xqueue = {
+            'interface': XQUEUE_INTERFACE,
+            'construct_callback': partial(self.make_xqueue_callback, descriptor.location),
+            'default_queuename': xqueue_default_queuename.replace(' ', '_'),
+            'waittime': settings.XQUEUE_WAITTIME_BETWEEN_REQUESTS
+        }
 
-    if settings.FEATURES.get("LICENSING", False):
-        block_wrappers.append(wrap_with_license)
+        # TODO (cpennington): When modules are shared between courses, the static
+        # prefix is going to have to be specific to the module, not the directory
+        # that the xml was loaded from
+        data_directory = getattr(descriptor, 'data_dir', None)
+        static_asset_path = self.static_asset_path or descriptor.static_asset_path
 
-    # Wrap the output display in a single div to allow for the XModule
-    # javascript to be bound correctly
-    if wrap_xmodule_display is True:
+        # Build a list of wrapping functions that will be applied in order
+        # to the Fragment content coming out of the xblocks that are about to be rendered.
+        block_wrappers = list(self.leading_block_wrappers)
+        # Rewrite urls beginning in /static to point to course-specific content
         block_wrappers.append(partial(
-            wrap_xblock,
-            'LmsRuntime',
-            extra_data={'course-id': course_id.to_deprecated_string()},
-            usage_id_serializer=lambda usage_id: quote_slashes(usage_id.to_deprecated_string()),
-            request_token=request_token,
+            replace_static_urls,
+            data_directory,
+            course_id=self.course_id,
+            static_asset_path=static_asset_path
         ))
+        block_wrappers.extend(self.trailing_block_wrappers)
+        if settings.FEATURES.get('DISPLAY_DEBUG_INFO_TO_STAFF'):
+            staff_markup_wrapper = self.staff_markup_wrapper(descriptor)
+            if staff_markup_wrapper is not None:
+                block_wrappers.append(staff_markup_wrapper)
+
+        # These modules store data using the anonymous_student_id as a key.
+        # To prevent loss of data, we will continue to provide old modules with
+        # the per-student anonymized id (as we have in the past),
+        # while giving selected modules a per-course anonymized id.
+        # As we have the time to manually test more modules, we can add to the list
+        # of modules that get the per-course anonymized id.
+        is_pure_xblock = isinstance(descriptor, XBlock) and not isinstance(descriptor, XModuleDescriptor)
+        module_class = getattr(descriptor, 'module_class', None)
+        is_lti_module = not is_pure_xblock and issubclass(module_class, LTIModule)
+        if is_pure_xblock or is_lti_module:
+            anonymous_student_id = self.anonymous_course_student_id
+        else:
+            anonymous_student_id = self.anonymous_student_id
+
+        field_data = LmsFieldData(descriptor._field_data, self.student_data)  # pylint: disable=protected-access
+
+        user_is_staff = self.user_is_staff(descriptor)
+
+        services = dict(self.services(descriptor))
+        services['field-data'] = field_data
+
+        system = LmsModuleSystem(
+            track_function=self.track_function,
+            render_template=render_to_string,
+            static_url=settings.STATIC_URL,
+            xqueue=xqueue,
+            # TODO (cpennington): Figure out how to share info between systems
+            filestore=descriptor.runtime.resources_fs,
+            get_module=self.get_module,
+            user=self.user,
+            debug=settings.DEBUG,
+            hostname=settings.SITE_NAME,
+            # TODO (cpennington): This should be removed when all html from
+            # a module is coming through get_html and is therefore covered
+            # by the replace_static_urls code below
+            replace_urls=partial(
+                static_replace.replace_static_urls,
+                data_directory=data_directory,
+                course_id=self.course_id,
+                static_asset_path=static_asset_path,
+            ),
+            replace_course_urls=partial(
+                static_replace.replace_course_urls,
+                course_key=self.course_id
+            ),
+            replace_jump_to_id_urls=partial(
+                static_replace.replace_jump_to_id_urls,
+                course_id=self.course_id,
+                jump_to_id_base_url=self.jump_to_id_base_url
+            ),
+            node_path=settings.NODE_PATH,
+            publish=partial(self.publish, descriptor.location),
+            anonymous_student_id=anonymous_student_id,
+            course_id=self.course_id,
+            cache=cache,
+            can_execute_unsafe_code=partial(can_execute_unsafe_code, self.course_id),
+            get_python_lib_zip=partial(get_python_lib_zip, contentstore, self.course_id),
+            # TODO: When we merge the descriptor and module systems, we can stop reaching into the mixologist
+            # (cpennington)
+            mixins=descriptor.runtime.mixologist._mixins,  # pylint: disable=protected-access
+            wrappers=block_wrappers,
+            get_real_user=user_by_anonymous_id,
+            services=services,
+            get_user_role=partial(get_user_role, self.user, self.course_id),
+            descriptor_runtime=descriptor._runtime,  # pylint: disable=protected-access
+            rebind_noauth_module_to_user=self.rebind_noauth_module_to_user,
+            user_location=self.user_location,
+            request_token=self.request_token,
+        )
 
-    # TODO (cpennington): When modules are shared between courses, the static
-    # prefix is going to have to be specific to the module, not the directory
-    # that the xml was loaded from
+        # pass position specified in URL to module through ModuleSystem
+        system.set('position', self.parsed_position)
 
-    # Rewrite urls beginning in /static to point to course-specific content
-    block_wrappers.append(partial(
-        replace_static_urls,
-        getattr(descriptor, 'data_dir', None),
-        course_id=course_id,
-        static_asset_path=static_asset_path or descriptor.static_asset_path
-    ))
-
-    # Allow URLs of the form '/course/' refer to the root of multicourse directory
-    #   hierarchy of this course
-    block_wrappers.append(partial(replace_course_urls, course_id))
-
-    # this will rewrite intra-courseware links (/jump_to_id/<id>). This format
-    # is an improvement over the /course/... format for studio authored courses,
-    # because it is agnostic to course-hierarchy.
-    # NOTE: module_id is empty string here. The 'module_id' will get assigned in the replacement
-    # function, we just need to specify something to get the reverse() to work.
-    block_wrappers.append(partial(
-        replace_jump_to_id_urls,
-        course_id,
-        reverse('jump_to_id', kwargs={'course_id': course_id.to_deprecated_string(), 'module_id': ''}),
-    ))
-
-    if settings.FEATURES.get('DISPLAY_DEBUG_INFO_TO_STAFF'):
-        if is_masquerading_as_specific_student(user, course_id):
-            # When masquerading as a specific student, we want to show the debug button
-            # unconditionally to enable resetting the state of the student we are masquerading as.
-            # We already know the user has staff access when masquerading is active.
-            staff_access = True
-            # To figure out whether the user has instructor access, we temporarily remove the
-            # masquerade_settings from the real_user.  With the masquerading settings in place,
-            # the result would always be "False".
-            masquerade_settings = user.real_user.masquerade_settings
-            del user.real_user.masquerade_settings
-            instructor_access = bool(has_access(user.real_user, 'instructor', descriptor, course_id))
-            user.real_user.masquerade_settings = masquerade_settings
+        system.set(u'user_is_staff', user_is_staff)
+        system.set(u'user_is_admin', self.user_is_admin)
+        system.set(u'user_is_beta_tester', self.user_is_beta_tester)
+        system.set(u'days_early_for_beta', descriptor.days_early_for_beta)
+
+        # make an ErrorDescriptor -- assuming that the descriptor's system is ok
+        if user_is_staff:
+            system.error_descriptor_class = ErrorDescriptor
         else:
-            staff_access = has_access(user, 'staff', descriptor, course_id)
-            instructor_access = bool(has_access(user, 'instructor', descriptor, course_id))
-        if staff_access:
-            block_wrappers.append(partial(add_staff_markup, user, instructor_access, disable_staff_debug_info))
-
-    # These modules store data using the anonymous_student_id as a key.
-    # To prevent loss of data, we will continue to provide old modules with
-    # the per-student anonymized id (as we have in the past),
-    # while giving selected modules a per-course anonymized id.
-    # As we have the time to manually test more modules, we can add to the list
-    # of modules that get the per-course anonymized id.
-    is_pure_xblock = isinstance(descriptor, XBlock) and not isinstance(descriptor, XModuleDescriptor)
-    module_class = getattr(descriptor, 'module_class', None)
-    is_lti_module = not is_pure_xblock and issubclass(module_class, LTIModule)
-    if is_pure_xblock or is_lti_module:
-        anonymous_student_id = anonymous_id_for_user(user, course_id)
-    else:
-        anonymous_student_id = anonymous_id_for_user(user, None)
-
-    field_data = LmsFieldData(descriptor._field_data, student_data)  # pylint: disable=protected-access
-
-    user_is_staff = bool(has_access(user, u'staff', descriptor.location, course_id))
-
-    system = LmsModuleSystem(
-        track_function=track_function,
-        render_template=render_to_string,
-        static_url=settings.STATIC_URL,
-        xqueue=xqueue,
-        # TODO (cpennington): Figure out how to share info between systems
-        filestore=descriptor.runtime.resources_fs,
-        get_module=inner_get_module,
-        user=user,
-        debug=settings.DEBUG,
-        hostname=settings.SITE_NAME,
-        # TODO (cpennington): This should be removed when all html from
-        # a module is coming through get_html and is therefore covered
-        # by the replace_static_urls code below
-        replace_urls=partial(
-            static_replace.replace_static_urls,
-            data_directory=getattr(descriptor, 'data_dir', None),
-            course_id=course_id,
-            static_asset_path=static_asset_path or descriptor.static_asset_path,
-        ),
-        replace_course_urls=partial(
-            static_replace.replace_course_urls,
-            course_key=course_id
-        ),
-        replace_jump_to_id_urls=partial(
-            static_replace.replace_jump_to_id_urls,
-            course_id=course_id,
-            jump_to_id_base_url=reverse('jump_to_id', kwargs={'course_id': course_id.to_deprecated_string(), 'module_id': ''})
-        ),
-        node_path=settings.NODE_PATH,
-        publish=publish,
-        anonymous_student_id=anonymous_student_id,
-        course_id=course_id,
-        cache=cache,
-        can_execute_unsafe_code=(lambda: can_execute_unsafe_code(course_id)),
-        get_python_lib_zip=(lambda: get_python_lib_zip(contentstore, course_id)),
-        # TODO: When we merge the descriptor and module systems, we can stop reaching into the mixologist (cpennington)
-        mixins=descriptor.runtime.mixologist._mixins,  # pylint: disable=protected-access
-        wrappers=block_wrappers,
-        get_real_user=user_by_anonymous_id,
-        services={
-            'fs': FSService(),
-            'field-data': field_data,
-            'user': DjangoXBlockUserService(user, user_is_staff=user_is_staff),
-            "reverification": ReverificationService(),
-            'proctoring': ProctoringService(),
-            'credit': CreditService(),
-            'bookmarks': BookmarksService(user=user),
-        },
-        get_user_role=lambda: get_user_role(user, course_id),
-        descriptor_runtime=descriptor._runtime,  # pylint: disable=protected-access
-        rebind_noauth_module_to_user=rebind_noauth_module_to_user,
-        user_location=user_location,
-        request_token=request_token,
-    )
+            system.error_descriptor_class = NonStaffErrorDescriptor
 
-    # pass position specified in URL to module through ModuleSystem
-    if position is not None:
-        try:
-            position = int(position)
-        except (ValueError, TypeError):
-            log.exception('Non-integer %r passed as position.', position)
-            position = None
+        return system, field_data
 
-    system.set('position', position)
+    def get_module(self, descriptor):
+        """
+        Binds `descriptor` to the user, and returns it, or None if the user doesn't have access to it.  The module
+        systems of its children are built by this factory too.
+        """
+        (system, student_data) = self.get_module_system(descriptor)
 
-    system.set(u'user_is_staff', user_is_staff)
-    system.set(u'user_is_admin', bool(has_access(user, u'staff', 'global')))
-    system.set(u'user_is_beta_tester', CourseBetaTesterRole(course_id).has_user(user))
-    system.set(u'days_early_for_beta', descriptor.days_early_for_beta)
+        descriptor.bind_for_student(
+            system,
+            self.user.id,
+            [
+                partial(OverrideFieldData.wrap, self.user, self.course),
+                partial(LmsFieldData, student_data=student_data),
+            ],
+        )
+
+        descriptor.scope_ids = descriptor.scope_ids._replace(user_id=self.user.id)
 
-    # make an ErrorDescriptor -- assuming that the descriptor's system is ok
-    if has_access(user, u'staff', descriptor.location, course_id):
-        system.error_descriptor_class = ErrorDescriptor
-    else:
-        system.error_descriptor_class = NonStaffErrorDescriptor
+        # Do not check access when it's a noauth request.
+        # Not that the access check needs to happen after the descriptor is bound
+        # for the student, since there may be field override data for the student
+        # that affects xblock visibility.
+        user_needs_access_check = getattr(self.user, 'known', True) and not isinstance(self.user, SystemUser)
+        if user_needs_access_check:
+            if not has_access(self.user, 'load', descriptor, self.course_id):
+                return None
+        return descriptor
 
-    return system, field_data
+
+def get_module_system_for_user(user, student_data,
+                               # Arguments preceding this comment have user binding, those following don't
+                               descriptor, course_id, track_function, xqueue_callback_url_prefix,
+                               request_token, position=None, wrap_xmodule_display=True, grade_bucket_type=None,
+                               static_asset_path='', user_location=None, disable_staff_debug_info=False,
+                               course=None):
+    """
+    Helper function that returns a module system and student_data bound to a user and a descriptor.
+
+    The purpose of this function is to factor out everywhere a user is implicitly bound when creating a module,
+    to allow an existing module to be re-bound to a user.  The user bindings are made by a ModuleSystemFactory,
+    which also builds the module systems of the descriptor's children.
+
+    The arguments fall into two categories: those that have explicit or implicit user binding, which are user
+    and student_data, and those don't and are just present so that ModuleSystem can be instantiated, which
+    are all the other arguments.  Ultimately, this isn't too different than how get_module_for_descriptor_internal
+    was before refactoring.
+
+    Arguments:
+        see arguments for get_module()
+        request_token (str): A token unique to the request use by xblock initialization
+
+    Returns:
+        (LmsModuleSystem, KvsFieldData):  (module system, student_data) bound to, primarily, the user and descriptor
+    """
+    factory = ModuleSystemFactory(
+        user=user,
+        student_data=student_data,
+        course_id=course_id,
+        track_function=track_function,
+        xqueue_callback_url_prefix=xqueue_callback_url_prefix,
+        request_token=request_token,
+        position=position,
+        wrap_xmodule_display=wrap_xmodule_display,
+        grade_bucket_type=grade_bucket_type,
+        static_asset_path=static_asset_path,
+        user_location=user_location,
+        disable_staff_debug_info=disable_staff_debug_info,
+        course=course
+    )
+    return factory.get_module_system(descriptor)
 
 
 # TODO: Find all the places that this method is called and figure out how to
@@ -804,44 +960,22 @@ def get_module_for_descriptor_internal(user, descriptor, student_data, course_id
     Arguments:
         request_token (str): A unique token for this request, used to isolate xblock rendering
     """
-
-    (system, student_data) = get_module_system_for_user(
+    factory = ModuleSystemFactory(
         user=user,
         student_data=student_data,  # These have implicit user bindings, the rest of args are considered not to
-        descriptor=descriptor,
         course_id=course_id,
         track_function=track_function,
         xqueue_callback_url_prefix=xqueue_callback_url_prefix,
+        request_token=request_token,
         position=position,
         wrap_xmodule_display=wrap_xmodule_display,
         grade_bucket_type=grade_bucket_type,
         static_asset_path=static_asset_path,
         user_location=user_location,
-        request_token=request_token,
         disable_staff_debug_info=disable_staff_debug_info,
         course=course
     )
-
-    descriptor.bind_for_student(
-        system,
-        user.id,
-        [
-            partial(OverrideFieldData.wrap, user, course),
-            partial(LmsFieldData, student_data=student_data),
-        ],
-    )
-
-    descriptor.scope_ids = descriptor.scope_ids._replace(user_id=user.id)
-
-    # Do not check access when it's a noauth request.
-    # Not that the access check needs to happen after the descriptor is bound
-    # for the student, since there may be field override data for the student
-    # that affects xblock visibility.
-    user_needs_access_check = getattr(user, 'known', True) and not isinstance(user, SystemUser)
-    if user_needs_access_check:
-        if not has_access(user, 'load', descriptor, course_id):
-            return None
-    return descriptor
+    return factory.get_module(descriptor)
 
 
 def load_single_xblock(request, user_id, course_id, usage_key_string, course=None):
@@ -1043,7 +1177,8 @@ def _invoke_xblock_handler(request, course_id, usage_id, handler, suffix, course
     newrelic.agent.add_custom_parameter('course_id', unicode(course_key))
     newrelic.agent.add_custom_parameter('org', unicode(course_key.org))
 
-    with modulestore().bulk_operations(course_key):
+    # The fields set by the handler are written when it returns.
+    with modulestore().bulk_operations(course_key), bulk_writes():
         instance, tracking_context = get_module_by_usage_id(request, course_id, usage_id, course=course)
 
         # Name the transaction so that we can view XBlock handlers separately in
@@ -0,0 +1,102 @@
+"""
+Tests for grading students in batches.
+"""
+from mock import call, patch
+from nose.plugins.attrib import attr
+
+from courseware import batch_grades
+from courseware.batch_grades import BatchGrader, iterate_batch_grades_for
+from courseware.grades import iterate_grades_for
+from courseware.model_data import set_score
+from student.models import CourseEnrollment
+from student.tests.factories import UserFactory
+from xmodule.modulestore.tests.factories import CourseFactory, ItemFactory
+from xmodule.modulestore.tests.django_utils import SharedModuleStoreTestCase
+
+
+@attr('shard_1')
+class TestBatchGrades(SharedModuleStoreTestCase):
+    """
+    Tests that students graded in batches get the same grades as
+    students graded separately.
+    """
+    @classmethod
+    def setUpClass(cls):
+        super(TestBatchGrades, cls).setUpClass()
+        cls.course = CourseFactory.create()
+        chapter = ItemFactory.create(category='chapter', parent=cls.course)
+        cls.problems = []
+        for section_format in ['Homework', 'Homework', 'Homework', 'Midterm Exam']:
+            sequential = ItemFactory.create(category='sequential', parent=chapter, graded=True, format=section_format)
+            vertical = ItemFactory.create(category='vertical', parent=sequential)
+            for _ in xrange(2):
+                cls.problems.append(ItemFactory.create(category='problem', parent=vertical))
+
+    def setUp(self):
+        super(TestBatchGrades, self).setUp()
+        self.students = [UserFactory.create() for _ in xrange(5)]
+        for student in self.students:
+            CourseEnrollment.enroll(student, self.course.id)
+
+        # The first student hasn't attempted any problem, so no max score
+        # needs to be known to grade them.
+        for student_index, student in enumerate(self.students[1:]):
+            for problem_index, problem in enumerate(self.problems):
+                set_score(student.id, problem.location, (student_index + problem_index) % 3, 2)
+
+    def assert_same_grades(self, batch_results):
+        """
+        Asserts that the given results of iterate_batch_grades_for match
+        the results of iterate_grades_for.
+        """
+        expected_results = list(iterate_grades_for(self.course.id, self.students))
+        self.assertEqual(len(batch_results), len(expected_results))
+        for (student, gradeset, err_msg), (expected_student, expected_gradeset, __) in zip(
+                batch_results, expected_results
+        ):
+            self.assertEqual(student, expected_student)
+            self.assertEqual(err_msg, "")
+            self.assertEqual(gradeset['percent'], expected_gradeset['percent'])
+            self.assertEqual(gradeset['grade'], expected_gradeset['grade'])
+            self.assertEqual(
+                [(section['label'], section['percent']) for section in gradeset['section_breakdown']],
+                [(section['label'], section['percent']) for section in expected_gradeset['section_breakdown']],
+            )
+
+    def test_same_grades(self):
+        with patch.object(batch_grades, 'iterate_grades_for', wraps=iterate_grades_for) as mock_iterate_grades_for:
+            batch_results = list(iterate_batch_grades_for(self.course, self.students, batch_size=2))
+        self.assertFalse(mock_iterate_grades_for.called)
+        self.assertEqual(
+            [type(gradeset['percent']) for __, gradeset, __ in batch_results],
+            [float] * len(self.students),
+        )
+        self.assert_same_grades(batch_results)
+
+    def test_grades_updated_signal(self):
+        with patch.object(batch_grades, 'send_grades_updated') as mock_send_grades_updated:
+            batch_results = list(iterate_batch_grades_for(self.course, self.students, batch_size=2))
+        self.assertEqual(
+            mock_send_grades_updated.call_args_list,
+            [call(student, self.course, gradeset) for student, gradeset, __ in batch_results],
+        )
+
+    def test_unknown_max_score(self):
+        # The max score of a problem that a student has state for but no
+        # score isn't known without loading the problem.
+        set_score(self.students[0].id, self.problems[0].location, None, None)
+        with patch.object(batch_grades, 'iterate_grades_for', wraps=iterate_grades_for) as mock_iterate_grades_for:
+            batch_results = list(iterate_batch_grades_for(self.course.id, self.students))
+        mock_iterate_grades_for.assert_called_once_with(self.course, [self.students[0]])
+        self.assert_same_grades(batch_results)
+
+    def test_course_not_batch_gradable(self):
+        with patch.object(BatchGrader, '_is_same_for_all_students', return_value=False):
+            self.assertIsNone(BatchGrader.create_for_course(self.course))
+            with patch.object(batch_grades, 'iterate_grades_for', wraps=iterate_grades_for) as mock_iterate_grades_for:
+                batch_results = list(iterate_batch_grades_for(self.course, self.students))
+        mock_iterate_grades_for.assert_called_once_with(self.course, self.students)
+        self.assert_same_grades(batch_results)
+
+    def test_empty_student_list(self):
+        self.assertEqual(list(iterate_batch_grades_for(self.course, [])), [])
@@ -1,6 +1,9 @@
 """
 Test grade calculation.
 """
+from datetime import timedelta
+
+from django.db import IntegrityError
 from django.http import Http404
 from django.test import TestCase
 from django.test.client import RequestFactory
@@ -10,6 +13,7 @@ from nose.plugins.attrib import attr
 from opaque_keys.edx.locations import SlashSeparatedCourseKey
 from opaque_keys.edx.locator import CourseLocator, BlockUsageLocator
 
+from courseware import grades
 from courseware.grades import (
     field_data_cache_for_grading,
     grade,
@@ -20,11 +24,13 @@ from courseware.grades import (
 )
 from courseware.module_render import get_module
 from courseware.model_data import FieldDataCache, set_score
+from courseware.models import PersistentCourseGrade, PersistentSubsectionGrade, SCORE_CHANGED
 from courseware.tests.helpers import (
     LoginEnrollmentTestCase,
     get_request_for_user
 )
 from capa.tests.response_xml_factory import MultipleChoiceResponseXMLFactory
+from openedx.core.djangoapps.course_groups.tests.helpers import CohortFactory
 from student.tests.factories import UserFactory
 from student.models import CourseEnrollment
 from xmodule.modulestore.tests.factories import CourseFactory, ItemFactory
@@ -194,6 +200,122 @@ class TestMaxScoresCache(SharedModuleStoreTestCase):
         self.assertEqual(max_scores_cache.num_cached_from_remote(), 1)
 
 
+@attr('shard_1')
+@patch.dict('django.conf.settings.FEATURES', {'ENABLE_PERSISTENT_GRADES': True})
+class TestPersistedGrades(SharedModuleStoreTestCase):
+    """
+    Tests for reading and incrementally updating persisted grades.
+    """
+    @classmethod
+    def setUpClass(cls):
+        super(TestPersistedGrades, cls).setUpClass()
+        cls.course = CourseFactory.create()
+        chapter = ItemFactory.create(category='chapter', parent=cls.course)
+        cls.sequentials = []
+        cls.problems = []
+        for _ in xrange(2):
+            sequential = ItemFactory.create(category='sequential', parent=chapter, graded=True)
+            vertical = ItemFactory.create(category='vertical', parent=sequential)
+            cls.sequentials.append(sequential)
+            cls.problems.append(ItemFactory.create(category='problem', parent=vertical))
+
+    def setUp(self):
+        super(TestPersistedGrades, self).setUp()
+        self.student = UserFactory.create()
+        CourseEnrollment.enroll(self.student, self.course.id)
+        self.request = get_request_for_user(self.student)
+        for problem in self.problems:
+            set_score(self.student.id, problem.location, 1, 1)
+
+    def grade_and_count_scored(self):
+        """
+        Grades the student and returns the grade summary along with the
+        number of problems that were scored to compute it.
+        """
+        with patch('courseware.grades.get_score', wraps=grades.get_score) as mock_get_score:
+            grade_summary = grade(self.student, self.request, self.course)
+        return grade_summary, mock_get_score.call_count
+
+    def test_grades_persisted(self):
+        grade_summary, num_scored = self.grade_and_count_scored()
+        self.assertEqual(num_scored, 2)
+        self.assertEqual(
+            PersistentSubsectionGrade.objects.filter(user=self.student, course_id=self.course.id).count(), 2
+        )
+        self.assertTrue(PersistentCourseGrade.objects.filter(user=self.student, course_id=self.course.id).exists())
+
+        persisted_grade_summary, num_scored = self.grade_and_count_scored()
+        self.assertEqual(num_scored, 0)
+        self.assertEqual(persisted_grade_summary['percent'], grade_summary['percent'])
+        self.assertEqual(persisted_grade_summary['grade'], grade_summary['grade'])
+
+    def test_changed_subsection_regraded(self):
+        grade_summary, __ = self.grade_and_count_scored()
+
+        set_score(self.student.id, self.problems[0].location, 0, 1)
+        PersistentSubsectionGrade.invalidate(self.student.id, self.course.id, self.problems[0].location)
+        self.assertFalse(PersistentCourseGrade.objects.filter(user=self.student, course_id=self.course.id).exists())
+
+        # Only the subsection containing the changed problem is regraded.
+        regraded_summary, num_scored = self.grade_and_count_scored()
+        self.assertEqual(num_scored, 1)
+        self.assertLess(regraded_summary['percent'], grade_summary['percent'])
+        self.assertTrue(PersistentCourseGrade.objects.filter(user=self.student, course_id=self.course.id).exists())
+
+    def test_raw_scores_not_persisted(self):
+        self.grade_and_count_scored()
+        with patch('courseware.grades.get_score', wraps=grades.get_score) as mock_get_score:
+            grade_summary = grade(self.student, self.request, self.course, keep_raw_scores=True)
+        self.assertEqual(mock_get_score.call_count, 2)
+        self.assertEqual(len(grade_summary['raw_scores']), 2)
+
+    def test_score_changed_signal_regrades(self):
+        grade_summary, __ = self.grade_and_count_scored()
+
+        set_score(self.student.id, self.problems[0].location, 0, 1)
+        SCORE_CHANGED.send(
+            sender=None,
+            points_possible=1,
+            points_earned=0,
+            user_id=self.student.id,
+            course_id=unicode(self.course.id),
+            usage_id=unicode(self.problems[0].location),
+        )
+        self.assertFalse(PersistentCourseGrade.objects.filter(user=self.student, course_id=self.course.id).exists())
+
+        regraded_summary, num_scored = self.grade_and_count_scored()
+        self.assertEqual(num_scored, 1)
+        self.assertLess(regraded_summary['percent'], grade_summary['percent'])
+
+    def test_cohort_membership_change_regrades(self):
+        self.grade_and_count_scored()
+
+        cohort = CohortFactory.create(course_id=self.course.id, users=[self.student])
+        self.assertFalse(PersistentSubsectionGrade.objects.filter(user=self.student).exists())
+        self.assertFalse(PersistentCourseGrade.objects.filter(user=self.student).exists())
+
+        __, num_scored = self.grade_and_count_scored()
+        self.assertEqual(num_scored, 2)
+
+        cohort.users.remove(self.student)
+        self.assertFalse(PersistentSubsectionGrade.objects.filter(user=self.student).exists())
+
+    def test_release_changes_course_version(self):
+        before_release = grades.PersistedGrades._get_course_version(  # pylint: disable=protected-access
+            self.course, self.course.start - timedelta(days=1)
+        )
+        after_release = grades.PersistedGrades._get_course_version(  # pylint: disable=protected-access
+            self.course, self.course.start + timedelta(days=1)
+        )
+        self.assertNotEqual(before_release, after_release)
+
+    def test_concurrently_persisted_grades(self):
+        with patch.object(PersistentSubsectionGrade.objects, 'bulk_create', side_effect=IntegrityError):
+            __, num_scored = self.grade_and_count_scored()
+        self.assertEqual(num_scored, 2)
+        self.assertFalse(PersistentCourseGrade.objects.filter(user=self.student, course_id=self.course.id).exists())
+
+
 class TestFieldDataCacheScorableLocations(SharedModuleStoreTestCase):
     """
     Make sure we can filter the locations we pull back student state for via
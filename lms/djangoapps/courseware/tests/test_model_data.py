@@ -1,14 +1,17 @@
 """
 Test for lms courseware app, module data (runtime data storage for XBlocks)
 """
+import copy
 import json
 from mock import Mock, patch
 from nose.plugins.attrib import attr
 from functools import partial
 
-from courseware.model_data import DjangoKeyValueStore, FieldDataCache, InvalidScopeError
-from courseware.models import StudentModule, XModuleUserStateSummaryField
-from courseware.models import XModuleStudentInfoField, XModuleStudentPrefsField
+from courseware.model_data import (
+    DjangoKeyValueStore, DjangoOrmFieldCache, FieldDataCache, InvalidScopeError, bulk_writes,
+)
+from courseware.models import StudentModule, StudentModuleStateCache, XModuleUserStateSummaryField
+from courseware.models import XModuleStudentInfoField, XModuleStudentPrefsField, chunks_by_size
 
 from student.tests.factories import UserFactory
 from courseware.tests.factories import StudentModuleFactory as cmfStudentModuleFactory, location, course_id
@@ -18,8 +21,11 @@ from courseware.tests.factories import StudentPrefsFactory, StudentInfoFactory
 from xblock.fields import Scope, BlockScope, ScopeIds
 from xblock.exceptions import KeyValueMultiSaveError
 from xblock.core import XBlock
+from django.conf import settings
+from django.core.cache import cache
 from django.test import TestCase
-from django.db import DatabaseError
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.db import DatabaseError, connection
 
 
 def mock_field(scope, name):
@@ -52,6 +58,22 @@ class StudentModuleFactory(cmfStudentModuleFactory):
     course_id = course_id
 
 
+CACHES_ENABLE_DEFAULT = copy.deepcopy(settings.CACHES)
+CACHES_ENABLE_DEFAULT['default']['BACKEND'] = 'django.core.cache.backends.locmem.LocMemCache'
+
+
+@attr('shard_1')
+class TestChunksBySize(TestCase):
+    """Tests of chunking the values written by a single query"""
+    def test_chunks_by_size(self):
+        values = ['a', 'bb', 'ccc', 'dddddd', 'e', 'f', 'g']
+        self.assertEquals(
+            list(chunks_by_size(values, 3, 5, len)),
+            [['a', 'bb'], ['ccc'], ['dddddd'], ['e', 'f', 'g']],
+        )
+        self.assertEquals(list(chunks_by_size([], 3, 5, len)), [])
+
+
 @attr('shard_1')
 class TestInvalidScopes(TestCase):
     def setUp(self):
@@ -226,6 +248,54 @@ class TestStudentModuleStorage(OtherUserFailureTestMixin, TestCase):
                 self.kvs.set_many(kv_dict)
         self.assertEquals(exception_context.exception.saved_field_names, [])
 
+    def test_bulk_writes(self):
+        "Test that fields set within bulk_writes are written together when it exits"
+        with bulk_writes():
+            with self.assertNumQueries(0):
+                self.kvs.set(user_state_key('a_field'), 'new_value')
+                self.kvs.set(user_state_key('not_a_field'), 'other_value')
+                self.assertEquals('new_value', self.kvs.get(user_state_key('a_field')))
+                self.assertEquals('b_value', self.kvs.get(user_state_key('b_field')))
+            self.assertEquals(
+                {'b_field': 'b_value', 'a_field': 'a_value'}, json.loads(StudentModule.objects.all()[0].state)
+            )
+
+        self.assertEquals(
+            {'b_field': 'b_value', 'a_field': 'new_value', 'not_a_field': 'other_value'},
+            json.loads(StudentModule.objects.all()[0].state)
+        )
+
+    def test_bulk_writes_failure(self):
+        "Test that fields which can't be written within bulk_writes fail when it exits"
+        with patch('django.db.models.Model.save', side_effect=DatabaseError):
+            with self.assertRaises(KeyValueMultiSaveError) as exception_context:
+                with bulk_writes():
+                    self.kvs.set(user_state_key('a_field'), 'new_value')
+        self.assertEquals(exception_context.exception.saved_field_names, [])
+
+    def test_bulk_writes_partial_failure(self):
+        "Test that the fields of every FieldDataCache are written when bulk_writes exits, even if some fail"
+        other_kvs = DjangoKeyValueStore(FieldDataCache(
+            [mock_descriptor([mock_field(Scope.user_state, 'b_field')])], course_id, self.user
+        ))
+        with patch.object(self.field_data_cache, 'flush', side_effect=KeyValueMultiSaveError([])):
+            with self.assertRaises(KeyValueMultiSaveError) as exception_context:
+                with bulk_writes():
+                    self.kvs.set(user_state_key('a_field'), 'new_value')
+                    other_kvs.set(user_state_key('b_field'), 'other_value')
+        self.assertEquals(exception_context.exception.saved_field_names, ['b_field'])
+        self.assertEquals(
+            {'b_field': 'other_value', 'a_field': 'a_value'}, json.loads(StudentModule.objects.all()[0].state)
+        )
+
+    def test_bulk_writes_failure_within_exception(self):
+        "Test that fields which can't be written don't mask an exception raised within bulk_writes"
+        with patch('django.db.models.Model.save', side_effect=DatabaseError):
+            with self.assertRaises(ValueError):
+                with bulk_writes():
+                    self.kvs.set(user_state_key('a_field'), 'new_value')
+                    raise ValueError()
+
 
 @attr('shard_1')
 class TestMissingStudentModule(TestCase):
@@ -272,6 +342,24 @@ class TestMissingStudentModule(TestCase):
         self.assertEquals(location('usage_id').replace(run=None), student_module.module_state_key)
         self.assertEquals(course_id, student_module.course_id)
 
+    def test_set_fields_in_missing_student_modules(self):
+        "Test that setting fields of several missing StudentModules creates them together"
+        other_user_state_key = partial(DjangoKeyValueStore.Key, Scope.user_state, 1, location('other_usage_id'))
+
+        # The StudentModules are read, inserted in bulk, and read again, and the
+        # history of each problem is written.
+        with self.assertNumQueries(5, using='default'):
+            with self.assertNumQueries(2, using='student_module_history'):
+                self.kvs.set_many({
+                    user_state_key('a_field'): 'a_value',
+                    other_user_state_key('a_field'): 'other_value',
+                })
+
+        self.assertEquals(
+            {'a_value', 'other_value'},
+            {json.loads(student_module.state)['a_field'] for student_module in StudentModule.objects.all()}
+        )
+
     def test_delete_field_from_missing_student_module(self):
         "Test that deleting a field from a missing StudentModule raises a KeyError"
         with self.assertNumQueries(0):
@@ -283,6 +371,77 @@ class TestMissingStudentModule(TestCase):
             self.assertFalse(self.kvs.has(user_state_key('a_field')))
 
 
+@attr('shard_1')
+@override_settings(CACHES=CACHES_ENABLE_DEFAULT, STUDENT_MODULE_STATE_CACHE_TIMEOUT=60)
+class TestStudentModuleStateCache(TestCase):
+    """Tests for the cache of user_state between FieldDataCaches"""
+    # Tell Django to clean out all databases, not just default
+    multi_db = True
+
+    def setUp(self):
+        super(TestStudentModuleStateCache, self).setUp()
+        cache.clear()
+        student_module = StudentModuleFactory(state=json.dumps({'a_field': 'a_value'}))
+        self.user = student_module.student
+        self.assertEqual(self.user.id, 1)   # check our assumption hard-coded in the key functions above.
+
+    def make_kvs(self):
+        """
+        Returns a DjangoKeyValueStore of a new FieldDataCache, as made by a new request.
+        """
+        field_data_cache = FieldDataCache(
+            [mock_descriptor([mock_field(Scope.user_state, 'a_field')])], course_id, self.user
+        )
+        return DjangoKeyValueStore(field_data_cache)
+
+    def test_cached_between_field_data_caches(self):
+        "Test that the user_state read by a FieldDataCache is reused by the next ones"
+        with self.assertNumQueries(1):
+            self.make_kvs()
+        with self.assertNumQueries(0):
+            kvs = self.make_kvs()
+        self.assertEquals('a_value', kvs.get(user_state_key('a_field')))
+
+    @override_settings(STUDENT_MODULE_STATE_CACHE_TIMEOUT=0)
+    def test_disabled(self):
+        "Test that FieldDataCaches read the user_state when the cache is disabled"
+        for __ in range(2):
+            with self.assertNumQueries(1):
+                self.make_kvs()
+
+    def test_set_invalidates(self):
+        "Test that setting a field invalidates the cached user_state"
+        self.make_kvs().set(user_state_key('a_field'), 'new_value')
+        with self.assertNumQueries(1):
+            kvs = self.make_kvs()
+        self.assertEquals('new_value', kvs.get(user_state_key('a_field')))
+
+    def test_delete_invalidates(self):
+        "Test that deleting a field invalidates the cached user_state"
+        self.make_kvs().delete(user_state_key('a_field'))
+        with self.assertNumQueries(1):
+            kvs = self.make_kvs()
+        self.assertRaises(KeyError, kvs.get, user_state_key('a_field'))
+
+    def test_too_big_not_cached(self):
+        "Test that user_state too big to cache is read by every FieldDataCache"
+        with patch.object(StudentModuleStateCache, 'MAX_SIZE', 10):
+            for __ in range(2):
+                with self.assertNumQueries(1):
+                    kvs = self.make_kvs()
+        self.assertEquals('a_value', kvs.get(user_state_key('a_field')))
+
+    def test_missing_student_module_cached(self):
+        "Test that a missing StudentModule is cached, and that deleting a StudentModule invalidates the cache"
+        self.make_kvs()
+        StudentModule.objects.all().delete()
+        with self.assertNumQueries(1):
+            self.make_kvs()
+        with self.assertNumQueries(0):
+            kvs = self.make_kvs()
+        self.assertRaises(KeyError, kvs.get, user_state_key('a_field'))
+
+
 @attr('shard_1')
 class StorageTestBase(object):
     """
@@ -392,12 +551,57 @@ class StorageTestBase(object):
             with self.assertNumQueries(1):
                 self.kvs.set(key, 'test value')
 
-        with patch('django.db.models.Model.save', side_effect=[None, DatabaseError]):
+        kv_dict[self.key_factory('missing_field')] = 'new value'
+        with patch('django.db.models.query.QuerySet.update', side_effect=DatabaseError):
             with self.assertRaises(KeyValueMultiSaveError) as exception_context:
                 self.kvs.set_many(kv_dict)
 
+        # The new field is inserted before the existing fields are updated.
         exception = exception_context.exception
-        self.assertEquals(exception.saved_field_names, ['existing_field', 'other_existing_field'])
+        self.assertEquals(exception.saved_field_names, ['missing_field'])
+
+    def test_set_many_large_values(self):
+        """Test that existing fields are updated by several queries when their values add up to too much"""
+        kv_dict = self.construct_kv_dict()
+        with patch.object(DjangoOrmFieldCache, 'UPDATE_CHUNK_MAX_BYTES', len(json.dumps('newer value'))):
+            with CaptureQueriesContext(connection) as queries:
+                self.kvs.set_many(kv_dict)
+        updates = [query for query in queries.captured_queries if query['sql'].startswith('UPDATE')]
+        self.assertEquals(len(updates), len(kv_dict))
+        for key in kv_dict:
+            self.assertEquals(self.kvs.get(key), kv_dict[key])
+
+    def test_set_many_missing_fields(self):
+        """Test that setting many new fields at the same time inserts them together"""
+        kv_dict = {self.key_factory('missing_field'): 'new value', self.key_factory('other_missing_field'): 'newer'}
+
+        # The rows are inserted by a single query, and read again to find their ids
+        with self.assertNumQueries(2):
+            self.kvs.set_many(kv_dict)
+        self.assertEquals(3, self.storage_class.objects.all().count())
+
+        with self.assertNumQueries(1):
+            self.kvs.set_many({key: 'newest' for key in kv_dict})
+        with self.assertNumQueries(1):
+            self.kvs.delete(self.key_factory('missing_field'))
+        self.assertEquals('newest', json.loads(self.storage_class.objects.get(field_name='other_missing_field').value))
+        self.assertEquals(2, self.storage_class.objects.all().count())
+
+    def test_bulk_writes(self):
+        """Test that fields set within bulk_writes are written together when it exits"""
+        with bulk_writes():
+            with self.assertNumQueries(0):
+                self.kvs.set(self.key_factory('existing_field'), 'new value')
+                self.kvs.set(self.key_factory('other_existing_field'), 'newer value')
+                self.assertEquals('new value', self.kvs.get(self.key_factory('existing_field')))
+            self.assertEquals(
+                'old_value', json.loads(self.storage_class.objects.get(field_name='existing_field').value)
+            )
+
+        self.assertEquals('new value', json.loads(self.storage_class.objects.get(field_name='existing_field').value))
+        self.assertEquals(
+            'newer value', json.loads(self.storage_class.objects.get(field_name='other_existing_field').value)
+        )
 
 
 class TestUserStateSummaryStorage(StorageTestBase, TestCase):
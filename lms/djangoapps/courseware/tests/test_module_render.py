@@ -2033,6 +2033,63 @@ class LMSXBlockServiceBindingTest(SharedModuleStoreTestCase):
         self.assertEqual(runtime.days_early_for_beta, 5)
 
 
+@attr('shard_1')
+class TestModuleSystemFactory(SharedModuleStoreTestCase):
+    """
+    Tests that the module systems of the children of a module share the parts bound to the user.
+    """
+    @classmethod
+    def setUpClass(cls):
+        super(TestModuleSystemFactory, cls).setUpClass()
+        cls.course = CourseFactory.create()
+        cls.vertical = ItemFactory.create(category='vertical', parent=cls.course)
+        cls.children = [
+            ItemFactory.create(category='html', parent=cls.vertical, data='<a href="/static/{}.png"/>'.format(index))
+            for index in range(5)
+        ]
+
+    def setUp(self):
+        super(TestModuleSystemFactory, self).setUp()
+        self.user = UserFactory.create()
+
+    def get_vertical(self):
+        """
+        Returns the vertical, bound to the user.
+        """
+        field_data_cache = FieldDataCache.cache_for_descriptor_descendents(
+            self.course.id, self.user, modulestore().get_item(self.vertical.location)
+        )
+        return render.get_module(
+            self.user, Mock(name='request', user=self.user), self.vertical.location, field_data_cache,
+            course=self.course,
+        )
+
+    def test_children_share_user_bindings(self):
+        with patch('courseware.module_render.anonymous_id_for_user', wraps=anonymous_id_for_user) as mock_id:
+            with patch('courseware.module_render.CourseBetaTesterRole') as mock_role:
+                mock_role.return_value.has_user.return_value = False
+                vertical = self.get_vertical()
+                children = vertical.get_children()
+
+        self.assertEqual([child.location for child in children], [child.location for child in self.children])
+        self.assertEqual(mock_id.call_count, 1)
+        self.assertEqual(mock_role.return_value.has_user.call_count, 1)
+
+        user_service = vertical.runtime.service(vertical, 'user')
+        for child in children:
+            self.assertIs(child.runtime.service(child, 'user'), user_service)
+            self.assertIsNot(
+                child.runtime.service(child, 'field-data'), vertical.runtime.service(vertical, 'field-data')
+            )
+            self.assertEqual(child.runtime.anonymous_student_id, vertical.runtime.anonymous_student_id)
+
+    def test_children_bound_to_their_descriptor(self):
+        vertical = self.get_vertical()
+        for child in vertical.get_children():
+            self.assertEqual(child.runtime.days_early_for_beta, child.days_early_for_beta)
+            self.assertIn(child.location.block_id, child.runtime.xqueue['construct_callback']())
+
+
 class PureXBlockWithChildren(PureXBlock):
     """
     Pure XBlock with children to use in tests.
@@ -14,8 +14,14 @@ except ImportError:
 
 import dogstats_wrapper as dog_stats_api
 from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
+from django.db.models import Case, TextField, Value, When
+from django.db.models.signals import post_save
+from django.utils import timezone
 from xblock.fields import Scope
-from courseware.models import StudentModule, BaseStudentModuleHistory
+from courseware.models import (
+    StudentModule, StudentModuleStateCache, BaseStudentModuleHistory, chunks, chunks_by_size,
+)
 from edx_user_state_client.interface import XBlockUserStateClient, XBlockUserState
 
 
@@ -42,6 +48,13 @@ class DjangoXBlockUserStateClient(XBlockUserStateClient):
     # Use this sample rate for DataDog events.
     API_DATADOG_SAMPLE_RATE = 0.1
 
+    # The number of modules whose state is updated by each query of set_many.
+    UPDATE_CHUNK_SIZE = 500
+
+    # The total length of the states updated by each query of set_many, which
+    # keeps the queries well below MySQL's max_allowed_packet.
+    UPDATE_CHUNK_MAX_BYTES = 1024 * 1024
+
     class ServiceUnavailable(XBlockUserStateClient.ServiceUnavailable):
         """
         This error is raised if the service backing this client is currently unavailable.
@@ -95,6 +108,53 @@ class DjangoXBlockUserStateClient(XBlockUserStateClient):
                 usage_key = student_module.module_state_key.map_into_course(student_module.course_id)
                 yield (student_module, usage_key)
 
+    def _get_block_states(self, username, block_keys):
+        """
+        Yields the usage key, the serialized state and the modified date of
+        the existing :class:`~StudentModule`s for the supplied ``username`` and
+        ``block_keys``.
+
+        They're read from the :class:`~StudentModuleStateCache` when it's enabled
+        and the user is the one this client was created for, and only the
+        `StudentModule`s which aren't cached are loaded.
+
+        Arguments:
+            username (str): The name of the user to load `StudentModule`s for.
+            block_keys (list of :class:`~UsageKey`): The set of XBlocks to load data for.
+        """
+        if not (
+                StudentModuleStateCache.enabled() and
+                self.user is not None and
+                self.user.id is not None and
+                self.user.username == username
+        ):
+            for module, usage_key in self._get_student_modules(username, block_keys):
+                yield (usage_key, module.state, module.modified)
+            return
+
+        course_key_func = attrgetter('course_key')
+        by_course = itertools.groupby(
+            sorted(block_keys, key=course_key_func),
+            course_key_func,
+        )
+
+        for course_key, usage_keys in by_course:
+            usage_keys = list(usage_keys)
+            version, states = StudentModuleStateCache.get(self.user.id, course_key)
+
+            missing_keys = [usage_key for usage_key in usage_keys if unicode(usage_key) not in states]
+            if missing_keys:
+                # Blocks without a StudentModule are cached too, so that they aren't looked up again.
+                states.update((unicode(usage_key), None) for usage_key in missing_keys)
+                for module, usage_key in self._get_student_modules(username, missing_keys):
+                    states[unicode(usage_key)] = (module.state, module.modified)
+                StudentModuleStateCache.set(self.user.id, course_key, version, states)
+
+            for usage_key in usage_keys:
+                if states[unicode(usage_key)] is not None:
+                    module_state, modified = states[unicode(usage_key)]
+                    yield (usage_key, module_state, modified)
+
     def _ddog_increment(self, evt_time, evt_name):
         """
         DataDog increment method.
@@ -138,16 +198,15 @@ class DjangoXBlockUserStateClient(XBlockUserStateClient):
 
         self._ddog_histogram(evt_time, 'get_many.blks_requested', len(block_keys))
 
-        modules = self._get_student_modules(username, block_keys)
-        for module, usage_key in modules:
-            if module.state is None:
+        for usage_key, module_state, modified in self._get_block_states(username, block_keys):
+            if module_state is None:
                 self._ddog_increment(evt_time, 'get_many.empty_state')
                 continue
 
-            state = json.loads(module.state)
-            state_length += len(module.state)
+            state = json.loads(module_state)
+            state_length += len(module_state)
 
-            self._ddog_histogram(evt_time, 'get_many.block_size', len(module.state))
+            self._ddog_histogram(evt_time, 'get_many.block_size', len(module_state))
 
             # If the state is the empty dict, then it has been deleted, and so
             # conformant UserStateClients should treat it as if it doesn't exist.
@@ -161,7 +220,7 @@ class DjangoXBlockUserStateClient(XBlockUserStateClient):
                     if field in state
                 }
             block_count += 1
-            yield XBlockUserState(username, usage_key, state, module.modified, scope)
+            yield XBlockUserState(username, usage_key, state, modified, scope)
 
         # The rest of this method exists only to submit DataDog events.
         # Remove it once we're no longer interested in the data.
@@ -184,10 +243,11 @@ class DjangoXBlockUserStateClient(XBlockUserStateClient):
         if scope != Scope.user_state:
             raise ValueError("Only Scope.user_state is supported")
 
-        # We do a find_or_create for every block (rather than re-using field objects
+        # We read the modules of all the blocks (rather than re-using field objects
         # that were queried in get_many) so that if the score has
         # been changed by some other piece of the code, we don't overwrite
-        # that score.
+        # that score.  New modules are inserted, and the state of existing modules
+        # updated, in bulk.
         if self.user is not None and self.user.username == username:
             user = self.user
         else:
@@ -200,20 +260,27 @@ class DjangoXBlockUserStateClient(XBlockUserStateClient):
 
         evt_time = time()
 
+        existing_modules = {
+            usage_key: student_module
+            for student_module, usage_key in self._get_student_modules(username, block_keys_to_state.keys())
+        }
+        new_modules = []
+        updated_modules = []
         for usage_key, state in block_keys_to_state.items():
-            student_module, created = StudentModule.objects.get_or_create(
-                student=user,
-                course_id=usage_key.course_key,
-                module_state_key=usage_key,
-                defaults={
-                    'state': json.dumps(state),
-                    'module_type': usage_key.block_type,
-                },
-            )
+            student_module = existing_modules.get(usage_key)
+            created = student_module is None
 
             num_fields_before = num_fields_after = num_new_fields_set = len(state)
             num_fields_updated = 0
-            if not created:
+            if created:
+                new_modules.append(StudentModule(
+                    student=user,
+                    course_id=usage_key.course_key,
+                    module_state_key=usage_key,
+                    state=json.dumps(state),
+                    module_type=usage_key.block_type,
+                ))
+            else:
                 if student_module.state is None:
                     current_state = {}
                 else:
@@ -222,10 +289,9 @@ class DjangoXBlockUserStateClient(XBlockUserStateClient):
                 current_state.update(state)
                 num_fields_after = len(current_state)
                 student_module.state = json.dumps(current_state)
-                # We just read this object, so we know that we can do an update
-                student_module.save(force_update=True)
+                updated_modules.append(student_module)
 
-            # The rest of this method exists only to submit DataDog events.
+            # The rest of this loop exists only to submit DataDog events.
             # Remove it once we're no longer interested in the data.
             #
             # Record whether a state row has been created or updated.
@@ -245,11 +311,96 @@ class DjangoXBlockUserStateClient(XBlockUserStateClient):
             num_fields_updated = max(0, len(state) - num_new_fields_set)
             self._ddog_histogram(evt_time, 'set_many.fields_updated', num_fields_updated)
 
+        self._create_student_modules(username, new_modules, block_keys_to_state)
+        self._update_student_modules(updated_modules)
+
         # Events for the entire set_many call.
         finish_time = time()
         self._ddog_histogram(evt_time, 'set_many.blks_updated', len(block_keys_to_state))
         self._ddog_histogram(evt_time, 'set_many.response_time', (finish_time - evt_time) * 1000)
 
+    def _create_student_modules(self, username, student_modules, block_keys_to_state):
+        """
+        Inserts the new :class:`~StudentModule`s ``student_modules``, in a single query if there are several.
+
+        If another request created some of them first, the state of each in ``block_keys_to_state`` is
+        overlaid over the stored state instead.
+        """
+        if not student_modules:
+            return
+
+        if len(student_modules) == 1:
+            student_module = student_modules[0]
+            try:
+                with transaction.atomic():
+                    student_module.save(force_insert=True)
+            except IntegrityError:
+                self._overlay_state(student_module, block_keys_to_state[student_module.module_state_key])
+            return
+
+        try:
+            with transaction.atomic():
+                StudentModule.objects.bulk_create(student_modules)
+        except IntegrityError:
+            for student_module in student_modules:
+                self._create_student_modules(username, [student_module], block_keys_to_state)
+            return
+
+        # bulk_create doesn't set the ids of the modules, which the history of their state refers to,
+        # and doesn't send post_save, which saves that history.
+        for student_module, _ in self._get_student_modules(
+                username, [student_module.module_state_key for student_module in student_modules]
+        ):
+            post_save.send(
+                sender=StudentModule, instance=student_module, created=True, update_fields=None, raw=False,
+                using=student_module._state.db,  # pylint: disable=protected-access
+            )
+
+    def _overlay_state(self, student_module, state):
+        """
+        Overlays ``state`` over the stored state of the existing ``student_module``, which wasn't loaded.
+        """
+        student_module = StudentModule.objects.get(
+            student_id=student_module.student_id,
+            course_id=student_module.course_id,
+            module_state_key=student_module.module_state_key,
+        )
+        current_state = json.loads(student_module.state) if student_module.state is not None else {}
+        current_state.update(state)
+        student_module.state = json.dumps(current_state)
+        student_module.save(force_update=True)
+
+    def _update_student_modules(self, student_modules):
+        """
+        Saves the state of the loaded :class:`~StudentModule`s ``student_modules``, in a single query for each
+        chunk of modules if there are several.  Chunks are limited by the length of their states as well as by
+        their number of modules.
+        """
+        if len(student_modules) == 1:
+            # We just read this object, so we know that we can do an update
+            student_modules[0].save(force_update=True)
+            return
+
+        modified = timezone.now()
+        for chunk in chunks_by_size(
+                student_modules, self.UPDATE_CHUNK_SIZE, self.UPDATE_CHUNK_MAX_BYTES,
+                lambda student_module: len(student_module.state),
+        ):
+            # Only the state is updated, so that scores set since the modules were read aren't overwritten.
+            StudentModule.objects.filter(id__in=[student_module.id for student_module in chunk]).update(
+                state=Case(
+                    *[When(id=student_module.id, then=Value(student_module.state)) for student_module in chunk],
+                    output_field=TextField()
+                ),
+                modified=modified,
+            )
+            for student_module in chunk:
+                student_module.modified = modified
+                post_save.send(
+                    sender=StudentModule, instance=student_module, created=False, update_fields=None, raw=False,
+                    using=student_module._state.db,  # pylint: disable=protected-access
+                )
+
     def delete_many(self, username, block_keys, scope=Scope.user_state, fields=None):
         """
         Delete the stored XBlock state for a many xblock usages.
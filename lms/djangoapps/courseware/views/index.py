@@ -48,7 +48,7 @@ from ..entrance_exams import (
 )
 from ..exceptions import Redirect
 from ..masquerade import setup_masquerade
-from ..model_data import FieldDataCache
+from ..model_data import FieldDataCache, bulk_writes
 from ..module_render import toc_for_course, get_module_for_descriptor
 from .views import get_current_child, registered_for_course
 
@@ -98,7 +98,7 @@ class CoursewareIndex(View):
         try:
             self._init_new_relic()
             self._verify_position()
-            with modulestore().bulk_operations(self.course_key):
+            with modulestore().bulk_operations(self.course_key), bulk_writes():
                 self.course = get_course_with_access(request.user, 'load', self.course_key, depth=CONTENT_DEPTH)
                 self.is_staff = has_access(request.user, 'staff', self.course)
                 self._setup_masquerade_for_effective_user()
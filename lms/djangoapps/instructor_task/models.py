@@ -19,7 +19,9 @@ import csv
 import json
 import hashlib
 import os.path
+import tempfile
 import urllib
+import zlib
 
 from boto.s3.connection import S3Connection
 from boto.s3.key import Key
@@ -182,21 +184,24 @@ class InstructorTask(models.Model):
 class ReportStore(object):
     """
     Simple abstraction layer that can fetch and store CSV files for reports
-    download. Should probably refactor later to create a ReportFile object that
-    can simply be appended to for the sake of memory efficiency, rather than
-    passing in the whole dataset. Doing that for now just because it's simpler.
+    download. CSV rows may be passed as any iterable, including a generator,
+    and are written out as they are produced rather than held in memory.
     """
     @classmethod
-    def from_config(cls, config_name):
+    def from_config(cls, config_name, sub_path=None):
         """
         Return one of the ReportStore subclasses depending on django
         configuration. Look at subclasses for expected configuration.
+
+        If `sub_path` is given, the returned store keeps its files under
+        `sub_path` within the configured root path, separately from the
+        reports that are offered for download.
         """
         storage_type = getattr(settings, config_name).get("STORAGE_TYPE")
         if storage_type.lower() == "s3":
-            return S3ReportStore.from_config(config_name)
+            return S3ReportStore.from_config(config_name, sub_path)
         elif storage_type.lower() == "localfs":
-            return LocalFSReportStore.from_config(config_name)
+            return LocalFSReportStore.from_config(config_name, sub_path)
 
     def _get_utf8_encoded_rows(self, rows):
         """
@@ -207,6 +212,14 @@ class ReportStore(object):
         for row in rows:
             yield [unicode(item).encode('utf-8') for item in row]
 
+    def _get_unicode_rows(self, csv_lines):
+        """
+        Given an iterable of lines of a CSV file encoded as utf-8, return
+        its rows, with their strings decoded to unicode.
+        """
+        for row in csv.reader(csv_lines):
+            yield [item.decode('utf-8') for item in row]
+
 
 class S3ReportStore(ReportStore):
     """
@@ -220,6 +233,10 @@ class S3ReportStore(ReportStore):
     conventions on where files are stored to know what to display. Clients using
     this class can name the final file whatever they want.
     """
+    # The size at which buffered rows are uploaded as a part of a multipart
+    # upload. This is the minimum part size allowed by S3.
+    UPLOAD_PART_SIZE = 5 * 1024 * 1024
+
     def __init__(self, bucket_name, root_path):
         self.root_path = root_path
 
@@ -231,7 +248,7 @@ class S3ReportStore(ReportStore):
         self.bucket = conn.get_bucket(bucket_name)
 
     @classmethod
-    def from_config(cls, config_name):
+    def from_config(cls, config_name, sub_path=None):
         """
         The expected configuration for an `S3ReportStore` is to have a
         `GRADES_DOWNLOAD` dict in settings with the following fields::
@@ -245,10 +262,10 @@ class S3ReportStore(ReportStore):
         Since S3 access relies on boto, you must also define `AWS_ACCESS_KEY_ID`
         and `AWS_SECRET_ACCESS_KEY` in settings.
         """
-        return cls(
-            getattr(settings, config_name).get("BUCKET"),
-            getattr(settings, config_name).get("ROOT_PATH")
-        )
+        root_path = getattr(settings, config_name).get("ROOT_PATH")
+        if sub_path:
+            root_path = "{}/{}".format(root_path, sub_path)
+        return cls(getattr(settings, config_name).get("BUCKET"), root_path)
 
     def key_for(self, course_id, filename):
         """Return the S3 key we would use to store and retrieve the data for the
@@ -302,8 +319,14 @@ class S3ReportStore(ReportStore):
     def store_rows(self, course_id, filename, rows):
         """
         Given a `course_id`, `filename`, and `rows` (each row is an iterable of
-        strings), create a buffer that is a gzip'd csv file, and then `store()`
-        that buffer.
+        strings), write the rows to a buffer as a gzip'd csv file, and upload
+        it.
+
+        Whenever the buffer reaches `UPLOAD_PART_SIZE`, it is uploaded as a
+        part of an S3 multipart upload and emptied, so that `rows` can be a
+        generator of any number of rows. The file only becomes visible in S3
+        once all of its parts are uploaded. Files smaller than a single part
+        are uploaded with `store()`.
 
         Even though we store it in gzip format, browsers will transparently
         download and decompress it. Filenames should end in `.csv`, not `.gz`.
@@ -311,10 +334,70 @@ class S3ReportStore(ReportStore):
         output_buffer = StringIO()
         gzip_file = GzipFile(fileobj=output_buffer, mode="wb")
         csvwriter = csv.writer(gzip_file)
-        csvwriter.writerows(self._get_utf8_encoded_rows(rows))
-        gzip_file.close()
+        multipart_upload = None
+        num_parts = 0
+        try:
+            for row in self._get_utf8_encoded_rows(rows):
+                csvwriter.writerow(row)
+                if output_buffer.tell() >= self.UPLOAD_PART_SIZE:
+                    if multipart_upload is None:
+                        multipart_upload = self.bucket.initiate_multipart_upload(
+                            self.key_for(course_id, filename).key,
+                            headers={"Content-Encoding": "gzip", "Content-Type": "text/csv"},
+                        )
+                    num_parts += 1
+                    self._upload_part(multipart_upload, num_parts, output_buffer)
+            gzip_file.close()
+
+            if multipart_upload is None:
+                self.store(course_id, filename, output_buffer)
+            else:
+                num_parts += 1
+                self._upload_part(multipart_upload, num_parts, output_buffer)
+                multipart_upload.complete_upload()
+        except Exception:
+            if multipart_upload is not None:
+                multipart_upload.cancel_upload()
+            raise
+
+    def _upload_part(self, multipart_upload, part_num, output_buffer):
+        """
+        Upload the contents of `output_buffer` as part number `part_num` of
+        `multipart_upload`, and empty the buffer.
+        """
+        multipart_upload.upload_part_from_file(StringIO(output_buffer.getvalue()), part_num)
+        output_buffer.seek(0)
+        output_buffer.truncate()
 
-        self.store(course_id, filename, output_buffer)
+    def read_rows(self, course_id, filename):
+        """
+        Given a `course_id` and `filename`, return a generator of the rows of the
+        gzip'd csv file stored by `store_rows()`, downloading and decompressing
+        it as the rows are read.
+        """
+        key = self.bucket.get_key(self.key_for(course_id, filename).key)
+        return self._get_unicode_rows(self._read_lines(key))
+
+    def _read_lines(self, key):
+        """
+        Yield the decompressed lines of the gzip'd contents of `key`.
+        """
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        remainder = ''
+        for chunk in key:
+            lines = (remainder + decompressor.decompress(chunk)).splitlines(True)
+            # The last line may continue in the next chunk.
+            remainder = lines.pop() if lines else ''
+            for line in lines:
+                yield line
+        for line in (remainder + decompressor.flush()).splitlines(True):
+            yield line
+
+    def delete(self, course_id, filename):
+        """
+        Delete the file stored for `course_id` and `filename`.
+        """
+        self.bucket.delete_key(self.key_for(course_id, filename).key)
 
     def links_for(self, course_id):
         """
@@ -348,7 +431,7 @@ class LocalFSReportStore(ReportStore):
             os.makedirs(root_path)
 
     @classmethod
-    def from_config(cls, config_name):
+    def from_config(cls, config_name, sub_path=None):
         """
         Generate an instance of this object from Django settings. It assumes
         that there is a dict in settings named GRADES_DOWNLOAD and that it has
@@ -359,7 +442,10 @@ class LocalFSReportStore(ReportStore):
             STORAGE_TYPE : "localfs"
             ROOT_PATH : /tmp/edx/report-downloads/
         """
-        return cls(getattr(settings, config_name).get("ROOT_PATH"))
+        root_path = getattr(settings, config_name).get("ROOT_PATH")
+        if sub_path:
+            root_path = os.path.join(root_path, sub_path)
+        return cls(root_path)
 
     def path_to(self, course_id, filename):
         """Return the full path to a given file for a given course."""
@@ -384,12 +470,39 @@ class LocalFSReportStore(ReportStore):
         """
         Given a course_id, filename, and rows (each row is an iterable of strings),
         write this data out.
+
+        The rows are written as they are produced to a temporary file, which
+        is moved into place once all rows are written, so that only complete
+        files are visible.
         """
-        output_buffer = StringIO()
-        csvwriter = csv.writer(output_buffer)
-        csvwriter.writerows(self._get_utf8_encoded_rows(rows))
+        full_path = self.path_to(course_id, filename)
+        directory = os.path.dirname(full_path)
+        if not os.path.exists(directory):
+            os.mkdir(directory)
+
+        with tempfile.NamedTemporaryFile(dir=self.root_path, delete=False) as temp_file:
+            try:
+                csvwriter = csv.writer(temp_file)
+                csvwriter.writerows(self._get_utf8_encoded_rows(rows))
+            except Exception:
+                os.remove(temp_file.name)
+                raise
+        os.rename(temp_file.name, full_path)
 
-        self.store(course_id, filename, output_buffer)
+    def read_rows(self, course_id, filename):
+        """
+        Given a `course_id` and `filename`, return a generator of the rows of the
+        csv file stored by `store_rows()`.
+        """
+        with open(self.path_to(course_id, filename), "rb") as csv_file:
+            for row in self._get_unicode_rows(csv_file):
+                yield row
+
+    def delete(self, course_id, filename):
+        """
+        Delete the file stored for `course_id` and `filename`.
+        """
+        os.remove(self.path_to(course_id, filename))
 
     def links_for(self, course_id):
         """
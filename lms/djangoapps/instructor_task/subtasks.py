@@ -285,6 +285,7 @@ def queue_subtasks_for_query(
     item_fields,
     items_per_task,
     total_num_items,
+    followup_subtask_id=None,
 ):
     """
     Generates and queues subtasks to each execute a chunk of "items" generated by a queryset.
@@ -300,6 +301,10 @@ def queue_subtasks_for_query(
             These are in addition to the 'pk' field.
         `items_per_task` : maximum size of chunks to break each query chunk into for use by a subtask.
         `total_num_items` : total amount of items that will be put into subtasks
+        `followup_subtask_id` : optional id of a subtask that is not queued here, but by the
+            subtasks themselves once they have all completed (e.g. to combine their results).
+            It is stored along with the other subtasks, so that the InstructorTask only
+            succeeds once the followup subtask has completed as well.
 
     Returns:  the task progress as stored in the InstructorTask object.
 
@@ -309,6 +314,7 @@ def queue_subtasks_for_query(
     # Calculate the number of tasks that will be created, and create a list of ids for each task.
     total_num_subtasks = _get_number_of_subtasks(total_num_items, items_per_task)
     subtask_id_list = [str(uuid4()) for _ in range(total_num_subtasks)]
+    all_subtask_ids = subtask_id_list + ([followup_subtask_id] if followup_subtask_id is not None else [])
 
     # Update the InstructorTask  with information about the subtasks we've defined.
     TASK_LOG.info(
@@ -320,7 +326,7 @@ def queue_subtasks_for_query(
     )
     # Make sure this is committed to database before handing off subtasks to celery.
     with outer_atomic():
-        progress = initialize_subtask_info(entry, action_name, total_num_items, subtask_id_list)
+        progress = initialize_subtask_info(entry, action_name, total_num_items, all_subtask_ids)
 
     # Construct a generator that will return the recipients to use for each subtask.
     # Pass in the desired fields to fetch for each recipient.
@@ -35,7 +35,9 @@ from instructor_task.tasks_helper import (
     reset_attempts_module_state,
     delete_problem_module_state,
     upload_problem_responses_csv,
-    upload_grades_csv,
+    upload_grades_csv_in_shards,
+    upload_grades_csv_shard,
+    merge_grades_csv_shards,
     upload_problem_grade_report,
     upload_students_csv,
     cohort_students_and_upload,
@@ -172,10 +174,34 @@ def calculate_grades_csv(entry_id, xmodule_instance_args):
         xmodule_instance_args.get('task_id'), entry_id, action_name
     )
 
-    task_fn = partial(upload_grades_csv, xmodule_instance_args)
+    task_fn = partial(
+        upload_grades_csv_in_shards, calculate_grades_csv_shard, merge_grades_csv, xmodule_instance_args
+    )
     return run_main_task(entry_id, task_fn, action_name)
 
 
+@task(routing_key=settings.GRADES_DOWNLOAD_ROUTING_KEY)  # pylint: disable=not-callable
+def calculate_grades_csv_shard(
+    entry_id, xmodule_instance_args, shard_index, student_ids, merge_subtask_id, subtask_status_dict
+):
+    """
+    Grade a shard of a course's students, as a subtask of calculate_grades_csv.
+    """
+    return upload_grades_csv_shard(
+        merge_grades_csv, entry_id, xmodule_instance_args, shard_index, student_ids, merge_subtask_id,
+        subtask_status_dict
+    )
+
+
+@task(routing_key=settings.GRADES_DOWNLOAD_ROUTING_KEY)  # pylint: disable=not-callable
+def merge_grades_csv(entry_id, subtask_status_dict):
+    """
+    Merge the shards of a course's grades into the grade report, as a subtask
+    of calculate_grades_csv.
+    """
+    return merge_grades_csv_shards(entry_id, subtask_status_dict)
+
+
 @task(base=BaseInstructorTask, routing_key=settings.GRADES_DOWNLOAD_ROUTING_KEY)  # pylint: disable=not-callable
 def calculate_problem_grade_report(entry_id, xmodule_instance_args):
     """
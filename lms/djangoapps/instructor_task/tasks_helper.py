@@ -9,13 +9,14 @@ from collections import OrderedDict
 from datetime import datetime
 from django.conf import settings
 from eventtracking import tracker
-from itertools import chain
+from itertools import chain, count
 from time import time
+from uuid import uuid4
 import unicodecsv
 import logging
 
 from celery import Task, current_task
-from celery.states import SUCCESS, FAILURE
+from celery.states import SUCCESS, FAILURE, READY_STATES
 from django.contrib.auth.models import User
 from django.core.files.storage import DefaultStorage
 from django.db import reset_queries
@@ -45,6 +46,7 @@ from certificates.models import (
     GeneratedCertificate
 )
 from certificates.api import generate_user_certificates
+from courseware.batch_grades import iterate_batch_grades_for
 from courseware.courses import get_course_by_id, get_problems_in_section
 from courseware.grades import iterate_grades_for
 from courseware.models import StudentModule
@@ -59,6 +61,12 @@ from instructor_analytics.basic import (
 from instructor_analytics.csvs import format_dictlist
 from openassessment.data import OraAggregateData
 from instructor_task.models import ReportStore, InstructorTask, PROGRESS
+from instructor_task.subtasks import (
+    SubtaskStatus,
+    check_subtask_is_valid,
+    queue_subtasks_for_query,
+    update_subtask_status,
+)
 from lms.djangoapps.lms_xblock.runtime import LmsPartitionService
 from openedx.core.djangoapps.course_groups.cohorts import get_cohort
 from openedx.core.djangoapps.course_groups.models import CourseUserGroup
@@ -80,6 +88,10 @@ UPDATE_STATUS_SUCCEEDED = 'succeeded'
 UPDATE_STATUS_FAILED = 'failed'
 UPDATE_STATUS_SKIPPED = 'skipped'
 
+# The path, within the grades download ReportStore, under which the shards of
+# grade reports write their partial files until they are merged.
+GRADE_REPORT_SHARDS_PATH = 'grade_report_shards'
+
 # The setting name used for events when "settings" (account settings, preferences, profile information) change.
 REPORT_REQUESTED_EVENT_NAME = u'edx.instructor.report.requested'
 
@@ -611,6 +623,8 @@ def upload_csv_to_report_store(rows, csv_name, course_id, timestamp, config_name
                 [row1_colum1, row1_colum2, ...],
                 ...
             ]
+            This may also be a generator of rows, in which case each row
+            is written to the ReportStore as it is produced.
         csv_name: Name of the resulting CSV
         course_id: ID of the course
     """
@@ -657,35 +671,17 @@ def upload_exec_summary_to_store(data_dict, report_name, course_id, generated_at
     tracker.emit(REPORT_REQUESTED_EVENT_NAME, {"report_type": report_name})
 
 
-def upload_grades_csv(_xmodule_instance_args, _entry_id, course_id, _task_input, action_name):  # pylint: disable=too-many-statements
+def _generate_grade_report_rows(course, students, task_progress, err_rows, task_info_string):
     """
-    For a given `course_id`, generate a grades CSV file for all students that
-    are enrolled, and store using a `ReportStore`. Once created, the files can
-    be accessed by instantiating another `ReportStore` (via
-    `ReportStore.from_config()`) and calling `link_for()` on it. Writes are
-    buffered, so we'll never write part of a CSV file to S3 -- i.e. any files
-    that are visible in ReportStore will be complete ones.
+    Grades the given `students` of `course`, and yields the header row of their
+    grades CSV followed by a row for each student that is successfully graded.
 
-    As we start to add more CSV downloads, it will probably be worthwhile to
-    make a more general CSVDoc class instead of building out the rows like we
-    do here.
+    Students that fail to be graded are appended to `err_rows`, and the progress
+    is recorded in `task_progress` as the rows are produced.
     """
-    start_time = time()
-    start_date = datetime.now(UTC)
     status_interval = 100
-    enrolled_students = CourseEnrollment.objects.users_enrolled_in(course_id)
-    task_progress = TaskProgress(action_name, enrolled_students.count(), start_time)
-
-    fmt = u'Task: {task_id}, InstructorTask ID: {entry_id}, Course: {course_id}, Input: {task_input}'
-    task_info_string = fmt.format(
-        task_id=_xmodule_instance_args.get('task_id') if _xmodule_instance_args is not None else None,
-        entry_id=_entry_id,
-        course_id=course_id,
-        task_input=_task_input
-    )
-    TASK_LOG.info(u'%s, Task type: %s, Starting task execution', task_info_string, action_name)
-
-    course = get_course_by_id(course_id)
+    course_id = course.id
+    action_name = task_progress.action_name
     course_is_cohorted = is_course_cohorted(course.id)
     teams_enabled = course.teams_enabled
     cohorts_header = ['Cohort Name'] if course_is_cohorted else []
@@ -698,23 +694,17 @@ def upload_grades_csv(_xmodule_instance_args, _entry_id, course_id, _task_input,
     certificate_whitelist = CertificateWhitelist.objects.filter(course_id=course_id, whitelist=True)
     whitelisted_user_ids = [entry.user_id for entry in certificate_whitelist]
 
-    # Loop over all our students and build our CSV lists in memory
-    header = None
-    rows = []
-    err_rows = [["id", "username", "error_msg"]]
     current_step = {'step': 'Calculating Grades'}
-
-    total_enrolled_students = enrolled_students.count()
-    student_counter = 0
     TASK_LOG.info(
         u'%s, Task type: %s, Current step: %s, Starting grade calculation for total students: %s',
         task_info_string,
         action_name,
         current_step,
-
-        total_enrolled_students
+        task_progress.total
     )
-    for student, gradeset, err_msg in iterate_grades_for(course_id, enrolled_students):
+
+    header = None
+    for student, gradeset, err_msg in iterate_batch_grades_for(course, students):
         # Periodically update task status (this is a cache write)
         if task_progress.attempted % status_interval == 0:
             task_progress.update_task_state(extra_meta=current_step)
@@ -722,14 +712,13 @@ def upload_grades_csv(_xmodule_instance_args, _entry_id, course_id, _task_input,
 
         # Now add a log entry after each student is graded to get a sense
         # of the task's progress
-        student_counter += 1
         TASK_LOG.info(
             u'%s, Task type: %s, Current step: %s, Grade calculation in-progress for students: %s/%s',
             task_info_string,
             action_name,
             current_step,
-            student_counter,
-            total_enrolled_students
+            task_progress.attempted,
+            task_progress.total
         )
 
         if gradeset:
@@ -737,7 +726,7 @@ def upload_grades_csv(_xmodule_instance_args, _entry_id, course_id, _task_input,
             task_progress.succeeded += 1
             if not header:
                 header = [section['label'] for section in gradeset[u'section_breakdown']]
-                rows.append(
+                yield (
                     ["id", "email", "username", "grade"] + header + cohorts_header +
                     group_configs_header + teams_header +
                     ['Enrollment Track', 'Verification Status'] + certificate_info_header
@@ -787,7 +776,7 @@ def upload_grades_csv(_xmodule_instance_args, _entry_id, course_id, _task_input,
             # possible for a student to have a 0.0 show up in their row but
             # still have 100% for the course.
             row_percents = [percents.get(label, 0.0) for label in header]
-            rows.append(
+            yield (
                 [student.id, student.email, student.username, gradeset['percent']] +
                 row_percents + cohorts_group_name + group_configs_group_names + team_name +
                 [enrollment_mode] + [verification_status] + certificate_info
@@ -802,18 +791,47 @@ def upload_grades_csv(_xmodule_instance_args, _entry_id, course_id, _task_input,
         task_info_string,
         action_name,
         current_step,
-        student_counter,
-        total_enrolled_students
+        task_progress.attempted,
+        task_progress.total
+    )
+
+
+def upload_grades_csv(_xmodule_instance_args, _entry_id, course_id, _task_input, action_name):
+    """
+    For a given `course_id`, generate a grades CSV file for all students that
+    are enrolled, and store using a `ReportStore`. Once created, the files can
+    be accessed by instantiating another `ReportStore` (via
+    `ReportStore.from_config()`) and calling `link_for()` on it. Rows are
+    written to the `ReportStore` as students are graded, but we'll never make
+    part of a CSV file visible -- i.e. any files that are visible in
+    ReportStore will be complete ones.
+    """
+    start_time = time()
+    start_date = datetime.now(UTC)
+    enrolled_students = CourseEnrollment.objects.users_enrolled_in(course_id)
+    task_progress = TaskProgress(action_name, enrolled_students.count(), start_time)
+
+    fmt = u'Task: {task_id}, InstructorTask ID: {entry_id}, Course: {course_id}, Input: {task_input}'
+    task_info_string = fmt.format(
+        task_id=_xmodule_instance_args.get('task_id') if _xmodule_instance_args is not None else None,
+        entry_id=_entry_id,
+        course_id=course_id,
+        task_input=_task_input
     )
+    TASK_LOG.info(u'%s, Task type: %s, Starting task execution', task_info_string, action_name)
+
+    course = get_course_by_id(course_id)
+
+    # Rows are produced as they are written to the report, so only the
+    # errors are kept in memory.
+    err_rows = [["id", "username", "error_msg"]]
+    rows = _generate_grade_report_rows(course, enrolled_students, task_progress, err_rows, task_info_string)
+    upload_csv_to_report_store(rows, 'grade_report', course_id, start_date)
 
-    # By this point, we've got the rows we're going to stuff into our CSV files.
     current_step = {'step': 'Uploading CSVs'}
     task_progress.update_task_state(extra_meta=current_step)
     TASK_LOG.info(u'%s, Task type: %s, Current step: %s', task_info_string, action_name, current_step)
 
-    # Perform the actual upload
-    upload_csv_to_report_store(rows, 'grade_report', course_id, start_date)
-
     # If there are any error rows (don't count the header), write them out as well
     if len(err_rows) > 1:
         upload_csv_to_report_store(err_rows, 'grade_report_err', course_id, start_date)
@@ -823,6 +841,215 @@ def upload_grades_csv(_xmodule_instance_args, _entry_id, course_id, _task_input,
     return task_progress.update_task_state(extra_meta=current_step)
 
 
+def _get_grade_report_shard_store():
+    """
+    Returns the ReportStore that holds the partial grades CSV files written by
+    the shards of a grade report until they are merged.
+    """
+    return ReportStore.from_config('GRADES_DOWNLOAD', sub_path=GRADE_REPORT_SHARDS_PATH)
+
+
+def _grade_report_shard_filenames(entry_id, shard_index):
+    """
+    Returns the names of the partial grades CSV file and errors CSV file
+    written by the given shard of the given grade report.
+    """
+    filename = u'{}_{:04d}'.format(entry_id, shard_index)
+    return filename + u'.csv', filename + u'_err.csv'
+
+
+def upload_grades_csv_in_shards(
+    shard_task, merge_task, _xmodule_instance_args, _entry_id, course_id, _task_input, action_name
+):
+    """
+    For a given `course_id`, generate a grades CSV file for all students that
+    are enrolled, like `upload_grades_csv`.
+
+    If there are more enrolled students than GRADES_DOWNLOAD_STUDENTS_PER_TASK,
+    they are split into shards of that many students, which are graded in
+    parallel by `shard_task` subtasks.  Each shard writes a partial grades CSV
+    file, and once they have all completed, a `merge_task` subtask combines
+    them, in order, into the grade report.  Progress is tracked in the
+    InstructorTask using the subtask machinery that bulk email uses.
+    """
+    students_per_task = settings.GRADES_DOWNLOAD_STUDENTS_PER_TASK
+    enrolled_students = CourseEnrollment.objects.users_enrolled_in(course_id).order_by('id')
+    total_num_students = enrolled_students.count()
+    if not students_per_task or total_num_students <= students_per_task:
+        return upload_grades_csv(_xmodule_instance_args, _entry_id, course_id, _task_input, action_name)
+
+    entry = InstructorTask.objects.get(pk=_entry_id)
+
+    # If the task is requeued after its shards were queued, there is no need
+    # to queue them again.
+    if len(entry.subtasks) > 0 and len(entry.task_output) > 0:
+        TASK_LOG.warning(u"Task %s has already queued its grade report shards!", entry.task_id)
+        return json.loads(entry.task_output)
+
+    merge_subtask_id = str(uuid4())
+    shard_indices = count()
+
+    def _create_shard_subtask(student_list, initial_subtask_status):
+        """Creates a subtask to grade a shard of students."""
+        return shard_task.subtask(
+            (
+                _entry_id,
+                _xmodule_instance_args,
+                next(shard_indices),
+                [student['pk'] for student in student_list],
+                merge_subtask_id,
+                initial_subtask_status.to_dict(),
+            ),
+            task_id=initial_subtask_status.task_id,
+            routing_key=settings.GRADES_DOWNLOAD_ROUTING_KEY,
+        )
+
+    TASK_LOG.info(
+        u"Task %s: Preparing to queue subtasks for grading %s students of course %s",
+        entry.task_id,
+        total_num_students,
+        course_id,
+    )
+    return queue_subtasks_for_query(
+        entry,
+        action_name,
+        _create_shard_subtask,
+        [enrolled_students],
+        [],
+        students_per_task,
+        total_num_students,
+        followup_subtask_id=merge_subtask_id,
+    )
+
+
+def upload_grades_csv_shard(
+    merge_task, entry_id, xmodule_instance_args, shard_index, student_ids, merge_subtask_id, subtask_status_dict
+):
+    """
+    Grades the students with the given `student_ids`, as shard `shard_index` of
+    the grade report of InstructorTask `entry_id`, and writes their rows to
+    partial grades CSV files.
+
+    Once every shard of the grade report has completed, a `merge_task`
+    subtask is queued to combine them into the grade report.
+    """
+    subtask_status = SubtaskStatus.from_dict(subtask_status_dict)
+    current_task_id = subtask_status.task_id
+    check_subtask_is_valid(entry_id, current_task_id, subtask_status)
+
+    entry = InstructorTask.objects.get(pk=entry_id)
+    course_id = entry.course_id
+    task_info_string = u'Task: {task_id}, InstructorTask ID: {entry_id}, Course: {course_id}, Shard: {shard}'.format(
+        task_id=current_task_id,
+        entry_id=entry_id,
+        course_id=course_id,
+        shard=shard_index,
+    )
+    report_store = _get_grade_report_shard_store()
+    filename, err_filename = _grade_report_shard_filenames(entry_id, shard_index)
+    students = User.objects.filter(id__in=student_ids).order_by('id')
+    task_progress = TaskProgress(json.loads(entry.task_output)['action_name'], len(student_ids), time())
+    err_rows = []
+
+    try:
+        course = get_course_by_id(course_id)
+        rows = _generate_grade_report_rows(course, students, task_progress, err_rows, task_info_string)
+        report_store.store_rows(course_id, filename, rows)
+        subtask_status.increment(succeeded=task_progress.succeeded, failed=task_progress.failed, state=SUCCESS)
+    except Exception as exc:  # pylint: disable=broad-except
+        # Since we don't know how far the shard got, we count all of its
+        # students as having failed, and report them as errors.
+        TASK_LOG.exception(u'%s, Grading shard failed unexpectedly!', task_info_string)
+        report_store.store_rows(course_id, filename, [])
+        err_rows = [[student.id, student.username, unicode(exc)] for student in students]
+        subtask_status.increment(failed=len(student_ids), state=FAILURE)
+
+    report_store.store_rows(course_id, err_filename, err_rows)
+    update_subtask_status(entry_id, current_task_id, subtask_status)
+
+    # The last shard to complete queues the merge.
+    subtask_status_info = json.loads(InstructorTask.objects.get(pk=entry_id).subtasks)['status']
+    if all(
+            status['state'] in READY_STATES
+            for subtask_id, status in subtask_status_info.iteritems()
+            if subtask_id != merge_subtask_id
+    ):
+        TASK_LOG.info(u'%s, Queuing merge of grade report shards', task_info_string)
+        merge_task.apply_async(
+            (entry_id, SubtaskStatus.create(merge_subtask_id).to_dict()),
+            task_id=merge_subtask_id,
+            routing_key=settings.GRADES_DOWNLOAD_ROUTING_KEY,
+        )
+
+    return subtask_status.to_dict()
+
+
+def merge_grades_csv_shards(entry_id, subtask_status_dict):
+    """
+    Combines the partial grades CSV files written by the shards of the grade
+    report of InstructorTask `entry_id`, in order, into the grade report and
+    its errors report, and deletes them.
+    """
+    subtask_status = SubtaskStatus.from_dict(subtask_status_dict)
+    current_task_id = subtask_status.task_id
+    check_subtask_is_valid(entry_id, current_task_id, subtask_status)
+
+    entry = InstructorTask.objects.get(pk=entry_id)
+    course_id = entry.course_id
+    start_date = entry.created or datetime.now(UTC)
+    # All subtasks but this one are shards.
+    num_shards = json.loads(entry.subtasks)['total'] - 1
+    report_store = _get_grade_report_shard_store()
+    shard_filenames = [_grade_report_shard_filenames(entry_id, shard_index) for shard_index in xrange(num_shards)]
+
+    def merged_rows():
+        """
+        Yields the header row of the first shard with any rows, followed by
+        the rows of every shard without their header rows.
+        """
+        header = None
+        for filename, __ in shard_filenames:
+            rows = report_store.read_rows(course_id, filename)
+            shard_header = next(rows, None)
+            if shard_header is None:
+                continue
+            if header is None:
+                header = shard_header
+                yield header
+            for row in rows:
+                yield row
+
+    try:
+        upload_csv_to_report_store(merged_rows(), 'grade_report', course_id, start_date)
+
+        err_rows = chain.from_iterable(
+            report_store.read_rows(course_id, err_filename) for __, err_filename in shard_filenames
+        )
+        first_err_row = next(err_rows, None)
+        if first_err_row is not None:
+            upload_csv_to_report_store(
+                chain([["id", "username", "error_msg"], first_err_row], err_rows),
+                'grade_report_err',
+                course_id,
+                start_date,
+            )
+
+        for filenames in shard_filenames:
+            for filename in filenames:
+                report_store.delete(course_id, filename)
+    except Exception:
+        TASK_LOG.exception(
+            u'Task: %s, InstructorTask ID: %s, Merging grade report shards failed!', current_task_id, entry_id
+        )
+        subtask_status.increment(state=FAILURE)
+        update_subtask_status(entry_id, current_task_id, subtask_status)
+        raise
+
+    subtask_status.increment(state=SUCCESS)
+    update_subtask_status(entry_id, current_task_id, subtask_status)
+    return subtask_status.to_dict()
+
+
 def _order_problems(blocks):
     """
     Sort the problems by the assignment type and assignment that it belongs to.
@@ -932,48 +1159,53 @@ def upload_problem_grade_report(_xmodule_instance_args, _entry_id, course_id, _t
             extra_meta={'step': 'Generating course structure. Please refresh and try again.'}
         )
 
-    # Just generate the static fields for now.
-    rows = [list(header_row.values()) + ['Final Grade'] + list(chain.from_iterable(problems.values()))]
     error_rows = [list(header_row.values()) + ['error_msg']]
     current_step = {'step': 'Calculating Grades'}
 
-    for student, gradeset, err_msg in iterate_grades_for(course_id, enrolled_students, keep_raw_scores=True):
-        student_fields = [getattr(student, field_name) for field_name in header_row]
-        task_progress.attempted += 1
+    def problem_grade_rows():
+        """
+        Yields a row for each student that is successfully graded.
+        """
+        for student, gradeset, err_msg in iterate_grades_for(course_id, enrolled_students, keep_raw_scores=True):
+            student_fields = [getattr(student, field_name) for field_name in header_row]
+            task_progress.attempted += 1
 
-        if 'percent' not in gradeset or 'raw_scores' not in gradeset:
-            # There was an error grading this student.
-            # Generally there will be a non-empty err_msg, but that is not always the case.
-            if not err_msg:
-                err_msg = u"Unknown error"
-            error_rows.append(student_fields + [err_msg])
-            task_progress.failed += 1
-            continue
+            if 'percent' not in gradeset or 'raw_scores' not in gradeset:
+                # There was an error grading this student.
+                # Generally there will be a non-empty err_msg, but that is not always the case.
+                if not err_msg:
+                    err_msg = u"Unknown error"
+                error_rows.append(student_fields + [err_msg])
+                task_progress.failed += 1
+                continue
 
-        final_grade = gradeset['percent']
-        # Only consider graded problems
-        problem_scores = {unicode(score.module_id): score for score in gradeset['raw_scores'] if score.graded}
-        earned_possible_values = list()
-        for problem_id in problems:
-            try:
-                problem_score = problem_scores[problem_id]
-                earned_possible_values.append([problem_score.earned, problem_score.possible])
-            except KeyError:
-                # The student has not been graded on this problem.  For example,
-                # iterate_grades_for skips problems that students have never
-                # seen in order to speed up report generation.  It could also be
-                # the case that the student does not have access to it (e.g. A/B
-                # test or cohorted courseware).
-                earned_possible_values.append(['N/A', 'N/A'])
-        rows.append(student_fields + [final_grade] + list(chain.from_iterable(earned_possible_values)))
-
-        task_progress.succeeded += 1
-        if task_progress.attempted % status_interval == 0:
-            task_progress.update_task_state(extra_meta=current_step)
+            final_grade = gradeset['percent']
+            # Only consider graded problems
+            problem_scores = {unicode(score.module_id): score for score in gradeset['raw_scores'] if score.graded}
+            earned_possible_values = list()
+            for problem_id in problems:
+                try:
+                    problem_score = problem_scores[problem_id]
+                    earned_possible_values.append([problem_score.earned, problem_score.possible])
+                except KeyError:
+                    # The student has not been graded on this problem.  For example,
+                    # iterate_grades_for skips problems that students have never
+                    # seen in order to speed up report generation.  It could also be
+                    # the case that the student does not have access to it (e.g. A/B
+                    # test or cohorted courseware).
+                    earned_possible_values.append(['N/A', 'N/A'])
+
+            task_progress.succeeded += 1
+            if task_progress.attempted % status_interval == 0:
+                task_progress.update_task_state(extra_meta=current_step)
+            yield student_fields + [final_grade] + list(chain.from_iterable(earned_possible_values))
 
     # Perform the upload if any students have been successfully graded
-    if len(rows) > 1:
-        upload_csv_to_report_store(rows, 'problem_grade_report', course_id, start_date)
+    rows = problem_grade_rows()
+    first_row = next(rows, None)
+    if first_row is not None:
+        header = list(header_row.values()) + ['Final Grade'] + list(chain.from_iterable(problems.values()))
+        upload_csv_to_report_store(chain([header, first_row], rows), 'problem_grade_report', course_id, start_date)
     # If there are any error rows, write them out as well
     if len(error_rows) > 1:
         upload_csv_to_report_store(error_rows, 'problem_grade_report_err', course_id, start_date)
@@ -1035,13 +1267,9 @@ def upload_enrollment_report(_xmodule_instance_args, _entry_id, course_id, _task
     )
     TASK_LOG.info(u'%s, Task type: %s, Starting task execution', task_info_string, action_name)
 
-    # Loop over all our students and build our CSV lists in memory
-    rows = []
-    header = None
     current_step = {'step': 'Gathering Profile Information'}
     enrollment_report_provider = PaidCourseEnrollmentReportProvider()
     total_students = students_in_course.count()
-    student_counter = 0
     TASK_LOG.info(
         u'%s, Task type: %s, Current step: %s, generating detailed enrollment report for total students: %s',
         task_info_string,
@@ -1050,86 +1278,92 @@ def upload_enrollment_report(_xmodule_instance_args, _entry_id, course_id, _task
         total_students
     )
 
-    for student in students_in_course:
-        # Periodically update task status (this is a cache write)
-        if task_progress.attempted % status_interval == 0:
-            task_progress.update_task_state(extra_meta=current_step)
-        task_progress.attempted += 1
+    def enrollment_rows():
+        """
+        Yields the header row followed by a row for each student.
+        """
+        header = None
+        for student in students_in_course:
+            # Periodically update task status (this is a cache write)
+            if task_progress.attempted % status_interval == 0:
+                task_progress.update_task_state(extra_meta=current_step)
+            task_progress.attempted += 1
 
-        # Now add a log entry after certain intervals to get a hint that task is in progress
-        student_counter += 1
-        if student_counter % 100 == 0:
-            TASK_LOG.info(
-                u'%s, Task type: %s, Current step: %s, gathering enrollment profile for students in progress: %s/%s',
-                task_info_string,
-                action_name,
-                current_step,
-                student_counter,
-                total_students
-            )
+            # Now add a log entry after certain intervals to get a hint that task is in progress
+            if task_progress.attempted % 100 == 0:
+                TASK_LOG.info(
+                    u'%s, Task type: %s, Current step: %s, '
+                    u'gathering enrollment profile for students in progress: %s/%s',
+                    task_info_string,
+                    action_name,
+                    current_step,
+                    task_progress.attempted,
+                    total_students
+                )
 
-        user_data = enrollment_report_provider.get_user_profile(student.id)
-        course_enrollment_data = enrollment_report_provider.get_enrollment_info(student, course_id)
-        payment_data = enrollment_report_provider.get_payment_info(student, course_id)
-
-        # display name map for the column headers
-        enrollment_report_headers = {
-            'User ID': _('User ID'),
-            'Username': _('Username'),
-            'Full Name': _('Full Name'),
-            'First Name': _('First Name'),
-            'Last Name': _('Last Name'),
-            'Company Name': _('Company Name'),
-            'Title': _('Title'),
-            'Language': _('Language'),
-            'Year of Birth': _('Year of Birth'),
-            'Gender': _('Gender'),
-            'Level of Education': _('Level of Education'),
-            'Mailing Address': _('Mailing Address'),
-            'Goals': _('Goals'),
-            'City': _('City'),
-            'Country': _('Country'),
-            'Enrollment Date': _('Enrollment Date'),
-            'Currently Enrolled': _('Currently Enrolled'),
-            'Enrollment Source': _('Enrollment Source'),
-            'Manual (Un)Enrollment Reason': _('Manual (Un)Enrollment Reason'),
-            'Enrollment Role': _('Enrollment Role'),
-            'List Price': _('List Price'),
-            'Payment Amount': _('Payment Amount'),
-            'Coupon Codes Used': _('Coupon Codes Used'),
-            'Registration Code Used': _('Registration Code Used'),
-            'Payment Status': _('Payment Status'),
-            'Transaction Reference Number': _('Transaction Reference Number')
-        }
+            user_data = enrollment_report_provider.get_user_profile(student.id)
+            course_enrollment_data = enrollment_report_provider.get_enrollment_info(student, course_id)
+            payment_data = enrollment_report_provider.get_payment_info(student, course_id)
+
+            # display name map for the column headers
+            enrollment_report_headers = {
+                'User ID': _('User ID'),
+                'Username': _('Username'),
+                'Full Name': _('Full Name'),
+                'First Name': _('First Name'),
+                'Last Name': _('Last Name'),
+                'Company Name': _('Company Name'),
+                'Title': _('Title'),
+                'Language': _('Language'),
+                'Year of Birth': _('Year of Birth'),
+                'Gender': _('Gender'),
+                'Level of Education': _('Level of Education'),
+                'Mailing Address': _('Mailing Address'),
+                'Goals': _('Goals'),
+                'City': _('City'),
+                'Country': _('Country'),
+                'Enrollment Date': _('Enrollment Date'),
+                'Currently Enrolled': _('Currently Enrolled'),
+                'Enrollment Source': _('Enrollment Source'),
+                'Manual (Un)Enrollment Reason': _('Manual (Un)Enrollment Reason'),
+                'Enrollment Role': _('Enrollment Role'),
+                'List Price': _('List Price'),
+                'Payment Amount': _('Payment Amount'),
+                'Coupon Codes Used': _('Coupon Codes Used'),
+                'Registration Code Used': _('Registration Code Used'),
+                'Payment Status': _('Payment Status'),
+                'Transaction Reference Number': _('Transaction Reference Number')
+            }
+
+            if not header:
+                header = user_data.keys() + course_enrollment_data.keys() + payment_data.keys()
+                display_headers = []
+                for header_element in header:
+                    # translate header into a localizable display string
+                    display_headers.append(enrollment_report_headers.get(header_element, header_element))
+                yield display_headers
 
-        if not header:
-            header = user_data.keys() + course_enrollment_data.keys() + payment_data.keys()
-            display_headers = []
-            for header_element in header:
-                # translate header into a localizable display string
-                display_headers.append(enrollment_report_headers.get(header_element, header_element))
-            rows.append(display_headers)
+            task_progress.succeeded += 1
+            yield user_data.values() + course_enrollment_data.values() + payment_data.values()
 
-        rows.append(user_data.values() + course_enrollment_data.values() + payment_data.values())
-        task_progress.succeeded += 1
+    # Gather the students' information and upload their rows as they are produced
+    upload_csv_to_report_store(
+        enrollment_rows(), 'enrollment_report', course_id, start_date, config_name='FINANCIAL_REPORTS'
+    )
 
     TASK_LOG.info(
         u'%s, Task type: %s, Current step: %s, Detailed enrollment report generated for students: %s/%s',
         task_info_string,
         action_name,
         current_step,
-        student_counter,
+        task_progress.attempted,
         total_students
     )
 
-    # By this point, we've got the rows we're going to stuff into our CSV files.
     current_step = {'step': 'Uploading CSVs'}
     task_progress.update_task_state(extra_meta=current_step)
     TASK_LOG.info(u'%s, Task type: %s, Current step: %s', task_info_string, action_name, current_step)
 
-    # Perform the actual upload
-    upload_csv_to_report_store(rows, 'enrollment_report', course_id, start_date, config_name='FINANCIAL_REPORTS')
-
     # One last update before we close out...
     TASK_LOG.info(u'%s, Task type: %s, Finalizing detailed enrollment task', task_info_string, action_name)
     return task_progress.update_task_state(extra_meta=current_step)
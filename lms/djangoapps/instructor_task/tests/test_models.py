@@ -3,7 +3,9 @@ Tests for instructor_task/models.py.
 """
 
 from cStringIO import StringIO
+from gzip import GzipFile
 import mock
+import os
 import time
 from datetime import datetime
 from unittest import TestCase
@@ -23,17 +25,56 @@ class MockKey(object):
 
     def set_contents_from_string(self, contents, headers):  # pylint: disable=unused-argument
         """ Expected method on a Key object. """
+        self.contents = contents
         self.bucket.store_key(self)
 
     def generate_url(self, expires_in):  # pylint: disable=unused-argument
         """ Expected method on a Key object. """
         return "http://fake-edx-s3.edx.org/"
 
+    def __iter__(self):
+        """ Expected method on a Key object, which reads its contents in chunks. """
+        for index in xrange(0, len(self.contents), 100):
+            yield self.contents[index:index + 100]
+
+
+class MockMultiPartUpload(object):
+    """
+    Mocking a boto S3 MultiPartUpload object.
+    """
+    def __init__(self, bucket, key_name):
+        self.bucket = bucket
+        self.key_name = key_name
+        self.parts = {}
+        self.cancelled = False
+
+    def upload_part_from_file(self, fp, part_num):
+        """ Expected method on a MultiPartUpload object. """
+        self.parts[part_num] = fp.read()
+
+    def complete_upload(self):
+        """ Expected method on a MultiPartUpload object. """
+        key = MockKey(self.bucket)
+        key.key = self.key_name
+        key.contents = ''.join(self.parts[part_num] for part_num in sorted(self.parts))
+        self.bucket.store_key(key)
+
+    def cancel_upload(self):
+        """ Expected method on a MultiPartUpload object. """
+        self.cancelled = True
+
 
 class MockBucket(object):
     """ Mocking a boto S3 Bucket object. """
     def __init__(self, _name):
         self.keys = []
+        self.multipart_uploads = []
+
+    def initiate_multipart_upload(self, key_name, headers):  # pylint: disable=unused-argument
+        """ Expected method on a Bucket object. """
+        multipart_upload = MockMultiPartUpload(self, key_name)
+        self.multipart_uploads.append(multipart_upload)
+        return multipart_upload
 
     def store_key(self, key):
         """ Not a Bucket method, created just to store the keys in the Bucket for testing purposes. """
@@ -43,6 +84,14 @@ class MockBucket(object):
         """ Expected method on a Bucket object. """
         return self.keys
 
+    def get_key(self, key_name):
+        """ Expected method on a Bucket object. """
+        return next((key for key in self.keys if key.key == key_name), None)
+
+    def delete_key(self, key_name):
+        """ Expected method on a Bucket object. """
+        self.keys = [key for key in self.keys if key.key != key_name]
+
 
 class MockS3Connection(object):
     """ Mocking a boto S3 Connection """
@@ -61,7 +110,7 @@ class ReportStoreTestMixin(object):
     def setUp(self):
         self.course_id = CourseLocator(org="testx", course="coursex", run="runx")
 
-    def create_report_store(self):
+    def create_report_store(self, sub_path=None):
         """
         Subclasses should override this and return their report store.
         """
@@ -84,14 +133,72 @@ class ReportStoreTestMixin(object):
             ['new_file', 'middle_file', 'old_file']
         )
 
+    def test_read_rows(self):
+        report_store = self.create_report_store()
+        report_store.store_rows(self.course_id, 'report.csv', generate_rows(1000))
+        self.assertEqual(
+            list(report_store.read_rows(self.course_id, 'report.csv')),
+            [[unicode(row[0]), row[1]] for row in generate_rows(1000)]
+        )
+
+    def test_delete(self):
+        report_store = self.create_report_store()
+        report_store.store_rows(self.course_id, 'report.csv', generate_rows(10))
+        report_store.delete(self.course_id, 'report.csv')
+        self.assertEqual(report_store.links_for(self.course_id), [])
+
+    def test_sub_path(self):
+        report_store = self.create_report_store()
+        sub_path_report_store = self.create_report_store(sub_path='partial')
+        sub_path_report_store.store_rows(self.course_id, 'report.csv', generate_rows(10))
+        self.assertEqual(report_store.links_for(self.course_id), [])
+
+
+def generate_rows(num_rows, error=None):
+    """
+    Yields `num_rows` CSV rows, and then raises `error`, if given.
+    """
+    for index in xrange(num_rows):
+        yield [index, u'r\xf6w {}'.format(index)]
+    if error is not None:
+        raise error
+
+
+def expected_csv(num_rows):
+    """
+    Returns the CSV content expected for `num_rows` rows from `generate_rows`.
+    """
+    return ''.join('{},r\xc3\xb6w {}\r\n'.format(index, index) for index in xrange(num_rows))
+
 
 class LocalFSReportStoreTestCase(ReportStoreTestMixin, TestReportMixin, TestCase):
     """
     Test the LocalFSReportStore model.
     """
-    def create_report_store(self):
+    def create_report_store(self, sub_path=None):
         """ Create and return a LocalFSReportStore. """
-        return LocalFSReportStore.from_config(config_name='GRADES_DOWNLOAD')
+        return LocalFSReportStore.from_config(config_name='GRADES_DOWNLOAD', sub_path=sub_path)
+
+    def test_store_rows(self):
+        report_store = self.create_report_store()
+        report_store.store_rows(self.course_id, 'report.csv', generate_rows(100))
+
+        self.assertEqual([link[0] for link in report_store.links_for(self.course_id)], ['report.csv'])
+        with open(report_store.path_to(self.course_id, 'report.csv')) as report_file:
+            self.assertEqual(report_file.read(), expected_csv(100))
+
+    def test_store_rows_error(self):
+        report_store = self.create_report_store()
+        with self.assertRaises(ValueError):
+            report_store.store_rows(self.course_id, 'report.csv', generate_rows(100, ValueError()))
+
+        # Neither the report nor its partially written rows are left behind.
+        self.assertEqual(report_store.links_for(self.course_id), [])
+        root_path = report_store.root_path
+        self.assertEqual(
+            [name for name in os.listdir(root_path) if os.path.isfile(os.path.join(root_path, name))],
+            []
+        )
 
 
 @mock.patch('instructor_task.models.S3Connection', new=MockS3Connection)
@@ -102,6 +209,42 @@ class S3ReportStoreTestCase(ReportStoreTestMixin, TestReportMixin, TestCase):
     """
     Test the S3ReportStore model.
     """
-    def create_report_store(self):
+    def create_report_store(self, sub_path=None):
         """ Create and return a S3ReportStore. """
-        return S3ReportStore.from_config(config_name='GRADES_DOWNLOAD')
+        return S3ReportStore.from_config(config_name='GRADES_DOWNLOAD', sub_path=sub_path)
+
+    def get_stored_rows(self, report_store, filename):
+        """
+        Returns the decompressed content stored for `filename` by
+        `report_store`.
+        """
+        key_name = report_store.key_for(self.course_id, filename).key
+        contents = [key.contents for key in report_store.bucket.keys if key.key == key_name]
+        self.assertEqual(len(contents), 1)
+        return GzipFile(fileobj=StringIO(contents[0])).read()
+
+    def test_store_rows(self):
+        report_store = self.create_report_store()
+        report_store.store_rows(self.course_id, 'report.csv', generate_rows(100))
+
+        self.assertEqual(report_store.bucket.multipart_uploads, [])
+        self.assertEqual(self.get_stored_rows(report_store, 'report.csv'), expected_csv(100))
+
+    @mock.patch('instructor_task.models.S3ReportStore.UPLOAD_PART_SIZE', 100)
+    def test_store_rows_multipart(self):
+        report_store = self.create_report_store()
+        report_store.store_rows(self.course_id, 'report.csv', generate_rows(10000))
+
+        multipart_upload, = report_store.bucket.multipart_uploads
+        self.assertGreater(len(multipart_upload.parts), 1)
+        self.assertEqual(self.get_stored_rows(report_store, 'report.csv'), expected_csv(10000))
+
+    @mock.patch('instructor_task.models.S3ReportStore.UPLOAD_PART_SIZE', 100)
+    def test_store_rows_multipart_error(self):
+        report_store = self.create_report_store()
+        with self.assertRaises(ValueError):
+            report_store.store_rows(self.course_id, 'report.csv', generate_rows(10000, ValueError()))
+
+        multipart_upload, = report_store.bucket.multipart_uploads
+        self.assertTrue(multipart_upload.cancelled)
+        self.assertEqual(report_store.bucket.keys, [])
@@ -26,7 +26,7 @@ class TestSubtasks(InstructorTaskCourseTestCase):
             random_id = uuid4().hex[:8]
             self.create_student(username='student{0}'.format(random_id))
 
-    def _queue_subtasks(self, create_subtask_fcn, items_per_task, initial_count, extra_count):
+    def _queue_subtasks(self, create_subtask_fcn, items_per_task, initial_count, extra_count, followup_subtask_id=None):
         """Queue subtasks while enrolling more students into course in the middle of the process."""
 
         task_id = str(uuid4())
@@ -46,6 +46,7 @@ class TestSubtasks(InstructorTaskCourseTestCase):
             return {}
 
         with patch('instructor_task.subtasks.initialize_subtask_info') as mock_initialize_subtask_info:
+            self.mock_initialize_subtask_info = mock_initialize_subtask_info
             mock_initialize_subtask_info.side_effect = initialize_subtask_info
             queue_subtasks_for_query(
                 entry=instructor_task,
@@ -55,6 +56,7 @@ class TestSubtasks(InstructorTaskCourseTestCase):
                 item_fields=[],
                 items_per_task=items_per_task,
                 total_num_items=initial_count,
+                followup_subtask_id=followup_subtask_id,
             )
 
     def test_queue_subtasks_for_query1(self):
@@ -80,3 +82,19 @@ class TestSubtasks(InstructorTaskCourseTestCase):
         self.assertEqual(len(mock_create_subtask_fcn_args[0][0][0]), 3)
         self.assertEqual(len(mock_create_subtask_fcn_args[1][0][0]), 3)
         self.assertEqual(len(mock_create_subtask_fcn_args[2][0][0]), 5)
+
+    def test_queue_subtasks_for_query_followup_subtask(self):
+        """Test that queue_subtasks_for_query() records, but doesn't create, the followup subtask."""
+
+        mock_create_subtask_fcn = Mock()
+        followup_subtask_id = str(uuid4())
+        self._queue_subtasks(mock_create_subtask_fcn, 3, 7, 0, followup_subtask_id=followup_subtask_id)
+
+        self.assertEqual(mock_create_subtask_fcn.call_count, 3)
+        subtask_ids = self.mock_initialize_subtask_info.call_args[0][3]
+        self.assertEqual(len(subtask_ids), 4)
+        self.assertEqual(subtask_ids[-1], followup_subtask_id)
+        self.assertNotIn(
+            followup_subtask_id,
+            [call_args[0][1].task_id for call_args in mock_create_subtask_fcn.call_args_list]
+        )
@@ -8,12 +8,14 @@ Unit tests for LMS instructor-initiated background tasks helper functions.
 
 """
 
+import json
 import os
 import shutil
 from datetime import datetime
 import urllib
 
 import ddt
+from celery.states import SUCCESS
 from freezegun import freeze_time
 from mock import Mock, patch
 from nose.plugins.attrib import attr
@@ -46,12 +48,16 @@ from lms.djangoapps.verify_student.tests.factories import SoftwareSecurePhotoVer
 from xmodule.modulestore.tests.factories import CourseFactory, ItemFactory
 from xmodule.partitions.partitions import Group, UserPartition
 from instructor_task.models import ReportStore
+from instructor_task.tasks import calculate_grades_csv_shard, merge_grades_csv
+from instructor_task.tests.factories import InstructorTaskFactory
 from survey.models import SurveyForm, SurveyAnswer
 from instructor_task.tasks_helper import (
     cohort_students_and_upload,
     upload_problem_responses_csv,
     upload_grades_csv,
+    upload_grades_csv_in_shards,
     upload_problem_grade_report,
+    GRADE_REPORT_SHARDS_PATH,
     upload_students_csv,
     upload_may_enroll_csv,
     upload_enrollment_report,
@@ -111,14 +117,14 @@ class TestInstructorGradeReport(InstructorGradeReportTestCase):
         self.assertDictContainsSubset({'attempted': num_students, 'succeeded': num_students, 'failed': 0}, result)
 
     @patch('instructor_task.tasks_helper._get_current_task')
-    @patch('instructor_task.tasks_helper.iterate_grades_for')
-    def test_grading_failure(self, mock_iterate_grades_for, _mock_current_task):
+    @patch('instructor_task.tasks_helper.iterate_batch_grades_for')
+    def test_grading_failure(self, mock_iterate_batch_grades_for, _mock_current_task):
         """
         Test that any grading errors are properly reported in the
         progress dict and uploaded to the report store.
         """
-        # mock an error response from `iterate_grades_for`
-        mock_iterate_grades_for.return_value = [
+        # mock an error response from `iterate_batch_grades_for`
+        mock_iterate_batch_grades_for.return_value = [
             (self.create_student('username', 'student@example.com'), {}, 'Cannot grade student')
         ]
         result = upload_grades_csv(None, None, self.course.id, None, 'graded')
@@ -127,6 +133,34 @@ class TestInstructorGradeReport(InstructorGradeReportTestCase):
         report_store = ReportStore.from_config(config_name='GRADES_DOWNLOAD')
         self.assertTrue(any('grade_report_err' in item[0] for item in report_store.links_for(self.course.id)))
 
+    @override_settings(GRADES_DOWNLOAD_STUDENTS_PER_TASK=2)
+    @patch('instructor_task.tasks_helper._get_current_task')
+    def test_grading_in_shards(self, _mock_current_task):
+        """
+        Test that the grades of students graded in shards are merged, in
+        order, into a single grade report.
+        """
+        students = [self.create_student('student{}'.format(index)) for index in xrange(5)]
+        entry = InstructorTaskFactory.create(course_id=self.course.id, task_id='task_id', task_type='grade_course')
+        upload_grades_csv_in_shards(
+            calculate_grades_csv_shard, merge_grades_csv, None, entry.id, self.course.id, None, 'graded'
+        )
+
+        entry.refresh_from_db()
+        self.assertEqual(entry.task_state, SUCCESS)
+        self.assertEqual(len(json.loads(entry.subtasks)['status']), 4)
+        self.assertDictContainsSubset(
+            {'action_name': 'graded', 'attempted': 5, 'succeeded': 5, 'failed': 0},
+            json.loads(entry.task_output)
+        )
+        self.assertEqual(len(ReportStore.from_config(config_name='GRADES_DOWNLOAD').links_for(self.course.id)), 1)
+        self.verify_rows_in_csv(
+            [{'username': student.username} for student in sorted(students, key=lambda student: student.id)],
+            ignore_other_columns=True
+        )
+        shard_report_store = ReportStore.from_config(config_name='GRADES_DOWNLOAD', sub_path=GRADE_REPORT_SHARDS_PATH)
+        self.assertEqual(shard_report_store.links_for(self.course.id), [])
+
     def test_cohort_data_in_grading(self):
         """
         Test that cohort data is included in grades csv if cohort configuration is enabled for course.
@@ -289,13 +323,13 @@ class TestInstructorGradeReport(InstructorGradeReportTestCase):
         )
 
     @patch('instructor_task.tasks_helper._get_current_task')
-    @patch('instructor_task.tasks_helper.iterate_grades_for')
-    def test_unicode_in_csv_header(self, mock_iterate_grades_for, _mock_current_task):
+    @patch('instructor_task.tasks_helper.iterate_batch_grades_for')
+    def test_unicode_in_csv_header(self, mock_iterate_batch_grades_for, _mock_current_task):
         """
         Tests that CSV grade report works if unicode in headers.
         """
-        # mock a response from `iterate_grades_for`
-        mock_iterate_grades_for.return_value = [
+        # mock a response from `iterate_batch_grades_for`
+        mock_iterate_batch_grades_for.return_value = [
             (
                 self.create_student('username', 'student@example.com'),
                 {'section_breakdown': [{'label': u'\u8282\u540e\u9898 01'}], 'percent': 0, 'grade': None},
@@ -476,6 +476,14 @@ XQUEUE_INTERFACE = AUTH_TOKENS['XQUEUE_INTERFACE']
 # use the one from common.py
 MODULESTORE = convert_module_store_setting_if_needed(AUTH_TOKENS.get('MODULESTORE', MODULESTORE))
 CONTENTSTORE = AUTH_TOKENS.get('CONTENTSTORE', CONTENTSTORE)
+STATIC_CONTENT_DISK_CACHE.update(ENV_TOKENS.get('STATIC_CONTENT_DISK_CACHE', {}))
+COURSE_STRUCTURE_LOCAL_CACHE_SIZE = ENV_TOKENS.get(
+    'COURSE_STRUCTURE_LOCAL_CACHE_SIZE', COURSE_STRUCTURE_LOCAL_CACHE_SIZE
+)
+COURSE_STRUCTURE_CACHE_CODEC.update(ENV_TOKENS.get('COURSE_STRUCTURE_CACHE_CODEC', {}))
+STUDENT_MODULE_STATE_CACHE_TIMEOUT = ENV_TOKENS.get(
+    'STUDENT_MODULE_STATE_CACHE_TIMEOUT', STUDENT_MODULE_STATE_CACHE_TIMEOUT
+)
 DOC_STORE_CONFIG = AUTH_TOKENS.get('DOC_STORE_CONFIG', DOC_STORE_CONFIG)
 MONGODB_LOG = AUTH_TOKENS.get('MONGODB_LOG', {})
 
@@ -551,6 +559,9 @@ VERIFY_STUDENT = AUTH_TOKENS.get("VERIFY_STUDENT", VERIFY_STUDENT)
 GRADES_DOWNLOAD_ROUTING_KEY = HIGH_MEM_QUEUE
 
 GRADES_DOWNLOAD = ENV_TOKENS.get("GRADES_DOWNLOAD", GRADES_DOWNLOAD)
+GRADES_DOWNLOAD_STUDENTS_PER_TASK = ENV_TOKENS.get(
+    "GRADES_DOWNLOAD_STUDENTS_PER_TASK", GRADES_DOWNLOAD_STUDENTS_PER_TASK
+)
 
 # financial reports
 FINANCIAL_REPORTS = ENV_TOKENS.get("FINANCIAL_REPORTS", FINANCIAL_REPORTS)
@@ -817,3 +828,8 @@ API_ACCESS_FROM_EMAIL = ENV_TOKENS.get('API_ACCESS_FROM_EMAIL')
 APP_UPGRADE_CACHE_TIMEOUT = ENV_TOKENS.get('APP_UPGRADE_CACHE_TIMEOUT', APP_UPGRADE_CACHE_TIMEOUT)
 
 AFFILIATE_COOKIE_NAME = ENV_TOKENS.get('AFFILIATE_COOKIE_NAME', AFFILIATE_COOKIE_NAME)
+
+BLOCK_STRUCTURES_STORAGE_BACKEND = ENV_TOKENS.get('BLOCK_STRUCTURES_STORAGE_BACKEND', BLOCK_STRUCTURES_STORAGE_BACKEND)
+BLOCK_STRUCTURES_CACHE_COMPRESSOR = ENV_TOKENS.get(
+    'BLOCK_STRUCTURES_CACHE_COMPRESSOR', BLOCK_STRUCTURES_CACHE_COMPRESSOR
+)
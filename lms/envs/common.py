@@ -346,6 +346,10 @@ FEATURES = {
     # Enable the max score cache to speed up grading
     'ENABLE_MAX_SCORE_CACHE': True,
 
+    # Read course grades from, and incrementally update, the persisted
+    # subsection and course grades instead of regrading on every request.
+    'ENABLE_PERSISTENT_GRADES': False,
+
     # Enable LTI Provider feature.
     'ENABLE_LTI_PROVIDER': False,
 
@@ -707,6 +711,36 @@ XBLOCK_FIELD_DATA_WRAPPERS = ()
 
 MODULESTORE_BRANCH = 'published-only'
 CONTENTSTORE = None
+
+# A cache on local disk of assets served by the contentserver which are too large
+# for memcached.  None disables it.
+STATIC_CONTENT_DISK_CACHE = {
+    'DIRECTORY': None,
+    # The maximum size of the cache, in bytes.
+    'MAX_SIZE': 1024 ** 3,
+    # Larger assets are always streamed from the contentstore.
+    'MAX_FILE_SIZE': 100 * 1024 ** 2,
+}
+
+# The size, in bytes of their serializations, of the course structures which are cached
+# in each process in front of the 'course_structure_cache'.  The structures use several
+# times this much memory once unpickled, so it doesn't bound the memory of the process.
+# 0 disables it.
+COURSE_STRUCTURE_LOCAL_CACHE_SIZE = 64 * 1024 ** 2
+
+# How course structures are serialized ('pickle' or 'bson') and compressed ('zlib',
+# 'none', or 'lz4', which requires the lz4 package) in the 'course_structure_cache'.
+# Structures cached with any codec can be read after it changes.
+COURSE_STRUCTURE_CACHE_CODEC = {
+    'SERIALIZER': 'bson',
+    'COMPRESSOR': 'zlib',
+}
+
+# How long, in seconds, the state of the StudentModules of a user in a course is cached
+# in the 'default' cache between requests.  It's invalidated when any of them is saved
+# or deleted.  0 disables it.
+STUDENT_MODULE_STATE_CACHE_TIMEOUT = 0
+
 DOC_STORE_CONFIG = {
     'host': 'localhost',
     'db': 'xmodule',
@@ -759,6 +793,15 @@ CODE_JAIL = {
         # How many CPU seconds can jailed code use?
         'CPU': 1,
     },
+
+    # Pool of warm sandboxes, which fork a child for each execution.
+    'pool': {
+        # How many sandboxes can each process run?  0 means start a new
+        # sandbox for each execution.
+        'size': 0,
+        # After how many executions is a sandbox replaced?
+        'max_executions': 100,
+    },
 }
 
 # Some courses are allowed to run unsafe code. This is a list of regexes, one
@@ -2314,6 +2357,11 @@ GRADES_DOWNLOAD = {
     'ROOT_PATH': '/tmp/edx-s3/grades',
 }
 
+# Grade reports of courses with more enrolled students than this are generated
+# by subtasks that each grade this many students in parallel.  Set to None to
+# always generate grade reports in a single task.
+GRADES_DOWNLOAD_STUDENTS_PER_TASK = 5000
+
 FINANCIAL_REPORTS = {
     'STORAGE_TYPE': 'localfs',
     'BUCKET': 'edx-financial-reports',
@@ -2899,3 +2947,20 @@ AUTH_DOCUMENTATION_URL = 'http://edx.readthedocs.org/projects/edx-platform-api/e
 
 # Affiliate cookie tracking
 AFFILIATE_COOKIE_NAME = 'affiliate_id'
+
+################################ Settings for Course Blocks ################################
+
+# Optional persistent storage for collected course block structures, so that
+# they can be restored without recollecting them from the modulestore when
+# they are evicted from the cache.  Stored block structures expire after a day,
+# as they do in the cache.  Uses the same format as PROFILE_IMAGE_BACKEND, for
+# example:
+# {
+#     'class': 'django.core.files.storage.FileSystemStorage',
+#     'options': {'location': '/edx/var/edxapp/block_structures/'},
+# }
+BLOCK_STRUCTURES_STORAGE_BACKEND = None
+
+# How collected course block structures are compressed in the cache and storage:
+# 'zlib', 'none', or 'lz4', which requires the lz4 package.
+BLOCK_STRUCTURES_CACHE_COMPRESSOR = 'zlib'
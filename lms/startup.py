@@ -17,6 +17,7 @@ from monkey_patch import (
     django_db_models_options
 )
 
+from capa.safe_exec import configure_sandbox_pool
 import xmodule.x_module
 import lms_xblock.runtime
 
@@ -53,6 +54,10 @@ def run():
 
     add_mimetypes()
 
+    # Sandboxes of the pool are started when first needed, by each process.
+    sandbox_pool = settings.CODE_JAIL.get('pool', {})
+    configure_sandbox_pool(sandbox_pool.get('size', 0), sandbox_pool.get('max_executions', 100))
+
     # Mako requires the directories to be added after the django setup.
     microsite.enable_microsites(log)
 
@@ -7,11 +7,14 @@ Module with family of classes for block structures.
 The following internal data structures are implemented:
     _BlockRelations - Data structure for a single block's relations.
     _BlockData - Data structure for a single block's data.
+    _CompactBlockStructure - Interned, array-backed representation of
+        an entire block structure, used for serialization.
 """
+from array import array
 from collections import defaultdict
 from logging import getLogger
 
-from openedx.core.lib.graph_traversals import traverse_topologically, traverse_post_order
+from openedx.core.lib.graph_traversals import traverse_topologically, traverse_post_order, traverse_pre_order
 
 from .exceptions import TransformerException
 
@@ -527,6 +530,69 @@ class BlockStructureBlockData(BlockStructure):
             raise TransformerException('VERSION attribute is not set on transformer {0}.', transformer.name())
         self.set_transformer_data(transformer, TRANSFORMER_VERSION_KEY, transformer.VERSION)
 
+    def _get_subtree_keys(self, subtree_root_keys):
+        """
+        Returns the set of usage keys of all blocks in the subtrees
+        starting at the given subtree_root_keys, including the roots.
+        """
+        subtree_keys = set()
+        for subtree_root_key in subtree_root_keys:
+            subtree_keys.update(traverse_pre_order(subtree_root_key, self.get_children))
+        return subtree_keys
+
+    def _replace_subtrees(self, partial_block_structure, subtree_root_keys):
+        """
+        Mutates this block structure by replacing the subtrees starting
+        at subtree_root_keys with those in the given partial block
+        structure, and by replacing the block data of all blocks in the
+        partial block structure (including the ancestors of the
+        subtrees) and the non-block-specific transformer data.
+
+        The subtrees are replaced only if they can be replaced in place,
+        that is, if no block within them (other than the roots) is also
+        related to a block outside of them.
+
+        Arguments:
+            partial_block_structure (BlockStructureBlockData) - A
+                block structure with newly collected data, as created by
+                BlockStructureFactory.create_partial_from_modulestore.
+
+            subtree_root_keys (set(UsageKey)) - The usage keys of the
+                roots of the subtrees that are to be replaced.
+
+        Returns:
+            bool - Whether the subtrees were replaced.  If False, this
+                block structure is left unchanged.
+        """
+        old_subtree_keys = self._get_subtree_keys(subtree_root_keys)
+        new_subtree_keys = partial_block_structure._get_subtree_keys(subtree_root_keys)
+
+        for block_key in old_subtree_keys - subtree_root_keys:
+            if any(parent_key not in old_subtree_keys for parent_key in self.get_parents(block_key)):
+                return False
+        if any(block_key in self for block_key in new_subtree_keys - old_subtree_keys):
+            return False
+
+        # Remove blocks that are no longer in the subtrees.
+        for block_key in old_subtree_keys - new_subtree_keys:
+            self._block_relations.pop(block_key, None)
+            self._block_data_map.pop(block_key, None)
+
+        # Update relations within the subtrees, keeping the roots'
+        # relations with their ancestors.
+        for block_key in new_subtree_keys:
+            relations = self._block_relations[block_key]
+            relations.children = list(partial_block_structure.get_children(block_key))
+            if block_key not in subtree_root_keys:
+                relations.parents = list(partial_block_structure.get_parents(block_key))
+
+        # Update collected data.
+        for block_key in partial_block_structure.get_block_keys():
+            self._block_data_map[block_key] = partial_block_structure._block_data_map[block_key]
+        self._transformer_data = partial_block_structure._transformer_data
+
+        return True
+
 
 class BlockStructureModulestoreData(BlockStructureBlockData):
     """
@@ -626,3 +692,169 @@ class BlockStructureModulestoreData(BlockStructureBlockData):
         """
         if hasattr(xblock, field_name):
             self._block_data_map[usage_key].xblock_fields[field_name] = getattr(xblock, field_name)
+
+
+class _CompactBlockStructure(object):
+    """
+    Interned, array-backed representation of a block structure's
+    relations and collected data.
+
+    Each block's usage key is stored only once, in block_keys, and the
+    block is otherwise referred to by its integer index into that list.
+
+    Relations are stored in compressed sparse row (CSR) form: the
+    children of the block at index i are the blocks whose indices are
+    in child_indices[child_offsets[i]:child_offsets[i + 1]], and
+    similarly for parents.
+
+    Collected block data is stored column-wise: each xBlock field and
+    each transformer block field maps to a (block indices, values)
+    pair containing an entry for only those blocks that have a value.
+
+    Compared to the dict-of-objects representation used by
+    BlockStructureBlockData, this form has far fewer Python objects
+    and so is significantly smaller and faster to pickle.
+    """
+    def __init__(self):
+        # List of the usage keys of all blocks, in index order.
+        # list [UsageKey]
+        self.block_keys = []
+
+        # CSR arrays for the children and parents of each block.
+        # array [int]
+        self.child_offsets = array('l', [0])
+        self.child_indices = array('l')
+        self.parent_offsets = array('l', [0])
+        self.parent_indices = array('l')
+
+        # Map of xblock field name to its column of collected values.
+        # dict {string: (array [int], list [any picklable type])}
+        self.xblock_fields = {}
+
+        # Map of transformer name to a map of the transformer's block
+        # field names to their columns of values.
+        # dict {string: {string: (array [int], list [any picklable type])}}
+        self.transformer_block_fields = {}
+
+        # Map of a transformer's name to its non-block-specific data.
+        # dict {string: dict}
+        self.transformer_data = {}
+
+    @classmethod
+    def from_block_structure(cls, block_structure):
+        """
+        Creates and returns the compact representation of the given
+        block structure.
+
+        Arguments:
+            block_structure (BlockStructureBlockData) - The block
+                structure to convert.
+        """
+        compact = cls()
+        compact.block_keys = list(block_structure.get_block_keys())
+        block_indices = {usage_key: index for index, usage_key in enumerate(compact.block_keys)}
+
+        for usage_key in compact.block_keys:
+            relations = block_structure._block_relations[usage_key]  # pylint: disable=protected-access
+            compact.child_indices.extend(block_indices[child] for child in relations.children)
+            compact.child_offsets.append(len(compact.child_indices))
+            compact.parent_indices.extend(block_indices[parent] for parent in relations.parents)
+            compact.parent_offsets.append(len(compact.parent_indices))
+
+        for index, usage_key in enumerate(compact.block_keys):
+            block_data = block_structure._block_data_map.get(usage_key)  # pylint: disable=protected-access
+            if not block_data:
+                continue
+            for field_name, value in block_data.xblock_fields.iteritems():
+                cls._append_to_column(compact.xblock_fields, field_name, index, value)
+            for transformer_name, transformer_data in block_data.transformer_data.iteritems():
+                columns = compact.transformer_block_fields.setdefault(transformer_name, {})
+                for key, value in transformer_data.iteritems():
+                    cls._append_to_column(columns, key, index, value)
+
+        compact.transformer_data = dict(block_structure._transformer_data)  # pylint: disable=protected-access
+        return compact
+
+    def to_block_structure(self, root_block_usage_key):
+        """
+        Creates and returns a block structure, starting at the given
+        root_block_usage_key, from this compact representation.
+
+        Arguments:
+            root_block_usage_key (UsageKey) - The usage key of the root
+                of the block structure.
+
+        Returns:
+            BlockStructureModulestoreData - The expanded block structure.
+        """
+        block_keys = self.block_keys
+        block_relations = defaultdict(_BlockRelations)
+        for index, usage_key in enumerate(block_keys):
+            relations = block_relations[usage_key]
+            relations.children = [
+                block_keys[child_index]
+                for child_index in self.child_indices[self.child_offsets[index]:self.child_offsets[index + 1]]
+            ]
+            relations.parents = [
+                block_keys[parent_index]
+                for parent_index in self.parent_indices[self.parent_offsets[index]:self.parent_offsets[index + 1]]
+            ]
+
+        block_data_map = defaultdict(_BlockData)
+        for field_name, (indices, values) in self.xblock_fields.iteritems():
+            for index, value in zip(indices, values):
+                block_data_map[block_keys[index]].xblock_fields[field_name] = value
+        for transformer_name, columns in self.transformer_block_fields.iteritems():
+            for key, (indices, values) in columns.iteritems():
+                for index, value in zip(indices, values):
+                    block_data_map[block_keys[index]].transformer_data[transformer_name][key] = value
+
+        block_structure = BlockStructureModulestoreData(root_block_usage_key)
+        block_structure._block_relations = block_relations  # pylint: disable=protected-access
+        block_structure._block_data_map = block_data_map  # pylint: disable=protected-access
+        block_structure._transformer_data = defaultdict(dict, self.transformer_data)  # pylint: disable=protected-access
+        return block_structure
+
+    def __getstate__(self):
+        """
+        Returns the picklable state of this object as a tuple, avoiding
+        the overhead of pickling the attribute names.
+        """
+        return (
+            self.block_keys,
+            self.child_offsets,
+            self.child_indices,
+            self.parent_offsets,
+            self.parent_indices,
+            self.xblock_fields,
+            self.transformer_block_fields,
+            self.transformer_data,
+        )
+
+    def __setstate__(self, state):
+        """
+        Restores the state of this object from the tuple returned by
+        __getstate__.
+        """
+        (
+            self.block_keys,
+            self.child_offsets,
+            self.child_indices,
+            self.parent_offsets,
+            self.parent_indices,
+            self.xblock_fields,
+            self.transformer_block_fields,
+            self.transformer_data,
+        ) = state
+
+    @staticmethod
+    def _append_to_column(columns, column_name, index, value):
+        """
+        Appends the given block index and value to the named column in
+        the given map of columns, creating the column if needed.
+        """
+        if column_name not in columns:
+            columns[column_name] = (array('l'), [])
+        indices, values = columns[column_name]
+        indices.append(index)
+        values.append(value)
@@ -2,57 +2,97 @@
 Module for the Cache class for BlockStructure objects.
 """
 # pylint: disable=protected-access
+from contextlib import contextmanager
+from hashlib import sha1
 from logging import getLogger
+import os
+import time
+from uuid import uuid4
 
-from openedx.core.lib.cache_utils import zpickle, zunpickle
+from django.core.files.base import ContentFile
 
-from .block_structure import BlockStructureModulestoreData
+from xmodule.util.codecs import get_codec
+
+from .block_structure import BlockStructureModulestoreData, _CompactBlockStructure
 
 
 logger = getLogger(__name__)  # pylint: disable=C0103
 
 
+# The maximum size, in bytes, of a single value stored in the cache.
+# This is kept below memcached's default 1MB item size limit, leaving
+# room for the cache key and the cache backend's own overhead.
+DEFAULT_CHUNK_SIZE = 1000 * 1000
+
+# How long, in seconds, a block structure is kept in the cache and in
+# the persistent storage.  This is a fail-safe in case the signal to
+# invalidate the block structure doesn't come through.
+CACHE_TIMEOUT = 60 * 60 * 24
+
+# How long, in seconds, an update of a block structure holds its lock at
+# most, so that the lock of an update which died expires.
+UPDATE_LOCK_TIMEOUT = 5 * 60
+
+# How long, in seconds, an update waits before trying again to acquire
+# the lock held by another update.
+UPDATE_LOCK_POLL_INTERVAL = 1
+
+
 class BlockStructureCache(object):
     """
     Cache for BlockStructure objects.
     """
-    def __init__(self, cache):
+    def __init__(self, cache, storage=None, chunk_size=DEFAULT_CHUNK_SIZE, codec=None):
         """
         Arguments:
             cache (django.core.cache.backends.base.BaseCache) - The
                 cache into which cacheable data of the block structure
                 is to be serialized.
+
+            storage (django.core.files.storage.Storage) - An optional
+                persistent storage into which the serialized data is
+                also written, so the block structure can be restored
+                after it is evicted from the cache.
+
+            chunk_size (int) - The maximum size, in bytes, of a single
+                value stored in the cache.  Serialized data larger than
+                this is split across multiple cache keys.
+
+            codec (xmodule.util.codecs.Codec) - The codec which
+                serializes and compresses the data, pickle and zlib by
+                default.  Data encoded by any codec can be read.
         """
         self._cache = cache
+        self._storage = storage
+        self._chunk_size = chunk_size
+        self._codec = codec or get_codec()
 
     def add(self, block_structure):
         """
-        Store a compressed and pickled serialization of the given
-        block structure into the given cache.
+        Store a compressed serialization of the given block structure
+        into the given cache.
 
         The key in the cache is 'root.key.<root_block_usage_key>'.
-        The data stored in the cache includes the structure's
-        block relations, transformer data, and block data.
+        The data stored in the cache is the structure's compact
+        representation, which includes its block relations,
+        transformer data, and block data.
+
+        If the serialized data is larger than the chunk size, it is
+        split into chunks stored at 'root.key.<root_block_usage_key>.
+        <version>.<chunk index>', and the root key instead stores a
+        manifest with the data's version (its content hash) and its
+        number of chunks.
 
         Arguments:
             block_structure (BlockStructure) - The block structure
                 that is to be serialized to the given cache.
         """
-        data_to_cache = (
-            block_structure._block_relations,
-            block_structure._transformer_data,
-            block_structure._block_data_map,
-        )
-        zp_data_to_cache = zpickle(data_to_cache)
+        data_to_cache = _CompactBlockStructure.from_block_structure(block_structure)
+        zp_data_to_cache = self._codec.encode(data_to_cache)
+        self._set_in_cache(block_structure.root_block_usage_key, zp_data_to_cache)
 
-        # Set the timeout value for the cache to 1 day as a fail-safe
-        # in case the signal to invalidate the cache doesn't come through.
-        timeout_in_seconds = 60 * 60 * 24
-        self._cache.set(
-            self._encode_root_cache_key(block_structure.root_block_usage_key),
-            zp_data_to_cache,
-            timeout=timeout_in_seconds,
-        )
+        if self._storage:
+            self._set_in_storage(block_structure.root_block_usage_key, zp_data_to_cache)
 
         logger.info(
             "Wrote BlockStructure %s to cache, size: %s",
@@ -65,6 +105,10 @@ class BlockStructureCache(object):
         Deserializes and returns the block structure starting at
         root_block_usage_key from the given cache, if it's found in the cache.
 
+        If the block structure is not found in the cache but is found in
+        the persistent storage, and hasn't expired there, it is read from
+        the storage and re-added to the cache until it expires.
+
         The given root_block_usage_key must equate the root_block_usage_key
         previously passed to serialize_to_cache.
 
@@ -81,7 +125,12 @@ class BlockStructureCache(object):
         """
 
         # Find root_block_usage_key in the cache.
-        zp_data_from_cache = self._cache.get(self._encode_root_cache_key(root_block_usage_key))
+        zp_data_from_cache = self._get_from_cache(root_block_usage_key)
+        if not zp_data_from_cache and self._storage:
+            zp_data_from_cache, timeout_in_seconds = self._get_from_storage(root_block_usage_key)
+            if zp_data_from_cache:
+                self._set_in_cache(root_block_usage_key, zp_data_from_cache, timeout_in_seconds)
+
         if not zp_data_from_cache:
             logger.info(
                 "Did not find BlockStructure %r in the cache.",
@@ -96,7 +145,12 @@ class BlockStructureCache(object):
             )
 
         # Deserialize and construct the block structure.
-        block_relations, transformer_data, block_data_map = zunpickle(zp_data_from_cache)
+        data_from_cache = self._codec.decode(zp_data_from_cache)
+        if isinstance(data_from_cache, _CompactBlockStructure):
+            return data_from_cache.to_block_structure(root_block_usage_key)
+
+        # Support data cached in the earlier, non-compact format.
+        block_relations, transformer_data, block_data_map = data_from_cache
         block_structure = BlockStructureModulestoreData(root_block_usage_key)
         block_structure._block_relations = block_relations
         block_structure._transformer_data = transformer_data
@@ -104,6 +158,37 @@ class BlockStructureCache(object):
 
         return block_structure
 
+    @contextmanager
+    def update_lock(self, root_block_usage_key):
+        """
+        A context manager which holds the lock of updates of the block
+        structure for the given root_block_usage_key, waiting until any
+        other update releases it, so that updates which read, modify and
+        write the cached block structure don't overwrite each other's
+        changes.
+
+        The lock is held in the cache, so it's shared by all the
+        processes using it, and expires after UPDATE_LOCK_TIMEOUT.
+
+        Arguments:
+            root_block_usage_key (UsageKey) - The usage_key for the root
+                of the block structure that is to be updated.
+        """
+        lock_key = self._encode_lock_cache_key(root_block_usage_key)
+        token = uuid4().hex
+        while not self._cache.add(lock_key, token, timeout=UPDATE_LOCK_TIMEOUT):
+            logger.info(
+                "Waiting for another update of BlockStructure %r.",
+                root_block_usage_key,
+            )
+            time.sleep(UPDATE_LOCK_POLL_INTERVAL)
+        try:
+            yield
+        finally:
+            # Don't release the lock if it expired and was acquired by another update.
+            if self._cache.get(lock_key) == token:
+                self._cache.delete(lock_key)
+
     def delete(self, root_block_usage_key):
         """
         Deletes the block structure for the given root_block_usage_key
@@ -115,11 +200,127 @@ class BlockStructureCache(object):
                 the cache.
         """
         self._cache.delete(self._encode_root_cache_key(root_block_usage_key))
+        if self._storage:
+            storage_name = self._encode_root_storage_name(root_block_usage_key)
+            if self._storage.exists(storage_name):
+                self._storage.delete(storage_name)
         logger.info(
             "Deleted BlockStructure %r from the cache.",
             root_block_usage_key,
         )
 
+    def _set_in_cache(self, root_block_usage_key, zp_data, timeout_in_seconds=CACHE_TIMEOUT):
+        """
+        Stores the given serialized data for the given
+        root_block_usage_key in the cache for timeout_in_seconds,
+        splitting it into chunks if it is larger than the chunk size.
+        """
+        root_cache_key = self._encode_root_cache_key(root_block_usage_key)
+
+        if len(zp_data) <= self._chunk_size:
+            self._cache.set(root_cache_key, zp_data, timeout=timeout_in_seconds)
+            return
+
+        # Write the chunks before the manifest that refers to them, so
+        # readers never find a manifest without its chunks.  Since the
+        # chunk keys are versioned, readers of a previous manifest
+        # continue to find that version's chunks.
+        version = sha1(zp_data).hexdigest()
+        chunks = {
+            self._encode_chunk_cache_key(root_cache_key, version, index): zp_data[offset:offset + self._chunk_size]
+            for index, offset in enumerate(xrange(0, len(zp_data), self._chunk_size))
+        }
+        self._cache.set_many(chunks, timeout=timeout_in_seconds)
+        self._cache.set(
+            root_cache_key,
+            {'version': version, 'num_chunks': len(chunks)},
+            timeout=timeout_in_seconds,
+        )
+
+    def _get_from_cache(self, root_block_usage_key):
+        """
+        Returns the serialized data for the given root_block_usage_key
+        from the cache, reassembling it from its chunks if needed;
+        returns None if it is not found.
+        """
+        root_cache_key = self._encode_root_cache_key(root_block_usage_key)
+        data_from_cache = self._cache.get(root_cache_key)
+        if not isinstance(data_from_cache, dict):
+            return data_from_cache
+
+        # The data was split into chunks, as described by the manifest.
+        version = data_from_cache['version']
+        chunk_keys = [
+            self._encode_chunk_cache_key(root_cache_key, version, index)
+            for index in xrange(data_from_cache['num_chunks'])
+        ]
+        chunks = self._cache.get_many(chunk_keys)
+        if len(chunks) != len(chunk_keys):
+            logger.info(
+                "Missing %d of %d chunks of BlockStructure %r in the cache.",
+                len(chunk_keys) - len(chunks),
+                len(chunk_keys),
+                root_block_usage_key,
+            )
+            return None
+
+        zp_data = ''.join(chunks[chunk_key] for chunk_key in chunk_keys)
+        if sha1(zp_data).hexdigest() != version:
+            logger.warning(
+                "Chunks of BlockStructure %r in the cache do not match version %s.",
+                root_block_usage_key,
+                version,
+            )
+            return None
+        return zp_data
+
+    def _set_in_storage(self, root_block_usage_key, zp_data):
+        """
+        Stores the given serialized data for the given
+        root_block_usage_key in the persistent storage, preceded by a
+        line with the time at which it was written.
+
+        The data is written to a temporary file which is then renamed
+        over the stored file, so readers never find a missing or
+        partially written file.
+        """
+        storage_name = self._encode_root_storage_name(root_block_usage_key)
+        content = ContentFile("{:d}\n".format(int(time.time())) + zp_data)
+        try:
+            storage_path = self._storage.path(storage_name)
+        except NotImplementedError:
+            # Storages without local paths, such as S3, can't rename
+            # files, so the stored file is replaced in place.
+            if self._storage.exists(storage_name):
+                self._storage.delete(storage_name)
+            self._storage.save(storage_name, content)
+            return
+
+        temp_name = self._storage.save(u"{}.{}.tmp".format(storage_name, uuid4().hex), content)
+        os.rename(self._storage.path(temp_name), storage_path)
+
+    def _get_from_storage(self, root_block_usage_key):
+        """
+        Returns the serialized data for the given root_block_usage_key
+        from the persistent storage and the number of seconds until it
+        expires; returns (None, None) if it is not found or it has
+        expired.
+        """
+        storage_name = self._encode_root_storage_name(root_block_usage_key)
+        if not self._storage.exists(storage_name):
+            return None, None
+        with self._storage.open(storage_name) as storage_file:
+            written_at, zp_data = storage_file.read().split("\n", 1)
+
+        timeout_in_seconds = int(written_at) + CACHE_TIMEOUT - int(time.time())
+        if timeout_in_seconds <= 0:
+            logger.info(
+                "BlockStructure %r in the storage has expired.",
+                root_block_usage_key,
+            )
+            return None, None
+        return zp_data, timeout_in_seconds
+
     @classmethod
     def _encode_root_cache_key(cls, root_block_usage_key):
         """
@@ -127,3 +328,27 @@ class BlockStructureCache(object):
         for the given root_block_usage_key.
         """
         return "root.key." + unicode(root_block_usage_key)
+
+    @classmethod
+    def _encode_lock_cache_key(cls, root_block_usage_key):
+        """
+        Returns the cache key to use for the lock of updates of the
+        block structure for the given root_block_usage_key.
+        """
+        return "lock.key." + unicode(root_block_usage_key)
+
+    @classmethod
+    def _encode_chunk_cache_key(cls, root_cache_key, version, index):
+        """
+        Returns the cache key to use for storing the chunk at the given
+        index of the given version of a block structure's data.
+        """
+        return u"{}.{}.{}".format(root_cache_key, version, index)
+
+    @classmethod
+    def _encode_root_storage_name(cls, root_block_usage_key):
+        """
+        Returns the name to use for storing the block structure for the
+        given root_block_usage_key in the persistent storage.
+        """
+        return u"block_structures/{}.zpickle".format(root_block_usage_key)
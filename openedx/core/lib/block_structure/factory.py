@@ -1,6 +1,8 @@
 """
 Module for factory class for BlockStructure objects.
 """
+from openedx.core.lib.graph_traversals import traverse_pre_order
+
 from .block_structure import BlockStructureModulestoreData
 
 
@@ -32,30 +34,63 @@ class BlockStructureFactory(object):
                 root_block_usage_key is not found in the modulestore.
         """
         block_structure = BlockStructureModulestoreData(root_block_usage_key)
+        root_xblock = modulestore.get_item(root_block_usage_key, depth=None)
+        cls._add_xblock_subtree(block_structure, root_xblock, blocks_visited=set())
+        return block_structure
+
+    @classmethod
+    def create_partial_from_modulestore(cls, block_structure, subtree_root_keys, modulestore):
+        """
+        Creates and returns a block structure from the modulestore that
+        contains only the subtrees starting at the given subtree_root_keys
+        and the ancestors of those subtrees, as found in the given
+        block_structure.
+
+        Ancestors are related only to their own ancestors and to the
+        subtree roots, so transformers can percolate collected data
+        down to the subtrees with the usual traversals.  The xBlocks of
+        all children of the ancestors are also available through
+        get_xblock.
+
+        Arguments:
+            block_structure (BlockStructure) - A previously collected
+                block structure containing the subtree roots.
+
+            subtree_root_keys (set(UsageKey)) - The usage keys of the
+                roots of the subtrees that are to be read from the
+                modulestore.  None of the subtrees may contain another.
+
+            modulestore (ModuleStoreRead) - The modulestore that
+                contains the data for the xBlocks.
+
+        Returns:
+            BlockStructureModulestoreData - The created partial block
+                structure, with the same root as the given
+                block_structure.
+        """
+        partial_block_structure = BlockStructureModulestoreData(block_structure.root_block_usage_key)
         blocks_visited = set()
 
-        def build_block_structure(xblock):
-            """
-            Recursively update the block structure with the given xBlock
-            and its descendants.
-            """
-            # Check if the xblock was already visited (can happen in
-            # DAGs).
-            if xblock.location in blocks_visited:
-                return
-
-            # Add the xBlock.
-            blocks_visited.add(xblock.location)
-            block_structure._add_xblock(xblock.location, xblock)  # pylint: disable=protected-access
-
-            # Add relations with its children and recurse.
-            for child in xblock.get_children():
-                block_structure._add_relation(xblock.location, child.location)  # pylint: disable=protected-access
-                build_block_structure(child)
+        for subtree_root_key in subtree_root_keys:
+            subtree_root_xblock = modulestore.get_item(subtree_root_key, depth=None)
+            cls._add_xblock_subtree(partial_block_structure, subtree_root_xblock, blocks_visited)
 
-        root_xblock = modulestore.get_item(root_block_usage_key, depth=None)
-        build_block_structure(root_xblock)
-        return block_structure
+        ancestor_keys = set()
+        for subtree_root_key in subtree_root_keys:
+            for parent_key in block_structure.get_parents(subtree_root_key):
+                ancestor_keys.update(traverse_pre_order(parent_key, block_structure.get_parents))
+
+        for ancestor_key in ancestor_keys:
+            ancestor_xblock = modulestore.get_item(ancestor_key)
+            partial_block_structure._add_xblock(ancestor_key, ancestor_xblock)  # pylint: disable=protected-access
+            for child_key in block_structure.get_children(ancestor_key):
+                if child_key in ancestor_keys or child_key in subtree_root_keys:
+                    partial_block_structure._add_relation(ancestor_key, child_key)  # pylint: disable=protected-access
+            for child in ancestor_xblock.get_children():
+                if child.location not in blocks_visited and child.location not in ancestor_keys:
+                    partial_block_structure._add_xblock(child.location, child)  # pylint: disable=protected-access
+
+        return partial_block_structure
 
     @classmethod
     def create_from_cache(cls, root_block_usage_key, block_structure_cache):
@@ -82,3 +117,32 @@ class BlockStructureFactory(object):
             NoneType - If the root_block_usage_key is not found in the cache.
         """
         return block_structure_cache.get(root_block_usage_key)
+
+    @classmethod
+    def _add_xblock_subtree(cls, block_structure, xblock, blocks_visited):
+        """
+        Recursively updates the given block structure with the given
+        xBlock and its descendants.
+
+        Arguments:
+            block_structure (BlockStructureModulestoreData) - The block
+                structure to update.
+
+            xblock (XBlock) - The root xBlock of the subtree to add.
+
+            blocks_visited (set(UsageKey)) - The usage keys of the
+                xBlocks already added, updated in place.
+        """
+        # Check if the xblock was already visited (can happen in
+        # DAGs).
+        if xblock.location in blocks_visited:
+            return
+
+        # Add the xBlock.
+        blocks_visited.add(xblock.location)
+        block_structure._add_xblock(xblock.location, xblock)  # pylint: disable=protected-access
+
+        # Add relations with its children and recurse.
+        for child in xblock.get_children():
+            block_structure._add_relation(xblock.location, child.location)  # pylint: disable=protected-access
+            cls._add_xblock_subtree(block_structure, child, blocks_visited)
@@ -2,18 +2,26 @@
 Top-level module for the Block Structure framework with a class for managing
 BlockStructures.
 """
+from logging import getLogger
+
+from openedx.core.lib.graph_traversals import traverse_pre_order
+from xmodule.modulestore.exceptions import ItemNotFoundError
+
 from .cache import BlockStructureCache
 from .factory import BlockStructureFactory
 from .exceptions import UsageKeyNotInBlockStructure
 from .transformers import BlockStructureTransformers
 
 
+logger = getLogger(__name__)  # pylint: disable=C0103
+
+
 class BlockStructureManager(object):
     """
     Top-level class for managing Block Structures.
     """
 
-    def __init__(self, root_block_usage_key, modulestore, cache):
+    def __init__(self, root_block_usage_key, modulestore, cache, storage=None, codec=None):
         """
         Arguments:
             root_block_usage_key (UsageKey) - The usage_key for the root
@@ -26,10 +34,18 @@ class BlockStructureManager(object):
             cache (django.core.cache.backends.base.BaseCache) - The
                 cache to use for storing/retrieving the block structure's
                 collected data.
+
+            storage (django.core.files.storage.Storage) - An optional
+                persistent storage to use for storing/retrieving the
+                block structure's collected data when it is not in the
+                cache.
+
+            codec (xmodule.util.codecs.Codec) - An optional codec to
+                use for serializing the block structure's collected data.
         """
         self.root_block_usage_key = root_block_usage_key
         self.modulestore = modulestore
-        self.block_structure_cache = BlockStructureCache(cache)
+        self.block_structure_cache = BlockStructureCache(cache, storage, codec=codec)
 
     def get_transformed(self, transformers, starting_block_usage_key=None):
         """
@@ -95,15 +111,31 @@ class BlockStructureManager(object):
             self.block_structure_cache.add(block_structure)
         return block_structure
 
-    def update_collected(self):
+    def update_collected(self, changed_usage_keys=None):
         """
         Updates the collected Block Structure for the root_block_usage_key.
 
-        Details: The cache is cleared and updated by collecting transformers
-        data from the modulestore.
+        Details: If changed_usage_keys is given and an up-to-date block
+        structure is in the cache, only the subtrees of the changed blocks
+        are read from the modulestore and recollected, along with the
+        collected data of their ancestors.  Otherwise, the cache is
+        cleared and updated by collecting transformers data from the
+        modulestore.
+
+        Concurrent updates of the same block structure are serialized,
+        so that an update doesn't write a block structure read before
+        another update wrote its changes.
+
+        Arguments:
+            changed_usage_keys (set(UsageKey)) - Usage keys of the roots
+                of the subtrees that changed in the modulestore, or None
+                if the extent of the change is unknown.
         """
-        self.clear()
-        self.get_collected()
+        with self.block_structure_cache.update_lock(self.root_block_usage_key):
+            if changed_usage_keys and self._update_collected_subtrees(changed_usage_keys):
+                return
+            self.clear()
+            self.get_collected()
 
     def clear(self):
         """
@@ -111,3 +143,80 @@ class BlockStructureManager(object):
         root block key.
         """
         self.block_structure_cache.delete(self.root_block_usage_key)
+
+    def _update_collected_subtrees(self, changed_usage_keys):
+        """
+        Updates the cached block structure by recollecting only the
+        subtrees of the given changed blocks.
+
+        Returns:
+            bool - Whether the cached block structure could be updated
+                incrementally.
+        """
+        block_structure = BlockStructureFactory.create_from_cache(
+            self.root_block_usage_key,
+            self.block_structure_cache
+        )
+        if block_structure is None or BlockStructureTransformers.is_collected_outdated(block_structure):
+            return False
+
+        subtree_root_keys = self._get_subtree_root_keys(block_structure, changed_usage_keys)
+        if not subtree_root_keys or self.root_block_usage_key in subtree_root_keys:
+            return False
+
+        partial_block_structure = BlockStructureFactory.create_partial_from_modulestore(
+            block_structure,
+            subtree_root_keys,
+            self.modulestore,
+        )
+        BlockStructureTransformers.collect(partial_block_structure)
+        replaced = block_structure._replace_subtrees(  # pylint: disable=protected-access
+            partial_block_structure,
+            subtree_root_keys,
+        )
+        if not replaced:
+            return False
+
+        logger.info(
+            "Incrementally updated BlockStructure %s for the subtrees at %s.",
+            self.root_block_usage_key,
+            [unicode(subtree_root_key) for subtree_root_key in subtree_root_keys],
+        )
+        self.block_structure_cache.add(block_structure)
+        return True
+
+    def _get_subtree_root_keys(self, block_structure, changed_usage_keys):
+        """
+        Returns the usage keys, as found in the given block structure, of
+        the roots of the subtrees that need to be recollected for the
+        given changed blocks; returns None if they cannot be determined.
+
+        A changed block that is new is recollected from its closest
+        ancestor in the block structure, and a changed block that no
+        longer exists is recollected from its parents.  Subtrees
+        contained in other subtrees are omitted.
+        """
+        subtree_root_keys = set()
+
+        for block_key in changed_usage_keys:
+            try:
+                while block_key not in block_structure:
+                    block_key = self.modulestore.get_parent_location(block_key)
+                    if block_key is None:
+                        return None
+            except ItemNotFoundError:
+                return None
+
+            if self.modulestore.has_item(block_key):
+                subtree_root_keys.add(block_key)
+            else:
+                subtree_root_keys.update(block_structure.get_parents(block_key))
+
+        return {
+            subtree_root_key for subtree_root_key in subtree_root_keys
+            if not any(
+                ancestor_key in subtree_root_keys
+                for ancestor_key in traverse_pre_order(subtree_root_key, block_structure.get_parents)
+                if ancestor_key != subtree_root_key
+            )
+        }
@@ -1,12 +1,13 @@
 """
 Common utilities for tests in block_structure module
 """
-from contextlib import contextmanager
+from contextlib import closing, contextmanager
+from StringIO import StringIO
 from mock import patch
 from xmodule.modulestore.exceptions import ItemNotFoundError
 
 from ..block_structure import BlockStructureBlockData
-from ..transformer import BlockStructureTransformer
+from ..transformer import BlockStructureTransformer, FilteringTransformerMixin
 
 
 class MockXBlock(object):
@@ -68,6 +69,27 @@ class MockModulestore(object):
             raise ItemNotFoundError
         return item
 
+    def has_item(self, block_key):
+        """
+        Returns whether a mock XBlock is associated with the given
+        block_key.
+        """
+        return block_key in self.blocks
+
+    def get_parent_location(self, block_key):
+        """
+        Returns the block key of the parent of the mock XBlock associated
+        with the given block_key, or None if it has no parent.
+
+        Raises ItemNotFoundError if the item is not found.
+        """
+        if block_key not in self.blocks:
+            raise ItemNotFoundError
+        return next(
+            (parent_key for parent_key, block in self.blocks.iteritems() if block_key in block.children),
+            None
+        )
+
 
 class MockCache(object):
     """
@@ -95,6 +117,32 @@ class MockCache(object):
         """
         return self.map.get(key, default)
 
+    def add(self, key, val, timeout):  # pylint: disable=unused-argument
+        """
+        Associates the given key with the given value in the cache,
+        unless the key is already in the cache.  Returns whether it was
+        added.
+        """
+        if key in self.map:
+            return False
+        self.map[key] = val
+        return True
+
+    def set_many(self, data, timeout):
+        """
+        Associates each of the given keys with its value in the cache.
+        """
+        self.set_call_count += 1
+        self.map.update(data)
+        self.timeout_from_last_call = timeout
+
+    def get_many(self, keys):
+        """
+        Returns a dictionary of the given keys that are found in the
+        cache, mapped to their values.
+        """
+        return {key: self.map[key] for key in keys if key in self.map}
+
     def delete(self, key):
         """
         Deletes the given key from the cache.
@@ -102,6 +150,47 @@ class MockCache(object):
         del self.map[key]
 
 
+class MockStorage(object):
+    """
+    A mock Storage object, providing only the minimum features needed
+    by the block cache framework.
+    """
+    def __init__(self):
+        # An in-memory map of file names to file contents.
+        self.files = {}
+
+    def exists(self, name):
+        """
+        Returns whether a file with the given name exists.
+        """
+        return name in self.files
+
+    def save(self, name, content):
+        """
+        Saves the given content under the given name.
+        """
+        self.files[name] = content.read()
+        return name
+
+    def open(self, name):
+        """
+        Returns a file-like object for the file with the given name.
+        """
+        return closing(StringIO(self.files[name]))
+
+    def delete(self, name):
+        """
+        Deletes the file with the given name.
+        """
+        del self.files[name]
+
+    def path(self, name):
+        """
+        Like remote storages, this storage has no local paths.
+        """
+        raise NotImplementedError()
+
+
 class MockModulestoreFactory(object):
     """
     A factory for creating MockModulestore objects.
@@ -140,6 +229,25 @@ class MockTransformer(BlockStructureTransformer):
         pass
 
 
+class MockFilteringTransformer(FilteringTransformerMixin, BlockStructureTransformer):
+    """
+    A mock FilteringTransformerMixin class that removes the blocks
+    in its removed_blocks list.
+    """
+    VERSION = 1
+
+    def __init__(self, removed_blocks=None):
+        self.removed_blocks = removed_blocks or []
+
+    @classmethod
+    def name(cls):
+        # Use the class' name for Mock transformers.
+        return cls.__name__
+
+    def transform_block_filters(self, usage_info, block_structure):
+        return [lambda block_key: block_key in self.removed_blocks]
+
+
 @contextmanager
 def mock_registered_transformers(transformers):
     """
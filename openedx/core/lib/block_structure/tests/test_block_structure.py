@@ -11,7 +11,7 @@ from unittest import TestCase
 
 from openedx.core.lib.graph_traversals import traverse_post_order
 
-from ..block_structure import BlockStructure, BlockStructureModulestoreData
+from ..block_structure import BlockStructure, BlockStructureModulestoreData, _CompactBlockStructure
 from ..exceptions import TransformerException
 from .helpers import MockXBlock, MockTransformer, ChildrenMapTestMixin
 
@@ -219,3 +219,60 @@ class TestBlockStructureData(TestCase, ChildrenMapTestMixin):
         block_structure = self.create_block_structure(ChildrenMapTestMixin.LINEAR_CHILDREN_MAP)
         block_structure.remove_block_if(lambda block: block == 2)
         self.assert_block_structure(block_structure, [[1], [], [], []], missing_blocks=[2])
+
+
+@attr('shard_2')
+@ddt.ddt
+class TestCompactBlockStructure(TestCase, ChildrenMapTestMixin):
+    """
+    Tests for _CompactBlockStructure
+    """
+    @ddt.data(
+        [],
+        ChildrenMapTestMixin.SIMPLE_CHILDREN_MAP,
+        ChildrenMapTestMixin.LINEAR_CHILDREN_MAP,
+        ChildrenMapTestMixin.DAG_CHILDREN_MAP,
+    )
+    def test_relations(self, children_map):
+        block_structure = self.create_block_structure(children_map)
+        compact = _CompactBlockStructure.from_block_structure(block_structure)
+        self.assertEquals(len(compact.block_keys), max(len(children_map), 1))
+        self.assertEquals(len(compact.child_indices), sum(len(children) for children in children_map))
+
+        expanded = compact.to_block_structure(block_structure.root_block_usage_key)
+        self.assertEquals(expanded.root_block_usage_key, block_structure.root_block_usage_key)
+        self.assert_block_structure(expanded, children_map)
+        self.assertEquals(
+            list(expanded.topological_traversal()),
+            list(block_structure.topological_traversal()),
+        )
+
+    def test_block_data(self):
+        block_structure = self.create_block_structure(self.SIMPLE_CHILDREN_MAP, BlockStructureModulestoreData)
+        for block_key in block_structure:
+            block_structure._add_xblock(block_key, MockXBlock(block_key, {"field1": block_key, "field2": None}))
+        block_structure._xblock_map[3].field_map.pop("field2")
+        block_structure.request_xblock_fields("field1", "field2")
+        block_structure._collect_requested_xblock_fields()
+
+        transformer = MockTransformer()
+        block_structure._add_transformer(transformer)
+        block_structure.set_transformer_data(transformer, "global", "global.val")
+        block_structure.set_transformer_block_field(1, transformer, "key", "1.val")
+        block_structure.set_transformer_block_field(4, transformer, "key", False)
+
+        expanded = _CompactBlockStructure.from_block_structure(block_structure).to_block_structure(0)
+
+        for block_key in block_structure:
+            for field in ["field1", "field2"]:
+                self.assertEquals(
+                    expanded.get_xblock_field(block_key, field, "default"),
+                    block_structure.get_xblock_field(block_key, field, "default"),
+                )
+            self.assertEquals(
+                expanded.get_transformer_block_data(block_key, transformer),
+                block_structure.get_transformer_block_data(block_key, transformer),
+            )
+        self.assertEquals(expanded.get_xblock_field(3, "field2", "default"), "default")
+        self.assertEquals(expanded.get_transformer_data(transformer, "global"), "global.val")
+        self.assertEquals(expanded._get_transformer_data_version(transformer), MockTransformer.VERSION)
@@ -1,11 +1,20 @@
 """
 Tests for block_structure/cache.py
 """
+import os
+import shutil
+import tempfile
+from django.core.files.storage import FileSystemStorage
+from mock import patch
 from nose.plugins.attrib import attr
 from unittest import TestCase
 
-from ..cache import BlockStructureCache
-from .helpers import ChildrenMapTestMixin, MockCache, MockTransformer
+from openedx.core.lib.cache_utils import zpickle
+from xmodule.util.codecs import get_codec
+
+from ..block_structure import _CompactBlockStructure
+from ..cache import BlockStructureCache, CACHE_TIMEOUT
+from .helpers import ChildrenMapTestMixin, MockCache, MockStorage, MockTransformer
 
 
 @attr('shard_2')
@@ -42,6 +51,23 @@ class TestBlockStructureCache(ChildrenMapTestMixin, TestCase):
         self.assertIsNotNone(cached_value)
         self.assert_block_structure(cached_value, self.children_map)
 
+    def test_add_and_get_with_codec(self):
+        self.block_structure_cache = BlockStructureCache(self.mock_cache, codec=get_codec('pickle', 'none'))
+        self.add_transformers()
+        self.block_structure_cache.add(self.block_structure)
+
+        # Block structures cached with another codec can still be read.
+        cached_value = BlockStructureCache(self.mock_cache).get(self.block_structure.root_block_usage_key)
+        self.assert_block_structure(cached_value, self.children_map)
+
+    def test_get_zpickled(self):
+        root_cache_key = BlockStructureCache._encode_root_cache_key(self.block_structure.root_block_usage_key)
+        self.mock_cache.set(
+            root_cache_key, zpickle(_CompactBlockStructure.from_block_structure(self.block_structure)), None
+        )
+        cached_value = self.block_structure_cache.get(self.block_structure.root_block_usage_key)
+        self.assert_block_structure(cached_value, self.children_map)
+
     def test_get_none(self):
         self.assertIsNone(
             self.block_structure_cache.get(self.block_structure.root_block_usage_key)
@@ -54,3 +80,84 @@ class TestBlockStructureCache(ChildrenMapTestMixin, TestCase):
         self.assertIsNone(
             self.block_structure_cache.get(self.block_structure.root_block_usage_key)
         )
+
+    def test_add_and_get_chunked(self):
+        self.block_structure_cache = BlockStructureCache(self.mock_cache, chunk_size=50)
+        self.add_transformers()
+        self.block_structure_cache.add(self.block_structure)
+        self.assertGreater(len(self.mock_cache.map), 2)
+        self.assertEquals(self.mock_cache.timeout_from_last_call, 60 * 60 * 24)
+
+        cached_value = self.block_structure_cache.get(self.block_structure.root_block_usage_key)
+        self.assertIsNotNone(cached_value)
+        self.assert_block_structure(cached_value, self.children_map)
+        self.assertEquals(
+            cached_value.get_transformer_block_field(0, MockTransformer, 'test'),
+            '{} val'.format(MockTransformer.name()),
+        )
+
+    def test_get_chunked_missing_chunk(self):
+        self.block_structure_cache = BlockStructureCache(self.mock_cache, chunk_size=50)
+        self.block_structure_cache.add(self.block_structure)
+        root_cache_key = BlockStructureCache._encode_root_cache_key(self.block_structure.root_block_usage_key)
+        chunk_key = next(key for key in self.mock_cache.map if key != root_cache_key)
+        self.mock_cache.delete(chunk_key)
+        self.assertIsNone(
+            self.block_structure_cache.get(self.block_structure.root_block_usage_key)
+        )
+
+    def test_get_from_storage(self):
+        storage = MockStorage()
+        self.block_structure_cache = BlockStructureCache(self.mock_cache, storage)
+        self.add_transformers()
+        self.block_structure_cache.add(self.block_structure)
+        self.assertEquals(len(storage.files), 1)
+
+        # Mimic eviction from the cache.
+        self.mock_cache.map.clear()
+        cached_value = self.block_structure_cache.get(self.block_structure.root_block_usage_key)
+        self.assertIsNotNone(cached_value)
+        self.assert_block_structure(cached_value, self.children_map)
+
+        # The block structure is re-added to the cache.
+        self.assertEquals(len(self.mock_cache.map), 1)
+
+    def test_get_from_storage_until_expired(self):
+        storage = MockStorage()
+        self.block_structure_cache = BlockStructureCache(self.mock_cache, storage)
+        with patch('openedx.core.lib.block_structure.cache.time.time', return_value=1000):
+            self.block_structure_cache.add(self.block_structure)
+
+        # The block structure is re-added to the cache only until it expires in the storage.
+        self.mock_cache.map.clear()
+        with patch('openedx.core.lib.block_structure.cache.time.time', return_value=1000 + CACHE_TIMEOUT - 10):
+            self.assertIsNotNone(self.block_structure_cache.get(self.block_structure.root_block_usage_key))
+        self.assertEquals(self.mock_cache.timeout_from_last_call, 10)
+
+        self.mock_cache.map.clear()
+        with patch('openedx.core.lib.block_structure.cache.time.time', return_value=1000 + CACHE_TIMEOUT):
+            self.assertIsNone(self.block_structure_cache.get(self.block_structure.root_block_usage_key))
+        self.assertEquals(self.mock_cache.map, {})
+
+    def test_add_to_file_system_storage(self):
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location)
+        self.block_structure_cache = BlockStructureCache(self.mock_cache, FileSystemStorage(location))
+        self.block_structure_cache.add(self.block_structure)
+        self.block_structure_cache.add(self.block_structure)
+
+        # The stored file is replaced, without leaving temporary files behind.
+        self.assertEquals(os.listdir(os.path.join(location, 'block_structures')), ['0.zpickle'])
+        self.mock_cache.map.clear()
+        cached_value = self.block_structure_cache.get(self.block_structure.root_block_usage_key)
+        self.assert_block_structure(cached_value, self.children_map)
+
+    def test_delete_from_storage(self):
+        storage = MockStorage()
+        self.block_structure_cache = BlockStructureCache(self.mock_cache, storage)
+        self.block_structure_cache.add(self.block_structure)
+        self.block_structure_cache.delete(self.block_structure.root_block_usage_key)
+        self.assertEquals(storage.files, {})
+        self.assertIsNone(
+            self.block_structure_cache.get(self.block_structure.root_block_usage_key)
+        )
@@ -1,6 +1,7 @@
 """
 Tests for manager.py
 """
+from mock import patch
 from nose.plugins.attrib import attr
 from unittest import TestCase
 
@@ -12,6 +13,16 @@ from .helpers import (
 )
 
 
+#     0
+#    / \
+#   1  2
+#  / \   \
+# 3   4   5
+#        / \
+#       6   7
+UPDATED_CHILDREN_MAP = [[1, 2], [3, 4], [5], [], [], [6, 7], [], []]
+
+
 class TestTransformer1(MockTransformer):
     """
     Test Transformer class with basic functionality to verify collected and
@@ -159,3 +170,50 @@ class TestBlockStructureManager(TestCase, ChildrenMapTestMixin):
         self.bs_manager.clear()
         self.collect_and_verify(expect_modulestore_called=True, expect_cache_updated=True)
         self.assertEquals(TestTransformer1.collect_call_count, 2)
+
+    def update_and_verify(self, changed_usage_keys, expect_modulestore_call_count):
+        """
+        Updates the modulestore to UPDATED_CHILDREN_MAP, calls the manager's
+        update_collected method with the given changed_usage_keys, and
+        verifies the updated block structure in the cache.
+        """
+        self.collect_and_verify(expect_modulestore_called=True, expect_cache_updated=True)
+        self.children_map = UPDATED_CHILDREN_MAP
+        self.modulestore = MockModulestoreFactory.create(self.children_map)
+        self.bs_manager.modulestore = self.modulestore
+        with mock_registered_transformers(self.registered_transformers):
+            self.bs_manager.update_collected(changed_usage_keys)
+        self.assertEquals(self.modulestore.get_items_call_count, expect_modulestore_call_count)
+        self.collect_and_verify(expect_modulestore_called=False, expect_cache_updated=False)
+
+    def test_update_collected_subtrees(self):
+        # Only block 2's new subtree (2, 5, 6, 7), its ancestor (0) and
+        # the ancestor's children (1, 2) are read from the modulestore.
+        self.update_and_verify(changed_usage_keys={5}, expect_modulestore_call_count=7)
+        self.assertEquals(TestTransformer1.collect_call_count, 2)
+
+    def test_update_collected_unknown_changes(self):
+        self.update_and_verify(changed_usage_keys=None, expect_modulestore_call_count=len(UPDATED_CHILDREN_MAP))
+        self.assertEquals(TestTransformer1.collect_call_count, 2)
+
+    def test_update_collected_waits_for_other_update(self):
+        # Another update holds the lock, which it releases while this update waits.
+        lock_key = 'lock.key.0'
+        self.cache.add(lock_key, 'other update', timeout=60)
+        with patch(
+            'openedx.core.lib.block_structure.cache.time.sleep', side_effect=lambda _: self.cache.delete(lock_key)
+        ) as mock_sleep:
+            self.update_and_verify(changed_usage_keys={5}, expect_modulestore_call_count=7)
+        self.assertEquals(mock_sleep.call_count, 1)
+        self.assertNotIn(lock_key, self.cache.map)
+
+    def test_update_collected_deleted_block(self):
+        self.collect_and_verify(expect_modulestore_called=True, expect_cache_updated=True)
+        self.children_map = [[1, 2], [3], [], [], []]
+        self.modulestore = MockModulestoreFactory.create(self.children_map)
+        del self.modulestore.blocks[4]
+        self.bs_manager.modulestore = self.modulestore
+        with mock_registered_transformers(self.registered_transformers):
+            self.bs_manager.update_collected({4})
+        self.children_map = [[1, 2], [3], [], []]
+        self.collect_and_verify(expect_modulestore_called=False, expect_cache_updated=False)
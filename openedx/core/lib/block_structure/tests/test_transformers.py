@@ -9,7 +9,7 @@ from ..block_structure import BlockStructureModulestoreData
 from ..exceptions import TransformerException
 from ..transformers import BlockStructureTransformers
 from .helpers import (
-    ChildrenMapTestMixin, MockTransformer, mock_registered_transformers
+    ChildrenMapTestMixin, MockFilteringTransformer, MockTransformer, mock_registered_transformers
 )
 
 
@@ -63,6 +63,43 @@ class TestBlockStructureTransformers(ChildrenMapTestMixin, TestCase):
             self.transformers.transform(block_structure=MagicMock())
             self.assertTrue(mock_transform_call.called)
 
+    def test_transform_filtering(self):
+        block_structure = self.create_block_structure(self.SIMPLE_CHILDREN_MAP)
+        with mock_registered_transformers([MockFilteringTransformer]):
+            self.transformers += [MockFilteringTransformer([1]), MockFilteringTransformer([2])]
+
+        with patch.object(block_structure, 'remove_block_if', wraps=block_structure.remove_block_if) as mock_remove:
+            self.transformers.transform(block_structure)
+
+        # The removal conditions of both transformers are applied in a
+        # single traversal.
+        self.assertEquals(mock_remove.call_count, 1)
+        self.assert_block_structure(block_structure, [[], [], [], [], []], missing_blocks=[1, 2, 3, 4])
+
+    def test_transform_filtering_order(self):
+        block_structure = self.create_block_structure(self.SIMPLE_CHILDREN_MAP)
+        filtering_transformer = MockFilteringTransformer([3])
+        with mock_registered_transformers([MockFilteringTransformer, MockTransformer]):
+            self.transformers += [filtering_transformer, MockTransformer(), MockFilteringTransformer([2])]
+
+        def transform(usage_info, block_structure):  # pylint: disable=unused-argument
+            """
+            Verifies the removal conditions of the preceding filtering
+            transformer are applied before this transformer is.
+            """
+            self.assertNotIn(3, block_structure)
+            self.assertIn(2, block_structure)
+            filtering_transformer.removed_blocks.append(4)
+
+        with patch(
+            'openedx.core.lib.block_structure.tests.helpers.MockTransformer.transform',
+            side_effect=transform,
+        ) as mock_transform_call:
+            self.transformers.transform(block_structure)
+            self.assertTrue(mock_transform_call.called)
+
+        self.assert_block_structure(block_structure, [[1], [4], [], [], []], missing_blocks=[2, 3])
+
     def test_is_collected_outdated(self):
         block_structure = self.create_block_structure(
             self.SIMPLE_CHILDREN_MAP,
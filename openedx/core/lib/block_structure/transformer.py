@@ -126,3 +126,67 @@ class BlockStructureTransformer(object):
                 transformer, that is to be transformed in place.
         """
         pass
+
+
+class FilteringTransformerMixin(BlockStructureTransformer):
+    """
+    Transformers may optionally choose to implement this mixin if their
+    transform logic consists of removing blocks from the block structure
+    based only on each block's own collected data.
+
+    Instead of traversing the block structure themselves, such
+    transformers return removal conditions from
+    transform_block_filters.  When consecutive filtering transformers
+    are applied by BlockStructureTransformers, their removal conditions
+    are combined and applied in a single traversal of the block
+    structure, rather than one traversal per transformer.
+    """
+    def transform(self, usage_info, block_structure):
+        """
+        Applies this transformer's removal conditions to the given
+        block_structure on their own.  In normal operation, the removal
+        conditions of consecutive filtering transformers are instead
+        combined by BlockStructureTransformers.
+        """
+        removal_conditions = self.transform_block_filters(usage_info, block_structure)
+        if removal_conditions:
+            block_structure.remove_block_if(combine_removal_conditions(removal_conditions))
+
+    @abstractmethod
+    def transform_block_filters(self, usage_info, block_structure):
+        """
+        Returns a list of removal conditions for the given usage_info.
+        The blocks that satisfy any of the removal conditions, along with
+        their descendants, are removed from the block_structure.
+
+        Since the removal conditions of several transformers are applied
+        together in a single traversal, a removal condition must depend
+        only on the collected data of the block it is given and on
+        data computed when this method is called, and not on which
+        other blocks are in the block_structure at the time it is
+        applied.
+
+        This method may itself mutate the block_structure, as long as it
+        does so before returning.
+
+        Arguments:
+            usage_info (any negotiated type) - See the description in
+                BlockStructureTransformer.transform.
+
+            block_structure (BlockStructureBlockData) - A mutable
+                block structure, with already collected data for the
+                transformer.
+
+        Returns:
+            [(usage_key)->bool] - A list of functions that take a block's
+                usage key and return whether or not to remove that block.
+        """
+        pass
+
+
+def combine_removal_conditions(removal_conditions):
+    """
+    Returns a single removal condition that is satisfied by a block if
+    any of the given removal_conditions is satisfied by it.
+    """
+    return lambda block_key: any(removal_condition(block_key) for removal_condition in removal_conditions)
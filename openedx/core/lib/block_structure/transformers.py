@@ -4,6 +4,7 @@ Module for a collection of BlockStructureTransformers.
 from logging import getLogger
 
 from .exceptions import TransformerException
+from .transformer import FilteringTransformerMixin, combine_removal_conditions
 from .transformer_registry import TransformerRegistry
 
 
@@ -80,13 +81,32 @@ class BlockStructureTransformers(object):
         """
         The given block structure is transformed by each transformer in the
         collection, in the order that the transformers were added.
+
+        The removal conditions of consecutive filtering transformers are
+        combined and applied in a single traversal of the block structure.
         """
+        removal_conditions = []
         for transformer in self._transformers:
-            transformer.transform(self.usage_info, block_structure)
+            if isinstance(transformer, FilteringTransformerMixin):
+                removal_conditions.extend(transformer.transform_block_filters(self.usage_info, block_structure))
+            else:
+                self._remove_blocks(block_structure, removal_conditions)
+                removal_conditions = []
+                transformer.transform(self.usage_info, block_structure)
+        self._remove_blocks(block_structure, removal_conditions)
 
         # Prune the block structure to remove any unreachable blocks.
         block_structure._prune_unreachable()  # pylint: disable=protected-access
 
+    @classmethod
+    def _remove_blocks(cls, block_structure, removal_conditions):
+        """
+        Removes the blocks that satisfy any of the given removal
+        conditions from the given block structure, in a single traversal.
+        """
+        if removal_conditions:
+            block_structure.remove_block_if(combine_removal_conditions(removal_conditions))
+
     @classmethod
     def is_collected_outdated(cls, block_structure):
         """